@@ -8,19 +8,26 @@ const UserLoader = {
     // パス設定
     seasonsConfigPath: 'config/seasons.json',
     sessionStatsPath: 'data/session_stats.csv',
+    sessionIndexPath: 'data/sessions/index.json',
+    dataBasePath: 'data/',
     seasonStatsPathTemplate: 'data/season_{id}_stats.csv',
     allStatsPath: 'data/all_stats.csv',
+    rangesPathTemplate: 'data/ranges/{id}.json',
 
     // データキャッシュ
     seasonsConfig: null,
-    sessionStatsData: null,
+    sessionStatsData: [],
+    sessionIndex: null,
+    loadedSessionDates: new Set(),
     seasonStatsData: {},
     allStatsData: null,
+    rangesData: null,
 
     // 状態
     playerId: null,
     currentSeasonId: null,
     chartInstance: null,
+    rangeAction: 'open',
 
     pageHref(path) {
         return `${this.internalBasePath}${String(path).replace(/^\/+/, '')}`;
@@ -42,7 +49,7 @@ const UserLoader = {
 
             // データロード
             await this.loadSeasonsConfig();
-            await this.loadSessionStats();
+            await this.loadSessionIndex();
 
             // デフォルトシーズンを設定
             this.currentSeasonId = this.seasonsConfig.current_season_id ||
@@ -86,6 +93,8 @@ const UserLoader = {
                 return;
             }
 
+            await this.loadSessionStats(this.currentSeasonId);
+
             // ページタイトルを更新
             document.title = `${player['プレイヤー']} の戦績 | ポーカー鳳凰戦`;
 
@@ -95,6 +104,8 @@ const UserLoader = {
             this.renderSeasonSummary(player);
             this.renderWeeklyChart();
             this.renderPokerStats(player);
+            await this.loadRanges();
+            this.renderRanges();
             this.renderLeagueConditions(player);
             this.setupShareButtons(player);
             this.setupChartShare(player);
@@ -114,14 +125,44 @@ const UserLoader = {
         this.seasonsConfig = await response.json();
     },
 
+    /**
+     * 節ごとのファイルのインデックスを読み込み（無ければ session_stats.csv を使う）
+     */
+    async loadSessionIndex() {
+        try {
+            const response = await fetch(this.sessionIndexPath);
+            if (response.ok) this.sessionIndex = await response.json();
+        } catch (e) {
+            this.sessionIndex = null;
+        }
+    },
+
     /**
      * セッション別スタッツを読み込み
+     * インデックスがあればそのシーズンの節のファイルだけを取得する（ハッシュをクエリに付けてキャッシュさせる）
      */
-    async loadSessionStats() {
-        const response = await fetch(this.sessionStatsPath);
-        if (!response.ok) throw new Error('session_stats.csv の読み込みに失敗');
-        const csvText = await response.text();
-        this.sessionStatsData = this.parseCSV(csvText);
+    async loadSessionStats(seasonId) {
+        if (!this.sessionIndex) {
+            if (this.loadedSessionDates.has('*')) return;
+            const response = await fetch(this.sessionStatsPath);
+            if (!response.ok) throw new Error('session_stats.csv の読み込みに失敗');
+            const csvText = await response.text();
+            this.sessionStatsData = this.parseCSV(csvText);
+            this.loadedSessionDates.add('*');
+            return;
+        }
+
+        const partitions = this.sessionIndex.partitions.filter(
+            p => p.season_id === seasonId && !this.loadedSessionDates.has(p.date)
+        );
+        const results = await Promise.all(partitions.map(async (partition) => {
+            const file = partition.files.session_stats;
+            const response = await fetch(`${this.dataBasePath}${file.path}?v=${file.sha256.slice(0, 12)}`);
+            if (!response.ok) throw new Error(`${file.path} の読み込みに失敗`);
+            return this.parseCSV(await response.text());
+        }));
+        partitions.forEach(p => this.loadedSessionDates.add(p.date));
+        results.forEach(rows => this.sessionStatsData.push(...rows));
     },
 
     /**
@@ -301,6 +342,11 @@ const UserLoader = {
         } catch (e) {
             // CSVが存在しない場合、空データとして扱う
         }
+        try {
+            await this.loadSessionStats(seasonId);
+        } catch (e) {
+            // 節のファイルが読めない場合、チャートは空で表示する
+        }
 
         let player = this.findPlayer(seasonId);
         if (!player) {
@@ -311,6 +357,7 @@ const UserLoader = {
         this.renderSeasonSummary(player);
         this.renderWeeklyChart();
         this.renderPokerStats(player);
+        this.renderRanges();
         this.renderLeagueConditions(player);
         this.setupChartShare(player);
     },
@@ -595,6 +642,69 @@ const UserLoader = {
         container.innerHTML = html;
     },
 
+    /**
+     * 見せたハンドの表（preflop_ranges.py の出力）を読み込み。無ければ null のまま
+     */
+    async loadRanges() {
+        try {
+            const response = await fetch(this.rangesPathTemplate.replace('{id}', encodeURIComponent(this.playerId)));
+            this.rangesData = response.ok ? await response.json() : null;
+        } catch (e) {
+            this.rangesData = null;
+        }
+    },
+
+    /**
+     * 見せたハンドの 13x13 のヒートマップを描画（表示中のシーズン・選択中のアクション）
+     */
+    renderRanges() {
+        const section = document.getElementById('preflop-ranges-section');
+        const summary = this.rangesData && this.rangesData.seasons[String(this.currentSeasonId)];
+        if (!summary || !summary.hands) {
+            section.classList.add('hidden');
+            return;
+        }
+        section.classList.remove('hidden');
+
+        const actions = [
+            { key: 'open', label: 'オープン' },
+            { key: 'call', label: 'コール' },
+            { key: '3bet', label: '3bet' },
+        ];
+        const sum = values => values.reduce((a, b) => a + b, 0);
+        const tabs = document.getElementById('preflop-ranges-tabs');
+        tabs.innerHTML = actions.map(action => `
+            <button class="season-tab${action.key === this.rangeAction ? ' active' : ''}" data-action="${action.key}">
+                ${action.label} (${sum(summary[action.key])})
+            </button>
+        `).join('');
+        tabs.querySelectorAll('.season-tab').forEach(tab => {
+            tab.addEventListener('click', (e) => {
+                this.rangeAction = e.currentTarget.dataset.action;
+                this.renderRanges();
+            });
+        });
+
+        // 行・列とも A から 2 の順。右上がスーテッド、左下がオフスート
+        const ranks = 'AKQJT98765432';
+        const counts = summary[this.rangeAction];
+        const max = Math.max(...counts);
+        let html = '';
+        counts.forEach((count, index) => {
+            const row = Math.floor(index / 13);
+            const col = index % 13;
+            let label;
+            if (row === col) label = ranks[row] + ranks[row];
+            else if (row < col) label = `${ranks[row]}${ranks[col]}s`;
+            else label = `${ranks[col]}${ranks[row]}o`;
+            const style = count ? ` style="background-color: rgba(212, 175, 55, ${(0.25 + 0.75 * count / max).toFixed(2)})"` : '';
+            html += `<div class="range-cell${count ? ' shown' : ''}"${style} title="${label}: ${count}">${label}</div>`;
+        });
+        document.getElementById('preflop-ranges-grid').innerHTML = html;
+        document.getElementById('preflop-ranges-note').textContent =
+            `ショーダウンなどで見せたハンド ${summary.hands} 回（プリフロップのアクション別）`;
+    },
+
     /**
      * リーグ条件を表示
      */
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+オールインの EV 収支（All-in adjusted）
+
+ベッティングが終わった（全員オールイン、または残りが1人を除いてオールイン）あとにボードが
+配られたハンドについて、オールイン時点のエクイティで各プレイヤーの取り分を期待値に置き換える。
+EV 収支 = 収支 + Σ（ポットの取り分の期待値 - 実際に獲得した額）。
+運の良し悪し（オールイン後のボード）を除いた収支になる。
+
+対象にするハンド（PokerNowParser で変換したテキスト）:
+- 最後のアクション（fold / check / call / bet / raise）がリバーより前
+- フォールドしていない2人以上が全員ハンドを見せている（2枚とも）
+- 1回目のボードが5枚まで配られている（ラン・イット・トゥワイスでも期待値は同じなので1回目のボードの
+  オールイン時点までを使う）
+- 獲得額の合計が投入額の合計と一致する（未コールの返却は変換で消えているので、各ストリートの
+  最大額を2番目の額までに切り詰めて求める）
+
+サイドポットはフォールドしていないプレイヤーの投入額の段ごとに分け、段ごとの対象プレイヤーで
+エクイティを求める（hand_evaluator.equity、残りのボードをすべて列挙）。
+
+Usage:
+    python scripts/allin_ev.py [--season 3] [--data-dir data]   # シーズンの全ショーダウンの評価時間と EV 収支
+"""
+
+import argparse
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from hand_evaluator import equity, parse_card
+
+
+BB_PATTERN = re.compile(r"Hold'em No Limit \(\d+/(\d+)\)")
+ACTION_PATTERN = re.compile(r"^(.*): (folds|checks|calls|bets|raises|posts|shows|wins)\b(.*)$")
+BOARD_PATTERN = re.compile(r"^\*\*\* (?:FLOP|TURN|RIVER) \*\*\* \[(.*)\]")
+CARD_PATTERN = re.compile(r"(?:10|[2-9TJQKA])[shdc]")
+AMOUNT_PATTERN = re.compile(r"(\d+)")
+# ベッティングのアクション（最後のアクションのボードの枚数を見る）
+BETTING_VERBS = ("folds", "checks", "calls", "bets", "raises")
+# 補正を足すときに丸める桁（1/1,000,000 BB）。ハンドごとの値も丸めてから足すので、
+# ハンドをどう分けて足しても同じ float になる
+EV_DIGITS = 6
+
+
+@dataclass
+class AllInHand:
+    """オールイン後にボードが配られたハンド（EV 収支の対象）"""
+    bb: int
+    # オールイン時点のボード
+    board: List[int]
+    # フォールドしていないプレイヤー -> ホールカード
+    holes: Dict[str, Tuple[int, int]]
+    # プレイヤー -> 投入額（デッドマネーを除く、未コールの分は返却済み）
+    invested: Dict[str, int]
+    # プレイヤー -> 実際の獲得額
+    won: Dict[str, int]
+    # 欠けていた SB などのデッドマネーの合計（メインポットに入る）
+    dead: int = 0
+    pots: List[Tuple[int, List[str]]] = field(default_factory=list)
+
+    def build_pots(self) -> List[Tuple[int, List[str]]]:
+        """(額, 対象プレイヤー) のポット（メインポットから順）"""
+        levels = sorted({self.invested.get(name, 0) for name in self.holes})
+        pots = []
+        previous = 0
+        for level in levels:
+            amount = sum(max(0, min(c, level) - previous) for c in self.invested.values())
+            eligible = [name for name in self.holes if self.invested.get(name, 0) >= level]
+            if amount:
+                pots.append((amount, eligible))
+            previous = level
+        # フォールドしたプレイヤーの、残ったプレイヤーの最大額を超える分は最後のポットに入れる
+        overflow = sum(max(0, c - previous) for c in self.invested.values())
+        if pots:
+            pots[0] = (pots[0][0] + self.dead, pots[0][1])
+            pots[-1] = (pots[-1][0] + overflow, pots[-1][1])
+        self.pots = pots
+        return pots
+
+
+def _close_street(street: Dict[str, int], invested: Dict[str, int]) -> None:
+    """ストリートの額を投入額に足す（1人だけ最大額なら、返却された未コールの分を差し引く）"""
+    if street:
+        amounts = sorted(street.values(), reverse=True)
+        second = amounts[1] if len(amounts) > 1 else 0
+        for name, amount in street.items():
+            invested[name] = invested.get(name, 0) + min(amount, second)
+    street.clear()
+
+
+def parse_allin(history: str) -> Optional[AllInHand]:
+    """変換後の1ハンドから EV 収支の対象のハンドを取り出す（対象でなければ None）"""
+    if "shows" not in history:
+        return None
+    match = BB_PATTERN.search(history)
+    if match is None:
+        return None
+
+    board: List[int] = []
+    action_board = 0
+    street: Dict[str, int] = {}
+    invested: Dict[str, int] = {}
+    won: Dict[str, int] = {}
+    dead = 0
+    folded = set()
+    seen = set()
+    shown: Dict[str, Tuple[int, int]] = {}
+
+    for line in history.split("\n"):
+        board_match = BOARD_PATTERN.match(line)
+        if board_match:
+            _close_street(street, invested)
+            board.extend(parse_card(c) for c in CARD_PATTERN.findall(board_match.group(1)))
+            continue
+        action = ACTION_PATTERN.match(line)
+        if action is None:
+            continue
+        name, verb, rest = action.groups()
+        if verb == "wins":
+            won[name] = won.get(name, 0) + int(AMOUNT_PATTERN.search(rest).group(1))
+            continue
+        if verb == "shows":
+            cards = CARD_PATTERN.findall(rest)
+            if len(cards) == 2:
+                shown[name] = (parse_card(cards[0]), parse_card(cards[1]))
+            continue
+        seen.add(name)
+        if verb in BETTING_VERBS:
+            action_board = len(board)
+        if verb == "folds":
+            folded.add(name)
+        elif verb != "checks":
+            amount = int(AMOUNT_PATTERN.search(rest).group(1))
+            if rest.startswith(" a missing"):
+                dead += amount
+            else:
+                # Poker Now の額はストリートでの合計
+                street[name] = amount
+    _close_street(street, invested)
+
+    live = [name for name in seen if name not in folded]
+    if len(live) < 2 or action_board >= 5 or len(board) < 5:
+        return None
+    if any(name not in shown for name in live):
+        return None
+    if sum(won.values()) != sum(invested.values()) + dead:
+        return None
+
+    hand = AllInHand(
+        bb=int(match.group(1)),
+        board=board[:action_board],
+        holes={name: shown[name] for name in sorted(live)},
+        invested=invested,
+        won=won,
+        dead=dead,
+    )
+    hand.build_pots()
+    return hand
+
+
+def hand_ev_adjustments(hand: AllInHand) -> Dict[str, float]:
+    """プレイヤー -> 期待値と実際の獲得額の差（BB）"""
+    names = list(hand.holes)
+    index = {name: i for i, name in enumerate(names)}
+    shares = equity(
+        [hand.holes[name] for name in names], hand.board,
+        eligible=[[index[name] for name in eligible] for _, eligible in hand.pots],
+    )
+    adjustments = {}
+    for name in names:
+        expected = sum(shares[pot, index[name]] * amount for pot, (amount, _) in enumerate(hand.pots))
+        adjustments[name] = (expected - hand.won.get(name, 0)) / hand.bb
+    return adjustments
+
+
+def ev_adjustments(histories: Iterable[str]) -> Dict[str, float]:
+    """
+    ハンドごとの EV 収支の補正（BB）をプレイヤー名ごとに合計する
+
+    ハンドごとの和なので、ハンドを分けて計算した結果を足しても同じになる（EV_DIGITS で丸めながら足す）。
+    """
+    totals: Dict[str, float] = {}
+    for history in histories:
+        hand = parse_allin(history)
+        if hand is None:
+            continue
+        for name, delta in hand_ev_adjustments(hand).items():
+            totals[name] = round(totals.get(name, 0.0) + round(delta, EV_DIGITS), EV_DIGITS)
+    return totals
+
+
+def _season_histories(data_dir: Path, config, season_id: Optional[int]) -> Iterable[str]:
+    from csv_formatter import PokerNowParser
+    from dataset_manifest import LOG_PREFIX, DatasetManifest
+
+    manifest = DatasetManifest.refresh(data_dir, config, save=False)
+    for date_str in manifest.date_strs():
+        if season_id is not None and manifest.season_id(date_str) != season_id:
+            continue
+        for table in manifest.table_dirs(date_str):
+            log = manifest.table_file(date_str, table, LOG_PREFIX)
+            if log is None:
+                continue
+            formatted, _ = PokerNowParser(str(log)).parse()
+            yield from (h for h in formatted.split("\n\n") if h.strip())
+
+
+def main():
+    from config_loader import ConfigLoader
+    from hand_evaluator import prepare
+
+    parser = argparse.ArgumentParser(description="オールインの EV 収支を計算し、評価にかかる時間を表示")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--config-dir", default="config", help="設定ディレクトリのパス (default: config)")
+    parser.add_argument("--season", type=int, default=None, help="対象シーズン ID（default: 全期間）")
+    parser.add_argument("--top", type=int, default=10, help="補正の大きいプレイヤーを表示する人数 (default: 10)")
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).parent.parent
+    config = ConfigLoader(str(base_dir / args.config_dir))
+
+    start = time.perf_counter()
+    histories = list(_season_histories(base_dir / args.data_dir, config, args.season))
+    parsed = time.perf_counter()
+    prepare()
+    built = time.perf_counter()
+    hands = [hand for hand in map(parse_allin, histories) if hand is not None]
+    totals: Dict[str, float] = {}
+    streets = {0: 0, 3: 0, 4: 0}
+    for hand in hands:
+        streets[len(hand.board)] += 1
+        for name, delta in hand_ev_adjustments(hand).items():
+            totals[name] = totals.get(name, 0.0) + delta
+    evaluated = time.perf_counter()
+
+    title = f"シーズン {args.season}" if args.season is not None else "全期間"
+    print(f"{title}: {len(histories)} ハンド, オールインのショーダウン {len(hands)} "
+          f"(プリフロップ {streets[0]}, フロップ {streets[3]}, ターン {streets[4]})")
+    print(f"  ログの読み込み: {parsed - start:.2f}s")
+    print(f"  評価の表の作成: {built - parsed:.2f}s")
+    print(f"  エクイティの計算: {evaluated - built:.2f}s")
+    for name, delta in sorted(totals.items(), key=lambda item: -abs(item[1]))[:args.top]:
+        print(f"  {name}: {delta:+.2f} BB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+凍結シーズンのハンド履歴のアーカイブ
+
+凍結したシーズン（seasons.json の frozen: true）の日付ディレクトリ内のファイル
+（ハンド履歴ログ・Ledger・計算済み JSON / CSV）を .gz（または .xz）に圧縮して置き換える。
+読み込み側（PokerNowParser・LedgerParser・計算済み JSON・マニフェスト）は
+compressed_io で圧縮版をそのまま読めるので、設定の変更は不要。
+
+圧縮後のファイルは展開して元の内容と一致することを確認してから元ファイルを削除する。
+gzip のヘッダーには時刻とファイル名を入れないので、同じ内容からは同じバイト列になる
+（git の差分が出ない）。
+
+Usage:
+    python scripts/archive_sessions.py [--season 1 2] [--format gz|xz] [--preseason] [--dry-run]
+    python scripts/archive_sessions.py --restore --season 1       # 展開して元に戻す
+    python scripts/archive_sessions.py --benchmark --preseason    # 非圧縮と圧縮のパース時間を比較
+"""
+
+import argparse
+import gzip
+import hashlib
+import lzma
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import List
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from compressed_io import is_compressed, strip_compression
+
+
+FORMATS = {"gz": ".gz", "xz": ".xz"}
+COPY_CHUNK = 1 << 20
+
+
+def _open_compressed_writer(path: Path, fmt: str):
+    if fmt == "gz":
+        raw = open(path, "wb")
+        return gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=9, mtime=0), raw
+    return lzma.open(path, "wb", preset=9), None
+
+
+def _digest(f) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(COPY_CHUNK), b""):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _open_binary(path: Path):
+    if path.name.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.name.endswith(".xz"):
+        return lzma.open(path, "rb")
+    return open(path, "rb")
+
+
+def _write_compressed(src, path: Path, fmt: str) -> None:
+    writer, raw = _open_compressed_writer(path, fmt)
+    try:
+        shutil.copyfileobj(src, writer, COPY_CHUNK)
+    finally:
+        writer.close()
+        if raw is not None:
+            raw.close()
+
+
+def compress_file(path: Path, fmt: str) -> Path:
+    """path を圧縮して置き換え、圧縮後のパスを返す（展開結果を元ファイルと照合してから削除）"""
+    target = path.with_name(path.name + FORMATS[fmt])
+    tmp = target.with_name(target.name + ".tmp")
+    with open(path, "rb") as src:
+        _write_compressed(src, tmp, fmt)
+
+    with open(path, "rb") as f:
+        expected = _digest(f)
+    with (gzip.open(tmp, "rb") if fmt == "gz" else lzma.open(tmp, "rb")) as f:
+        actual = _digest(f)
+    if actual != expected:
+        tmp.unlink()
+        raise IOError(f"{path}: compressed content does not match the original")
+
+    os.replace(tmp, target)
+    path.unlink()
+    return target
+
+
+def restore_file(path: Path) -> Path:
+    """圧縮ファイルを展開して元の名前に戻す"""
+    target = path.with_name(strip_compression(path.name))
+    tmp = target.with_name(target.name + ".tmp")
+    with _open_binary(path) as src, open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK)
+    os.replace(tmp, target)
+    path.unlink()
+    return target
+
+
+def collect_files(directories: List[Path], restore: bool) -> List[Path]:
+    """対象ディレクトリ以下の、圧縮する（restore なら展開する）ファイル"""
+    files = []
+    for directory in directories:
+        for path in sorted(directory.rglob("*")):
+            if not path.is_file() or path.name.startswith(".") or path.name.endswith(".tmp"):
+                continue
+            if is_compressed(path.name) == restore:
+                files.append(path)
+    return files
+
+
+def benchmark(files: List[Path], repeat: int = 3) -> List[dict]:
+    """
+    ハンド履歴ログを非圧縮・.gz・.xz で置いたときの PokerNowParser のパース時間を測る
+
+    files（非圧縮・圧縮のどちらでもよい）から3形式のコピーを一時ディレクトリに作り、
+    全ログのパースを repeat 回ずつ計って最短の時間を返す。パース結果が形式によらず
+    同じことも確認する。元のファイルは変更しない。
+
+    Returns:
+        list: 形式ごとの {"format", "bytes", "seconds"}
+    """
+    import tempfile
+    import time
+    from csv_formatter import PokerNowParser
+
+    logs = [path for path in files if strip_compression(path.name).startswith("poker_now_log_")]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = {}
+        for fmt in ("plain", *FORMATS):
+            paths = []
+            for i, path in enumerate(logs):
+                name = f"{i:04d}_{strip_compression(path.name)}{FORMATS.get(fmt, '')}"
+                target = Path(tmp) / name
+                with _open_binary(path) as src:
+                    if fmt == "plain":
+                        with open(target, "wb") as dst:
+                            shutil.copyfileobj(src, dst, COPY_CHUNK)
+                    else:
+                        _write_compressed(src, target, fmt)
+                paths.append(target)
+            variants[fmt] = paths
+
+        expected = None
+        for fmt, paths in variants.items():
+            digest = hashlib.sha256()
+            for path in paths:
+                digest.update(PokerNowParser(str(path)).parse()[0].encode("utf-8"))
+            if expected is None:
+                expected = digest.hexdigest()
+            elif digest.hexdigest() != expected:
+                raise IOError(f"{fmt}: parsed output differs from the uncompressed logs")
+
+            seconds = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                for path in paths:
+                    PokerNowParser(str(path)).parse()
+                seconds.append(time.perf_counter() - started)
+            results.append({
+                "format": fmt,
+                "bytes": sum(path.stat().st_size for path in paths),
+                "seconds": min(seconds),
+            })
+    return results
+
+
+def main():
+    from config_loader import ConfigLoader
+    from dataset_manifest import DatasetManifest
+
+    parser = argparse.ArgumentParser(description="凍結シーズンのハンド履歴を圧縮してアーカイブ")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--config-dir", default="config", help="設定ディレクトリのパス (default: config)")
+    parser.add_argument("--season", type=int, nargs="+", default=None,
+                        help="対象シーズン ID（default: 凍結済みの全シーズン）")
+    parser.add_argument("--preseason", action="store_true", help="hand_histories/preseason も対象にする")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="gz", help="圧縮形式 (default: gz)")
+    parser.add_argument("--restore", action="store_true", help="圧縮ファイルを展開して元に戻す")
+    parser.add_argument("--dry-run", action="store_true", help="対象ファイルと合計サイズだけを表示")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="ファイルは変更せず、対象のログを非圧縮・gz・xz で置いたときのパース時間を比較")
+    parser.add_argument("--repeat", type=int, default=3, help="--benchmark の計測回数（最短を表示, default: 3）")
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).parent.parent
+    data_dir = base_dir / args.data_dir
+    config = ConfigLoader(str(base_dir / args.config_dir))
+
+    frozen = [s["id"] for s in config.get_all_seasons() if s.get("frozen")]
+    season_ids = args.season if args.season is not None else frozen
+    if not args.restore and not args.benchmark:
+        not_frozen = [sid for sid in season_ids if sid not in frozen]
+        if not_frozen:
+            print(f"Error: season {not_frozen} is not frozen (only frozen seasons can be archived)")
+            sys.exit(1)
+
+    manifest = DatasetManifest.refresh(data_dir, config, save=False)
+    directories = [
+        manifest.hand_histories_dir / date_str
+        for date_str in manifest.date_strs() if manifest.season_id(date_str) in season_ids
+    ]
+    if args.preseason and (manifest.hand_histories_dir / "preseason").exists():
+        directories.append(manifest.hand_histories_dir / "preseason")
+
+    if args.benchmark:
+        files = collect_files(directories, False) + collect_files(directories, True)
+        logs = [path for path in files if strip_compression(path.name).startswith("poker_now_log_")]
+        print(f"対象: シーズン {season_ids}{' + preseason' if args.preseason else ''}, "
+              f"ハンド履歴ログ {len(logs)} ファイル（{args.repeat} 回のうち最短）")
+        if not logs:
+            print("対象ファイルはありません")
+            return
+        results = benchmark(sorted(logs), args.repeat)
+        base = results[0]
+        for r in results:
+            print(f"  {r['format']:<6} {r['bytes'] / 1e6:7.1f} MB ({r['bytes'] / base['bytes']:6.1%})  "
+                  f"パース {r['seconds']:6.2f} 秒 ({r['seconds'] / base['seconds']:.2f}x)")
+        return
+
+    files = collect_files(directories, args.restore)
+    total_before = sum(path.stat().st_size for path in files)
+    action = "展開" if args.restore else f"圧縮 ({args.format})"
+    print(f"対象: シーズン {season_ids}{' + preseason' if args.preseason else ''}, "
+          f"{len(directories)} ディレクトリ, {len(files)} ファイル, {total_before / 1e6:.1f} MB")
+    if args.dry_run or not files:
+        print("[DRY RUN] ファイルは変更されていません" if args.dry_run else "対象ファイルはありません")
+        return
+
+    total_after = 0
+    for path in files:
+        result = restore_file(path) if args.restore else compress_file(path, args.format)
+        total_after += result.stat().st_size
+    print(f"{action}: {total_before / 1e6:.1f} MB -> {total_after / 1e6:.1f} MB "
+          f"({total_after / max(total_before, 1):.1%})")
+
+    DatasetManifest.refresh(data_dir, config)
+
+
+if __name__ == "__main__":
+    main()
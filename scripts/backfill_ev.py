@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+凍結シーズンの EV 収支の補正の後付け（1回だけ実行する移行スクリプト）
+
+EV収支の列を追加する前に凍結したシーズンの season_{N}_session_stats_raw.csv と
+season_{N}_stats_raw.csv に、ハンド履歴ログから計算した補正（ev_adjustment）と EV収支の列を書き足す。
+main.py は凍結シーズンのログを読まないので、補正の無い行の EV収支は空のまま出力される。
+
+ログは日付・テーブル名の順に読み、同じハンドが複数のログにある場合は最初のログで数える
+（main.py の集計と同じ）。プレイヤーは ID 変更・players.json の統合を適用した canonical_id でまとめる。
+- 節の行: その節のログから計算したハンド数が CSV のハンド数と一致する場合だけ補正を書く
+  （計算済み JSON から凍結した節など、ログと一致しない行は空のまま）
+- シーズンの行: そのプレイヤーの全ての節に補正があり、ハンド数の合計が一致する場合だけ、
+  節の補正を日付順に足して書く
+
+Usage:
+    python scripts/backfill_ev.py [--season 1 2] [--dry-run]
+"""
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from allin_ev import EV_DIGITS
+from hand_analysis import PlayerStats
+
+
+EV_COLUMNS = ["EV収支", "ev_adjustment"]
+
+
+def session_adjustments(data_dir: Path, config, registry, season_ids: List[int],
+                        verbose: bool = False) -> Dict[str, Dict[str, PlayerStats]]:
+    """
+    シーズンのログから節ごと・プレイヤーごとのハンド数と補正を計算する
+
+    Returns:
+        日付 -> canonical_id -> PlayerStats（hands と ev_adjustment だけを使う）
+    """
+    from csv_formatter import PokerNowParser, extract_player_id_map
+    from dataset_manifest import LOG_PREFIX, DatasetManifest
+    from hand_analysis import StatsCalculator, calculate_players
+
+    manifest = DatasetManifest.refresh(data_dir, config, save=False)
+    seen = set()
+    sessions: Dict[str, Dict[str, PlayerStats]] = {}
+    for date_str in manifest.date_strs():
+        if manifest.season_id(date_str) not in season_ids:
+            continue
+        players = sessions.setdefault(date_str, {})
+        for table in manifest.table_dirs(date_str):
+            log = manifest.table_file(date_str, table, LOG_PREFIX)
+            if log is None:
+                continue
+            parser = PokerNowParser(str(log))
+            formatted, _ = parser.parse()
+            for change in registry.detect_id_changes(parser.raw_text):
+                registry.register_id_change(change["old_id"], change["new_id"], change["display_name"])
+            player_id_map = extract_player_id_map(parser.raw_text)
+
+            histories = []
+            for history, fingerprint in zip((h for h in formatted.split("\n\n") if h.strip()),
+                                            parser.hand_fingerprints):
+                if fingerprint not in seen:
+                    seen.add(fingerprint)
+                    histories.append(history)
+            names = StatsCalculator(histories).get_all_players()
+            for name, stats in calculate_players(histories, names).items():
+                player_id = registry.get_canonical_id(player_id_map.get(name, name))
+                players.setdefault(player_id, PlayerStats(player_id=player_id)).merge(stats)
+            if verbose:
+                print(f"  {date_str}/{table}: {len(histories)} hands")
+    return sessions
+
+
+def _read_rows(path: Path) -> Tuple[List[str], List[dict]]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        return list(reader.fieldnames), list(reader)
+
+
+def _write_rows(path: Path, fieldnames: List[str], rows: List[dict]) -> None:
+    for column in EV_COLUMNS:
+        if column not in fieldnames:
+            fieldnames.append(column)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(rows)
+    tmp.replace(path)
+
+
+def _set_ev(row: dict, adjustment: Optional[float]) -> None:
+    from stats_aggregator import StatsAggregator
+    if adjustment is None:
+        row["EV収支"] = row["ev_adjustment"] = ""
+        return
+    net = float(row["収支"].replace("+", ""))
+    row["EV収支"] = StatsAggregator._format_net(net + adjustment)
+    row["ev_adjustment"] = StatsAggregator._format_exact(adjustment)
+
+
+def backfill_season(data_dir: Path, season_id: int, sessions: Dict[str, Dict[str, PlayerStats]],
+                    registry, dry_run: bool = False) -> dict:
+    """
+    シーズンの節別・シーズン別 raw CSV に補正を書き足す
+
+    Returns:
+        dict: {"session_rows", "session_filled", "season_rows", "season_filled"}
+    """
+    session_path = data_dir / f"season_{season_id}_session_stats_raw.csv"
+    season_path = data_dir / f"season_{season_id}_stats_raw.csv"
+
+    session_fields, session_rows = _read_rows(session_path)
+    # プレイヤー -> [(日付, ハンド数, 補正 or None)]
+    by_player: Dict[str, List[Tuple[str, int, Optional[float]]]] = {}
+    filled = 0
+    for row in session_rows:
+        player_id = registry.get_canonical_id(row["player_id"])
+        hands = int(row["ハンド数"])
+        computed = sessions.get(row["session_date"], {}).get(player_id)
+        adjustment = computed.ev_adjustment if computed is not None and computed.hands == hands else None
+        _set_ev(row, adjustment)
+        filled += adjustment is not None
+        by_player.setdefault(row["player_id"], []).append((row["session_date"], hands, adjustment))
+
+    season_fields, season_rows = _read_rows(season_path)
+    season_filled = 0
+    for row in season_rows:
+        entries = sorted(by_player.get(row["player_id"], []))
+        adjustment = None
+        if entries and all(a is not None for _, _, a in entries) \
+                and sum(h for _, h, _ in entries) == int(row["ハンド数"]):
+            adjustment = 0
+            for _, _, a in entries:
+                adjustment = round(adjustment + a, EV_DIGITS)
+        _set_ev(row, adjustment)
+        season_filled += adjustment is not None
+
+    if not dry_run:
+        _write_rows(session_path, session_fields, session_rows)
+        _write_rows(season_path, season_fields, season_rows)
+    return {
+        "session_rows": len(session_rows), "session_filled": filled,
+        "season_rows": len(season_rows), "season_filled": season_filled,
+    }
+
+
+def main():
+    from config_loader import ConfigLoader
+    from player_registry import PlayerRegistry
+
+    parser = argparse.ArgumentParser(description="凍結シーズンの raw CSV に EV 収支の補正を書き足す（1回だけ実行）")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--config-dir", default="config", help="設定ディレクトリのパス (default: config)")
+    parser.add_argument("--season", type=int, nargs="+", default=None,
+                        help="対象シーズン ID（default: 凍結済みの全シーズン）")
+    parser.add_argument("--dry-run", action="store_true", help="書き足せる行数を表示するだけ")
+    parser.add_argument("--verbose", "-v", action="store_true", help="テーブルごとのハンド数を表示")
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).parent.parent
+    data_dir = base_dir / args.data_dir
+    config = ConfigLoader(str(base_dir / args.config_dir))
+    registry = PlayerRegistry(config)
+
+    frozen = [s["id"] for s in config.get_all_seasons() if s.get("frozen")]
+    season_ids = args.season if args.season is not None else frozen
+    not_frozen = [sid for sid in season_ids if sid not in frozen]
+    if not_frozen:
+        print(f"Error: season {not_frozen} is not frozen (main.py が補正を計算します)")
+        sys.exit(1)
+
+    sessions = session_adjustments(data_dir, config, registry, season_ids, verbose=args.verbose)
+    for season_id in season_ids:
+        result = backfill_season(data_dir, season_id, sessions, registry, dry_run=args.dry_run)
+        print(f"Season {season_id}: 節 {result['session_filled']}/{result['session_rows']} 行, "
+              f"シーズン {result['season_filled']}/{result['season_rows']} 行に補正を書き足しました"
+              f"{'（DRY RUN）' if args.dry_run else ''}")
+
+
+if __name__ == "__main__":
+    main()
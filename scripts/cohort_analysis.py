@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+コホート・リテンション分析
+
+プレイヤーに通し番号を振り、各セッションの参加者を1行のビット列
+（np.packbits で 8人 = 1バイト）として持つ。新規参加者・累計参加者・
+コホート（初参加セッション）別の継続率・セッション間の復帰率と離脱率を、
+行どうしの AND / OR とビット数の集計だけで求める。
+
+Usage:
+    python scripts/cohort_analysis.py [--season 3] [--csv-dir out/]
+"""
+
+import argparse
+import csv
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Set
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+
+# retention / pair_counts で一度に AND を取る行数（メモリ使用量の上限を決める）
+ROW_CHUNK = 64
+
+_POPCOUNT = None
+
+
+def popcount(packed):
+    """
+    パック済みビット列の各行の 1 の数を返す
+
+    Args:
+        packed: uint8 または uint64 配列（最後の軸がビット列）
+
+    Returns:
+        int64 配列（最後の軸を集計した形）
+    """
+    import numpy as np
+
+    if hasattr(np, "bitwise_count"):  # numpy 2.0+
+        return np.bitwise_count(packed).sum(axis=-1, dtype=np.int64)
+
+    global _POPCOUNT
+    if _POPCOUNT is None:
+        _POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return _POPCOUNT[packed.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+
+def as_words(packed):
+    """パック済みビット列を 8バイト単位（uint64）に詰め直す（AND とビット数の集計を8倍速くする）"""
+    import numpy as np
+
+    pad = -packed.shape[-1] % 8
+    if pad:
+        packed = np.concatenate([packed, np.zeros(packed.shape[:-1] + (pad,), dtype=np.uint8)], axis=-1)
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+class Attendance:
+    """
+    セッション × プレイヤーの参加ビット行列
+
+    Attributes:
+        dates: セッション日付 (YYYYMMDD) のリスト（行の順）
+        player_ids: ビット位置 -> player_id
+        bits: (セッション数, ceil(プレイヤー数 / 8)) の uint8 配列
+        hands: (セッション数, プレイヤー数) の int64 配列（そのセッションのハンド数）
+    """
+
+    def __init__(self, dates: List[str], player_ids: List[str], bits, hands):
+        self.dates = dates
+        self.player_ids = player_ids
+        self.bits = bits
+        self.hands = hands
+
+    @classmethod
+    def from_sessions(cls, sessions: Dict[str, dict]) -> "Attendance":
+        """
+        weekly_report.get_weekly_data 形式のデータから作る
+
+        Args:
+            sessions: {date_str: {'players': set, 'player_hands': {player_id: hands}}}
+        """
+        import numpy as np
+
+        dates = sorted(sessions)
+        player_ids = sorted({pid for d in dates for pid in sessions[d]["players"]})
+        index = {pid: i for i, pid in enumerate(player_ids)}
+
+        present = np.zeros((len(dates), len(player_ids)), dtype=bool)
+        hands = np.zeros((len(dates), len(player_ids)), dtype=np.int64)
+        for row, date_str in enumerate(dates):
+            data = sessions[date_str]
+            cols = [index[pid] for pid in data["players"]]
+            present[row, cols] = True
+            for pid, n in data.get("player_hands", {}).items():
+                if pid in index:
+                    hands[row, index[pid]] = n
+
+        return cls(dates, player_ids, np.packbits(present, axis=1), hands)
+
+    def subset(self, dates: Iterable[str]) -> "Attendance":
+        """指定したセッションの行だけを持つ行列（プレイヤー番号は共通）"""
+        wanted = set(dates)
+        rows = [i for i, d in enumerate(self.dates) if d in wanted]
+        return Attendance([self.dates[i] for i in rows], self.player_ids, self.bits[rows], self.hands[rows])
+
+    def members(self, packed_row) -> Set[str]:
+        """1行分のビット列を player_id の集合に戻す"""
+        import numpy as np
+
+        flags = np.unpackbits(packed_row)[:len(self.player_ids)]
+        return {self.player_ids[i] for i in np.flatnonzero(flags)}
+
+    # --------------- Counts ---------------
+
+    def attendance_counts(self):
+        """セッションごとの参加者数"""
+        return popcount(self.bits)
+
+    def seen_before(self):
+        """各セッションより前のいずれかのセッションに参加したプレイヤー（行ごとのビット列）"""
+        import numpy as np
+
+        seen = np.zeros_like(self.bits)
+        if len(self.dates) > 1:
+            seen[1:] = np.bitwise_or.accumulate(self.bits, axis=0)[:-1]
+        return seen
+
+    def new_players(self):
+        """各セッションが初参加のプレイヤー（行ごとのビット列 = コホート）"""
+        return self.bits & ~self.seen_before()
+
+    def cumulative_counts(self):
+        """各セッション終了時点の累計参加者数"""
+        import numpy as np
+
+        return popcount(np.bitwise_or.accumulate(self.bits, axis=0))
+
+    def hand_gate_counts(self, required_hands: int):
+        """各セッション終了時点で累計 required_hands ハンド以上のプレイヤー数"""
+        return (self.hands.cumsum(axis=0) >= required_hands).sum(axis=1)
+
+    # --------------- Matrices ---------------
+
+    def _and_counts(self, left, right):
+        """left の各行と right の各行の AND のビット数 (len(left), len(right))"""
+        import numpy as np
+
+        left, right = as_words(left), as_words(right)
+        result = np.zeros((len(left), len(right)), dtype=np.int64)
+        for start in range(0, len(left), ROW_CHUNK):
+            chunk = left[start:start + ROW_CHUNK]
+            result[start:start + ROW_CHUNK] = popcount(chunk[:, None, :] & right[None, :, :])
+        return result
+
+    def retention_matrix(self):
+        """
+        コホート別の継続参加者数
+
+        Returns:
+            (セッション数, セッション数) の int64 配列。[c, s] は セッション c が初参加の
+            プレイヤーのうちセッション s に参加した人数（s < c は 0、対角はコホートの人数）
+        """
+        import numpy as np
+
+        return np.triu(self._and_counts(self.new_players(), self.bits))
+
+    def pair_counts(self):
+        """[i, j] = セッション i と j の両方に参加した人数"""
+        return self._and_counts(self.bits, self.bits)
+
+    def return_rates(self):
+        """
+        [i, j] = セッション i の参加者のうちセッション j にも参加した割合 (%)
+
+        j > i なら i から見た復帰率、離脱率は 100 - return_rates。
+        """
+        import numpy as np
+
+        counts = self.attendance_counts()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = self.pair_counts() * 100.0 / counts[:, None]
+        return np.where(counts[:, None] > 0, rates, 0.0)
+
+    def churn_rates(self):
+        """[i, j] = セッション i の参加者のうちセッション j に参加しなかった割合 (%)"""
+        import numpy as np
+
+        counts = self.attendance_counts()
+        return np.where(counts[:, None] > 0, 100.0 - self.return_rates(), 0.0)
+
+
+# --------------- Output ---------------
+
+def format_date(date_str: str) -> str:
+    return f"{date_str[4:6]}/{date_str[6:]}"
+
+
+def print_retention(attendance: Attendance, title: str) -> None:
+    """コホート別の継続率（初回参加者数に対する %）を表形式で表示する"""
+    retention = attendance.retention_matrix()
+    cohort_sizes = retention.diagonal()
+
+    print(f"\n【{title}】 コホート別継続率（%）")
+    header = "  初参加  人数 " + "".join(f"{format_date(d):>7}" for d in attendance.dates)
+    print(header)
+    for c, date_str in enumerate(attendance.dates):
+        size = int(cohort_sizes[c])
+        cells = []
+        for s in range(len(attendance.dates)):
+            if s < c:
+                cells.append(" " * 7)
+            elif size == 0:
+                cells.append(f"{'-':>7}")
+            else:
+                cells.append(f"{retention[c, s] * 100.0 / size:7.1f}")
+        print(f"  {format_date(date_str)}   {size:4d} " + "".join(cells))
+
+
+def write_matrix_csv(path: Path, dates: List[str], matrix, fmt: str = "{}") -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["session_date"] + dates)
+        for date_str, row in zip(dates, matrix):
+            writer.writerow([date_str] + [fmt.format(v) for v in row])
+
+
+def main():
+    from config_loader import ConfigLoader
+    from player_registry import PlayerRegistry
+    from weekly_report import SOURCES, get_weekly_data
+
+    parser = argparse.ArgumentParser(description="コホート別継続率・セッション間の復帰率を計算")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--config-dir", default="config", help="設定ディレクトリのパス (default: config)")
+    parser.add_argument("--season", type=int, default=None, help="対象シーズン ID（default: 全セッション）")
+    parser.add_argument("--source", choices=SOURCES, default="auto",
+                        help="参加者の取得方法（weekly_report.py と同じ, default: auto）")
+    parser.add_argument("--csv-dir", default=None,
+                        help="継続人数・復帰率・離脱率の行列を CSV で書き出すディレクトリ")
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).parent.parent
+    config = ConfigLoader(str(base_dir / args.config_dir))
+    registry = PlayerRegistry(config)
+    sessions = get_weekly_data(base_dir / args.data_dir, config, registry, args.source)
+    if args.season is not None:
+        sessions = {d: v for d, v in sessions.items() if v["season_id"] == args.season}
+    sessions = {d: v for d, v in sessions.items() if v["players"]}
+    if not sessions:
+        print("データが見つかりませんでした。")
+        return
+
+    attendance = Attendance.from_sessions(sessions)
+    title = f"シーズン {args.season}" if args.season is not None else "全セッション"
+    print(f"{title}: {len(attendance.dates)} セッション, {len(attendance.player_ids)} 人")
+    print_retention(attendance, title)
+
+    returns = attendance.return_rates()
+    print("\n【前回 → 今回】")
+    for i in range(1, len(attendance.dates)):
+        print(f"  {format_date(attendance.dates[i - 1])} → {format_date(attendance.dates[i])}: "
+              f"復帰 {returns[i - 1, i]:5.1f}%  離脱 {100.0 - returns[i - 1, i]:5.1f}%")
+
+    if args.csv_dir:
+        out_dir = Path(args.csv_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        write_matrix_csv(out_dir / "retention_counts.csv", attendance.dates, attendance.retention_matrix())
+        write_matrix_csv(out_dir / "return_rates.csv", attendance.dates, attendance.return_rates(), "{:.2f}")
+        write_matrix_csv(out_dir / "churn_rates.csv", attendance.dates, attendance.churn_rates(), "{:.2f}")
+        print(f"\nWritten: {out_dir}/retention_counts.csv, return_rates.csv, churn_rates.csv")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+圧縮ファイルの透過的な読み込み
+
+hand_histories のログ・Ledger・計算済み JSON は、アーカイブ後（archive_sessions.py）に
+.gz / .xz で置かれることがある。読み込み側は open_text で開けば、拡張子に応じて
+ストリーミング展開しながら読める（展開済みのファイルを一時的に作らない）。
+"""
+
+import gzip
+import lzma
+from pathlib import Path
+from typing import Iterable, List
+
+
+COMPRESSED_SUFFIXES = (".gz", ".xz")
+
+
+def open_text(path, newline=None):
+    """テキストとして開く（.gz / .xz は展開しながら読む）"""
+    path = str(path)
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline=newline)
+    if path.endswith(".xz"):
+        return lzma.open(path, "rt", encoding="utf-8", newline=newline)
+    return open(path, "r", encoding="utf-8", newline=newline)
+
+
+def strip_compression(name: str) -> str:
+    """圧縮の拡張子を除いたファイル名（"a.csv.gz" -> "a.csv"）"""
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def is_compressed(name: str) -> bool:
+    return name.endswith(COMPRESSED_SUFFIXES)
+
+
+def select_names(names: Iterable[str], prefix: str, suffix: str) -> List[str]:
+    """
+    prefix*suffix（圧縮の拡張子付きも含む）に一致する名前を、展開後の名前順で返す
+
+    同じファイルの圧縮版と非圧縮版が両方あれば非圧縮版を使う（アーカイブ途中の状態）。
+    """
+    selected = {}
+    for name in names:
+        plain = strip_compression(name)
+        if not (plain.startswith(prefix) and plain.endswith(suffix)):
+            continue
+        if plain not in selected or not is_compressed(name):
+            selected[plain] = name
+    return [selected[plain] for plain in sorted(selected)]
+
+
+def glob_compressed(directory: Path, pattern: str) -> List[Path]:
+    """
+    Path.glob と同じパターン（"poker_now_log_*.csv"、"**/ledger_*.csv" など）で、圧縮版も含めて探す
+    """
+    prefix, _, suffix = pattern.rsplit("/", 1)[-1].partition("*")
+    by_dir = {}
+    for path in Path(directory).glob(pattern + "*"):
+        by_dir.setdefault(path.parent, []).append(path.name)
+    result = []
+    for parent in sorted(by_dir):
+        result.extend(parent / name for name in select_names(by_dir[parent], prefix, suffix))
+    return result
@@ -5,9 +5,38 @@ Poker Now CSV パーサー
 
 import re
 import csv
+import hashlib
 from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 
+from compressed_io import open_text
+
+
+# "-- starting hand #44 (id: ej3j1wcuvkmg) ..." のハンド番号
+HAND_NUMBER_PATTERN = re.compile(r"-- starting hand #(\d+)")
+# poker_now_log_{ゲームID}.csv（アーカイブ後は .csv.gz / .csv.xz）
+LOG_FILENAME_PATTERN = re.compile(r"poker_now_log_(.+)\.csv(?:\.gz|\.xz)?$")
+
+
+def game_id_from_path(csv_path) -> Optional[str]:
+    """ログのファイル名から Poker Now のゲームIDを取り出す（形式が違えば None）"""
+    match = LOG_FILENAME_PATTERN.match(Path(csv_path).name)
+    return match.group(1) if match else None
+
+
+def hand_fingerprint(game_id: Optional[str], raw_hand: str) -> str:
+    """
+    1ハンドの指紋
+
+    ゲームID + ハンド番号（"{game_id}#{n}"）。ゲームIDかハンド番号が取れない場合は
+    空白を正規化したアクション列のハッシュ（"h:{16桁}"）。
+    """
+    match = HAND_NUMBER_PATTERN.match(raw_hand)
+    if game_id and match:
+        return f"{game_id}#{match.group(1)}"
+    normalized = " ".join(raw_hand.split())
+    return "h:" + hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).hexdigest()
+
 
 class PokerNowParser:
     """Poker Now のCSVログをパースするクラス"""
@@ -15,11 +44,37 @@ class PokerNowParser:
     SUITS = {"♠": "s", "♥": "h", "♦": "d", "♣": "c"}
     ACTIONS = ["posts", "folds", "checks", "calls", "raises", "bets", "shows", "collected"]
 
+    # ハンドごとに使う正規表現（1ログで数万回呼ぶのでコンパイル済みのものを使う）
+    NAME_AND_ID_PATTERN = re.compile(r'"(.*? @ .*?)"')
+    NAME_ID_SPLIT_PATTERN = re.compile(r"(.*?) @ (.*)")
+    HAND_PATTERN = re.compile(r"(-- starting hand[\s\S]*?)\n\n")
+    HEADER_END_PATTERN = re.compile(r"\) --")
+    HEADER_PATTERN = re.compile(r"-- starting.*?--")
+    STACKS_PATTERN = re.compile(r"Player stacks: (.*?)\n")
+    STACK_PATTERN = re.compile(r"#(\d*) (.*?) \((.*?)\)")
+    STACKS_LINE_PATTERN = re.compile(r"(Player stacks: .*?\n)")
+    MY_HAND_PATTERN = re.compile(r"Your hand is (.*?)\n")
+    FLOP_PATTERN = re.compile(r'^Flop:\s+\[', re.MULTILINE)
+    TURN_PATTERN = re.compile(r'^Turn:\s+.*?\s+\[', re.MULTILINE)
+    RIVER_PATTERN = re.compile(r'^River:\s+.*?\s+\[', re.MULTILINE)
+    COMBINATION_PATTERN = re.compile(r" with .*? \(combination: .*?\)")
+    ENDING_PATTERN = re.compile(r"-- ending hand #\d* --[\s\S]*")
+    # 変換後のハンドから Dealt to you のプレイヤーを推定するための行
+    DEALT_PATTERN = re.compile(r"^Dealt to you \[(.*?)\]", re.MULTILINE)
+    SEAT_PATTERN = re.compile(r"^seat \d+: (.*?) \(\d+ in chips\)", re.MULTILINE)
+    SHOWS_PATTERN = re.compile(r"^(.*): shows a (.*?)\.?$", re.MULTILINE)
+
     def __init__(self, csv_path: str, bb: int = 20):
         self.csv_path = Path(csv_path)
         self.bb = bb
         self.player_names = {}
         self.raw_text = ""
+        # 未コールベットの返却行（全プレイヤー名のいずれか）。_format_text で作る
+        self._uncalled_pattern = None
+        # 変換後のハンドと同じ順の指紋（hand_fingerprint）
+        self.hand_fingerprints: List[str] = []
+        # Dealt to you（"Your hand is"）のプレイヤー名。推定できなければ None
+        self.dealt_player: Optional[str] = None
 
     def parse(self) -> Tuple[str, Dict[str, str]]:
         """
@@ -28,11 +83,8 @@ class PokerNowParser:
         Returns:
             Tuple[str, Dict[str, str]]: (変換後テキスト, プレイヤー名辞書)
         """
-        # CSV読み込み
-        rows = self._read_csv()
-
-        # 逆順に結合（Poker Nowは新しい順で記録されるため）
-        self.raw_text = "\n".join(reversed(rows[1:]))  # ヘッダーを除く
+        # CSV読み込み（Poker Nowは新しい順で記録されるため逆順に結合）
+        self.read_raw_text()
 
         # プレイヤー名を抽出
         self._extract_player_names()
@@ -42,17 +94,23 @@ class PokerNowParser:
 
         return formatted, self.player_names
 
+    def read_raw_text(self) -> str:
+        """フォーマット変換をせずに、時系列順に並べた生テキストだけを読み込む"""
+        rows = self._read_csv()
+        self.raw_text = "\n".join(reversed(rows[1:]))  # ヘッダーを除く
+        return self.raw_text
+
     def _read_csv(self) -> List[str]:
-        """CSVファイルを読み込む"""
-        with open(self.csv_path, "r", encoding="utf-8") as f:
+        """CSVファイルを読み込む（.gz / .xz は展開しながら読む）"""
+        with open_text(self.csv_path) as f:
             reader = csv.reader(f)
             return [row[0] for row in reader if row]
 
     def _extract_player_names(self) -> None:
         """プレイヤー名を抽出して辞書に登録"""
-        name_and_ids = re.findall(r'"(.*? @ .*?)"', self.raw_text)
+        name_and_ids = self.NAME_AND_ID_PATTERN.findall(self.raw_text)
         for name_and_id in name_and_ids:
-            match = re.match(r"(.*?) @ (.*)", name_and_id)
+            match = self.NAME_ID_SPLIT_PATTERN.match(name_and_id)
             if match:
                 name = match.group(1)
                 if name_and_id not in self.player_names:
@@ -70,36 +128,44 @@ class PokerNowParser:
         txt = txt.replace("-- starting hand", "\n-- starting hand")
 
         # 各ハンドを抽出して変換
-        histories = re.findall(r"(-- starting hand[\s\S]*?)\n\n", txt + "\n\n")
+        histories = self.HAND_PATTERN.findall(txt + "\n\n")
+
+        names = sorted(set(self.player_names.values()))
+        self._uncalled_pattern = re.compile(
+            "Uncalled bet of .*? returned to (?:" + "|".join(re.escape(n) for n in names) + ")\n"
+        ) if names else None
 
+        game_id = game_id_from_path(self.csv_path)
         formatted_histories = []
+        self.hand_fingerprints = []
         for history in histories:
             formatted = self._format_hand(history)
             if formatted:
                 formatted_histories.append(formatted)
+                self.hand_fingerprints.append(hand_fingerprint(game_id, history))
+        self.dealt_player = self._find_dealt_player(formatted_histories)
 
         return "\n\n".join(formatted_histories)
 
     def _format_hand(self, history: str) -> str:
         """1ハンド分を変換"""
         # ハンド情報の冒頭を変換
-        history = re.sub(
-            r"\) --",
+        history = self.HEADER_END_PATTERN.sub(
             f") --\nHold'em No Limit (10/{self.bb})\n"
             "Table 'Poker Now - Po' 10-max Seat #3 is the button",
             history
         )
-        history = re.sub(r"-- starting.*?--", "", history)
+        history = self.HEADER_PATTERN.sub("", history)
 
         # シートの位置情報を整形
-        stack_match = re.findall(r"Player stacks: (.*?)\n", history)
+        stack_match = self.STACKS_PATTERN.findall(history)
         if stack_match:
-            stacks = re.findall(r"#(\d*) (.*?) \((.*?)\)", stack_match[0])
+            stacks = self.STACK_PATTERN.findall(stack_match[0])
             stack_sentence = ""
             for stack in stacks:
                 stack_sentence += f"seat {stack[0]}: {stack[1]} ({stack[2]} in chips)\n"
             history = history.replace(
-                re.findall(r"(Player stacks: .*?\n)", history)[0],
+                self.STACKS_LINE_PATTERN.findall(history)[0],
                 stack_sentence
             )
 
@@ -109,9 +175,9 @@ class PokerNowParser:
         history = history.replace("collected", "wins")
         history = history.replace(" from pot", "")
 
-        # 未コールベットの返却を削除
-        for player in self.player_names.values():
-            history = re.sub(rf"Uncalled bet of .*? returned to {re.escape(player)}\n", "", history)
+        # 未コールベットの返却を削除（全プレイヤー名を1つのパターンにまとめて1回で置換）
+        if self._uncalled_pattern is not None and "Uncalled bet of" in history:
+            history = self._uncalled_pattern.sub("", history)
 
         # スートを変換
         for suit, short in self.SUITS.items():
@@ -126,7 +192,7 @@ class PokerNowParser:
 
         # 自分のハンド情報を追加
         if "Your hand is" in history:
-            my_hand_match = re.findall(r"Your hand is (.*?)\n", history)
+            my_hand_match = self.MY_HAND_PATTERN.findall(history)
             if my_hand_match:
                 my_hand = my_hand_match[0]
                 history = history.replace(
@@ -137,35 +203,42 @@ class PokerNowParser:
 
         # ストリートマーカーを追加（行頭のパターンのみマッチさせ、プレイヤー名との誤マッチを防ぐ）
         # Flop: [カード] 形式
-        history = re.sub(
-            r'^Flop:\s+\[',
-            '*** FLOP *** [',
-            history,
-            flags=re.MULTILINE
-        )
+        history = self.FLOP_PATTERN.sub('*** FLOP *** [', history)
         # Turn: カード, カード, カード [新カード] 形式
-        history = re.sub(
-            r'^Turn:\s+.*?\s+\[',
-            '*** TURN *** [',
-            history,
-            flags=re.MULTILINE
-        )
+        history = self.TURN_PATTERN.sub('*** TURN *** [', history)
         # River: カード, カード, カード, カード [新カード] 形式
-        history = re.sub(
-            r'^River:\s+.*?\s+\[',
-            '*** RIVER *** [',
-            history,
-            flags=re.MULTILINE
-        )
+        history = self.RIVER_PATTERN.sub('*** RIVER *** [', history)
 
         # 組み合わせ情報を削除
-        history = re.sub(r" with .*? \(combination: .*?\)", "", history)
+        history = self.COMBINATION_PATTERN.sub("", history)
 
         # 末尾のハンド終了情報を削除
-        history = re.sub(r"-- ending hand #\d* --[\s\S]*", "", history)
+        history = self.ENDING_PATTERN.sub("", history)
 
         return history.strip()
 
+    def _find_dealt_player(self, histories: List[str]) -> Optional[str]:
+        """
+        Dealt to you のプレイヤー（ログを書き出したプレイヤー）を推定する
+
+        ログには名前が出ないので、同じハンドで同じカードを見せたプレイヤーがいればその人、
+        いなければ Dealt to you のあるハンドすべてに座っていたプレイヤーが1人だけのときその人にする。
+        """
+        candidates = None
+        for history in histories:
+            dealt = self.DEALT_PATTERN.search(history)
+            if dealt is None:
+                continue
+            cards = sorted(dealt.group(1).split())
+            for name, shown in self.SHOWS_PATTERN.findall(history):
+                if sorted(shown.replace(",", " ").split()) == cards:
+                    return name
+            seated = set(self.SEAT_PATTERN.findall(history))
+            candidates = seated if candidates is None else candidates & seated
+        if candidates is not None and len(candidates) == 1:
+            return next(iter(candidates))
+        return None
+
     def get_histories_by_player_count(self, formatted_text: str) -> Dict[int, str]:
         """
         プレイヤー数ごとにハンド履歴を分割
@@ -239,6 +312,34 @@ def extract_player_id_map(raw_csv_text: str) -> Dict[str, str]:
     return name_id_map
 
 
+# "Player stacks: #1 "name @ id" (1000) | #3 ..." の1席分
+SEATED_PLAYER_PATTERN = re.compile(r'#\d* "(.*?) @ [^"]+" \((\d+)\)')
+
+
+def count_seated_hands(raw_csv_text: str) -> Dict[str, int]:
+    """
+    生のCSVテキストから、プレイヤー名ごとの着席ハンド数を数える
+
+    StatsCalculator の hands（シート情報に名前があるハンド数）と同じ値を、
+    フォーマット変換やスタッツ計算をせずに Player stacks の行だけから求める。
+
+    Returns:
+        Dict[str, int]: {プレイヤー名: ハンド数}
+    """
+    counts: Dict[str, int] = {}
+    for hand in raw_csv_text.split("-- starting hand")[1:]:
+        # 空行以降は次のハンドの前の別ログ（PokerNowParser と同じ区切り）
+        hand = hand.split("\n\n", 1)[0]
+        start = hand.find("Player stacks: ")
+        if start < 0:
+            continue
+        end = hand.find("\n", start)
+        line = hand[start:] if end < 0 else hand[start:end]
+        for name in {name for name, _ in SEATED_PLAYER_PATTERN.findall(line)}:
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
 if __name__ == "__main__":
     import sys
 
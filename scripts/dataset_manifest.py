@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+データセットのマニフェスト
+
+data/hand_histories/ の日付ディレクトリ・テーブルディレクトリとファイルの一覧を
+1回の os.scandir の走査で作り、data/cache/manifest.json に保存する。
+各ファイルはサイズ・更新時刻・内容のハッシュを持ち、ハンド履歴ログは
+ハンド数・着席したプレイヤー（raw ID・名前・ハンド数）・ID変更も持つ。
+
+2回目以降はサイズと更新時刻が前回と同じファイルの情報を引き継ぎ、
+変わったファイルだけを読み直す（ハッシュ・着席スキャン）。
+StatsAggregator と weekly_report.py はディレクトリを直接走査せず、これを参照する。
+
+マニフェストの構成:
+  {
+    "version": 1,
+    "updated_at": "...",
+    "dates": {
+      "YYYYMMDD": {
+        "season_id": 3,
+        "files": {ファイル名: ファイル情報},              # 日付ディレクトリ直下（計算済み JSON など）
+        "dirs": {ディレクトリ名: {ファイル名: ファイル情報}}  # table{N} など
+      }
+    },
+    "ignored": [日付として読めないエントリ名]
+  }
+  ファイル情報: {size, mtime_ns, sha256}
+    + ハンド履歴ログ: {hands, seated: [[raw ID, 名前, ハンド数]], id_changes: [...]}
+
+Usage:
+    python scripts/dataset_manifest.py [--data-dir data] [--full] [-v]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from compressed_io import select_names, strip_compression
+from csv_formatter import PokerNowParser, count_seated_hands, extract_player_id_map
+from player_registry import PlayerRegistry
+
+
+MANIFEST_PATH = "cache/manifest.json"
+MANIFEST_VERSION = 1
+LOG_PREFIX = "poker_now_log_"
+LEDGER_PREFIX = "ledger_"
+
+# ハッシュ計算で一度に読むバイト数
+HASH_CHUNK = 1 << 20
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_log(path: str) -> dict:
+    """ハンド履歴ログの着席情報（weekly_report の scan と同じ内容）を集める"""
+    raw_text = PokerNowParser(path).read_raw_text()
+    player_id_map = extract_player_id_map(raw_text)
+    seated = count_seated_hands(raw_text)
+    id_changes = [
+        {"display_name": name, "old_id": old_id, "new_id": new_id}
+        for name, new_id, old_id, new_id2 in PlayerRegistry.ID_CHANGE_PATTERN.findall(raw_text)
+        if new_id == new_id2
+    ]
+    return {
+        "hands": raw_text.count("-- starting hand"),
+        "seated": [[player_id_map.get(name, name), name, hands] for name, hands in seated.items()],
+        "id_changes": id_changes,
+    }
+
+
+class DatasetManifest:
+    """data/hand_histories/ のマニフェスト"""
+
+    def __init__(self, data_dir: Path, payload: dict):
+        self.data_dir = Path(data_dir)
+        self.hand_histories_dir = self.data_dir / "hand_histories"
+        self.payload = payload
+        self.dates: Dict[str, dict] = payload["dates"]
+        # refresh で読み直したファイル数（表示用）
+        self.rescanned = 0
+
+    @property
+    def path(self) -> Path:
+        return self.data_dir / MANIFEST_PATH
+
+    @classmethod
+    def load(cls, data_dir: Path) -> "DatasetManifest":
+        """保存済みのマニフェストを読み込む（無い・形式が違う場合は空）"""
+        path = Path(data_dir) / MANIFEST_PATH
+        payload = None
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        if not payload or payload.get("version") != MANIFEST_VERSION:
+            payload = {"version": MANIFEST_VERSION, "dates": {}, "ignored": []}
+        return cls(data_dir, payload)
+
+    @classmethod
+    def refresh(cls, data_dir: Path, config=None, full: bool = False,
+                save: bool = True, verbose: bool = False) -> "DatasetManifest":
+        """
+        ディレクトリを走査してマニフェストを更新する
+
+        Args:
+            config: ConfigLoader（日付のシーズン割り当てに使う。None なら season_id は None）
+            full: 前回の情報を使わずに全ファイルを読み直す
+            save: data/cache/manifest.json に保存する
+        """
+        previous = cls.load(data_dir)
+        manifest = cls(data_dir, {"version": MANIFEST_VERSION, "dates": {}, "ignored": []})
+        if manifest.hand_histories_dir.exists():
+            manifest._scan({} if full else previous.dates, config)
+        manifest.payload["updated_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        if verbose:
+            print(f"Manifest: {len(manifest.dates)} dates, {manifest.rescanned} files rescanned")
+        if save:
+            manifest.save()
+        return manifest
+
+    def _scan(self, previous: Dict[str, dict], config) -> None:
+        with os.scandir(self.hand_histories_dir) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if not entry.is_dir():
+                    continue
+                try:
+                    date = datetime.strptime(entry.name, "%Y%m%d")
+                except ValueError:
+                    self.payload["ignored"].append(entry.name)
+                    continue
+
+                season = config.get_season_by_date(date) if config else None
+                old = previous.get(entry.name, {})
+                files, dirs = self._scan_dir(entry.path, old.get("files", {}))
+                self.dates[entry.name] = {
+                    "season_id": season["id"] if season else None,
+                    "files": files,
+                    "dirs": {
+                        name: self._scan_dir(path, old.get("dirs", {}).get(name, {}))[0]
+                        for name, path in dirs
+                    },
+                }
+
+    def _scan_dir(self, path: str, previous: Dict[str, dict]):
+        """1ディレクトリ分のファイル情報と、サブディレクトリ [(名前, パス)] を返す"""
+        files: Dict[str, dict] = {}
+        dirs = []
+        with os.scandir(path) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.is_dir():
+                    dirs.append((entry.name, entry.path))
+                    continue
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+                old = previous.get(entry.name)
+                if old and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+                    files[entry.name] = old
+                    continue
+                info = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": file_sha256(entry.path)}
+                if entry.name.startswith(LOG_PREFIX) and strip_compression(entry.name).endswith(".csv"):
+                    try:
+                        info.update(scan_log(entry.path))
+                    except Exception as e:
+                        print(f"Warning: Failed to scan {entry.path}: {e}")
+                files[entry.name] = info
+                self.rescanned += 1
+        return files, dirs
+
+    def save(self) -> Path:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.payload, f, ensure_ascii=False, separators=(",", ":"))
+        tmp.replace(self.path)
+        return self.path
+
+    # --------------- Lookups ---------------
+
+    @property
+    def ignored(self) -> List[str]:
+        """日付として読めなかったディレクトリ名"""
+        return self.payload["ignored"]
+
+    def date_strs(self) -> List[str]:
+        """日付ディレクトリ (YYYYMMDD) の昇順リスト"""
+        return sorted(self.dates)
+
+    def season_id(self, date_str: str) -> Optional[int]:
+        return self.dates[date_str]["season_id"]
+
+    def date_files(self, date_str: str, prefix: str, suffix: str = ".json") -> List[Path]:
+        """日付ディレクトリ直下で prefix*suffix（.gz / .xz 付きも含む）に一致するファイル（名前順）"""
+        return [
+            self.hand_histories_dir / date_str / name
+            for name in select_names(self.dates[date_str]["files"], prefix, suffix)
+        ]
+
+    def table_dirs(self, date_str: str) -> List[str]:
+        """日付ディレクトリ内のテーブルディレクトリ名（名前に "table" を含むもの、名前順）"""
+        return [name for name in sorted(self.dates[date_str]["dirs"]) if "table" in name.lower()]
+
+    def subdirs(self, date_str: str) -> List[str]:
+        """日付ディレクトリ内の全サブディレクトリ名（名前順）"""
+        return sorted(self.dates[date_str]["dirs"])
+
+    def table_file(self, date_str: str, table: str, prefix: str, suffix: str = ".csv") -> Optional[Path]:
+        """テーブルディレクトリ内で prefix*suffix（.gz / .xz 付きも含む）に一致する最初のファイル"""
+        names = select_names(self.dates[date_str]["dirs"][table], prefix, suffix)
+        return self.hand_histories_dir / date_str / table / names[0] if names else None
+
+    def file_info(self, path: Path) -> Optional[dict]:
+        """ファイルのマニフェスト情報（サイズ・更新時刻・ハッシュ・ログの着席情報）"""
+        parts = Path(path).relative_to(self.hand_histories_dir).parts
+        entry = self.dates.get(parts[0])
+        if entry is None:
+            return None
+        if len(parts) == 2:
+            return entry["files"].get(parts[1])
+        if len(parts) == 3:
+            return entry["dirs"].get(parts[1], {}).get(parts[2])
+        return None
+
+
+def main():
+    from config_loader import ConfigLoader
+
+    parser = argparse.ArgumentParser(description="data/hand_histories/ のマニフェストを更新")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--config-dir", default="config", help="設定ディレクトリのパス (default: config)")
+    parser.add_argument("--full", action="store_true", help="前回の情報を使わずに全ファイルを読み直す")
+    parser.add_argument("--verbose", "-v", action="store_true", help="日付ごとの内容を表示")
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).parent.parent
+    config = ConfigLoader(str(base_dir / args.config_dir))
+    manifest = DatasetManifest.refresh(base_dir / args.data_dir, config, full=args.full)
+
+    total_hands = 0
+    for date_str in manifest.date_strs():
+        tables = manifest.table_dirs(date_str)
+        hands = sum(
+            (manifest.file_info(log) or {}).get("hands", 0)
+            for log in (manifest.table_file(date_str, t, LOG_PREFIX) for t in tables) if log
+        )
+        total_hands += hands
+        if args.verbose:
+            print(f"  {date_str} (Season {manifest.season_id(date_str)}): "
+                  f"{len(tables)} tables, {hands} hands, {len(manifest.dates[date_str]['files'])} files")
+    print(f"{len(manifest.dates)} dates, {total_hands} hands in logs, {manifest.rescanned} files rescanned")
+    print(f"Written: {manifest.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+fast-table DB アクセスモジュール
+Neon (PostgreSQL) と、テスト用の SQLite スタンドインの両方で同じクエリを実行する
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fast_table_stats import STAT_KEYS
+
+
+# 鳳凰戦のスタッツ対象サーバー（予選卓 houou-yosen は含めない）
+DEFAULT_SERVERS = ("houou-shared", "houou-main")
+
+# セッション日付の区切りに使うタイムゾーン（reconstruct_snapshots.py と同じく UTC 日付）
+SESSION_TIMEZONE = "UTC"
+
+
+def connect(database_url: str):
+    """
+    DB に接続する
+
+    sqlite:///path/to/fixture.db 形式の URL の場合は SQLite に接続する
+    （フィクスチャのハンドを入れたローカル DB での検証用）。
+    """
+    if database_url.startswith("sqlite:///"):
+        # ConnectionPool が作成スレッド以外から close できるようにする
+        return sqlite3.connect(database_url[len("sqlite:///"):], check_same_thread=False)
+
+    import psycopg2
+    return psycopg2.connect(database_url)
+
+
+def is_sqlite(conn) -> bool:
+    return isinstance(conn, sqlite3.Connection)
+
+
+@contextmanager
+def read_snapshot(conn):
+    """
+    ブロック内のクエリを1つの読み取り専用スナップショットから読む
+
+    PostgreSQL は REPEATABLE READ の読み取り専用トランザクション、SQLite は明示的な
+    BEGIN のトランザクションで実行し、終了時にロールバックする。
+    ウォーターマークと player_stats（やハンドの行）を別の時点から読むと、
+    その間に完了したハンドが二重に数えられたり抜けたりする。
+    """
+    if is_sqlite(conn):
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+        return
+
+    # set_session はトランザクションの外でしか変更できない
+    conn.rollback()
+    conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+
+
+class ConnectionPool:
+    """
+    スレッドごとに1本の接続を持つ小さな接続プール
+
+    バッチ取得をスレッドプールで並行に流すときに使う
+    （psycopg2 / sqlite3 の接続はスレッド間で共有しない）。
+    """
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect(self.database_url)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_all(self) -> None:
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+
+def query(conn, sql: str, params: Iterable = ()) -> List[dict]:
+    """SQL を実行して結果を dict のリストで返す（プレースホルダは %s で統一）"""
+    if is_sqlite(conn):
+        cur = conn.execute(sql.replace("%s", "?"), tuple(params))
+        columns = [c[0] for c in cur.description]
+        return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+    import psycopg2.extras
+    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+        cur.execute(sql, tuple(params))
+        return [dict(row) for row in cur.fetchall()]
+
+
+def session_window(date_str: str) -> Tuple[str, str]:
+    """
+    セッション日付 (YYYYMMDD) を [開始, 終了) の時刻範囲に変換する
+
+    文字列で渡すのは、PostgreSQL の timestamptz と SQLite の TEXT 比較の
+    両方で同じ順序になる形式にそろえるため。
+    """
+    start = datetime.strptime(date_str, "%Y%m%d")
+    end = start + timedelta(days=1)
+    fmt = "%Y-%m-%d %H:%M:%S+00:00"
+    return start.strftime(fmt), end.strftime(fmt)
+
+
+# hand_players と hand_actions を1回の往復で取得する（1サーバー1クエリ）
+# {where} には hands h に対する絞り込み条件が入る
+HAND_ROWS_SQL = """
+    SELECT 'player' AS kind,
+           hp.hand_id,
+           CAST(hp.user_id AS TEXT) AS user_id,
+           CAST(NULL AS INTEGER) AS action_index,
+           CAST(NULL AS TEXT) AS street,
+           CAST(NULL AS TEXT) AS action,
+           CAST(NULL AS BIGINT) AS amount_cbb,
+           hp.delta_cbb,
+           hp.showdown,
+           hp.folded_street,
+           u.display_name,
+           CASE WHEN u.is_bot THEN NULL ELSE u.discord_id END AS discord_id,
+           u.is_bot
+    FROM hands h
+    JOIN hand_players hp ON hp.hand_id = h.id
+    JOIN users u ON u.id = hp.user_id
+    WHERE h.server_id = %s
+      AND h.status = 'completed'
+      AND {where}
+    UNION ALL
+    SELECT 'action' AS kind,
+           ha.hand_id,
+           CAST(ha.user_id AS TEXT) AS user_id,
+           ha.action_index,
+           ha.street,
+           ha.action,
+           ha.amount_cbb,
+           NULL, NULL, NULL, NULL, NULL, NULL
+    FROM hands h
+    JOIN hand_actions ha ON ha.hand_id = h.id
+    WHERE h.server_id = %s
+      AND h.status = 'completed'
+      AND {where}
+    ORDER BY 2, 1, 4
+"""
+
+
+def _fetch_hand_rows(conn, server_id: str, where: str, params: Tuple) -> Tuple[Dict, Dict, Dict]:
+    """HAND_ROWS_SQL を実行し、ハンドごとの行と参加者情報に振り分ける"""
+    sql = HAND_ROWS_SQL.format(where=where)
+    rows = query(conn, sql, (server_id,) + params + (server_id,) + params)
+
+    players_by_hand: Dict = {}
+    actions_by_hand: Dict = {}
+    participants: Dict = {}
+    for row in rows:
+        hand_id = row["hand_id"]
+        if row["kind"] == "player":
+            players_by_hand.setdefault(hand_id, []).append(row)
+            participants.setdefault(row["user_id"], {
+                "user_id": row["user_id"],
+                "display_name": row["display_name"],
+                "discord_id": row["discord_id"],
+                "is_bot": bool(row["is_bot"]),
+            })
+        else:
+            actions_by_hand.setdefault(hand_id, []).append(row)
+
+    return players_by_hand, actions_by_hand, participants
+
+
+def fetch_session_rows(conn, server_id: str, date_str: str) -> Tuple[Dict, Dict, Dict]:
+    """
+    指定サーバー・指定日の完了ハンドを1クエリで取得する
+
+    Returns:
+        tuple: (players_by_hand, actions_by_hand, participants)
+            players_by_hand: {hand_id: [hand_players 行]}
+            actions_by_hand: {hand_id: [hand_actions 行 (action_index順)]}
+            participants: {user_id: {user_id, display_name, discord_id, is_bot}}
+    """
+    start, end = session_window(date_str)
+    return _fetch_hand_rows(
+        conn, server_id, "h.started_at >= %s AND h.started_at < %s", (start, end)
+    )
+
+
+def hand_range_condition(after_hand_id: int, until_hand_id: int,
+                         extra_hand_ids: Iterable[int] = ()) -> Tuple[str, Tuple]:
+    """
+    after_hand_id < id <= until_hand_id、または extra_hand_ids に含まれるハンドの絞り込み条件
+
+    extra_hand_ids は前回の取得時点で進行中だったハンド（id は古いが後から完了したもの）。
+    """
+    extra = tuple(sorted(extra_hand_ids))
+    where = "(h.id > %s AND h.id <= %s)"
+    if extra:
+        where = "(" + where + " OR h.id IN (" + ", ".join(["%s"] * len(extra)) + "))"
+    return where, (after_hand_id, until_hand_id) + extra
+
+
+def fetch_batch_rows(conn, server_id: str, date_str: str, first_hand_id: int,
+                     last_hand_id: int) -> Tuple[Dict, Dict, Dict]:
+    """指定サーバー・指定日で first_hand_id <= id <= last_hand_id の完了ハンドを1クエリで取得する"""
+    start, end = session_window(date_str)
+    return _fetch_hand_rows(
+        conn, server_id,
+        "h.id >= %s AND h.id <= %s AND h.started_at >= %s AND h.started_at < %s",
+        (first_hand_id, last_hand_id, start, end),
+    )
+
+
+def fetch_hand_index(conn, servers: Iterable[str], after_hand_id: int = 0,
+                     until_hand_id: Optional[int] = None,
+                     extra_hand_ids: Iterable[int] = ()) -> List[dict]:
+    """
+    指定サーバーの完了ハンドの id とセッション日付を取得する
+
+    until_hand_id を指定した場合は after_hand_id < id <= until_hand_id（と extra_hand_ids）に絞る。
+
+    Returns:
+        list: [{hand_id, server_id, session_date (YYYYMMDD)}]（id順）
+    """
+    servers = tuple(servers)
+    if is_sqlite(conn):
+        date_expr = "DATE(h.started_at)"
+    else:
+        date_expr = f"DATE(h.started_at AT TIME ZONE '{SESSION_TIMEZONE}')"
+    if until_hand_id is None:
+        where, params = "h.id > %s", (after_hand_id,)
+    else:
+        where, params = hand_range_condition(after_hand_id, until_hand_id, extra_hand_ids)
+    rows = query(conn, f"""
+        SELECT h.id AS hand_id, h.server_id, CAST({date_expr} AS TEXT) AS session_date
+        FROM hands h
+        WHERE h.status = 'completed'
+          AND h.server_id IN ({", ".join(["%s"] * len(servers))})
+          AND {where}
+        ORDER BY h.id
+    """, servers + params)
+    for row in rows:
+        row["session_date"] = row["session_date"].replace("-", "")
+    return rows
+
+
+def fetch_server_stats(conn) -> Dict[str, Dict[str, dict]]:
+    """player_stats を server_id ごとに取得する（user_id -> server_id -> stats）"""
+    rows = query(conn, f"""
+        SELECT CAST(user_id AS TEXT) AS user_id, server_id, {", ".join(STAT_KEYS)}
+        FROM player_stats
+    """)
+    result: Dict[str, Dict[str, dict]] = {}
+    for row in rows:
+        stats = {k: int(row[k]) if row[k] is not None else 0 for k in STAT_KEYS}
+        result.setdefault(row["user_id"], {})[row["server_id"]] = stats
+    return result
+
+
+def fetch_users(conn) -> Dict[str, dict]:
+    """users テーブルを user_id -> {user_id, display_name, discord_id, is_bot} で取得する"""
+    rows = query(conn, """
+        SELECT CAST(id AS TEXT) AS user_id,
+               display_name,
+               CASE WHEN is_bot THEN NULL ELSE discord_id END AS discord_id,
+               is_bot
+        FROM users
+    """)
+    return {row["user_id"]: {**row, "is_bot": bool(row["is_bot"])} for row in rows}
+
+
+def fetch_rows_between(conn, server_id: str, after_hand_id: int, until_hand_id: int,
+                       extra_hand_ids: Iterable[int] = ()) -> Tuple[Dict, Dict, Dict]:
+    """指定サーバーの after_hand_id < id <= until_hand_id（と extra_hand_ids）の完了ハンドを1クエリで取得する"""
+    where, params = hand_range_condition(after_hand_id, until_hand_id, extra_hand_ids)
+    return _fetch_hand_rows(conn, server_id, where, params)
+
+
+def fetch_watermark(conn, after_hand_id: int = 0) -> Optional[dict]:
+    """after_hand_id より後で最新の完了ハンド（id, started_at）を取得する"""
+    rows = query(conn, """
+        SELECT id AS hand_id, CAST(started_at AS TEXT) AS started_at
+        FROM hands
+        WHERE status = 'completed' AND id > %s
+        ORDER BY id DESC
+        LIMIT 1
+    """, (after_hand_id,))
+    return rows[0] if rows else None
+
+
+def fetch_pending_hand_ids(conn, until_hand_id: int) -> List[int]:
+    """
+    until_hand_id 以下でまだ完了していないハンドの id を取得する
+
+    ウォーターマークより前の進行中ハンドは、次回の差分取得で完了済みかを確認する。
+    """
+    rows = query(conn, """
+        SELECT id FROM hands
+        WHERE status = 'in_progress' AND id <= %s
+        ORDER BY id
+    """, (until_hand_id,))
+    return [row["id"] for row in rows]
+
+
+def fetch_participants_between(conn, after_hand_id: int, until_hand_id: int,
+                               extra_hand_ids: Iterable[int] = ()) -> List[dict]:
+    """after_hand_id < id <= until_hand_id（と extra_hand_ids）の完了ハンドに着席したユーザーを取得する"""
+    where, params = hand_range_condition(after_hand_id, until_hand_id, extra_hand_ids)
+    return query(conn, """
+        SELECT DISTINCT CAST(hp.user_id AS TEXT) AS user_id,
+               u.display_name,
+               CASE WHEN u.is_bot THEN NULL ELSE u.discord_id END AS discord_id,
+               u.is_bot
+        FROM hands h
+        JOIN hand_players hp ON hp.hand_id = h.id
+        JOIN users u ON u.id = hp.user_id
+        WHERE h.status = 'completed'
+          AND """ + where, params)
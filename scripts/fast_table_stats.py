@@ -0,0 +1,490 @@
+"""
+fast-table ハンドデータ分析モジュール
+hand_players / hand_actions の行からプレイヤースタッツ（player_stats と同じキー）を計算する
+"""
+
+from collections import defaultdict
+from typing import Dict
+
+
+STAT_KEYS = [
+    "hands", "vpip_hands", "pfr_hands",
+    "three_bet_hands", "three_bet_opp",
+    "four_bet_hands", "four_bet_opp",
+    "fold_to_three_bet_hands", "faced_three_bet_opp",
+    "fold_to_four_bet_hands", "faced_four_bet_opp",
+    "cbet_flop_made", "cbet_flop_opp",
+    "cbet_turn_made", "cbet_turn_opp",
+    "cbet_river_made", "cbet_river_opp",
+    "fold_to_cbet_flop", "fold_to_cbet_flop_opp",
+    "fold_to_cbet_turn", "fold_to_cbet_turn_opp",
+    "fold_to_cbet_river", "fold_to_cbet_river_opp",
+    "agg_raise", "agg_call", "agg_check",
+    "saw_flop_hands", "went_showdown_hands",
+    "won_showdown_hands", "won_when_saw_flop_hands",
+    "net_cbb", "showdown_cbb", "non_showdown_cbb",
+]
+
+
+def empty_stats():
+    return {k: 0 for k in STAT_KEYS}
+
+
+def add_stats(a, b):
+    return {k: a.get(k, 0) + b.get(k, 0) for k in STAT_KEYS}
+
+
+def sub_stats(a, b):
+    return {k: a.get(k, 0) - b.get(k, 0) for k in STAT_KEYS}
+
+
+# --------------- Hand analysis ---------------
+
+def analyze_hand(hand_id, players_data, actions_data):
+    """1ハンドを分析し、各プレイヤーのスタッツ貢献を返す"""
+    per_player = defaultdict(empty_stats)
+    player_uids = set()
+
+    # Check if flop was actually dealt:
+    # - any action on flop/turn/river, OR
+    # - any player went to showdown (all-in preflop runout), OR
+    # - any player folded on flop/turn/river
+    hand_reached_flop = (
+        any(a["street"] != "preflop" for a in actions_data)
+        or any(p["showdown"] for p in players_data)
+        or any(p["folded_street"] in ("flop", "turn", "river") for p in players_data)
+    )
+
+    for p in players_data:
+        uid = p["user_id"]
+        player_uids.add(uid)
+        per_player[uid]["hands"] = 1
+        per_player[uid]["net_cbb"] = int(p["delta_cbb"] or 0)
+
+        did_not_fold_preflop = (p["folded_street"] is None or p["folded_street"] != "preflop")
+        saw_flop = hand_reached_flop and did_not_fold_preflop
+        showdown = bool(p["showdown"])
+        won = int(p["delta_cbb"] or 0) > 0
+
+        if saw_flop:
+            per_player[uid]["saw_flop_hands"] = 1
+        if showdown:
+            per_player[uid]["went_showdown_hands"] = 1
+            per_player[uid]["showdown_cbb"] = int(p["delta_cbb"] or 0)
+        else:
+            per_player[uid]["non_showdown_cbb"] = int(p["delta_cbb"] or 0)
+        if showdown and won:
+            per_player[uid]["won_showdown_hands"] = 1
+        if saw_flop and won:
+            per_player[uid]["won_when_saw_flop_hands"] = 1
+
+    # Split actions by street
+    preflop_actions = []
+    postflop_actions = defaultdict(list)  # street -> [actions]
+    for a in actions_data:
+        if a["street"] == "preflop":
+            preflop_actions.append(a)
+        else:
+            postflop_actions[a["street"]].append(a)
+
+    # --- Preflop analysis ---
+    preflop_raise_count = 0
+    raisers = []  # [(uid, raise_number)]
+    players_who_vpipped = set()
+
+    for a in preflop_actions:
+        uid = a["user_id"]
+        act = a["action"]
+
+        # VPIP: call, raise, bet, or all_in on preflop
+        if act in ("call", "raise", "bet", "all_in"):
+            if uid not in players_who_vpipped:
+                per_player[uid]["vpip_hands"] = 1
+                players_who_vpipped.add(uid)
+
+        # PFR: raise or all_in on preflop (first raise action by this player)
+        if act in ("raise", "all_in"):
+            preflop_raise_count += 1
+            raisers.append((uid, preflop_raise_count))
+
+            # Only count PFR once per player
+            if per_player[uid]["pfr_hands"] == 0:
+                per_player[uid]["pfr_hands"] = 1
+
+            if preflop_raise_count == 2:
+                per_player[uid]["three_bet_hands"] = 1
+            elif preflop_raise_count == 3:
+                per_player[uid]["four_bet_hands"] = 1
+
+        # 3bet opportunity: player acts when exactly 1 raise has occurred,
+        # and they are NOT the original raiser
+        if preflop_raise_count == 1:
+            original_raiser = raisers[0][0]
+            if uid != original_raiser:
+                if act in ("call", "raise", "fold", "all_in"):
+                    per_player[uid]["three_bet_opp"] += 1
+
+        # 4bet opportunity: player acts when exactly 2 raises have occurred,
+        # and they are NOT the 3bettor
+        if preflop_raise_count == 2 and len(raisers) >= 2:
+            three_bettor = raisers[1][0]
+            if uid != three_bettor:
+                if act in ("call", "raise", "fold", "all_in"):
+                    per_player[uid]["four_bet_opp"] += 1
+
+    # faced_three_bet_opp / fold_to_three_bet:
+    # The original raiser faces a 3bet if raise_count >= 2
+    if preflop_raise_count >= 2 and len(raisers) >= 1:
+        original_raiser = raisers[0][0]
+        per_player[original_raiser]["faced_three_bet_opp"] = 1
+        # Check if original raiser folded after the 3bet
+        after_3bet = False
+        for a in preflop_actions:
+            if after_3bet and a["user_id"] == original_raiser:
+                if a["action"] == "fold":
+                    per_player[original_raiser]["fold_to_three_bet_hands"] = 1
+                break
+            if len(raisers) >= 2 and a["user_id"] == raisers[1][0] and a["action"] in ("raise", "all_in"):
+                after_3bet = True
+
+    # faced_four_bet_opp / fold_to_four_bet:
+    if preflop_raise_count >= 3 and len(raisers) >= 2:
+        three_bettor = raisers[1][0]
+        per_player[three_bettor]["faced_four_bet_opp"] = 1
+        after_4bet = False
+        for a in preflop_actions:
+            if after_4bet and a["user_id"] == three_bettor:
+                if a["action"] == "fold":
+                    per_player[three_bettor]["fold_to_four_bet_hands"] = 1
+                break
+            if len(raisers) >= 3 and a["user_id"] == raisers[2][0] and a["action"] in ("raise", "all_in"):
+                after_4bet = True
+
+    # --- Postflop analysis ---
+    # Determine last preflop aggressor (for cbet)
+    last_pf_aggressor = raisers[-1][0] if raisers else None
+
+    # Process each postflop street
+    street_order = ["flop", "turn", "river"]
+    prev_street_aggressor = last_pf_aggressor
+
+    for street in street_order:
+        street_actions = postflop_actions.get(street, [])
+        if not street_actions:
+            prev_street_aggressor = None
+            continue
+
+        # Cbet: if the previous street's aggressor bets this street
+        cbet_candidate = prev_street_aggressor
+        street_first_aggressor = None
+        cbet_key_made = f"cbet_{street}_made"
+        cbet_key_opp = f"cbet_{street}_opp"
+        fold_cbet_key = f"fold_to_cbet_{street}"
+        fold_cbet_opp_key = f"fold_to_cbet_{street}_opp"
+
+        if cbet_candidate and any(a["user_id"] == cbet_candidate for a in street_actions):
+            per_player[cbet_candidate][cbet_key_opp] = 1
+
+        cbet_happened = False
+        for a in street_actions:
+            uid = a["user_id"]
+            act = a["action"]
+
+            # Aggression stats (postflop only)
+            if act in ("raise", "bet", "all_in"):
+                per_player[uid]["agg_raise"] += 1
+                if street_first_aggressor is None:
+                    street_first_aggressor = uid
+            elif act == "call":
+                per_player[uid]["agg_call"] += 1
+            elif act == "check":
+                per_player[uid]["agg_check"] += 1
+
+            # Cbet detection
+            if uid == cbet_candidate and act in ("bet", "raise", "all_in"):
+                per_player[uid][cbet_key_made] = 1
+                cbet_happened = True
+
+            # Fold to cbet
+            if cbet_happened and uid != cbet_candidate:
+                if act in ("fold", "call", "raise", "all_in"):
+                    per_player[uid][fold_cbet_opp_key] += 1
+                    if act == "fold":
+                        per_player[uid][fold_cbet_key] += 1
+
+        prev_street_aggressor = street_first_aggressor
+
+    return per_player
+
+
+def accumulate_hands(players_by_hand: Dict, actions_by_hand: Dict,
+                     total_stats: Dict = None) -> Dict[str, dict]:
+    """ハンドごとの行をまとめて分析し、プレイヤー別の合計スタッツを返す"""
+    if total_stats is None:
+        total_stats = {}
+
+    for hand_id, pdata in players_by_hand.items():
+        if not pdata:
+            continue
+        adata = actions_by_hand.get(hand_id, [])
+        hand_stats = analyze_hand(hand_id, pdata, adata)
+        for uid, stats in hand_stats.items():
+            totals = total_stats.setdefault(uid, empty_stats())
+            for k in STAT_KEYS:
+                totals[k] += stats[k]
+
+    return dict(total_stats)
+
+
+# --------------- Columnar analysis ---------------
+#
+# analyze_hand をバッチ全体の列（numpy 配列）に対して一括で行う版。
+# 行はハンド順・action_index 順に並んでいる前提で、レイズ回数はハンド内の累積和、
+# 各ストリートの最初のアグレッサーなどは「ハンドごとの最初の行」で求める。
+# hand_players の (hand_id, user_id) は一意（主キー）であることを前提にしている。
+
+STREET_CODES = {"preflop": 0, "flop": 1, "turn": 2, "river": 3}
+OTHER_STREET = 4
+ACTION_CODES = {"fold": 0, "check": 1, "call": 2, "bet": 3, "raise": 4, "all_in": 5}
+OTHER_ACTION = 6
+
+
+def hands_to_columns(players_by_hand: Dict, actions_by_hand: Dict):
+    """
+    ハンドごとの行を列形式に変換する
+
+    accumulate_hands と同じく、hand_players の行がないハンドは対象外。
+
+    Returns:
+        tuple: (user_ids, n_hands, players, actions)
+            user_ids: 列内のユーザー番号 -> user_id
+            players: {hand, user, delta, showdown, folded_street} の配列
+            actions: {hand, user, street, action} の配列（ハンド順・action_index 順）
+    """
+    import numpy as np
+
+    user_index: Dict[str, int] = {}
+    p_hand, p_user, p_delta, p_showdown, p_folded = [], [], [], [], []
+    a_hand, a_user, a_street, a_action = [], [], [], []
+
+    n_hands = 0
+    for hand_id, pdata in players_by_hand.items():
+        if not pdata:
+            continue
+        h = n_hands
+        n_hands += 1
+        for p in pdata:
+            p_hand.append(h)
+            p_user.append(user_index.setdefault(p["user_id"], len(user_index)))
+            p_delta.append(int(p["delta_cbb"] or 0))
+            p_showdown.append(bool(p["showdown"]))
+            folded = p["folded_street"]
+            p_folded.append(-1 if folded is None else STREET_CODES.get(folded, OTHER_STREET))
+        for a in actions_by_hand.get(hand_id, []):
+            a_hand.append(h)
+            a_user.append(user_index.setdefault(a["user_id"], len(user_index)))
+            a_street.append(STREET_CODES.get(a["street"], OTHER_STREET))
+            a_action.append(ACTION_CODES.get(a["action"], OTHER_ACTION))
+
+    players = {
+        "hand": np.array(p_hand, dtype=np.int64),
+        "user": np.array(p_user, dtype=np.int64),
+        "delta": np.array(p_delta, dtype=np.int64),
+        "showdown": np.array(p_showdown, dtype=bool),
+        "folded_street": np.array(p_folded, dtype=np.int8),
+    }
+    actions = {
+        "hand": np.array(a_hand, dtype=np.int64),
+        "user": np.array(a_user, dtype=np.int64),
+        "street": np.array(a_street, dtype=np.int8),
+        "action": np.array(a_action, dtype=np.int8),
+    }
+    return list(user_index), n_hands, players, actions
+
+
+def analyze_columns(n_users: int, n_hands: int, players: dict, actions: dict):
+    """
+    列形式のバッチを一括で分析する（analyze_hand をハンドごとに足し合わせた結果と一致）
+
+    Returns:
+        tuple: (totals, touched)
+            totals: {stat_key: ユーザー番号ごとの合計 (int64 配列)}
+            touched: analyze_hand の結果に行が作られるユーザーの bool 配列
+    """
+    import numpy as np
+
+    U, H = n_users, n_hands
+    totals = {k: np.zeros(U, dtype=np.int64) for k in STAT_KEYS}
+
+    def add(key, users, values=None):
+        """行ごとの値（省略時は1）をユーザーごとに加算する"""
+        if values is None:
+            totals[key] += np.bincount(users, minlength=U)
+        else:
+            np.add.at(totals[key], users, values)
+
+    def add_flag(key, hands, users):
+        """(ハンド, ユーザー) ごとに最大1回だけ加算する"""
+        pairs = np.unique(hands * U + users)
+        totals[key] += np.bincount(pairs % U, minlength=U)
+
+    def first_in_hand(hands, mask):
+        """条件を満たす最初の行番号をハンドごとに返す（なければ -1）"""
+        rows = np.flatnonzero(mask)
+        first = np.full(H, -1, dtype=np.int64)
+        found, pos = np.unique(hands[rows], return_index=True)
+        first[found] = rows[pos]
+        return first
+
+    def last_in_hand(hands, mask):
+        """条件を満たす最後の行番号をハンドごとに返す（なければ -1）"""
+        rows = np.flatnonzero(mask)[::-1]
+        last = np.full(H, -1, dtype=np.int64)
+        found, pos = np.unique(hands[rows], return_index=True)
+        last[found] = rows[pos]
+        return last
+
+    ph, pu = players["hand"], players["user"]
+    delta, showdown, folded = players["delta"], players["showdown"], players["folded_street"]
+    ah, au, street, act = actions["hand"], actions["user"], actions["street"], actions["action"]
+    fold, check, call, bet, raise_, all_in = (ACTION_CODES[k] for k in ("fold", "check", "call", "bet", "raise", "all_in"))
+
+    touched = np.zeros(U, dtype=bool)
+    touched[pu] = True
+
+    # --- プレイヤー単位 ---
+    reached_flop = np.zeros(H, dtype=bool)
+    reached_flop[ah[street != STREET_CODES["preflop"]]] = True
+    reached_flop[ph[showdown]] = True
+    reached_flop[ph[(folded >= 1) & (folded <= 3)]] = True
+
+    saw_flop = reached_flop[ph] & (folded != STREET_CODES["preflop"])
+    won = delta > 0
+    add("hands", pu)
+    add("net_cbb", pu, delta)
+    add("saw_flop_hands", pu[saw_flop])
+    add("went_showdown_hands", pu[showdown])
+    add("showdown_cbb", pu[showdown], delta[showdown])
+    add("non_showdown_cbb", pu[~showdown], delta[~showdown])
+    add("won_showdown_hands", pu[showdown & won])
+    add("won_when_saw_flop_hands", pu[saw_flop & won])
+
+    # --- プリフロップ ---
+    pf = np.flatnonzero(street == STREET_CODES["preflop"])
+    h, u, a = ah[pf], au[pf], act[pf]
+    n = len(pf)
+
+    is_raise = (a == raise_) | (a == all_in)
+    vpip = is_raise | (a == call) | (a == bet)
+    responds = is_raise | (a == call) | (a == fold)
+
+    # ハンド内でその行までのレイズ回数（その行のレイズを含む）
+    cum = np.cumsum(is_raise)
+    hand_start = np.ones(n, dtype=bool)
+    hand_start[1:] = h[1:] != h[:-1]
+    start_rows = np.flatnonzero(hand_start)
+    group = np.cumsum(hand_start) - 1
+    raise_count = cum - (cum - is_raise)[start_rows][group] if n else cum
+
+    # raisers[k-1][0] に相当する k 回目のレイザー
+    raiser = []
+    for k in (1, 2, 3):
+        nth = np.full(H, -1, dtype=np.int64)
+        m = is_raise & (raise_count == k)
+        nth[h[m]] = u[m]
+        raiser.append(nth)
+    n_raises = np.bincount(h[is_raise], minlength=H)
+    last_raise_row = last_in_hand(h, is_raise)
+
+    add_flag("vpip_hands", h[vpip], u[vpip])
+    add_flag("pfr_hands", h[is_raise], u[is_raise])
+    m = is_raise & (raise_count == 2)
+    add_flag("three_bet_hands", h[m], u[m])
+    m = is_raise & (raise_count == 3)
+    add_flag("four_bet_hands", h[m], u[m])
+
+    opp3 = (raise_count == 1) & (u != raiser[0][h]) & responds
+    opp4 = (raise_count == 2) & (u != raiser[1][h]) & responds
+    add("three_bet_opp", u[opp3])
+    add("four_bet_opp", u[opp4])
+    touched[u[vpip | opp3 | opp4]] = True
+
+    # Fold to 3bet / 4bet: 相手のレイズ行（そのユーザーの最初のレイズ）より後の、最初の自分の行
+    for faced_key, fold_key, min_raises, facing, raising in (
+        ("faced_three_bet_opp", "fold_to_three_bet_hands", 2, raiser[0], raiser[1]),
+        ("faced_four_bet_opp", "fold_to_four_bet_hands", 3, raiser[1], raiser[2]),
+    ):
+        faced_hands = np.flatnonzero(n_raises >= min_raises)
+        add(faced_key, facing[faced_hands])
+        flip = first_in_hand(h, is_raise & (u == raising[h]))
+        rows = np.arange(n)
+        after = (flip[h] >= 0) & (rows > flip[h]) & (u == facing[h])
+        reply = first_in_hand(h, after)
+        replied = reply[faced_hands]
+        folded_hands = faced_hands[(replied >= 0) & (a[np.maximum(replied, 0)] == fold)]
+        add(fold_key, facing[folded_hands])
+
+    # --- ポストフロップ ---
+    last_pf_aggressor = np.where(last_raise_row >= 0, u[np.maximum(last_raise_row, 0)], -1) if n else np.full(H, -1)
+    candidate = last_pf_aggressor
+    rows = np.arange(len(ah))
+    aggressive = (act == raise_) | (act == bet) | (act == all_in)
+    for code, name in ((1, "flop"), (2, "turn"), (3, "river")):
+        on_street = street == code
+        has_actions = np.bincount(ah[on_street], minlength=H) > 0
+
+        agg = on_street & aggressive
+        add("agg_raise", au[agg])
+        add("agg_call", au[on_street & (act == call)])
+        add("agg_check", au[on_street & (act == check)])
+        touched[au[agg | (on_street & ((act == call) | (act == check)))]] = True
+
+        cand = candidate[ah]
+        by_candidate = on_street & (cand >= 0) & (au == cand)
+        opp_hands = np.unique(ah[by_candidate])
+        add(f"cbet_{name}_opp", candidate[opp_hands])
+        touched[candidate[opp_hands]] = True
+
+        made = by_candidate & aggressive
+        add(f"cbet_{name}_made", candidate[np.unique(ah[made])])
+
+        first_cbet = first_in_hand(ah, made)[ah]
+        facing = (on_street & (first_cbet >= 0) & (rows >= first_cbet) & (au != cand)
+                  & ((act == fold) | (act == call) | (act == raise_) | (act == all_in)))
+        add(f"fold_to_cbet_{name}_opp", au[facing])
+        add(f"fold_to_cbet_{name}", au[facing & (act == fold)])
+        touched[au[facing]] = True
+
+        first_aggressor_row = first_in_hand(ah, agg)
+        next_candidate = np.where(first_aggressor_row >= 0, au[np.maximum(first_aggressor_row, 0)], -1) if len(ah) else np.full(H, -1)
+        # アクションがないストリートの次はCBの候補なし
+        candidate = np.where(has_actions, next_candidate, -1)
+
+    return totals, touched
+
+
+def accumulate_hands_columnar(players_by_hand: Dict, actions_by_hand: Dict,
+                              total_stats: Dict = None) -> Dict[str, dict]:
+    """accumulate_hands の numpy 版（結果は同じ）"""
+    return accumulate_columns(*hands_to_columns(players_by_hand, actions_by_hand), total_stats)
+
+
+def accumulate_columns(user_ids, n_hands: int, players: dict, actions: dict,
+                       total_stats: Dict = None) -> Dict[str, dict]:
+    """列形式のバッチ（hands_to_columns の戻り値）を分析し、プレイヤー別の合計スタッツを返す"""
+    if total_stats is None:
+        total_stats = {}
+
+    if n_hands == 0:
+        return dict(total_stats)
+
+    totals, touched = analyze_columns(len(user_ids), n_hands, players, actions)
+    columns = {k: totals[k].tolist() for k in STAT_KEYS}
+    for i, uid in enumerate(user_ids):
+        if not touched[i]:
+            continue
+        merged = total_stats.setdefault(uid, empty_stats())
+        for k in STAT_KEYS:
+            merged[k] += columns[k][i]
+
+    return dict(total_stats)
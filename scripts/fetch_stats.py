@@ -3,8 +3,19 @@
 Neon DB からプレイヤースタッツを取得し、
 fast-table の /admin/stats/export と同じ JSON フォーマットで出力する。
 
+--scope session を指定すると、累積スナップショットではなく
+指定日のハンドだけを集計したセッション単位の JSON を出力する。
+--incremental を指定すると、前回の JSON のウォーターマーク以降に完了した
+ハンドだけを取得して前回の累積値に足し込む。
+--snapshot-format delta を指定すると、all-time JSON の代わりに
+セッション差分（と N セッションごとのキーフレーム）を書き出す。
+
 Usage:
     DATABASE_URL=postgresql://... python scripts/fetch_stats.py --data-dir data [--date YYYYMMDD] [--verbose] [--dry-run]
+    DATABASE_URL=postgresql://... python scripts/fetch_stats.py --incremental [--full-refresh-every 4]
+    DATABASE_URL=postgresql://... python scripts/fetch_stats.py --snapshot-format delta [--keyframe-every 8]
+    DATABASE_URL=postgresql://... python scripts/fetch_stats.py --scope session --date YYYYMMDD [--servers houou-main]
+    DATABASE_URL=sqlite:///fixture.db python scripts/fetch_stats.py --scope session --date YYYYMMDD
 """
 
 import argparse
@@ -14,12 +25,20 @@ import sys
 from datetime import datetime, timezone
 from pathlib import Path
 
-try:
-    import psycopg2
-    import psycopg2.extras
-except ImportError:
-    print("Error: psycopg2 is required. Install with: pip install psycopg2-binary")
-    sys.exit(1)
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from fast_table_db import (
+    DEFAULT_SERVERS, SESSION_TIMEZONE, connect, query, read_snapshot, fetch_session_rows,
+    fetch_rows_between, fetch_watermark, fetch_pending_hand_ids, fetch_participants_between,
+)
+from fast_table_stats import STAT_KEYS, empty_stats, accumulate_hands
+import snapshot_store
+from compressed_io import glob_compressed, open_text, strip_compression
+
+
+# --incremental で、この回数だけ差分取得が続いたら全件取得で突き合わせ直す
+DEFAULT_FULL_REFRESH_EVERY = 4
 
 
 # fast-table のデフォルト設定: BB_UNIT=0.01 → cbbPerBb=100
@@ -194,19 +213,17 @@ def build_raw_totals(stats):
 
 def fetch_participants(conn):
     """hand_players + users + hands を JOIN してプレイ実績のある参加者一覧を取得"""
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""
-            SELECT DISTINCT hp.user_id::text,
-                   u.display_name,
-                   CASE WHEN u.is_bot THEN NULL ELSE u.discord_id END AS discord_id,
-                   u.is_bot
-            FROM hand_players hp
-            JOIN users u ON u.id = hp.user_id
-            JOIN hands h ON h.id = hp.hand_id
-            WHERE h.status = 'completed'
-            ORDER BY u.display_name, hp.user_id::text
-        """)
-        return cur.fetchall()
+    return query(conn, """
+        SELECT DISTINCT CAST(hp.user_id AS TEXT) AS user_id,
+               u.display_name,
+               CASE WHEN u.is_bot THEN NULL ELSE u.discord_id END AS discord_id,
+               u.is_bot
+        FROM hand_players hp
+        JOIN users u ON u.id = hp.user_id
+        JOIN hands h ON h.id = hp.hand_id
+        WHERE h.status = 'completed'
+        ORDER BY u.display_name, CAST(hp.user_id AS TEXT)
+    """)
 
 
 def fetch_player_stats(conn, user_ids):
@@ -214,52 +231,52 @@ def fetch_player_stats(conn, user_ids):
     if not user_ids:
         return {}
 
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""
-            SELECT user_id::text,
-                   SUM(hands) AS hands,
-                   SUM(vpip_hands) AS vpip_hands,
-                   SUM(pfr_hands) AS pfr_hands,
-                   SUM(three_bet_hands) AS three_bet_hands,
-                   SUM(three_bet_opp) AS three_bet_opp,
-                   SUM(four_bet_hands) AS four_bet_hands,
-                   SUM(four_bet_opp) AS four_bet_opp,
-                   SUM(fold_to_three_bet_hands) AS fold_to_three_bet_hands,
-                   SUM(faced_three_bet_opp) AS faced_three_bet_opp,
-                   SUM(fold_to_four_bet_hands) AS fold_to_four_bet_hands,
-                   SUM(faced_four_bet_opp) AS faced_four_bet_opp,
-                   SUM(cbet_flop_made) AS cbet_flop_made,
-                   SUM(cbet_flop_opp) AS cbet_flop_opp,
-                   SUM(cbet_turn_made) AS cbet_turn_made,
-                   SUM(cbet_turn_opp) AS cbet_turn_opp,
-                   SUM(cbet_river_made) AS cbet_river_made,
-                   SUM(cbet_river_opp) AS cbet_river_opp,
-                   SUM(fold_to_cbet_flop) AS fold_to_cbet_flop,
-                   SUM(fold_to_cbet_flop_opp) AS fold_to_cbet_flop_opp,
-                   SUM(fold_to_cbet_turn) AS fold_to_cbet_turn,
-                   SUM(fold_to_cbet_turn_opp) AS fold_to_cbet_turn_opp,
-                   SUM(fold_to_cbet_river) AS fold_to_cbet_river,
-                   SUM(fold_to_cbet_river_opp) AS fold_to_cbet_river_opp,
-                   SUM(agg_raise) AS agg_raise,
-                   SUM(agg_call) AS agg_call,
-                   SUM(agg_check) AS agg_check,
-                   SUM(saw_flop_hands) AS saw_flop_hands,
-                   SUM(went_showdown_hands) AS went_showdown_hands,
-                   SUM(won_showdown_hands) AS won_showdown_hands,
-                   SUM(won_when_saw_flop_hands) AS won_when_saw_flop_hands,
-                   SUM(net_cbb) AS net_cbb,
-                   SUM(showdown_cbb) AS showdown_cbb,
-                   SUM(non_showdown_cbb) AS non_showdown_cbb
-            FROM player_stats
-            WHERE user_id = ANY(%s::uuid[])
-            AND server_id IN ('houou-shared', 'houou-main')
-            GROUP BY user_id
-        """, (user_ids,))
-        rows = cur.fetchall()
-
+    rows = query(conn, """
+        SELECT CAST(user_id AS TEXT) AS user_id,
+               SUM(hands) AS hands,
+               SUM(vpip_hands) AS vpip_hands,
+               SUM(pfr_hands) AS pfr_hands,
+               SUM(three_bet_hands) AS three_bet_hands,
+               SUM(three_bet_opp) AS three_bet_opp,
+               SUM(four_bet_hands) AS four_bet_hands,
+               SUM(four_bet_opp) AS four_bet_opp,
+               SUM(fold_to_three_bet_hands) AS fold_to_three_bet_hands,
+               SUM(faced_three_bet_opp) AS faced_three_bet_opp,
+               SUM(fold_to_four_bet_hands) AS fold_to_four_bet_hands,
+               SUM(faced_four_bet_opp) AS faced_four_bet_opp,
+               SUM(cbet_flop_made) AS cbet_flop_made,
+               SUM(cbet_flop_opp) AS cbet_flop_opp,
+               SUM(cbet_turn_made) AS cbet_turn_made,
+               SUM(cbet_turn_opp) AS cbet_turn_opp,
+               SUM(cbet_river_made) AS cbet_river_made,
+               SUM(cbet_river_opp) AS cbet_river_opp,
+               SUM(fold_to_cbet_flop) AS fold_to_cbet_flop,
+               SUM(fold_to_cbet_flop_opp) AS fold_to_cbet_flop_opp,
+               SUM(fold_to_cbet_turn) AS fold_to_cbet_turn,
+               SUM(fold_to_cbet_turn_opp) AS fold_to_cbet_turn_opp,
+               SUM(fold_to_cbet_river) AS fold_to_cbet_river,
+               SUM(fold_to_cbet_river_opp) AS fold_to_cbet_river_opp,
+               SUM(agg_raise) AS agg_raise,
+               SUM(agg_call) AS agg_call,
+               SUM(agg_check) AS agg_check,
+               SUM(saw_flop_hands) AS saw_flop_hands,
+               SUM(went_showdown_hands) AS went_showdown_hands,
+               SUM(won_showdown_hands) AS won_showdown_hands,
+               SUM(won_when_saw_flop_hands) AS won_when_saw_flop_hands,
+               SUM(net_cbb) AS net_cbb,
+               SUM(showdown_cbb) AS showdown_cbb,
+               SUM(non_showdown_cbb) AS non_showdown_cbb
+        FROM player_stats
+        WHERE server_id IN ('houou-shared', 'houou-main')
+        GROUP BY user_id
+    """)
+
+    wanted = set(user_ids)
     stats_by_user = {}
     for row in rows:
         uid = row["user_id"]
+        if uid not in wanted:
+            continue
         stats_by_user[uid] = {k: int(v) if v is not None else 0 for k, v in row.items() if k != "user_id"}
     return stats_by_user
 
@@ -276,7 +293,7 @@ def build_export_player(participant, stats):
         "discord_id": participant.get("discord_id"),
         "discord_username": None,
         "discord_global_name": None,
-        "is_bot": participant["is_bot"],
+        "is_bot": bool(participant["is_bot"]),
         "summary": summary,
         "metrics": metrics,
         "raw_totals": raw_totals,
@@ -302,7 +319,224 @@ EMPTY_STATS = {
 }
 
 
-def main():
+def format_generated_at(now):
+    """fast-table と同じ generated_at 文字列 (ミリ秒まで) を返す"""
+    return now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
+
+
+def format_file_timestamp(now):
+    """fast-table と同じファイル名用タイムスタンプを返す"""
+    return now.strftime("%Y-%m-%dT%H-%M-%S-") + f"{now.microsecond // 1000:03d}Z"
+
+
+def build_all_time_payload(conn, now, verbose=False):
+    """
+    player_stats の累積値から all-time スナップショットを構築する
+
+    ウォーターマークと player_stats が同じ時点の値になるよう、read_snapshot の中で呼ぶ。
+    """
+    # 次回の差分取得の起点
+    watermark = fetch_watermark(conn)
+    pending = fetch_pending_hand_ids(conn, watermark["hand_id"]) if watermark else []
+
+    # 参加者を取得
+    participants = fetch_participants(conn)
+    if verbose:
+        print(f"Found {len(participants)} participants")
+
+    # user_id リスト
+    user_ids = [p["user_id"] for p in participants]
+
+    # スタッツ取得
+    stats_by_user = fetch_player_stats(conn, user_ids)
+    if verbose:
+        print(f"Loaded stats for {len(stats_by_user)} players")
+
+    # JSON 構築
+    players = []
+    for participant in participants:
+        uid = participant["user_id"]
+        stats = stats_by_user.get(uid, EMPTY_STATS.copy())
+        players.append(build_export_player(participant, stats))
+
+    return {
+        "generated_at": format_generated_at(now),
+        "scope": {
+            "type": "all_time",
+            "date": None,
+            "timezone": None,
+        },
+        "player_count": len(players),
+        "players": players,
+        "watermark": build_watermark(watermark, pending, "full", 0),
+    }
+
+
+def build_watermark(row, pending_hand_ids, mode, incremental_runs):
+    """
+    次回の差分取得に使うウォーターマークを構築する
+
+    hand_id 以下の完了ハンドはすべて集計済み。pending_hand_ids は hand_id 以下で
+    まだ進行中だったハンドで、次回に完了していれば足し込む。
+    """
+    return {
+        "hand_id": row["hand_id"] if row else 0,
+        "started_at": str(row["started_at"]) if row else None,
+        "pending_hand_ids": list(pending_hand_ids),
+        "mode": mode,
+        "incremental_runs": incremental_runs,
+    }
+
+
+def find_previous_export(data_dir, date_str):
+    """date_str 以前で最新の all-time JSON を探す"""
+    hand_histories_dir = data_dir / "hand_histories"
+    if not hand_histories_dir.exists():
+        return None
+    for date_dir in sorted(hand_histories_dir.iterdir(), reverse=True):
+        if not date_dir.is_dir() or not date_dir.name.isdigit() or date_dir.name > date_str:
+            continue
+        json_files = glob_compressed(date_dir, "player-stats-all-time-*.json")
+        if json_files:
+            return json_files[-1]
+    return None
+
+
+def load_previous_export(data_dir, date_str):
+    """
+    差分取得の起点になる前回の累積値を読み込む
+
+    all-time JSON とスナップショット（キーフレーム + 差分）のうち新しい方を使う。
+
+    Returns:
+        tuple: (payload, source_name)。payload は players と watermark を持つ dict
+    """
+    json_path = find_previous_export(data_dir, date_str)
+    delta_path = snapshot_store.find_latest_delta(data_dir, date_str)
+
+    # 日付ディレクトリ、ファイル名のタイムスタンプの順で比較する
+    if delta_path and (json_path is None or (
+        (delta_path.parent.name, strip_compression(delta_path.name)[len(snapshot_store.DELTA_PREFIX):])
+        >= (json_path.parent.name, strip_compression(json_path.name)[len(snapshot_store.ALL_TIME_PREFIX):])
+    )):
+        players, last = snapshot_store.reconstruct(data_dir, delta_path.parent.name)
+        payload = {"players": list(players.values()), "watermark": last.get("watermark")}
+        return payload, f"{delta_path.parent.name}/{delta_path.name}"
+
+    if json_path:
+        with open_text(json_path) as f:
+            return json.load(f), f"{json_path.parent.name}/{json_path.name}"
+
+    return None, None
+
+
+def build_incremental_payload(conn, previous, now, verbose=False):
+    """
+    前回の all-time JSON に、ウォーターマーク以降に完了したハンドだけを足し込む
+
+    取得するのは新しいハンドと新しく着席したユーザーのみなので、
+    DB の履歴が増えても1回あたりのコストは週ごとのハンド数で決まる。
+    player_stats ではなく analyze_hand で計算した値を加算するため、
+    定期的な全件取得（--full-refresh-every）で DB の値と突き合わせ直す。
+    """
+    previous_mark = previous["watermark"]
+    after_hand_id = previous_mark["hand_id"]
+
+    participants = {}
+    stats_by_user = {}
+    for player in previous["players"]:
+        uid = player["user_id"]
+        participants[uid] = {
+            "user_id": uid,
+            "display_name": player["display_name"],
+            "discord_id": player.get("discord_id"),
+            "is_bot": player["is_bot"],
+        }
+        stats_by_user[uid] = {k: player["raw_totals"].get(k, 0) for k in STAT_KEYS}
+
+    previous_pending = previous_mark.get("pending_hand_ids", [])
+    watermark = fetch_watermark(conn, after_hand_id)
+    if watermark is None:
+        watermark = {"hand_id": after_hand_id, "started_at": previous_mark.get("started_at")}
+    until_hand_id = watermark["hand_id"]
+
+    # 新しく着席したユーザー（表示名の変更もここで反映される）
+    new_users = 0
+    for row in fetch_participants_between(conn, after_hand_id, until_hand_id, previous_pending):
+        if row["user_id"] not in participants:
+            new_users += 1
+        participants[row["user_id"]] = {**row, "is_bot": bool(row["is_bot"])}
+
+    new_hands = 0
+    for server_id in DEFAULT_SERVERS:
+        players_by_hand, actions_by_hand, _ = fetch_rows_between(
+            conn, server_id, after_hand_id, until_hand_id, previous_pending
+        )
+        new_hands += len(players_by_hand)
+        accumulate_hands(players_by_hand, actions_by_hand, stats_by_user)
+
+    pending = fetch_pending_hand_ids(conn, until_hand_id)
+    if verbose:
+        print(f"Hands {after_hand_id + 1}-{until_hand_id} (+{len(previous_pending)} pending): "
+              f"{new_hands} new hands, {new_users} new users, {len(pending)} still in progress")
+
+    players = []
+    for participant in sorted(participants.values(), key=lambda p: (p["display_name"], p["user_id"])):
+        stats = stats_by_user.get(participant["user_id"], EMPTY_STATS.copy())
+        players.append(build_export_player(participant, stats))
+
+    return {
+        "generated_at": format_generated_at(now),
+        "scope": {
+            "type": "all_time",
+            "date": None,
+            "timezone": None,
+        },
+        "player_count": len(players),
+        "players": players,
+        "watermark": build_watermark(
+            watermark, pending, "incremental", previous_mark.get("incremental_runs", 0) + 1
+        ),
+    }
+
+
+def build_session_payload(conn, date_str, servers, now, verbose=False):
+    """
+    指定日のハンドだけを集計したセッション単位のスナップショットを構築する
+
+    サーバーごとに hand_players / hand_actions を1クエリで取得し、
+    reconstruct_snapshots.py と同じ analyze_hand で集計する。
+    """
+    participants = {}
+    stats_by_user = {}
+    for server_id in servers:
+        players_by_hand, actions_by_hand, server_participants = fetch_session_rows(
+            conn, server_id, date_str
+        )
+        if verbose:
+            print(f"  {server_id}: {len(players_by_hand)} hands, {len(server_participants)} players")
+        participants.update(server_participants)
+        accumulate_hands(players_by_hand, actions_by_hand, stats_by_user)
+
+    players = []
+    for participant in sorted(participants.values(), key=lambda p: (p["display_name"], p["user_id"])):
+        stats = stats_by_user.get(participant["user_id"], empty_stats())
+        players.append(build_export_player(participant, stats))
+
+    return {
+        "generated_at": format_generated_at(now),
+        "scope": {
+            "type": "session",
+            "date": f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}",
+            "timezone": SESSION_TIMEZONE,
+            "servers": list(servers),
+        },
+        "player_count": len(players),
+        "players": players,
+    }
+
+
+def main(argv=None):
     parser = argparse.ArgumentParser(
         description="Neon DB からスタッツを取得し player-stats JSON を生成"
     )
@@ -314,6 +548,31 @@ def main():
         "--date", default=None,
         help="セッション日付 YYYYMMDD (default: 当日)"
     )
+    parser.add_argument(
+        "--scope", choices=["all-time", "session"], default="all-time",
+        help="all-time: 累積スナップショット / session: 指定日のハンドのみ集計 (default: all-time)"
+    )
+    parser.add_argument(
+        "--servers", nargs="+", default=list(DEFAULT_SERVERS),
+        help=f"--scope session で集計するサーバー (default: {' '.join(DEFAULT_SERVERS)})"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="前回の all-time JSON のウォーターマーク以降のハンドだけを取得して足し込む"
+    )
+    parser.add_argument(
+        "--full-refresh-every", type=int, default=DEFAULT_FULL_REFRESH_EVERY,
+        help=f"--incremental でも、差分取得がこの回数続いたら全件取得する (default: {DEFAULT_FULL_REFRESH_EVERY})"
+    )
+    parser.add_argument(
+        "--snapshot-format", choices=["json", "delta"], default="json",
+        help="all-time の出力形式。json: player-stats-all-time-*.json / "
+             "delta: キーフレーム + セッション差分 (snapshot_store.py) (default: json)"
+    )
+    parser.add_argument(
+        "--keyframe-every", type=int, default=snapshot_store.DEFAULT_KEYFRAME_EVERY,
+        help=f"--snapshot-format delta でキーフレームを書く間隔（セッション数, default: {snapshot_store.DEFAULT_KEYFRAME_EVERY}）"
+    )
     parser.add_argument(
         "--verbose", "-v", action="store_true",
         help="詳細な出力を表示"
@@ -322,7 +581,7 @@ def main():
         "--dry-run", action="store_true",
         help="実際にファイルを書き込まない"
     )
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
     database_url = os.environ.get("DATABASE_URL")
     if not database_url:
@@ -342,62 +601,74 @@ def main():
         print(f"Database URL: {database_url[:30]}...")
         print(f"Data directory: {data_dir}")
         print(f"Session date: {date_str}")
+        print(f"Scope: {args.scope}")
 
     # DB 接続
     try:
-        conn = psycopg2.connect(database_url)
+        conn = connect(database_url)
+    except ImportError:
+        print("Error: psycopg2 is required. Install with: pip install psycopg2-binary")
+        sys.exit(1)
     except Exception as e:
         print(f"Error: Failed to connect to database: {e}")
         sys.exit(1)
 
     try:
-        # 参加者を取得
-        participants = fetch_participants(conn)
-        if args.verbose:
-            print(f"Found {len(participants)} participants")
-
-        # user_id リスト
-        user_ids = [p["user_id"] for p in participants]
-
-        # スタッツ取得
-        stats_by_user = fetch_player_stats(conn, user_ids)
-        if args.verbose:
-            print(f"Loaded stats for {len(stats_by_user)} players")
-
-        # JSON 構築
         now = datetime.now(timezone.utc)
-        players = []
-        for participant in participants:
-            uid = participant["user_id"]
-            stats = stats_by_user.get(uid, EMPTY_STATS.copy())
-            players.append(build_export_player(participant, stats))
-
-        payload = {
-            "generated_at": now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z",
-            "scope": {
-                "type": "all_time",
-                "date": None,
-                "timezone": None,
-            },
-            "player_count": len(players),
-            "players": players,
-        }
+        if args.scope == "session":
+            with read_snapshot(conn):
+                payload = build_session_payload(conn, date_str, args.servers, now, verbose=args.verbose)
+            filename = f"player-stats-session-{format_file_timestamp(now)}.json"
+        else:
+            previous = None
+            if args.incremental:
+                previous, previous_name = load_previous_export(data_dir, date_str)
+                mark = previous.get("watermark") if previous else None
+                if not mark:
+                    if args.verbose:
+                        print("No watermark in previous export, running full refresh")
+                    previous = None
+                elif mark.get("incremental_runs", 0) >= args.full_refresh_every:
+                    if args.verbose:
+                        print(f"{mark['incremental_runs']} incremental runs since last full refresh, running full refresh")
+                    previous = None
+                elif args.verbose:
+                    print(f"Incremental fetch from {previous_name} (hand {mark['hand_id']})")
+
+            # ウォーターマーク・player_stats・ハンドの行を1つのスナップショットから読む
+            with read_snapshot(conn):
+                if previous is not None:
+                    payload = build_incremental_payload(conn, previous, now, verbose=args.verbose)
+                else:
+                    payload = build_all_time_payload(conn, now, verbose=args.verbose)
+            # ファイル名生成（fast-table と同じ形式）
+            filename = f"player-stats-all-time-{format_file_timestamp(now)}.json"
 
         if args.verbose:
-            print(f"Built export with {len(players)} players")
+            print(f"Built export with {payload['player_count']} players")
 
         if args.dry_run:
             print("[DRY RUN] Would write JSON file")
             print(json.dumps(payload, indent=2, ensure_ascii=False)[:500] + "...")
             return
 
+        if args.scope == "all-time" and args.snapshot_format == "delta":
+            players = {p["user_id"]: p for p in payload["players"]}
+            written = snapshot_store.write_snapshot(
+                data_dir, date_str, players,
+                file_timestamp=format_file_timestamp(now),
+                generated_at=payload["generated_at"],
+                watermark=payload["watermark"],
+                keyframe_every=args.keyframe_every,
+                verbose=args.verbose,
+            )
+            for path in written:
+                print(f"Written: {path}")
+            return
+
         # 出力ディレクトリ作成
         output_dir = data_dir / "hand_histories" / date_str
         output_dir.mkdir(parents=True, exist_ok=True)
-
-        # ファイル名生成（fast-table と同じ形式）
-        timestamp = now.strftime("%Y-%m-%dT%H-%M-%S-") + f"{now.microsecond // 1000:03d}Z"
-        filename = f"player-stats-all-time-{timestamp}.json"
         output_path = output_dir / filename
 
         with open(output_path, "w", encoding="utf-8") as f:
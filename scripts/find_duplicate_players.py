@@ -1,16 +1,44 @@
 #!/usr/bin/env python3
 """
 重複プレイヤー検出スクリプト
-同じ display_name を持つプレイヤーを検出して表示する
+同じ display_name を持つプレイヤーと、表記ゆれ（大文字小文字・全角半角・記号）の
+近い名前を持つプレイヤーの統合候補を検出して表示する
+
+近い名前の候補は、正規化した名前の文字 bigram をキーにしたブロック（転置索引）で
+絞り込み、同じブロックに入ったペアだけを比較する（全ペア比較はしない）。
+Ledger があれば、同じ Poker Now の player_id が両方の名前で使われたこと（同一人物の根拠）と
+同じ時間帯に着席していたこと（別人の根拠）も確認する。
 
 Usage:
-    python scripts/find_duplicate_players.py [--config-dir config]
+    python scripts/find_duplicate_players.py [--config-dir config] [--min-score 0.85] [--no-ledger]
 """
 
 import argparse
+import csv
 import json
 import sys
+import unicodedata
+from difflib import SequenceMatcher
+from itertools import combinations
 from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from compressed_io import glob_compressed, open_text
+
+
+# 近い名前とみなす類似度（正規化後の名前の SequenceMatcher.ratio）
+DEFAULT_MIN_SCORE = 0.85
+# これより多くのプレイヤーが持つ bigram はブロックに使わない（ありふれた文字の組）
+MAX_BLOCK_SIZE = 50
+# 候補にするのに必要な共通 bigram 数（短い名前は名前全体の一致のみ）
+MIN_SHARED_GRAMS = 2
+# 類似度を計算する前に足切りする bigram の Dice 係数
+MIN_GRAM_DICE = 0.5
+# 同じ player_id が両方の名前で使われていた場合にスコアに足す値（1件あたり、上限 1.0）
+LEDGER_ID_BONUS = 0.1
 
 
 def find_duplicates(players_path: Path) -> dict:
@@ -39,15 +67,203 @@ def find_duplicates(players_path: Path) -> dict:
     return duplicates
 
 
+def normalize_name(name: str) -> str:
+    """
+    比較用に名前を正規化する
+
+    NFKC（全角英数→半角など）→ casefold → カタカナをひらがなに → 文字・数字以外を除去。
+    記号だけの名前は NFKC + casefold のみ。
+    """
+    text = unicodedata.normalize("NFKC", name).casefold()
+    text = "".join(chr(ord(ch) - 0x60) if "\u30a1" <= ch <= "\u30f6" else ch for ch in text)
+    stripped = "".join(ch for ch in text if unicodedata.category(ch)[0] in "LN")
+    return stripped or text.strip()
+
+
+def name_grams(normalized: str) -> Set[str]:
+    """前後に境界記号を付けた文字 bigram（1文字の名前も2つの bigram になる）"""
+    padded = f"^{normalized}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def candidate_pairs(normalized: Dict[str, str]) -> Dict[Tuple[str, str], int]:
+    """
+    bigram のブロックで比較するペアを絞り込む
+
+    Args:
+        normalized: {player_id: 正規化した名前}
+
+    Returns:
+        dict: {(player_id, player_id): 共通 bigram 数}（MIN_SHARED_GRAMS 以上のみ）
+    """
+    blocks: Dict[str, List[str]] = {}
+    for pid, name in normalized.items():
+        for gram in name_grams(name):
+            blocks.setdefault(gram, []).append(pid)
+
+    shared: Dict[Tuple[str, str], int] = {}
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        for a, b in combinations(sorted(members), 2):
+            shared[(a, b)] = shared.get((a, b), 0) + 1
+    return {pair: n for pair, n in shared.items() if n >= MIN_SHARED_GRAMS}
+
+
+def scan_ledgers(hand_histories_dir: Path, alias_map: Dict[str, str],
+                 name_map: Dict[str, str]) -> Tuple[Dict[str, Set[str]], Dict[str, list]]:
+    """
+    Ledger CSV から、player_id ごとの対応プレイヤーと着席時間帯を集める
+
+    Args:
+        alias_map: {alias (Poker Now の player_id): players.json のメインID}
+        name_map: {正規化した名前: メインID}（名前が一意なもののみ）
+
+    Returns:
+        tuple: (links, intervals)
+            links: {ledger の player_id: その ID で着席したメインIDの集合}
+            intervals: {メインID: [(start, end, ledger の player_id)]}（ISO 8601 文字列）
+    """
+    links: Dict[str, Set[str]] = {}
+    intervals: Dict[str, list] = {}
+    for ledger_path in glob_compressed(hand_histories_dir, "**/ledger_*.csv"):
+        with open_text(ledger_path) as f:
+            rows = list(csv.DictReader(f))
+        # 退席していないプレイヤー（session_end_at が空）はテーブル終了まで着席とみなす
+        table_end = max((t for row in rows for t in (row["session_start_at"], row["session_end_at"]) if t),
+                        default="")
+        for row in rows:
+            ledger_id = row["player_id"]
+            entries = set()
+            if ledger_id in alias_map:
+                entries.add(alias_map[ledger_id])
+            by_name = name_map.get(normalize_name(row["player_nickname"]))
+            if by_name:
+                entries.add(by_name)
+            if not entries:
+                continue
+            links.setdefault(ledger_id, set()).update(entries)
+            if ledger_id in alias_map and row["session_start_at"]:
+                intervals.setdefault(alias_map[ledger_id], []).append(
+                    (row["session_start_at"], row["session_end_at"] or table_end, ledger_id)
+                )
+    return links, intervals
+
+
+def seated_together(a: list, b: list) -> bool:
+    """2人の着席時間帯が重なるか（同じ player_id の行どうしは同じ席なので除く）"""
+    for start_a, end_a, id_a in a:
+        for start_b, end_b, id_b in b:
+            if id_a != id_b and start_a < end_b and start_b < end_a:
+                return True
+    return False
+
+
+def find_near_duplicates(players_path: Path, hand_histories_dir: Optional[Path] = None,
+                         min_score: float = DEFAULT_MIN_SCORE) -> List[dict]:
+    """
+    表記ゆれの近い名前を持つプレイヤーの統合候補を検出
+
+    同じ display_name のペアは find_duplicates が扱うので含めない。
+
+    Returns:
+        list: [{ids, names, score, similarity, shared_ledger_ids, seated_together}]
+            スコアの高い順。同時に着席していたペアは別人として score=0、末尾に並べる
+    """
+    with open(players_path, 'r', encoding='utf-8') as f:
+        players = json.load(f)['players']
+
+    normalized = {pid: normalize_name(info['display_name']) for pid, info in players.items()}
+    pairs = candidate_pairs(normalized)
+
+    links: Dict[str, Set[str]] = {}
+    intervals: Dict[str, list] = {}
+    if hand_histories_dir is not None and hand_histories_dir.exists():
+        alias_map = {alias: pid for pid, info in players.items() for alias in info.get('aliases', [pid])}
+        name_owners: Dict[str, Set[str]] = {}
+        for pid, name in normalized.items():
+            name_owners.setdefault(name, set()).add(pid)
+        name_map = {name: next(iter(owners)) for name, owners in name_owners.items() if len(owners) == 1}
+        links, intervals = scan_ledgers(hand_histories_dir, alias_map, name_map)
+
+    shared_ids: Dict[Tuple[str, str], int] = {}
+    for entries in links.values():
+        for pair in combinations(sorted(entries), 2):
+            shared_ids[pair] = shared_ids.get(pair, 0) + 1
+
+    gram_counts = {pid: len(name_grams(name)) for pid, name in normalized.items()}
+    suggestions = []
+    for a, b in set(pairs) | set(shared_ids):
+        name_a, name_b = players[a]['display_name'], players[b]['display_name']
+        if name_a == name_b:
+            continue
+        n_shared = shared_ids.get((a, b), 0)
+        dice = 2 * pairs.get((a, b), 0) / (gram_counts[a] + gram_counts[b])
+        if dice < MIN_GRAM_DICE and not n_shared:
+            continue
+        similarity = SequenceMatcher(None, normalized[a], normalized[b]).ratio()
+        score = min(1.0, similarity + LEDGER_ID_BONUS * n_shared)
+        if score < min_score:
+            continue
+        together = seated_together(intervals.get(a, []), intervals.get(b, []))
+        suggestions.append({
+            'ids': [a, b],
+            'names': [name_a, name_b],
+            'score': 0.0 if together else round(score, 3),
+            'similarity': round(similarity, 3),
+            'shared_ledger_ids': n_shared,
+            'seated_together': together,
+        })
+
+    suggestions.sort(key=lambda s: (-s['score'], -s['similarity'], s['ids']))
+    return suggestions
+
+
+def print_near_duplicates(suggestions: List[dict]) -> None:
+    """近い名前の統合候補をスコア順に表示"""
+    candidates = [s for s in suggestions if not s['seated_together']]
+    conflicts = [s for s in suggestions if s['seated_together']]
+    print(f"=== 近い名前の統合候補 ({len(candidates)}件) ===")
+    for s in candidates:
+        evidence = f", 共通ID {s['shared_ledger_ids']}" if s['shared_ledger_ids'] else ""
+        print(f"  {s['score']:.2f}  {s['names'][0]} ({s['ids'][0]})  <->  "
+              f"{s['names'][1]} ({s['ids'][1]})  [類似度 {s['similarity']:.2f}{evidence}]")
+    if conflicts:
+        print(f"\n  同時に着席していたため除外: {len(conflicts)}件")
+        for s in conflicts:
+            print(f"    {s['names'][0]} ({s['ids'][0]})  <->  {s['names'][1]} ({s['ids'][1]})")
+
+
 def main():
     parser = argparse.ArgumentParser(
-        description="同じ display_name を持つプレイヤーを検出"
+        description="同じ display_name・近い名前を持つプレイヤーを検出"
     )
     parser.add_argument(
         "--config-dir",
         default="config",
         help="設定ディレクトリのパス (default: config)"
     )
+    parser.add_argument(
+        "--data-dir",
+        default="data",
+        help="データディレクトリのパス（Ledger の参照に使う, default: data）"
+    )
+    parser.add_argument(
+        "--min-score",
+        type=float,
+        default=DEFAULT_MIN_SCORE,
+        help=f"近い名前の候補として表示するスコアの下限 (default: {DEFAULT_MIN_SCORE})"
+    )
+    parser.add_argument(
+        "--no-ledger",
+        action="store_true",
+        help="Ledger を参照しない（名前の類似度だけで候補を出す）"
+    )
+    parser.add_argument(
+        "--json",
+        default=None,
+        help="近い名前の統合候補を JSON で書き出すパス"
+    )
     args = parser.parse_args()
 
     base_dir = Path(__file__).parent.parent
@@ -58,12 +274,20 @@ def main():
         sys.exit(1)
 
     duplicates = find_duplicates(players_path)
+    hand_histories_dir = None if args.no_ledger else base_dir / args.data_dir / "hand_histories"
+    suggestions = find_near_duplicates(players_path, hand_histories_dir, args.min_score)
+
+    print_near_duplicates(suggestions)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(suggestions, f, ensure_ascii=False, indent=2)
+        print(f"\nWritten: {args.json}")
 
     if not duplicates:
-        print("重複している display_name はありません。")
+        print("\n重複している display_name はありません。")
         return
 
-    print(f"=== 重複している display_name ({len(duplicates)}件) ===")
+    print(f"\n=== 重複している display_name ({len(duplicates)}件) ===")
     for name, entries in duplicates.items():
         print(f"\n{name}:")
         for entry in entries:
@@ -7,6 +7,14 @@ import re
 from typing import List, Dict, Tuple, Optional
 from dataclasses import dataclass, field
 
+from allin_ev import EV_DIGITS, ev_adjustments
+
+
+# 収支を足すときに丸める桁（BB）。収支は 1/100 BB 単位の値なので、足すたびに丸めると足す順序によらず
+# 同じ float になる（--season / --since で節ごとの値から復元しても、テーブルごとに足した全体の集計と一致する）。
+# EV 収支の補正も同じように EV_DIGITS（allin_ev.py）で丸めながら足す。
+NET_DIGITS = 2
+
 
 @dataclass
 class PlayerStats:
@@ -29,6 +37,17 @@ class PlayerStats:
     wtsd_hands: int = 0
     wtsd_count: int = 0
     wdsd_count: int = 0
+    # オールインのエクイティで獲得額を期待値に置き換えたときの収支との差（BB、allin_ev.py）
+    ev_adjustment: float = 0
+    # ev_adjustment を計算したハンド数（ハンド履歴ログから計算したハンド。計算済み JSON のハンドは含まない）
+    ev_hands: int = 0
+
+    @property
+    def ev_net(self) -> Optional[float]:
+        """EV収支（BB）。補正を計算していないハンドがあれば None"""
+        if self.ev_hands != self.hands:
+            return None
+        return self.net + self.ev_adjustment
 
     @property
     def vpip(self) -> float:
@@ -81,7 +100,7 @@ class PlayerStats:
 
     def merge(self, other: 'PlayerStats') -> None:
         """他のPlayerStatsとマージする"""
-        self.net += other.net
+        self.net = round(self.net + other.net, NET_DIGITS)
         self.hands += other.hands
         self.vpip_hands += other.vpip_hands
         self.vpip_count += other.vpip_count
@@ -96,6 +115,8 @@ class PlayerStats:
         self.wtsd_hands += other.wtsd_hands
         self.wtsd_count += other.wtsd_count
         self.wdsd_count += other.wdsd_count
+        self.ev_adjustment = round(self.ev_adjustment + other.ev_adjustment, EV_DIGITS)
+        self.ev_hands += other.ev_hands
 
     def to_dict(self) -> dict:
         """辞書形式で出力"""
@@ -104,6 +125,7 @@ class PlayerStats:
             "プレイヤー": self.display_name,
             "リーグ": self.league,
             "収支": self.net,
+            "EV収支": self.ev_net,
             "ハンド数": self.hands,
             "VPIP": self.vpip,
             "PFR": self.pfr,
@@ -170,6 +192,26 @@ class StatsCalculator:
         return list(players)
 
 
+def calculate_players(histories: List[str], players: List[str]) -> Dict[str, PlayerStats]:
+    """
+    histories の各ハンドから players のスタッツを計算する
+
+    各スタッツはハンドごとの数の合計なので、ハンドを連続した範囲に分けて計算した結果を
+    PlayerStats.merge で足すと、まとめて計算した結果と一致する（StatsAggregator のチャンク並列で使う）。
+    players はログ全体のプレイヤーを渡す（名前の部分一致で他のプレイヤーのハンドが数えられる場合があるため、
+    範囲内に着席していないプレイヤーも計算する）。
+    EV 収支の補正（allin_ev.py）もハンドごとの和なので同じように分けて計算できる。
+    """
+    calculator = StatsCalculator(histories)
+    player_stats = {name: calculator.calculate_all(name) for name in players}
+    for stats in player_stats.values():
+        stats.ev_hands = stats.hands
+    for name, adjustment in ev_adjustments(histories).items():
+        if name in player_stats:
+            player_stats[name].ev_adjustment = adjustment
+    return player_stats
+
+
 # ==============================================================================
 # 以下、既存の関数群（互換性維持のため残す）
 # ==============================================================================
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+ハンドデータのオフラインキャッシュ
+
+hand_players / hand_actions を (サーバー, セッション日付) ごとの圧縮列形式ファイル
+（numpy の .npz）にダンプし、DB に接続せずに再集計できるようにする。
+
+キャッシュの構成:
+  {cache_dir}/manifest.json          ウォーターマーク・進行中ハンド・パーティション一覧
+  {cache_dir}/users.json             users テーブル
+  {cache_dir}/player_stats.json      ダンプ時点の player_stats（検証・ベースライン用）
+  {cache_dir}/{server}/{YYYYMMDD}.npz  1サーバー1セッション分のハンド
+
+ダンプはハンド id の差分で行う（fetch_stats.py --incremental と同じく、前回の
+ウォーターマークより後のハンドと、前回進行中だったハンドだけを取得する）。
+street / action の文字列は各パーティションの語彙テーブルへの番号で持つので、
+定義にない値が入っても元の行をそのまま復元できる。
+
+読み出しは CacheSource から行う（reconstruct_snapshots.py rebuild / verify の --cache）。
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fast_table_db import (
+    fetch_batch_rows, fetch_hand_index, fetch_pending_hand_ids,
+    fetch_server_stats, fetch_users, fetch_watermark,
+)
+from fast_table_stats import ACTION_CODES, OTHER_ACTION, OTHER_STREET, STREET_CODES
+
+
+DEFAULT_CACHE_DIR = "data/cache/hands"
+MANIFEST_NAME = "manifest.json"
+USERS_NAME = "users.json"
+PLAYER_STATS_NAME = "player_stats.json"
+CACHE_VERSION = 1
+
+# 1回のクエリで読むハンド数（reconstruct_snapshots.py のバッチと同じ考え方）
+DEFAULT_DUMP_BATCH_SIZE = 2000
+
+# CacheSource がスレッド間で共有して保持する展開済みパーティション数
+OPEN_PARTITIONS = 4
+
+
+# --------------- Manifest ---------------
+
+def load_manifest(cache_dir: Path) -> dict:
+    path = Path(cache_dir) / MANIFEST_NAME
+    if not path.exists():
+        return {"version": CACHE_VERSION, "watermark": 0, "pending_hand_ids": [], "partitions": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != CACHE_VERSION:
+        raise ValueError(f"{path}: unsupported cache version {manifest.get('version')}")
+    return manifest
+
+
+def _write_json(path: Path, payload) -> None:
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=1)
+    tmp.replace(path)
+
+
+def partition_path(cache_dir: Path, server_id: str, date_str: str) -> Path:
+    return Path(cache_dir) / server_id / f"{date_str}.npz"
+
+
+# --------------- Encoding ---------------
+
+def _vocab(values: Iterable[Optional[str]]) -> Tuple[List[str], Dict[str, int]]:
+    names = sorted({v for v in values if v is not None})
+    return names, {name: i for i, name in enumerate(names)}
+
+
+def encode_partition(players_by_hand: Dict, actions_by_hand: Dict) -> dict:
+    """
+    ハンドごとの行を列形式の配列にする
+
+    None は -1（folded_street / 語彙番号）または null マスク（delta_cbb / amount_cbb）で表す。
+    """
+    import numpy as np
+
+    hand_ids = sorted(players_by_hand)
+    player_rows = [p for hid in hand_ids for p in players_by_hand[hid]]
+    action_rows = [a for hid in hand_ids for a in actions_by_hand.get(hid, [])]
+
+    user_ids, user_index = _vocab([p["user_id"] for p in player_rows] + [a["user_id"] for a in action_rows])
+    street_names, street_index = _vocab(
+        [p["folded_street"] for p in player_rows] + [a["street"] for a in action_rows]
+    )
+    action_names, action_index = _vocab([a["action"] for a in action_rows])
+
+    def code(index, value):
+        return -1 if value is None else index[value]
+
+    return {
+        "hand_id": np.array(hand_ids, dtype=np.int64),
+        "user_ids": np.array(user_ids, dtype=str),
+        "street_names": np.array(street_names, dtype=str),
+        "action_names": np.array(action_names, dtype=str),
+        "p_hand_id": np.array([p["hand_id"] for p in player_rows], dtype=np.int64),
+        "p_user": np.array([user_index[p["user_id"]] for p in player_rows], dtype=np.int32),
+        "p_delta": np.array([p["delta_cbb"] or 0 for p in player_rows], dtype=np.int64),
+        "p_delta_null": np.array([p["delta_cbb"] is None for p in player_rows], dtype=bool),
+        "p_showdown": np.array([bool(p["showdown"]) for p in player_rows], dtype=bool),
+        "p_folded": np.array([code(street_index, p["folded_street"]) for p in player_rows], dtype=np.int16),
+        "a_hand_id": np.array([a["hand_id"] for a in action_rows], dtype=np.int64),
+        "a_index": np.array([a["action_index"] for a in action_rows], dtype=np.int32),
+        "a_user": np.array([code(user_index, a["user_id"]) for a in action_rows], dtype=np.int32),
+        "a_street": np.array([code(street_index, a["street"]) for a in action_rows], dtype=np.int16),
+        "a_action": np.array([code(action_index, a["action"]) for a in action_rows], dtype=np.int16),
+        "a_amount": np.array([a["amount_cbb"] or 0 for a in action_rows], dtype=np.int64),
+        "a_amount_null": np.array([a["amount_cbb"] is None for a in action_rows], dtype=bool),
+    }
+
+
+def decode_partition(cols: dict, first_hand_id: int = None,
+                     last_hand_id: int = None) -> Tuple[Dict, Dict]:
+    """
+    列形式のパーティションを (players_by_hand, actions_by_hand) に戻す
+
+    first_hand_id / last_hand_id を指定した場合はその範囲（両端を含む）のハンドだけを返す。
+    """
+    p_sel, a_sel = _select(cols, first_hand_id, last_hand_id)
+    user_ids = cols["user_ids"].tolist()
+    street_names = cols["street_names"].tolist()
+    action_names = cols["action_names"].tolist()
+
+    def name(names, i):
+        return None if i < 0 else names[i]
+
+    players_by_hand: Dict = {}
+    for hand_id, user, delta, delta_null, showdown, folded in zip(
+        *(cols[k][p_sel].tolist() for k in ("p_hand_id", "p_user", "p_delta", "p_delta_null",
+                                              "p_showdown", "p_folded"))
+    ):
+        players_by_hand.setdefault(hand_id, []).append({
+            "hand_id": hand_id,
+            "user_id": user_ids[user],
+            "delta_cbb": None if delta_null else delta,
+            "showdown": showdown,
+            "folded_street": name(street_names, folded),
+        })
+
+    actions_by_hand: Dict = {}
+    for hand_id, index, user, street, action, amount, amount_null in zip(
+        *(cols[k][a_sel].tolist() for k in ("a_hand_id", "a_index", "a_user", "a_street",
+                                              "a_action", "a_amount", "a_amount_null"))
+    ):
+        actions_by_hand.setdefault(hand_id, []).append({
+            "hand_id": hand_id,
+            "user_id": name(user_ids, user),
+            "action_index": index,
+            "street": name(street_names, street),
+            "action": name(action_names, action),
+            "amount_cbb": None if amount_null else amount,
+        })
+
+    return players_by_hand, actions_by_hand
+
+
+def _select(cols: dict, first_hand_id: Optional[int], last_hand_id: Optional[int]):
+    """範囲内の players / actions の行番号（ハンド id 順に並んでいる前提で二分探索）"""
+    import numpy as np
+
+    lo = -np.inf if first_hand_id is None else first_hand_id
+    hi = np.inf if last_hand_id is None else last_hand_id
+    p = cols["p_hand_id"]
+    a = cols["a_hand_id"]
+    p_sel = np.arange(np.searchsorted(p, lo, "left"), np.searchsorted(p, hi, "right"))
+    a_sel = np.arange(np.searchsorted(a, lo, "left"), np.searchsorted(a, hi, "right"))
+    return p_sel, a_sel
+
+
+def partition_to_columns(cols: dict, first_hand_id: int = None, last_hand_id: int = None):
+    """
+    パーティションを fast_table_stats.analyze_columns の入力形式にする
+
+    hands_to_columns と同じく、プレイヤー行のないハンドのアクションは除外する。
+
+    Returns:
+        tuple: (user_ids, n_hands, players, actions)（hands_to_columns の戻り値と同じ形）
+    """
+    import numpy as np
+
+    p_sel, a_sel = _select(cols, first_hand_id, last_hand_id)
+    p_hand = cols["p_hand_id"][p_sel]
+    a_hand = cols["a_hand_id"][a_sel]
+
+    hand_ids = np.unique(p_hand)
+    keep = np.isin(a_hand, hand_ids)
+    a_sel, a_hand = a_sel[keep], a_hand[keep]
+
+    # 語彙番号 -1（None）は末尾の「その他」に落とす
+    street_map = np.array([STREET_CODES.get(str(s), OTHER_STREET) for s in cols["street_names"]]
+                          + [OTHER_STREET], dtype=np.int8)
+    action_map = np.array([ACTION_CODES.get(str(a), OTHER_ACTION) for a in cols["action_names"]]
+                          + [OTHER_ACTION], dtype=np.int8)
+    folded = cols["p_folded"][p_sel]
+    folded_street = np.where(folded < 0, -1, street_map[folded])
+    a_user = cols["a_user"][a_sel]
+
+    user_ids = [str(u) for u in cols["user_ids"]]
+    if (a_user < 0).any():
+        # user_id のないアクションは hands_to_columns と同じく None を1人分として数える
+        user_ids.append(None)
+    players = {
+        "hand": np.searchsorted(hand_ids, p_hand),
+        "user": cols["p_user"][p_sel].astype(np.int64),
+        "delta": cols["p_delta"][p_sel],
+        "showdown": cols["p_showdown"][p_sel],
+        "folded_street": folded_street.astype(np.int8),
+    }
+    actions = {
+        "hand": np.searchsorted(hand_ids, a_hand),
+        "user": np.where(a_user < 0, len(user_ids) - 1, a_user).astype(np.int64),
+        "street": street_map[cols["a_street"][a_sel]],
+        "action": action_map[cols["a_action"][a_sel]],
+    }
+    return user_ids, len(hand_ids), players, actions
+
+
+def write_partition(path: Path, cols: dict) -> None:
+    import numpy as np
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.stem + ".tmp.npz")
+    np.savez_compressed(tmp, **cols)
+    tmp.replace(path)
+
+
+def read_partition(path: Path) -> dict:
+    import numpy as np
+
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+# --------------- Dump ---------------
+
+def _merge_rows(path: Path, players_by_hand: Dict, actions_by_hand: Dict) -> Tuple[Dict, Dict]:
+    """既存パーティションの行に新しいハンドを足す（同じ hand_id は新しい行で置き換える）"""
+    if not path.exists():
+        return players_by_hand, actions_by_hand
+    old_players, old_actions = decode_partition(read_partition(path))
+    for hand_id in players_by_hand:
+        old_actions.pop(hand_id, None)
+    old_players.update(players_by_hand)
+    old_actions.update(actions_by_hand)
+    return old_players, old_actions
+
+
+def dump(conn, cache_dir: Path, servers: Iterable[str],
+         batch_size: int = DEFAULT_DUMP_BATCH_SIZE, full: bool = False,
+         verbose: bool = False, dry_run: bool = False) -> dict:
+    """
+    前回のダンプ以降に完了したハンドをキャッシュに追記する
+
+    取得はバッチ単位で行い、(サーバー, セッション日付) が切り替わるたびに
+    そのパーティションを書き出すので、メモリに載るのは1パーティション分だけ。
+
+    Args:
+        full: キャッシュを無視して最初から取り直す
+
+    Returns:
+        dict: 更新後のマニフェスト
+    """
+    from reconstruct_snapshots import plan_batches
+
+    cache_dir = Path(cache_dir)
+    servers = list(servers)
+    manifest = load_manifest(cache_dir)
+    if full or manifest.get("servers") != servers:
+        if manifest["partitions"] and verbose:
+            print("   Starting over (full dump or server list changed)")
+        manifest = {"version": CACHE_VERSION, "watermark": 0, "pending_hand_ids": [], "partitions": {}}
+
+    after = manifest["watermark"]
+    pending = manifest["pending_hand_ids"]
+    latest = fetch_watermark(conn, after)
+    until = latest["hand_id"] if latest else after
+
+    hand_index = fetch_hand_index(conn, servers, after, until, pending)
+    batches = plan_batches(hand_index, batch_size)
+    print(f"   {len(hand_index)} new hands after #{after} "
+          f"({len(pending)} previously pending) in {len(batches)} batches")
+
+    partitions = manifest["partitions"]
+    current_key = None
+    players_by_hand: Dict = {}
+    actions_by_hand: Dict = {}
+
+    def flush():
+        if current_key is None or not players_by_hand:
+            return
+        server_id, date_str = current_key
+        path = partition_path(cache_dir, server_id, date_str)
+        merged_players, merged_actions = _merge_rows(path, players_by_hand, actions_by_hand)
+        hand_ids = sorted(merged_players)
+        partitions.setdefault(server_id, {})[date_str] = {
+            "hands": len(hand_ids),
+            "first_hand_id": hand_ids[0],
+            "last_hand_id": hand_ids[-1],
+        }
+        if verbose:
+            print(f"   {server_id}/{date_str}: +{len(players_by_hand)} hands ({len(hand_ids)} total)")
+        if not dry_run:
+            write_partition(path, encode_partition(merged_players, merged_actions))
+
+    for server_id, date_str, first_hand_id, last_hand_id in batches:
+        if (server_id, date_str) != current_key:
+            flush()
+            current_key = (server_id, date_str)
+            players_by_hand, actions_by_hand = {}, {}
+        batch_players, batch_actions, _ = fetch_batch_rows(
+            conn, server_id, date_str, first_hand_id, last_hand_id
+        )
+        players_by_hand.update(batch_players)
+        actions_by_hand.update(batch_actions)
+    flush()
+
+    manifest.update({
+        "servers": servers,
+        "watermark": until,
+        "pending_hand_ids": fetch_pending_hand_ids(conn, until),
+        "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    })
+    if not dry_run:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _write_json(cache_dir / USERS_NAME, fetch_users(conn))
+        _write_json(cache_dir / PLAYER_STATS_NAME, fetch_server_stats(conn))
+        _write_json(cache_dir / MANIFEST_NAME, manifest)
+    return manifest
+
+
+# --------------- Source ---------------
+
+class CacheSource:
+    """
+    キャッシュからハンドを読むデータソース
+
+    reconstruct_snapshots.py の DatabaseSource と同じメソッドを持ち、
+    rebuild / verify を DB なしで実行できる。
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.manifest = load_manifest(self.cache_dir)
+        if not self.manifest["partitions"]:
+            raise FileNotFoundError(f"{self.cache_dir}: no cached hands (run dump first)")
+        self._open: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _read_json(self, name: str):
+        with open(self.cache_dir / name, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def hand_index(self, servers: Iterable[str]) -> List[dict]:
+        rows = []
+        for server_id in servers:
+            for date_str in sorted(self.manifest["partitions"].get(server_id, {})):
+                for hand_id in self._partition(server_id, date_str)["hand_id"]:
+                    rows.append({"hand_id": int(hand_id), "server_id": server_id, "session_date": date_str})
+        rows.sort(key=lambda r: r["hand_id"])
+        return rows
+
+    def users(self) -> Dict[str, dict]:
+        return self._read_json(USERS_NAME)
+
+    def server_stats(self) -> Dict[str, Dict[str, dict]]:
+        return self._read_json(PLAYER_STATS_NAME)
+
+    def _partition(self, server_id: str, date_str: str) -> dict:
+        key = (server_id, date_str)
+        with self._lock:
+            cols = self._open.get(key)
+            if cols is not None:
+                self._open.move_to_end(key)
+                return cols
+        cols = read_partition(partition_path(self.cache_dir, server_id, date_str))
+        with self._lock:
+            self._open[key] = cols
+            while len(self._open) > OPEN_PARTITIONS:
+                self._open.popitem(last=False)
+        return cols
+
+    def fetch(self, batch: Tuple[str, str, int, int]) -> Tuple[Dict, Dict]:
+        server_id, date_str, first_hand_id, last_hand_id = batch
+        return decode_partition(self._partition(server_id, date_str), first_hand_id, last_hand_id)
+
+    def fetch_columns(self, batch: Tuple[str, str, int, int]):
+        """行の dict を作らずに analyze_columns の入力形式で返す（numpy エンジン用）"""
+        server_id, date_str, first_hand_id, last_hand_id = batch
+        return partition_to_columns(self._partition(server_id, date_str), first_hand_id, last_hand_id)
+
+    def close(self) -> None:
+        with self._lock:
+            self._open.clear()
@@ -0,0 +1,402 @@
+"""
+7枚のハンドの役の評価（テーブル参照）とオールインのエクイティ
+
+カードは 0〜51 の整数（ランク * 4 + スート、ランクは 2 = 0 〜 A = 12、スートは s h d c = 0〜3）。
+役の強さは 1〜7462 の整数（大きいほど強い、同じ値は引き分け）で、5枚の役の種類の数と同じ。
+
+評価は2つの表を引くだけで行う（どちらも最初に使うときに作る、1秒前後）。
+- ランクの表: 7枚のランクの組み合わせ（各ランク4枚まで）ごとの、フラッシュを除いた最強の役。
+  ランクごとの鍵（RANK_KEYS）の和が組み合わせごとに異なるので、和をそのまま添字にする（約 780 万要素）
+- フラッシュの表: 同じスートのランクのビットマスク（13ビット）ごとの、フラッシュ・ストレートフラッシュの役。
+  7枚でフラッシュがあるときはフォーカード・フルハウスにはならないので、フラッシュがあればこちらの値を使う
+
+evaluate() は NumPy の配列（N × 7）をまとめて評価する。equity() は残りのボードをすべて列挙し、
+ボード側の鍵の和・スートごとの枚数とマスクを1回だけ計算して、プレイヤーごとにホールカードの分を足して引く。
+プリフロップ（5枚とも未知）は 52 枚から 5 枚のボードすべてを、役が同じになるグループ（ランクの組み合わせと
+フラッシュになり得るスートのマスク）にまとめておき、グループごとに1回だけ表を引く（_full_boards）。
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+
+RANKS = "23456789TJQKA"
+SUITS = "shdc"
+SUIT_SYMBOLS = {"♠": "s", "♥": "h", "♦": "d", "♣": "c"}
+
+# 7枚のランクの組み合わせ（各ランク4枚まで）で和が重ならないランクごとの鍵（最大 7,825,759）
+RANK_KEYS = (0, 1, 5, 22, 98, 453, 2031, 8698, 22854, 83661, 262349, 636345, 1479181)
+
+# 役の種類（_value の最上位）
+HIGH_CARD, PAIR, TWO_PAIR, TRIPS, STRAIGHT, FLUSH, FULL_HOUSE, QUADS, STRAIGHT_FLUSH = range(9)
+
+# _card_packs の鍵の部分のビット数（鍵の和の最大 7,825,759 < 2^23）
+KEY_BITS = 23
+KEY_MASK = (1 << KEY_BITS) - 1
+
+# 5, 4, 3, 2, A のストレート（A を 1 として扱う）
+WHEEL_MASK = 0b1000000001111
+
+
+def parse_card(text: str) -> int:
+    """"Kh" / "K♥" / "10♥" / "Th" をカードの整数にする"""
+    text = text.strip()
+    rank_text, suit_text = text[:-1], text[-1]
+    if rank_text == "10":
+        rank_text = "T"
+    suit_text = SUIT_SYMBOLS.get(suit_text, suit_text)
+    if len(rank_text) != 1 or rank_text.upper() not in RANKS or suit_text.lower() not in SUITS:
+        raise ValueError(f"カードとして読めません: {text!r}")
+    return RANKS.index(rank_text.upper()) * 4 + SUITS.index(suit_text.lower())
+
+
+def card_text(card: int) -> str:
+    return RANKS[card >> 2] + SUITS[card & 3]
+
+
+def _value(category: int, ranks: Sequence[int]) -> int:
+    """役の種類と比べる順のランク（最大5つ）を1つの整数にする（大きいほど強い）"""
+    value = category
+    for i in range(5):
+        value = value * 16 + (ranks[i] + 1 if i < len(ranks) else 0)
+    return value
+
+
+def _straight_high(mask: int) -> Optional[int]:
+    """ランクのビットマスクに含まれる最も高いストレートのトップ（無ければ None）"""
+    for high in range(12, 3, -1):
+        run = 0b11111 << (high - 4)
+        if mask & run == run:
+            return high
+    if mask & WHEEL_MASK == WHEEL_MASK:
+        return 3
+    return None
+
+
+def _rank_value(counts: Sequence[int]) -> int:
+    """ランクごとの枚数（7枚）から、フラッシュを除いた最強の役"""
+    by_count = {n: [r for r in range(12, -1, -1) if counts[r] == n] for n in (4, 3, 2, 1)}
+    present = [r for r in range(12, -1, -1) if counts[r]]
+    if by_count[4]:
+        quad = by_count[4][0]
+        return _value(QUADS, [quad, next(r for r in present if r != quad)])
+    if by_count[3] and len(by_count[3]) + len(by_count[2]) >= 2:
+        trips = by_count[3][0]
+        pair = max([r for r in by_count[3][1:]] + by_count[2])
+        return _value(FULL_HOUSE, [trips, pair])
+    high = _straight_high(sum(1 << r for r in present))
+    if high is not None:
+        return _value(STRAIGHT, [high])
+    if by_count[3]:
+        trips = by_count[3][0]
+        return _value(TRIPS, [trips] + [r for r in present if r != trips][:2])
+    if len(by_count[2]) >= 2:
+        high_pair, low_pair = by_count[2][:2]
+        kicker = next(r for r in present if r not in (high_pair, low_pair))
+        return _value(TWO_PAIR, [high_pair, low_pair, kicker])
+    if by_count[2]:
+        pair = by_count[2][0]
+        return _value(PAIR, [pair] + [r for r in present if r != pair][:3])
+    return _value(HIGH_CARD, present[:5])
+
+
+def _flush_value(mask: int) -> int:
+    """同じスートの5枚以上のランクのビットマスクから、フラッシュ・ストレートフラッシュの役"""
+    high = _straight_high(mask)
+    if high is not None:
+        return _value(STRAIGHT_FLUSH, [high])
+    return _value(FLUSH, [r for r in range(12, -1, -1) if mask >> r & 1][:5])
+
+
+def _rank_count_vectors(cards: int = 7):
+    """各ランク4枚までで合計 cards 枚になるランクごとの枚数の組み合わせ"""
+    counts = [0] * 13
+
+    def walk(rank: int, left: int):
+        if rank == 13:
+            if left == 0:
+                yield list(counts)
+            return
+        for n in range(min(4, left) + 1):
+            counts[rank] = n
+            yield from walk(rank + 1, left - n)
+        counts[rank] = 0
+
+    return walk(0, cards)
+
+
+@lru_cache(maxsize=None)
+def tables():
+    """
+    評価の表を作る
+
+    Returns:
+        (rank_keys, rank_table, flush_table)
+            rank_keys: ランク -> 鍵（int32, 13）
+            rank_table: 鍵の和 -> 役の強さ（uint16）
+            flush_table: ランクのビットマスク -> 役の強さ（uint16, 8192, 5枚未満は 0）
+    """
+    import numpy as np
+
+    rank_entries = []
+    for counts in _rank_count_vectors():
+        key = sum(n * k for n, k in zip(counts, RANK_KEYS))
+        rank_entries.append((key, _rank_value(counts)))
+    flush_entries = [(mask, _flush_value(mask)) for mask in range(1 << 13) if 5 <= bin(mask).count("1") <= 7]
+
+    # 役の値を 1 から始まる強さの順位に詰める
+    values = sorted({value for _, value in rank_entries} | {value for _, value in flush_entries})
+    strength = {value: i + 1 for i, value in enumerate(values)}
+
+    rank_table = np.zeros(max(key for key, _ in rank_entries) + 1, dtype=np.uint16)
+    for key, value in rank_entries:
+        rank_table[key] = strength[value]
+    flush_table = np.zeros(1 << 13, dtype=np.uint16)
+    for mask, value in flush_entries:
+        flush_table[mask] = strength[value]
+    return np.array(RANK_KEYS, dtype=np.int32), rank_table, flush_table
+
+
+def prepare() -> None:
+    """評価の表とプリフロップのボードのグループを作っておく（どちらも最初に使うときに作られる。時間を計るとき用）"""
+    tables()
+    _full_boards()
+
+
+def evaluate(cards) -> "np.ndarray":
+    """
+    7枚のハンドをまとめて評価する
+
+    Args:
+        cards: (N, 7) のカードの整数の配列
+
+    Returns:
+        (N,) の役の強さ（uint16）
+    """
+    import numpy as np
+
+    rank_keys, rank_table, flush_table = tables()
+    cards = np.asarray(cards, dtype=np.int64)
+    ranks, suits = cards >> 2, cards & 3
+    result = rank_table[rank_keys[ranks].sum(axis=1)]
+    bits = np.left_shift(1, ranks)
+    for suit in range(4):
+        in_suit = suits == suit
+        flush = in_suit.sum(axis=1) >= 5
+        if flush.any():
+            result[flush] = flush_table[(bits[flush] * in_suit[flush]).sum(axis=1)]
+    return result
+
+
+def evaluate_hand(cards: Sequence[int]) -> int:
+    """7枚のハンド1つを評価する"""
+    return int(evaluate([list(cards)])[0])
+
+
+@lru_cache(maxsize=8)
+def combination_index(n: int, k: int) -> "np.ndarray":
+    """range(n) から k 個を選ぶ組み合わせ（辞書順）の (C(n, k), k) の配列（uint8）"""
+    import numpy as np
+
+    if k == 0:
+        return np.zeros((1, 0), dtype=np.uint8)
+    combos = np.arange(n, dtype=np.uint8)[:, None]
+    for _ in range(k - 1):
+        last = combos[:, -1].astype(np.int64)
+        counts = n - 1 - last
+        total = int(counts.sum())
+        starts = np.repeat(np.cumsum(counts) - counts, counts)
+        following = np.arange(total) - starts + np.repeat(last + 1, counts)
+        combos = np.hstack([np.repeat(combos, counts, axis=0), following[:, None].astype(np.uint8)])
+    combos.setflags(write=False)
+    return combos
+
+
+@lru_cache(maxsize=None)
+def _card_packs() -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    カードごとの、足し合わせるとハンドの情報になる2つの整数（int64）
+
+    - 鍵とスートの枚数: 下位 KEY_BITS ビットがランクの鍵、その上に3ビットずつスートごとの枚数
+    - スートごとのランクのマスク: 13ビットずつ
+    """
+    import numpy as np
+
+    keys = np.array([RANK_KEYS[c >> 2] + (1 << (KEY_BITS + 3 * (c & 3))) for c in range(52)], dtype=np.int64)
+    masks = np.array([1 << (13 * (c & 3) + (c >> 2)) for c in range(52)], dtype=np.int64)
+    return keys, masks
+
+
+def _pack(cards: Sequence[int]) -> Tuple[int, int]:
+    """cards の _card_packs の和（Python の整数）"""
+    key = sum(RANK_KEYS[c >> 2] + (1 << (KEY_BITS + 3 * (c & 3))) for c in cards)
+    mask = sum(1 << (13 * (c & 3) + (c >> 2)) for c in cards)
+    return key, mask
+
+
+def _flush_candidates(board_keys) -> List[Tuple["np.ndarray", "np.ndarray"]]:
+    """スートごとの、ボード側にそのスートが3枚以上ある（フラッシュになり得る）ボードの添字と枚数"""
+    import numpy as np
+
+    candidates = []
+    for suit in range(4):
+        counts = ((board_keys >> (KEY_BITS + 3 * suit)) & 7).astype(np.uint8)
+        rows = np.flatnonzero(counts >= 3)
+        candidates.append((rows, counts[rows]))
+    return candidates
+
+
+@lru_cache(maxsize=None)
+def _full_boards():
+    """
+    52枚から5枚のボードすべて（2,598,960 通り）を、ホールカードと合わせたときの役が同じになる
+    グループ（約 15 万）にまとめたもの（プリフロップのオールイン用）
+
+    - どのスートも2枚以下のボード: フラッシュにならないので、ランクの組み合わせが同じなら同じグループ
+    - あるスートが3枚以上のボード（フラッシュになり得るのはそのスートだけ）: ランクの組み合わせと
+      そのスートのランクのマスクが同じなら同じグループ
+
+    Returns:
+        (board_groups, board_bits, keys, masks, candidates)
+            board_groups / board_bits: ボードごとのグループと使うカードのビット
+            keys / masks / candidates: グループごとの鍵の和（int32）・マスクの和（フラッシュになり得る
+                スートの分だけ）とフラッシュの候補
+    """
+    import numpy as np
+
+    keys, masks = _card_packs()
+    combos = combination_index(52, 5)
+    card_bits = np.left_shift(np.uint64(1), np.arange(52, dtype=np.uint64))
+    board_keys = np.zeros(len(combos), dtype=np.int64)
+    board_masks = np.zeros(len(combos), dtype=np.int64)
+    board_bits = np.zeros(len(combos), dtype=np.uint64)
+    for column in combos.T:
+        board_keys += keys[column]
+        board_masks += masks[column]
+        board_bits |= card_bits[column]
+
+    # ランクの鍵の和と、フラッシュになり得るスート（の番号 + 1）とそのマスクを1つの整数にしてまとめる
+    board_ids = board_keys & KEY_MASK
+    for suit in range(4):
+        flush = ((board_keys >> (KEY_BITS + 3 * suit)) & 7) >= 3
+        suit_masks = (board_masks[flush] >> (13 * suit)) & 0x1FFF
+        board_ids[flush] += (suit_masks << KEY_BITS) + ((suit + 1) << (KEY_BITS + 13))
+    group_ids, board_groups = np.unique(board_ids, return_inverse=True)
+    group_keys = group_ids & KEY_MASK
+    group_suits = (group_ids >> (KEY_BITS + 13)) - 1
+    group_masks = (group_ids >> KEY_BITS) & 0x1FFF
+
+    # _card_packs と同じ形（フラッシュになり得るスートだけ枚数とマスクを持つ）に戻す
+    popcount = np.array([bin(m).count("1") for m in range(1 << 13)], dtype=np.int64)
+    flush = group_suits >= 0
+    shifts = np.where(flush, group_suits, 0)
+    packed = group_keys + np.where(flush, popcount[group_masks] << (KEY_BITS + 3 * shifts), 0)
+    masks = np.where(flush, group_masks << (13 * shifts), 0)
+    return (
+        board_groups.reshape(-1).astype(np.int32), board_bits,
+        group_keys.astype(np.int32), masks, _flush_candidates(packed),
+    )
+
+
+def _board_packs(known: Sequence[int], board: Sequence[int]):
+    """
+    known を除いた残りのカードで board を5枚まで配るボードすべての、鍵の和（int32）・マスクの和・
+    フラッシュの候補（board の分も含む）・ボードの数（重み）
+
+    プリフロップは同じ役になるボードをまとめる（_full_boards）ので、重みは 1 とは限らない。
+    """
+    import numpy as np
+
+    if not board:
+        board_groups, board_bits, keys, masks, candidates = _full_boards()
+        valid = (board_bits & np.uint64(sum(1 << c for c in known))) == 0
+        weights = np.bincount(board_groups[valid], minlength=len(keys))
+        # 配れるボードのないグループは除く（known とランクが重なり、表の範囲外の鍵になることがある）
+        kept = weights > 0
+        position = np.cumsum(kept) - 1
+        return keys[kept], masks[kept], [
+            (position[rows[kept[rows]]], counts[kept[rows]]) for rows, counts in candidates
+        ], weights[kept]
+
+    keys, masks = _card_packs()
+    known_key, known_mask = _pack(board)
+    remaining = np.array([c for c in range(52) if c not in set(known)], dtype=np.int64)
+    combos = combination_index(len(remaining), 5 - len(board))
+    board_keys = np.full(len(combos), known_key, dtype=np.int64)
+    board_masks = np.full(len(combos), known_mask, dtype=np.int64)
+    for column in combos.T:
+        board_keys += keys[remaining[column]]
+        board_masks += masks[remaining[column]]
+    return (
+        (board_keys & KEY_MASK).astype(np.int32), board_masks, _flush_candidates(board_keys),
+        np.ones(len(combos), dtype=np.int64),
+    )
+
+
+def showdown_strengths(holes: Sequence[Tuple[int, int]], board: Sequence[int] = (),
+                       dead: Sequence[int] = ()) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    残りのボードをすべて列挙し、各プレイヤーの役の強さを返す
+
+    Args:
+        holes: プレイヤーごとのホールカード2枚
+        board: 出ているボード（0〜5枚）
+        dead: ボードに出ないことが分かっているカード
+
+    Returns:
+        (strengths, weights)
+            strengths: (プレイヤー数, 列の数) の役の強さ（uint16）
+            weights: 列ごとのボードの数（プリフロップは同じ役になるボードを1列にまとめる）
+    """
+    import numpy as np
+
+    _, rank_table, flush_table = tables()
+    known = [c for hole in holes for c in hole] + list(board) + list(dead)
+    if len(set(known)) != len(known):
+        raise ValueError(f"同じカードが複数あります: {[card_text(c) for c in known]}")
+    rank_keys, board_masks, candidates, weights = _board_packs(known, board)
+
+    strengths = np.empty((len(holes), len(rank_keys)), dtype=np.uint16)
+    for i, hole in enumerate(holes):
+        hole_key, hole_mask = _pack(hole)
+        row = strengths[i]
+        np.take(rank_table, rank_keys + np.int32(hole_key & KEY_MASK), out=row)
+        for suit, (rows, counts) in enumerate(candidates):
+            in_suit = sum(1 for c in hole if c & 3 == suit)
+            flush = rows[counts + in_suit >= 5]
+            if len(flush):
+                masks = (board_masks[flush] + hole_mask) >> (13 * suit)
+                row[flush] = flush_table[masks & 0x1FFF]
+    return strengths, weights
+
+
+def equity(holes: Sequence[Tuple[int, int]], board: Sequence[int] = (), dead: Sequence[int] = (),
+           eligible: Optional[List[Sequence[int]]] = None) -> "np.ndarray":
+    """
+    オールインのエクイティ（残りのボードをすべて列挙、引き分けは等分）
+
+    Args:
+        eligible: ポットごとの対象プレイヤー（holes の添字）。省略時は全員で1つのポット
+
+    Returns:
+        (ポットの数, プレイヤー数) の、各ポットの取り分の期待値（0〜1）
+    """
+    import numpy as np
+
+    strengths, weights = showdown_strengths(holes, board, dead)
+    if eligible is None:
+        eligible = [range(len(holes))]
+    weights = weights.astype(np.float64)
+    total = weights.sum()
+    shares = np.zeros((len(eligible), len(holes)))
+    for pot, players in enumerate(eligible):
+        players = list(players)
+        pot_strengths = strengths[players]
+        winners = pot_strengths == pot_strengths.max(axis=0)
+        # 引き分けの列だけ勝者の数で割る（ほとんどの列は勝者が1人）
+        ties = winners.sum(axis=0, dtype=np.uint8) > 1
+        wins = winners @ weights
+        if ties.any():
+            tied = winners[:, ties]
+            wins += (tied / tied.sum(axis=0) - tied) @ weights[ties]
+        shares[pot, players] = wins / total
+    return shares
@@ -0,0 +1,89 @@
+"""
+ハンド指紋インデックス
+
+ハンド履歴ログの各ハンドの指紋（csv_formatter.hand_fingerprint）と、
+そのハンドを集計するログ（持ち主、data_dir からの相対パス）の対応を保存する。
+同じゲームを2回エクスポートしたログや、再開したテーブルで前のハンドを含むログがあっても、
+ハンドは持ち主のログでだけ集計し、他のログでは重複としてスキップする。
+
+持ち主はハンドを含むログのうち日付・テーブル名の順で最初のもの（ログは日付・テーブル名の順に claim する）。
+同じツリーなら前回の実行やキャッシュの有無によらず同じ持ち主になる。
+保存したインデックスは、--season / --since で読み直さないログの持ち主を引き継ぐのと、
+前回から持ち主の変わったハンドの報告（changed_owners）にだけ使う。
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+DEFAULT_INDEX_PATH = "cache/hand_fingerprints.json"
+INDEX_VERSION = 1
+
+
+class FingerprintIndex:
+    """指紋 -> 持ち主ログの対応（1ハンドあたり dict の参照1回）"""
+
+    def __init__(self, path: Optional[Path] = None, previous: Optional[Dict[str, str]] = None):
+        self.path = path
+        # 前回の実行で保存した持ち主
+        self.previous: Dict[str, str] = previous or {}
+        # 今回の実行の持ち主
+        self.owners: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "FingerprintIndex":
+        """保存済みのインデックスを読み込む（無ければ空）"""
+        previous: Dict[str, str] = {}
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            if payload.get("version") == INDEX_VERSION:
+                for source, fingerprints in payload["sources"].items():
+                    for fp in fingerprints:
+                        previous[fp] = source
+        return cls(path, previous)
+
+    def retain_sources(self, sources: Iterable[str]) -> None:
+        """今回は読まないログ（--season / --since の範囲外）の指紋を、前回の持ち主のまま使用済みにする"""
+        sources = set(sources)
+        if sources:
+            for fp, owner in self.previous.items():
+                if owner in sources:
+                    self.owners.setdefault(fp, owner)
+
+    def claim(self, fingerprint: str, source: str) -> Optional[str]:
+        """
+        source のハンドを集計してよいか確認し、よければ持ち主として登録する
+
+        Returns:
+            None なら集計する。重複なら既に持っているログ（同じログ内の重複なら source 自身）
+        """
+        owner = self.owners.get(fingerprint)
+        if owner is None:
+            self.owners[fingerprint] = source
+        return owner
+
+    def changed_owners(self) -> Dict[Tuple[str, str], int]:
+        """前回の実行から持ち主が変わったハンドの数: (前回の持ち主, 今回の持ち主) -> ハンド数"""
+        changed: Dict[Tuple[str, str], int] = {}
+        for fp, owner in self.owners.items():
+            before = self.previous.get(fp)
+            if before is not None and before != owner:
+                changed[(before, owner)] = changed.get((before, owner), 0) + 1
+        return changed
+
+    def save(self) -> None:
+        """今回の実行で集計に使った指紋だけを保存する"""
+        sources: Dict[str, List[str]] = {}
+        for fp, owner in self.owners.items():
+            sources.setdefault(owner, []).append(fp)
+        payload = {
+            "version": INDEX_VERSION,
+            "sources": {source: sorted(fps) for source, fps in sorted(sources.items())},
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+        tmp.replace(self.path)
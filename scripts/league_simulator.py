@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+リーグ制度シミュレーター（Season 4 構想: plan_season4_league.md）
+
+session_stats_raw.csv の実際の節別成績（BB 収支・ハンド数）から
+「プレイヤーの型」を作り、数百〜千人規模のリーグを何千通りも並行に走らせて、
+未確定の設計パラメータ（AB↔CD の移動人数 X、C/D の比率、最低ハンド数）を比較する。
+
+モデル:
+  - 各プレイヤーは実在プレイヤー1人の成績を型として受け継ぐ（復元抽出）。
+    毎節、型の出席率で参加し、参加した節は型の節別成績から1行を復元抽出する
+  - 立ち上げ季（シーズン0）は全員を1つのプールで順位付けし、
+    上位100 → AB（A=上位30 / B）、残り → CD（C=上位 c_share / D）
+  - 以降の各シーズン:
+      1. サーバー内の順位 = 最低ハンド数を満たした人の総獲得BB順（未達は最下位扱い）
+      2. A 在籍者が AB の上位6（鳳凰卓）に入ると鳳凰の羽 +1、通算 N 枚で鳳凰位
+      3. AB の下位 X 人と CD の上位 X 人（最低ハンド数を満たした人のみ）が入れ替わる
+      4. AB は順位で A/B を再スライス（CD からの昇格者は B）、
+         CD は順位で C/D を再スライス（AB からの降格者は C）
+  - 「運による昇格」= 昇格したが、型の期待値（平均BB × 出席率）では昇格圏外だった人
+
+試行・プレイヤーは配列の軸として一括で計算し、ループはシーズン数だけ回す。
+
+Usage:
+    python scripts/league_simulator.py [--players 300 500 1000] [--x 5 10 20] [--min-hands 600 1000]
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+
+# plan_season4_league.md の構成
+AB_SIZE = 100
+A_SIZE = 30
+HOUOU_TABLE = 6        # 鳳凰卓 = 上位サーバーの top-6
+FEATHERS_FOR_HOUOU = 3  # 羽 N 枚で鳳凰位
+LEGEND_SIZE = 6         # 歴代6名で「伝説の6max」
+
+DEFAULT_C_SHARE = 0.4
+DEFAULT_SESSIONS_PER_SEASON = 8
+DEFAULT_SEASONS = 12
+DEFAULT_TRIALS = 1000
+
+# 一度に計算する試行数（(試行数, プレイヤー数, 節数) の配列のメモリ使用量を抑える）
+TRIAL_CHUNK = 200
+
+LEAGUES = ["A", "B", "C", "D"]
+
+
+# --------------- Empirical model ---------------
+
+class PlayerModel:
+    """
+    実データの節別成績から作るプレイヤーの型
+
+    Attributes:
+        starts / counts: 型ごとの節別成績の範囲（rows_bb / rows_hands の添字）
+        rows_bb / rows_hands: 全型の節別成績（BB 収支, ハンド数）を連結した配列
+        attendance: 型ごとの出席率（参加したシーズンの節のうち参加した割合）
+        expected_bb: 型ごとの1節あたり期待 BB（平均 BB × 出席率）
+    """
+
+    def __init__(self, starts, counts, rows_bb, rows_hands, attendance, expected_bb):
+        self.starts = starts
+        self.counts = counts
+        self.rows_bb = rows_bb
+        self.rows_hands = rows_hands
+        self.attendance = attendance
+        self.expected_bb = expected_bb
+
+    @property
+    def size(self) -> int:
+        return len(self.starts)
+
+    @classmethod
+    def from_session_stats(cls, path: Path, min_sessions: int = 2) -> "PlayerModel":
+        """
+        session_stats_raw.csv から型を作る
+
+        min_sessions 節未満しか参加していないプレイヤーは、1節の結果だけで
+        型の期待値が決まってしまうので使わない。
+        """
+        import numpy as np
+
+        rows_by_player: Dict[str, List[tuple]] = {}
+        sessions_by_season: Dict[str, set] = {}
+        seasons_by_player: Dict[str, set] = {}
+        with open(path, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                hands = int(row["ハンド数"])
+                sessions_by_season.setdefault(row["season_id"], set()).add(row["session_date"])
+                if hands <= 0:
+                    continue
+                pid = row["player_id"]
+                rows_by_player.setdefault(pid, []).append((float(row["収支"].replace("+", "")), hands))
+                seasons_by_player.setdefault(pid, set()).add(row["season_id"])
+
+        starts, counts, attendance, expected = [], [], [], []
+        rows_bb: List[float] = []
+        rows_hands: List[int] = []
+        for pid in sorted(rows_by_player):
+            rows = rows_by_player[pid]
+            if len(rows) < min_sessions:
+                continue
+            held = sum(len(sessions_by_season[s]) for s in seasons_by_player[pid])
+            rate = min(1.0, len(rows) / held)
+            starts.append(len(rows_bb))
+            counts.append(len(rows))
+            attendance.append(rate)
+            expected.append(sum(bb for bb, _ in rows) / len(rows) * rate)
+            rows_bb.extend(bb for bb, _ in rows)
+            rows_hands.extend(h for _, h in rows)
+
+        if not starts:
+            raise ValueError(f"{path}: no players with {min_sessions}+ sessions")
+
+        return cls(
+            np.array(starts, dtype=np.int64), np.array(counts, dtype=np.int64),
+            np.array(rows_bb, dtype=np.float64), np.array(rows_hands, dtype=np.int64),
+            np.array(attendance, dtype=np.float64), np.array(expected, dtype=np.float64),
+        )
+
+    def play_season(self, rng, archetypes, sessions: int):
+        """
+        1シーズン分の成績を一括で抽選する
+
+        Args:
+            archetypes: (試行数, プレイヤー数) の型番号
+
+        Returns:
+            tuple: (総獲得BB, 総ハンド数) いずれも (試行数, プレイヤー数)
+        """
+        import numpy as np
+
+        shape = archetypes.shape + (sessions,)
+        attend = rng.random(shape) < self.attendance[archetypes][..., None]
+        offset = (rng.random(shape) * self.counts[archetypes][..., None]).astype(np.int64)
+        rows = self.starts[archetypes][..., None] + offset
+        bb = np.where(attend, self.rows_bb[rows], 0.0).sum(axis=-1)
+        hands = np.where(attend, self.rows_hands[rows], 0).sum(axis=-1)
+        return bb, hands
+
+
+# --------------- League rules ---------------
+
+def rank_within(group, score, qualified):
+    """
+    試行ごとに、同じ group の中での順位（0 始まり）を返す
+
+    qualified（最低ハンド数を満たした人）を先に score の降順で並べ、未達はその後ろ。
+    """
+    import numpy as np
+
+    order = np.lexsort((-score, ~qualified, group), axis=-1)
+    position = np.empty_like(order)
+    np.put_along_axis(position, order, np.arange(order.shape[-1])[None, :], axis=-1)
+    # group の手前にいる人数を引いてグループ内の順位にする
+    n_groups = int(group.max()) + 1
+    sizes = np.stack([(group == g).sum(axis=-1) for g in range(n_groups)], axis=-1)
+    before = np.concatenate([np.zeros_like(sizes[:, :1]), np.cumsum(sizes, axis=-1)[:, :-1]], axis=-1)
+    return position - np.take_along_axis(before, group, axis=-1)
+
+
+def kth_largest(values, member, k: int):
+    """
+    試行ごとに、member の中で k 番目（1 始まり）に大きい値（人数が k 未満なら -inf）
+
+    k が 0（X = 0 で誰も移動しない）なら +inf（どの値もこれより小さいが、比べる昇格者がいない）
+    """
+    import numpy as np
+
+    if k < 1:
+        return np.full((values.shape[0], 1), np.inf)
+    masked = np.where(member, values, -np.inf)
+    k = min(k, values.shape[-1])
+    return -np.partition(-masked, k - 1, axis=-1)[:, k - 1:k]
+
+
+def slice_cd(rank_cd, in_cd, c_count, fixed_c):
+    """CD を C/D に再スライスする（fixed_c は順位に関係なく C に入れる人）"""
+    import numpy as np
+
+    n_fixed = fixed_c.sum(axis=-1, keepdims=True)
+    is_c = fixed_c | (in_cd & ~fixed_c & (rank_cd < np.maximum(c_count - n_fixed, 0)))
+    return np.where(is_c, 2, 3)
+
+
+def simulate(model: PlayerModel, n_players: int, x: int, min_hands: int,
+             c_share: float = DEFAULT_C_SHARE, trials: int = DEFAULT_TRIALS,
+             seasons: int = DEFAULT_SEASONS, sessions: int = DEFAULT_SESSIONS_PER_SEASON,
+             feathers_for_houou: int = FEATHERS_FOR_HOUOU, seed: int = 0) -> dict:
+    """
+    リーグ制度を trials 通り並行にシミュレーションする（TRIAL_CHUNK 試行ずつ計算して連結）
+
+    Returns:
+        dict: {
+            first_houou: 最初の鳳凰位が出たシーズン（1 始まり、出なければ 0）(trials,)
+            legend: 鳳凰位が LEGEND_SIZE 人そろったシーズン (trials,)
+            houou_count: 最終シーズン終了時点の鳳凰位の人数 (trials,)
+            luck: {"CD_to_AB" / "B_to_A": (運による昇格数, 昇格数)}
+            league_active: {league: (trials, seasons) の最低ハンド数を満たした人数}
+            league_sizes: {league: 編成上の人数（全試行で同じ）}
+        }
+    """
+    import numpy as np
+
+    rngs = np.random.default_rng(seed).spawn((trials + TRIAL_CHUNK - 1) // TRIAL_CHUNK)
+    parts = [
+        _simulate_chunk(rng, model, min(TRIAL_CHUNK, trials - i * TRIAL_CHUNK), n_players, x, min_hands,
+                        c_share, seasons, sessions, feathers_for_houou)
+        for i, rng in enumerate(rngs)
+    ]
+    first = parts[0]
+    return {
+        "first_houou": np.concatenate([p["first_houou"] for p in parts]),
+        "legend": np.concatenate([p["legend"] for p in parts]),
+        "houou_count": np.concatenate([p["houou_count"] for p in parts]),
+        "luck": {k: tuple(sum(p["luck"][k][i] for p in parts) for i in range(2)) for k in first["luck"]},
+        "league_active": {k: np.concatenate([p["league_active"][k] for p in parts]) for k in LEAGUES},
+        "league_sizes": first["league_sizes"],
+    }
+
+
+def _simulate_chunk(rng, model: PlayerModel, trials: int, n_players: int, x: int, min_hands: int,
+                    c_share: float, seasons: int, sessions: int, feathers_for_houou: int) -> dict:
+    import numpy as np
+
+    T, P = trials, n_players
+    ab_size = min(AB_SIZE, P)
+    a_size = min(A_SIZE, ab_size)
+    c_count = round((P - ab_size) * c_share)
+
+    archetypes = rng.integers(0, model.size, size=(T, P))
+    expected = model.expected_bb[archetypes]
+    everyone = np.zeros((T, P), dtype=np.int64)
+
+    # 立ち上げ季: 全員を1つのプールで順位付け
+    bb, hands = model.play_season(rng, archetypes, sessions)
+    rank = rank_within(everyone, bb, hands >= min_hands)
+    league = np.where(rank < a_size, 0, np.where(rank < ab_size, 1, 3))
+    in_cd = league == 3
+    rank_cd = rank_within(in_cd.astype(np.int64), bb, hands >= min_hands)
+    league = np.where(in_cd, slice_cd(rank_cd, in_cd, c_count, np.zeros_like(in_cd)), league)
+
+    feathers = np.zeros((T, P), dtype=np.int64)
+    houou_season = np.zeros((T, P), dtype=np.int64)
+    luck = {"CD_to_AB": [0, 0], "B_to_A": [0, 0]}
+    league_active = {name: np.zeros((T, seasons), dtype=np.int64) for name in LEAGUES}
+
+    for season in range(1, seasons + 1):
+        bb, hands = model.play_season(rng, archetypes, sessions)
+        qualified = hands >= min_hands
+        server = (league >= 2).astype(np.int64)  # 0 = AB, 1 = CD
+        rank = rank_within(server, bb, qualified)
+
+        for i, name in enumerate(LEAGUES):
+            league_active[name][:, season - 1] = ((league == i) & qualified).sum(axis=-1)
+
+        # 鳳凰の羽: A 在籍者が鳳凰卓（AB の top-6）に入ったら1枚
+        feathers += (league == 0) & (server == 0) & qualified & (rank < HOUOU_TABLE)
+        new_houou = (feathers >= feathers_for_houou) & (houou_season == 0)
+        houou_season[new_houou] = season
+
+        # AB ↔ CD の入れ替え（CD からは最低ハンド数を満たした人だけが上がる）
+        promote = (server == 1) & qualified & (rank < x)
+        n_move = promote.sum(axis=-1, keepdims=True)
+        n_ab = (server == 0).sum(axis=-1, keepdims=True)
+        relegate = (server == 0) & (rank >= n_ab - n_move)
+        # 型の期待値が CD の上位 X 人の水準に届かないのに昇格した人（同じ期待値の人は運ではない）
+        luck["CD_to_AB"][0] += int((promote & (expected < kth_largest(expected, server == 1, x))).sum())
+        luck["CD_to_AB"][1] += int(promote.sum())
+
+        # AB を再スライス（残留者の上位 A_SIZE が A、昇格者は B）
+        stay_ab = (server == 0) & ~relegate
+        to_a = stay_ab & (rank < a_size)
+        moved_up = to_a & (league == 1)
+        luck["B_to_A"][0] += int((moved_up & (expected < kth_largest(expected, server == 0, a_size))).sum())
+        luck["B_to_A"][1] += int(moved_up.sum())
+
+        # CD を再スライス（AB からの降格者は C）
+        in_cd = ((server == 1) & ~promote) | relegate
+        rank_cd = rank_within((~in_cd).astype(np.int64), bb, qualified & ~relegate)
+        cd_league = slice_cd(rank_cd, in_cd & ~relegate, c_count, relegate)
+
+        league = np.where(to_a, 0, np.where(stay_ab | promote, 1, cd_league))
+
+    houou_count = (houou_season > 0).sum(axis=-1)
+    first = np.where(houou_count > 0, np.where(houou_season > 0, houou_season, seasons + 1).min(axis=-1), 0)
+    ordered = np.sort(np.where(houou_season > 0, houou_season, seasons + 1), axis=-1)
+    legend = np.where(houou_count >= LEGEND_SIZE, ordered[:, min(LEGEND_SIZE, P) - 1], 0)
+
+    return {
+        "first_houou": first,
+        "legend": legend,
+        "houou_count": houou_count,
+        "luck": {k: tuple(v) for k, v in luck.items()},
+        "league_active": league_active,
+        "league_sizes": {"A": a_size, "B": ab_size - a_size, "C": c_count, "D": P - ab_size - c_count},
+    }
+
+
+# --------------- Report ---------------
+
+def describe_seasons(values, seasons: int) -> str:
+    """到達シーズンの分布（0 = 期間内に未到達）を1行にまとめる"""
+    import numpy as np
+
+    reached = values[values > 0]
+    share = len(reached) / len(values) * 100
+    if len(reached) == 0:
+        return f"到達 {share:5.1f}%"
+    p10, p50, p90 = np.percentile(reached, [10, 50, 90])
+    return f"到達 {share:5.1f}%  中央値 {p50:4.1f}季  (10%: {p10:.0f}季 / 90%: {p90:.0f}季)"
+
+
+def print_result(result: dict, n_players: int, x: int, min_hands: int, seasons: int) -> None:
+    import numpy as np
+
+    sizes = result["league_sizes"]
+    print(f"\n--- {n_players}人 / X={x} / 最低 {min_hands}ハンド ---")
+    print("  編成: " + " / ".join(f"{k}{v}" for k, v in sizes.items()))
+    print("  ハンド数を満たした人数（全シーズン平均, 5%〜95%）: " + " / ".join(
+        f"{name} {m.mean():.1f} ({np.percentile(m, 5):.0f}〜{np.percentile(m, 95):.0f})"
+        for name, m in result["league_active"].items()
+    ))
+    for key, label in (("CD_to_AB", "CD→AB"), ("B_to_A", "B→A")):
+        lucky, total = result["luck"][key]
+        rate = lucky / total * 100 if total else 0.0
+        print(f"  運による昇格率 {label}: {rate:5.1f}% ({lucky}/{total})")
+    print(f"  最初の鳳凰位: {describe_seasons(result['first_houou'], seasons)}")
+    print(f"  鳳凰位 {LEGEND_SIZE}名: {describe_seasons(result['legend'], seasons)}")
+    print(f"  {seasons}季後の鳳凰位: 平均 {result['houou_count'].mean():.2f}人")
+
+
+def default_min_hands(config_dir: Path) -> int:
+    """最新シーズンの required_hands"""
+    with open(config_dir / "seasons.json", "r", encoding="utf-8-sig") as f:
+        seasons = json.load(f)["seasons"]
+    return seasons[-1].get("league_rules", {}).get("required_hands", 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Season 4 リーグ制度（昇降格・鳳凰の羽）のモンテカルロシミュレーション")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--config-dir", default="config", help="設定ディレクトリのパス (default: config)")
+    parser.add_argument("--players", type=int, nargs="+", default=[300, 500, 1000],
+                        help="総人数（複数指定で比較, default: 300 500 1000）")
+    parser.add_argument("--x", type=int, nargs="+", default=[10],
+                        help="AB↔CD の移動人数 X（複数指定で比較, default: 10）")
+    parser.add_argument("--min-hands", type=int, nargs="+", default=None,
+                        help="最低ハンド数（default: 最新シーズンの required_hands）")
+    parser.add_argument("--c-share", type=float, default=DEFAULT_C_SHARE,
+                        help=f"CD サーバー内の C の割合 (default: {DEFAULT_C_SHARE})")
+    parser.add_argument("--feathers", type=int, default=FEATHERS_FOR_HOUOU,
+                        help=f"鳳凰位に必要な羽の枚数 N (default: {FEATHERS_FOR_HOUOU})")
+    parser.add_argument("--seasons", type=int, default=DEFAULT_SEASONS,
+                        help=f"シミュレーションするシーズン数（立ち上げ季を除く, default: {DEFAULT_SEASONS}）")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS_PER_SEASON,
+                        help=f"1シーズンの節数 (default: {DEFAULT_SESSIONS_PER_SEASON})")
+    parser.add_argument("--trials", type=int, default=DEFAULT_TRIALS, help=f"試行回数 (default: {DEFAULT_TRIALS})")
+    parser.add_argument("--min-sessions", type=int, default=2,
+                        help="型として使うプレイヤーの最低参加節数 (default: 2)")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード (default: 0)")
+    args = parser.parse_args()
+    if min(args.players) < 1:
+        parser.error("--players は 1 以上を指定してください")
+    if min(args.x) < 0:
+        parser.error("--x は 0 以上を指定してください（0 = AB↔CD の移動なし）")
+    if args.trials < 1 or args.seasons < 1 or args.sessions < 1:
+        parser.error("--trials / --seasons / --sessions は 1 以上を指定してください")
+
+    base_dir = Path(__file__).parent.parent
+    data_dir = base_dir / args.data_dir
+    min_hands_list = args.min_hands or [default_min_hands(base_dir / args.config_dir)]
+
+    model = PlayerModel.from_session_stats(data_dir / "session_stats_raw.csv", args.min_sessions)
+    print(f"プレイヤーの型: {model.size}人分（節別成績 {len(model.rows_bb)}行）")
+    print(f"{args.trials}試行 × {args.seasons}シーズン × {args.sessions}節, "
+          f"C/D = {args.c_share:.0%}/{1 - args.c_share:.0%}, 羽 {args.feathers}枚で鳳凰位")
+
+    for n_players in args.players:
+        for x in args.x:
+            for min_hands in min_hands_list:
+                started = time.perf_counter()
+                result = simulate(
+                    model, n_players, x, min_hands, c_share=args.c_share, trials=args.trials,
+                    seasons=args.seasons, sessions=args.sessions,
+                    feathers_for_houou=args.feathers, seed=args.seed,
+                )
+                print_result(result, n_players, x, min_hands, args.seasons)
+                print(f"  ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
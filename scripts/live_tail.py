@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+進行中の Poker Now ログのライブ集計
+
+開催中のテーブルのログ（poker_now_log_*.csv）を追いかけ、ハンドが終わるたびに
+プレイヤーごとの VPIP・PFR・収支を更新して、ローカルの Server-Sent Events で配信する。
+
+- ログは Poker Now のダウンロード（新しい順、再ダウンロードで上に行が増える）と、
+  追記型のエクスポート（古い順、末尾に行が増える）のどちらでも追える
+- 1エントリーずつ読み、ハンドの境界（-- starting hand / -- ending hand）で集計する。
+  保持するのは進行中の1ハンドとプレイヤーごとのカウンタだけなので、長時間でもメモリは増えない
+- VPIP / PFR の判定は StatsCalculator（hand_analysis.py）と同じ。収支はハンドごとのチップの
+  出入り（ブラインド・ベット・未コールの返却・獲得）から求める（Ledger とは途中の入金の扱いが違う）
+
+エンドポイント:
+    GET /events   テーブルの状態（JSON）を event: table で配信（接続時に全テーブル分）
+    GET /state    全テーブルの現在の状態（JSON）
+
+Usage:
+    python scripts/live_tail.py data/hand_histories/20260420            # 日付ディレクトリ内の全テーブル
+    python scripts/live_tail.py path/to/poker_now_log_xxx.csv --port 8765
+    python scripts/live_tail.py path/to/poker_now_log_xxx.csv --once     # 今ある分だけ集計して表示
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from stats_aggregator import BB_SIZE
+
+
+DEFAULT_PORT = 8765
+DEFAULT_INTERVAL = 1.0
+# SSE の接続維持のコメントを送る間隔（秒）
+KEEPALIVE_SECONDS = 15
+# 新しい順のログを末尾から読むときのブロックサイズ
+REVERSE_BLOCK = 1 << 16
+
+# レコードの最終行（entry の末尾, at, order）
+RECORD_END_PATTERN = re.compile(r',\d{4}-\d\d-\d\dT[\d:.]+Z,\d+\r?$')
+
+HAND_START_PATTERN = re.compile(r"-- starting hand #(\d+)")
+STACKS_PATTERN = re.compile(r'#\d* "(.*?) @ ([^"]+)" \((\d+)\)')
+ACTION_PATTERN = re.compile(r'"(.*?) @ ([^"]+)" (folds|checks|calls|raises|bets|posts|shows|collected)(.*)', re.S)
+AMOUNT_PATTERN = re.compile(r"(\d+)")
+UNCALLED_PATTERN = re.compile(r'Uncalled bet of (\d+) returned to "(.*?) @ [^"]+"')
+# ストリートの区切り（"Flop (second run):" などはベットがないので区切りとしては同じ扱い）
+STREET_PREFIXES = ("Flop", "Turn", "River")
+
+
+class LiveTableStats:
+    """
+    1テーブル分のライブ集計
+
+    feed() にログのエントリーを時系列順に渡す。計算量はエントリーあたり O(1)
+    （ハンド終了時は着席人数分）。
+    """
+
+    def __init__(self, table: str, bb: int = BB_SIZE):
+        self.table = table
+        self.bb = bb
+        self.big_blind_post = f"posts a big blind of {bb}"
+        # 名前 -> {player_id, hands, vpip, pfr, pfr_hands, net}（StatsCalculator と同じく名前で集計）
+        self.players: Dict[str, dict] = {}
+        self.hands = 0
+        self.last_hand: Optional[int] = None
+        self.updated_at: Optional[str] = None
+        self._hand: Optional[dict] = None
+
+    def feed(self, entry: str) -> bool:
+        """エントリーを1つ処理する。ハンドが1つ終わったら True"""
+        if entry.startswith("-- starting hand"):
+            finished = self._finish_hand()
+            match = HAND_START_PATTERN.match(entry)
+            self._hand = {
+                "number": int(match.group(1)) if match else None,
+                "seated": [],
+                # プリフロップ（BB のポスト後）のアクション: None = BB 前, True = 記録中, False = 終了
+                "preflop": None,
+                "actions": {},
+                "street": {},
+                "invested": {},
+                "won": {},
+            }
+            return finished
+        if entry.startswith("-- ending hand"):
+            return self._finish_hand()
+
+        hand = self._hand
+        if hand is None:
+            return False
+
+        if entry.startswith("Player stacks: "):
+            for name, player_id, _ in STACKS_PATTERN.findall(entry):
+                if name not in hand["seated"]:
+                    hand["seated"].append(name)
+                self.players.setdefault(name, {
+                    "player_id": player_id, "hands": 0, "vpip": 0, "pfr": 0, "pfr_hands": 0, "net": 0,
+                })
+            return False
+
+        if entry.startswith(STREET_PREFIXES):
+            if entry.startswith("Flop:"):
+                hand["preflop"] = False
+            self._close_street(hand)
+            return False
+
+        match = UNCALLED_PATTERN.match(entry)
+        if match:
+            name = match.group(2)
+            hand["street"][name] = hand["street"].get(name, 0) - int(match.group(1))
+            return False
+
+        match = ACTION_PATTERN.match(entry)
+        if match:
+            self._action(hand, match.group(1), match.group(3), match.group(3) + match.group(4))
+        return False
+
+    def _action(self, hand: dict, name: str, verb: str, text: str) -> None:
+        if verb == "collected":
+            # プリフロップだけで終わったハンドは最初の獲得までがプリフロップ（StatsCalculator と同じく獲得も含む）
+            if hand["preflop"]:
+                hand["actions"].setdefault(name, []).append("wins")
+                hand["preflop"] = False
+            amount = AMOUNT_PATTERN.search(text)
+            hand["won"][name] = hand["won"].get(name, 0) + int(amount.group(1))
+            return
+
+        if hand["preflop"]:
+            hand["actions"].setdefault(name, []).append(text)
+        if text.startswith(self.big_blind_post) and hand["preflop"] is None:
+            hand["preflop"] = True
+
+        if verb in ("calls", "bets", "raises", "posts"):
+            amount = int(AMOUNT_PATTERN.search(text).group(1))
+            if text.startswith("posts a missing"):
+                # 欠けていた SB はデッドマネー（このストリートのコール額に含まれない）
+                hand["invested"][name] = hand["invested"].get(name, 0) + amount
+            else:
+                # Poker Now の額はストリートでの合計
+                hand["street"][name] = amount
+
+    @staticmethod
+    def _close_street(hand: dict) -> None:
+        for name, amount in hand["street"].items():
+            hand["invested"][name] = hand["invested"].get(name, 0) + amount
+        hand["street"] = {}
+
+    def _finish_hand(self) -> bool:
+        hand, self._hand = self._hand, None
+        if hand is None:
+            return False
+        self._close_street(hand)
+
+        for name in hand["seated"]:
+            player = self.players[name]
+            player["hands"] += 1
+            if hand["preflop"] is None:
+                continue
+            # StatsCalculator と同じ判定: プリフロップのアクションが folds だけ / checks だけなら VPIP にしない
+            actions = hand["actions"].get(name, [])
+            if actions != ["folds"] and actions != ["checks"]:
+                player["vpip"] += 1
+            if actions:
+                player["pfr_hands"] += 1
+                if any(a.split(" ", 1)[0] == "raises" for a in actions):
+                    player["pfr"] += 1
+
+        for name in hand["invested"].keys() | hand["won"].keys():
+            if name in self.players:
+                self.players[name]["net"] += hand["won"].get(name, 0) - hand["invested"].get(name, 0)
+
+        self.hands += 1
+        self.last_hand = hand["number"]
+        self.updated_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        return True
+
+    def state(self) -> dict:
+        """配信用のテーブルの状態"""
+        players = []
+        for name, p in self.players.items():
+            players.append({
+                "name": name,
+                "player_id": p["player_id"],
+                "hands": p["hands"],
+                "vpip": round(p["vpip"] / p["hands"] * 100, 2) if p["hands"] else 0.0,
+                "pfr": round(p["pfr"] / p["pfr_hands"] * 100, 2) if p["pfr_hands"] else 0.0,
+                "net_chips": p["net"],
+                "net_bb": round(p["net"] / self.bb, 2),
+            })
+        players.sort(key=lambda p: p["net_chips"], reverse=True)
+        return {
+            "table": self.table,
+            "hands": self.hands,
+            "last_hand": self.last_hand,
+            "updated_at": self.updated_at,
+            "players": players,
+        }
+
+
+# --------------- Log follower ---------------
+
+def _parse_record(text: str) -> Optional[Tuple[str, int]]:
+    """1レコード分の CSV テキストを (entry, order) にする（不完全なら None）"""
+    try:
+        rows = list(csv.reader(io.StringIO(text)))
+    except csv.Error:
+        return None
+    if len(rows) != 1 or len(rows[0]) != 3 or not rows[0][2].isdigit():
+        return None
+    return rows[0][0], int(rows[0][2])
+
+
+def iter_records_reversed(path: Path) -> Iterator[Tuple[str, int]]:
+    """
+    ファイルの末尾から (entry, order) を返す（新しい順のログなら時系列順になる）
+
+    ブロック単位で後ろから読み、複数行のエントリー（"Game Config Changes" など）は
+    最終行（, 時刻, order で終わる行）の前の行をつなげて1レコードにする。
+    """
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        tail = b""
+        pending: List[str] = []
+        while position > 0:
+            size = min(REVERSE_BLOCK, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + tail).split(b"\n")
+            # 先頭の行はブロックの途中から始まっているかもしれないので次のブロックに回す
+            tail = lines.pop(0) if position > 0 else b""
+            for raw in reversed(lines):
+                yield from _push_line(raw.decode("utf-8"), pending)
+        if tail:
+            yield from _push_line(tail.decode("utf-8"), pending)
+
+
+def _push_line(line: str, pending: List[str]) -> Iterator[Tuple[str, int]]:
+    """iter_records_reversed で後ろから読んだ1行を処理する"""
+    if not line.strip() and not pending:
+        return
+    if RECORD_END_PATTERN.search(line) or line.rstrip("\r") == "entry,at,order":
+        # 新しいレコードの最終行。溜めていた行（1つ後ろのレコードの続き）は前のレコードの一部ではない
+        pending.clear()
+    pending.insert(0, line)
+    record = _parse_record("\n".join(pending))
+    if record is not None:
+        pending.clear()
+        yield record
+
+
+class LogFollower:
+    """
+    大きくなっていくログから、まだ読んでいないエントリーを時系列順に返す
+
+    新しい順のログ（ダウンロードし直すと上に行が増える）は order が前回より大きい行だけを読み、
+    古い順のログ（追記型）は前回の位置から読む。どちらも読んだ位置（order / バイト位置）だけを持つ。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.newest_first: Optional[bool] = None
+        self.last_order = -1
+        self.offset = 0
+
+    def poll(self) -> Iterator[str]:
+        if not self.path.exists():
+            return
+        if self.newest_first is None:
+            self.newest_first = self._detect_order()
+            if self.newest_first is None:
+                return
+        if self.newest_first:
+            yield from self._poll_newest_first()
+        else:
+            yield from self._poll_appended()
+
+    def _detect_order(self) -> Optional[bool]:
+        """先頭の2レコードの order で並び順を判定する（2レコード未満なら None）"""
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            orders = []
+            try:
+                for row in reader:
+                    if len(row) == 3 and row[2].isdigit():
+                        orders.append(int(row[2]))
+                        if len(orders) == 2:
+                            return orders[0] > orders[1]
+            except csv.Error:
+                pass
+        return None
+
+    def _poll_newest_first(self) -> Iterator[str]:
+        if self.last_order < 0:
+            for entry, order in iter_records_reversed(self.path):
+                self.last_order = max(self.last_order, order)
+                yield entry
+            return
+
+        # 先頭から前回の最後の行までが新しい行（ポーリング間隔分だけなので小さい）
+        new_rows = []
+        reached = False
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            try:
+                for row in csv.reader(f):
+                    if len(row) != 3 or not row[2].isdigit():
+                        continue
+                    order = int(row[2])
+                    if order <= self.last_order:
+                        reached = True
+                        break
+                    new_rows.append((row[0], order))
+            except csv.Error:
+                pass
+        if not reached:
+            # 書き込み途中（前回読んだ行までまだ届いていない）。次のポーリングで読み直す
+            return
+        for entry, order in reversed(new_rows):
+            self.last_order = order
+            yield entry
+
+    def _poll_appended(self) -> Iterator[str]:
+        size = self.path.stat().st_size
+        if size < self.offset:
+            # 作り直された（短くなった）ログは先頭から読み直し、読んだ order 以前は飛ばす
+            self.offset = 0
+        if size == self.offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(size - self.offset)
+        end = chunk.rfind(b"\n")
+        if end < 0:
+            return
+        try:
+            rows = list(csv.reader(io.StringIO(chunk[:end + 1].decode("utf-8"), newline="")))
+        except (csv.Error, UnicodeDecodeError):
+            # 複数行のエントリーの途中まで。続きが書かれるのを待つ
+            return
+        self.offset += end + 1
+        for row in rows:
+            if len(row) == 3 and row[2].isdigit() and int(row[2]) > self.last_order:
+                self.last_order = int(row[2])
+                yield row[0]
+
+
+# --------------- SSE server ---------------
+
+class StatePublisher:
+    """テーブルの最新状態を保持し、SSE のクライアントに変更を知らせる"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._tables: Dict[str, Tuple[int, dict]] = {}
+        self._version = 0
+
+    def publish(self, state: dict) -> None:
+        with self._cond:
+            self._version += 1
+            self._tables[state["table"]] = (self._version, state)
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._cond:
+            return {table: state for table, (_, state) in self._tables.items()}
+
+    def wait_changes(self, seen: int, timeout: float) -> Tuple[int, List[dict]]:
+        """seen より新しい状態のテーブルを返す（なければ timeout まで待つ）。遅いクライアントは途中の状態を飛ばす"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._version > seen, timeout)
+            changed = [state for version, state in self._tables.values() if version > seen]
+            return self._version, changed
+
+
+def make_handler(publisher: StatePublisher):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/state":
+                body = json.dumps(publisher.snapshot(), ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if self.path != "/events":
+                self.send_error(404)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            seen = 0
+            try:
+                while True:
+                    seen, changed = publisher.wait_changes(seen, KEEPALIVE_SECONDS)
+                    if not changed:
+                        self.wfile.write(b": keepalive\n\n")
+                    for state in changed:
+                        data = json.dumps(state, ensure_ascii=False)
+                        self.wfile.write(f"event: table\ndata: {data}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+# --------------- Main ---------------
+
+def find_logs(paths: List[Path]) -> List[Path]:
+    """指定されたファイルと、ディレクトリ以下の poker_now_log_*.csv"""
+    logs = []
+    for path in paths:
+        if path.is_dir():
+            logs.extend(sorted(path.rglob("poker_now_log_*.csv")))
+        elif path.suffix == ".csv":
+            logs.append(path)
+    return logs
+
+
+def table_name(log: Path) -> str:
+    """ログのテーブル名（テーブルディレクトリ名、なければファイル名）"""
+    return log.parent.name if "table" in log.parent.name.lower() else log.stem
+
+
+def print_table(state: dict) -> None:
+    print(f"\n=== {state['table']} ({state['hands']} hands, last #{state['last_hand']}) ===")
+    print("  プレイヤー              ハンド数   VPIP    PFR     収支(BB)")
+    for p in state["players"]:
+        print(f"  {p['name'][:20]:<20} {p['hands']:>8} {p['vpip']:>6.1f} {p['pfr']:>6.1f} {p['net_bb']:>+10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="進行中の Poker Now ログをライブ集計して SSE で配信")
+    parser.add_argument("paths", nargs="+", type=Path, help="ログのファイル、またはテーブルを含むディレクトリ")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"待ち受けるポート (default: {DEFAULT_PORT})")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help=f"ログを確認する間隔（秒, default: {DEFAULT_INTERVAL:g}）")
+    parser.add_argument("--bb", type=int, default=BB_SIZE, help=f"ビッグブラインド (default: {BB_SIZE})")
+    parser.add_argument("--once", action="store_true", help="今ある分だけを集計して表示し、サーバーは起動しない")
+    args = parser.parse_args()
+
+    followers: Dict[Path, Tuple[LogFollower, LiveTableStats]] = {}
+    publisher = StatePublisher()
+
+    def poll_all() -> None:
+        for log in find_logs(args.paths):
+            if log not in followers:
+                followers[log] = (LogFollower(log), LiveTableStats(table_name(log), bb=args.bb))
+        for follower, stats in followers.values():
+            finished = False
+            for entry in follower.poll():
+                finished = stats.feed(entry) or finished
+            if finished:
+                publisher.publish(stats.state())
+
+    poll_all()
+    if args.once:
+        for _, stats in followers.values():
+            print_table(stats.state())
+        return
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(publisher))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Following {len(followers)} logs, serving http://{args.host}:{args.port}/events (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(args.interval)
+            poll_all()
+    except KeyboardInterrupt:
+        print("\nStopped")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
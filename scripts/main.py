@@ -4,11 +4,18 @@
 
 Usage:
     python scripts/main.py --data-dir data --config-dir config [--verbose] [--dry-run]
+    python scripts/main.py --watch [--poll-interval 2] [--debounce 10]
+    python scripts/main.py --map partial_1.json --shard 1/4         # テーブルの 1/4 を部分集計
+    python scripts/main.py --reduce partial_*.json                  # 部分集計をまとめて出力
+    python scripts/main.py --since 20260316                         # 3/16 以降の節だけを集計し直す
+    python scripts/main.py --stream                                 # 節別データを一時ファイルに逃がして集計
+    python scripts/main.py --workers 4                              # 1つのログを4プロセスで分けて計算
 """
 
 import argparse
 import sys
 from pathlib import Path
+from typing import List, Optional
 
 # スクリプトディレクトリをパスに追加
 script_dir = Path(__file__).parent
@@ -17,6 +24,102 @@ sys.path.insert(0, str(script_dir))
 from config_loader import ConfigLoader
 from player_registry import PlayerRegistry
 from stats_aggregator import StatsAggregator
+from session_watcher import DEFAULT_DEBOUNCE, DEFAULT_POLL_INTERVAL, SessionWatcher
+from partial_aggregate import load_partials, map_tables, parse_shard, save_partial, select_sessions
+from session_spill import SessionSpill
+from session_partitions import write_partitions
+from preflop_ranges import build_ranges
+
+
+def print_summary(aggregator: StatsAggregator) -> None:
+    """集計結果のサマリーを表示"""
+    print(f"\n=== Summary ===")
+    print(f"Total players: {len(aggregator.all_stats)}")
+    print(f"Total unique hands: {aggregator.total_unique_hands}")
+    total_player_hands = sum(s.hands for s in aggregator.all_stats.values())
+    print(f"Total player-hands: {total_player_hands} (延べ参加数)")
+    print(f"Seasons with data: {len(aggregator.stats_by_season)}")
+    if aggregator.duplicate_hands:
+        total_duplicates = sum(sum(c.values()) for c in aggregator.duplicate_hands.values())
+        print(f"Duplicate hands skipped: {total_duplicates}")
+        for source, owners in sorted(aggregator.duplicate_hands.items()):
+            for owner, count in sorted(owners.items()):
+                where = "同じログ内" if owner == source else owner
+                print(f"  - {source}: {count} hands ({where})")
+    changed = aggregator.fingerprints.changed_owners()
+    if changed:
+        print(f"Duplicate hands moved to another log since the last run: {sum(changed.values())}")
+        for (before, after), count in sorted(changed.items()):
+            print(f"  - {before} -> {after}: {count} hands")
+
+
+def write_outputs(aggregator: StatsAggregator, registry: PlayerRegistry, config: ConfigLoader,
+                  data_dir: Path, as_of: Optional[str] = None, window: Optional[int] = None,
+                  season_ids: Optional[set] = None) -> List[Path]:
+    """
+    集計結果の CSV・インデックス・設定ファイルを書き出し、書いた CSV のパスを返す
+
+    season_ids を渡した場合、シーズン別の CSV はそのシーズンの分だけ書き直す（--watch / --season / --since）。
+    """
+    print("\nWriting CSV files...")
+
+    # データディレクトリが存在しない場合は作成
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    all_stats_path = aggregator.output_all_stats()
+    print(f"  - {all_stats_path}")
+
+    season_paths = aggregator.output_season_stats(season_ids)
+    for path in season_paths:
+        print(f"  - {path}")
+
+    # シーズン別 raw counts CSV を出力
+    raw_season_paths = aggregator.output_raw_season_stats(season_ids)
+    for path in raw_season_paths:
+        print(f"  - {path}")
+
+    # 節ごとの個人成績を出力
+    session_stats_path = aggregator.output_session_stats()
+    print(f"  - {session_stats_path}")
+
+    # 節ごとの raw counts CSV を出力
+    raw_session_stats_path = aggregator.output_raw_session_stats(season_ids)
+    print(f"  - {raw_session_stats_path}")
+
+    # 節ごとのファイルとインデックスを出力（内容の変わった分だけ）
+    partition_paths = write_partitions(data_dir, verbose=aggregator.verbose)
+    print(f"  - {data_dir / 'sessions'} ({len(partition_paths)} files updated)")
+
+    written = [all_stats_path, *season_paths, *raw_season_paths, session_stats_path, raw_session_stats_path,
+               *partition_paths]
+
+    # as-of / 直近 N 節のスタッツを出力
+    if as_of or window:
+        prefix_path = aggregator.output_prefix_stats(as_of, window)
+        print(f"  - {prefix_path}")
+        written.append(prefix_path)
+
+    # ハンド指紋インデックスを保存
+    fingerprints_path = aggregator.save_fingerprints()
+    print(f"  - {fingerprints_path}")
+
+    # hand_histories のマニフェストを保存
+    manifest_path = aggregator.save_manifest()
+    print(f"  - {manifest_path}")
+
+    # プレイヤー登録情報を保存
+    registry.save()
+    print(f"  - {config.players_path}")
+
+    # セッション数（開催回数）を更新（session_dates も含む）
+    config.update_session_counts(
+        aggregator.session_counts_by_season,
+        aggregator.total_session_count,
+        session_dates_by_season=aggregator.session_dates_by_season
+    )
+    print(f"  - {config.seasons_path} (session counts & dates updated)")
+
+    return written
 
 
 def main():
@@ -43,8 +146,113 @@ def main():
         action="store_true",
         help="実際にファイルを書き込まない"
     )
+    parser.add_argument(
+        "--as-of",
+        default=None,
+        help="この日付 (YYYYMMDD) 時点の累積スタッツも出力する"
+    )
+    parser.add_argument(
+        "--window",
+        type=int,
+        default=None,
+        help="各プレイヤーの直近 N 節のスタッツも出力する（--as-of と併用可）"
+    )
+
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="集計後も起動したままハンド履歴を監視し、変更のあったテーブルだけ読み直して CSV を更新する"
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        help=f"--watch でディレクトリを走査する間隔（秒, default: {DEFAULT_POLL_INTERVAL:g}）"
+    )
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE,
+        help=f"--watch で最後の変更からこの秒数たってから処理する（書き込み途中のファイル対策, default: {DEFAULT_DEBOUNCE:g}）"
+    )
+
+    parser.add_argument(
+        "--season",
+        nargs="+",
+        type=int,
+        default=None,
+        metavar="N",
+        help="このシーズンだけを集計し直す（他のシーズンは前回の session_stats_raw.csv から復元）"
+    )
+    parser.add_argument(
+        "--since",
+        default=None,
+        metavar="YYYYMMDD",
+        help="この日付以降の節だけを集計し直す（それより前は前回の session_stats_raw.csv から復元）"
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="集計の終わった節をメモリから一時ファイルに移しながら集計する（節の数によらずメモリ使用量が一定）"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        metavar="N",
+        help="1つのログのハンドを N 個に分けて並行にスタッツ計算するプロセス数（default: 0 = 逐次）"
+    )
+    parser.add_argument(
+        "--map",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="選んだテーブルのログだけを集計して部分集計ファイルに書く（--tables / --shard で選ぶ）"
+    )
+    parser.add_argument(
+        "--tables",
+        nargs="+",
+        default=None,
+        metavar="PATTERN",
+        help="--map するテーブル（日付 または 日付/テーブル のパターン、例: 202602* 20260316/*table1）"
+    )
+    parser.add_argument(
+        "--shard",
+        default=None,
+        metavar="I/N",
+        help="--map でテーブルを日付順に N 個に分けたうちの I 番目だけを集計する"
+    )
+    parser.add_argument(
+        "--reduce",
+        nargs="+",
+        type=Path,
+        default=None,
+        metavar="PATH",
+        help="部分集計ファイルをまとめて通常の CSV を出力する（ハンド履歴ログは読まない）"
+    )
 
     args = parser.parse_args()
+    if args.workers < 0:
+        parser.error("--workers は 0 以上を指定してください")
+    if args.window is not None and args.window < 1:
+        parser.error("--window は 1 以上を指定してください")
+    if args.map and (args.reduce or args.watch):
+        parser.error("--map は --reduce / --watch と同時に指定できません")
+    if (args.tables or args.shard) and not args.map:
+        parser.error("--tables / --shard は --map と一緒に指定してください")
+    if args.reduce and args.watch:
+        parser.error("--reduce は --watch と同時に指定できません")
+    rebuild_range = bool(args.season or args.since)
+    if rebuild_range and (args.watch or args.map or args.reduce):
+        parser.error("--season / --since は --watch / --map / --reduce と同時に指定できません")
+    if args.since is not None and not (len(args.since) == 8 and args.since.isdigit()):
+        parser.error("--since は YYYYMMDD で指定してください")
+    if args.stream and (args.watch or args.as_of or args.window or args.map):
+        parser.error("--stream は --watch / --as-of / --window / --map と同時に指定できません")
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
 
     # パスを解決
     base_dir = Path(__file__).parent.parent
@@ -69,12 +277,27 @@ def main():
             config,
             registry,
             data_dir=str(data_dir),
-            verbose=args.verbose
+            verbose=args.verbose,
+            # --watch ではテーブル単位の結果を残して、変更のないログを読み直さない
+            table_cache={} if args.watch else None,
+            seasons=args.season,
+            since=args.since,
+            session_spill=SessionSpill() if args.stream else None,
+            workers=args.workers
         )
     except Exception as e:
         print(f"Error during initialization: {e}")
         sys.exit(1)
 
+    for season_id in args.season or []:
+        season = config.get_season_by_id(season_id)
+        if not season:
+            print(f"Error: Season {season_id} not found in seasons.json")
+            sys.exit(1)
+        if season.get("frozen"):
+            print(f"Error: Season {season_id} is frozen (凍結シーズンは集計し直せません)")
+            sys.exit(1)
+
     # セッション検出
     sessions = aggregator.discover_sessions()
     if args.verbose:
@@ -88,12 +311,36 @@ def main():
         s.get("frozen") for s in config.get_all_seasons()
     )
 
-    if not sessions and not has_frozen:
+    if args.map:
+        selected = select_sessions(sessions, args.tables, shard)
+        print(f"\nMapping {len(selected)} tables...")
+        payload = map_tables(aggregator, selected)
+        hands = sum(table["unique_hands"] for table in payload["tables"])
+        print(f"  {len(payload['tables'])} tables, {len(payload['dates'])} dates, {hands} unique hands")
+        if args.dry_run:
+            print("\n[DRY RUN] Skipping file writes")
+        else:
+            print(f"  - {save_partial(payload, args.map)}")
+        aggregator.close()
+        print("\nDone!")
+        return
+
+    partial_tables = None
+    if args.reduce:
+        try:
+            partial_tables = load_partials(args.reduce)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        print(f"\nLoaded {len(partial_tables)} tables from {len(args.reduce)} partial files")
+
+    if not sessions and not has_frozen and not args.watch and not partial_tables:
         print("No sessions found. Please add hand histories to data/hand_histories/")
         print("\nExpected directory structure:")
         print("  data/hand_histories/")
         print("    └── {YYYYMMDD}/")
         print("        ├── player-stats-all-time-*.json  (precalculated)")
+        print("        ├── player-stats-delta-*.json     (precalculated, snapshot delta)")
         print("        └── table{N}/ (or {YYYYMMDD}_table{N}/)")
         print("            ├── poker_now_log_*.csv")
         print("            └── ledger_*.csv")
@@ -101,57 +348,40 @@ def main():
 
     # 集計処理
     print("\nProcessing sessions...")
-    aggregator.aggregate(sessions)
+    if partial_tables is None and not rebuild_range and not args.stream:
+        aggregator.aggregate(sessions)
+    else:
+        try:
+            aggregator.aggregate(sessions, partial_tables=partial_tables)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
 
     # 結果サマリー
-    print(f"\n=== Summary ===")
-    print(f"Total players: {len(aggregator.all_stats)}")
-    print(f"Total unique hands: {aggregator.total_unique_hands}")
-    total_player_hands = sum(s.hands for s in aggregator.all_stats.values())
-    print(f"Total player-hands: {total_player_hands} (延べ参加数)")
-    print(f"Seasons with data: {len(aggregator.stats_by_season)}")
+    print_summary(aggregator)
+    if rebuild_range:
+        seasons = ", ".join(str(sid) for sid in sorted(aggregator.rebuilt_season_ids)) or "なし"
+        print(f"Rebuilt seasons: {seasons} (範囲外の節は session_stats_raw.csv から復元、ユニークハンド数は範囲内のみ)")
 
     if args.dry_run:
         print("\n[DRY RUN] Skipping file writes")
     else:
-        # CSV出力
-        print("\nWriting CSV files...")
-
-        # データディレクトリが存在しない場合は作成
-        data_dir.mkdir(parents=True, exist_ok=True)
-
-        all_stats_path = aggregator.output_all_stats()
-        print(f"  - {all_stats_path}")
-
-        season_paths = aggregator.output_season_stats()
-        for path in season_paths:
-            print(f"  - {path}")
-
-        # シーズン別 raw counts CSV を出力
-        raw_season_paths = aggregator.output_raw_season_stats()
-        for path in raw_season_paths:
-            print(f"  - {path}")
-
-        # 節ごとの個人成績を出力
-        session_stats_path = aggregator.output_session_stats()
-        print(f"  - {session_stats_path}")
-
-        # 節ごとの raw counts CSV を出力
-        raw_session_stats_path = aggregator.output_raw_session_stats()
-        print(f"  - {raw_session_stats_path}")
-
-        # プレイヤー登録情報を保存
-        registry.save()
-        print(f"  - {config.players_path}")
+        write_outputs(aggregator, registry, config, data_dir, args.as_of, args.window,
+                      season_ids=aggregator.rebuilt_season_ids if rebuild_range else None)
+        # ユーザーページのレンジ表（集計で読んだログの節と、ログの変わった節だけ作り直す）
+        print("\nWriting preflop range files...")
+        ranges = build_ranges(data_dir, config, registry, holdings=aggregator.holdings, verbose=args.verbose)
+        print(f"Wrote {len(ranges)} range files (data/ranges/)")
 
-        # セッション数（開催回数）を更新（session_dates も含む）
-        config.update_session_counts(
-            aggregator.session_counts_by_season,
-            aggregator.total_session_count,
-            session_dates_by_season=aggregator.session_dates_by_season
+    if args.watch:
+        watcher = SessionWatcher(
+            config, registry, data_dir, aggregator.table_cache,
+            verbose=args.verbose, dry_run=args.dry_run, as_of=args.as_of, window=args.window,
+            interval=args.poll_interval, debounce=args.debounce, workers=args.workers
         )
-        print(f"  - {config.seasons_path} (session counts & dates updated)")
+        watcher.run()
 
+    aggregator.close()
     print("\nDone!")
 
 
@@ -2,21 +2,33 @@
 """
 重複プレイヤー統合スクリプト
 同じ display_name を持つプレイヤーを統合し、aliases をマージする
+--near を付けると find_duplicate_players.py の近い名前の統合候補
+（スコアが --min-score 以上で、同時に着席していないもの）も統合する
 
 Usage:
-    python scripts/merge_duplicate_players.py [--config-dir config] [--dry-run]
+    python scripts/merge_duplicate_players.py [--config-dir config] [--dry-run] [--near [--min-score 0.9]]
 """
 
 import argparse
 import json
 import sys
 from pathlib import Path
+from typing import List, Optional
 
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
 
-def merge_duplicates(players_path: Path, dry_run: bool = False) -> tuple:
+from find_duplicate_players import find_near_duplicates
+
+
+def merge_duplicates(players_path: Path, dry_run: bool = False,
+                     near_pairs: Optional[List[List[str]]] = None) -> tuple:
     """
     同じ display_name を持つプレイヤーを統合
 
+    Args:
+        near_pairs: 名前が違っても統合する player_id のペア（find_near_duplicates の ids）
+
     Returns:
         tuple: (統合前の件数, 統合後の件数, 新しいデータ, 変更差分リスト)
     """
@@ -26,25 +38,43 @@ def merge_duplicates(players_path: Path, dry_run: bool = False) -> tuple:
     original_count = len(data['players'])
     original_players = data['players']
 
-    # display_name でグループ化
+    # 同じ display_name と near_pairs をつないだグループの代表（ファイル順で最初のID）を求める
+    order = {player_id: i for i, player_id in enumerate(original_players)}
+    parent = {}
+    first_by_name = {}
+    for player_id, info in original_players.items():
+        parent[player_id] = first_by_name.setdefault(info['display_name'], player_id)
+
+    def root(player_id):
+        while parent[player_id] != player_id:
+            parent[player_id] = parent[parent[player_id]]
+            player_id = parent[player_id]
+        return player_id
+
+    for a, b in near_pairs or []:
+        ra, rb = root(a), root(b)
+        if ra != rb:
+            parent[max(ra, rb, key=order.get)] = min(ra, rb, key=order.get)
+
+    # グループ化（キーは代表ID）
     name_groups = {}
-    for player_id, info in data['players'].items():
-        name = info['display_name']
-        if name not in name_groups:
-            name_groups[name] = {
+    for player_id, info in original_players.items():
+        key = root(player_id)
+        if key not in name_groups:
+            name_groups[key] = {
                 'ids': [],
                 'all_aliases': set()
             }
-        name_groups[name]['ids'].append(player_id)
+        name_groups[key]['ids'].append(player_id)
         for alias in info.get('aliases', [player_id]):
-            name_groups[name]['all_aliases'].add(alias)
+            name_groups[key]['all_aliases'].add(alias)
 
     # 新しい players dict を作成 & 差分を収集
     new_players = {}
     diffs = []
-    for name, group in name_groups.items():
-        # 最初のIDをメインIDとして使用
-        main_id = group['ids'][0]
+    for main_id, group in name_groups.items():
+        # 最初のIDをメインIDとして使用（名前もメインIDのもの）
+        name = original_players[main_id]['display_name']
         all_aliases = sorted(list(group['all_aliases']))
 
         new_players[main_id] = {
@@ -64,6 +94,7 @@ def merge_duplicates(players_path: Path, dry_run: bool = False) -> tuple:
                 'display_name': name,
                 'main_id': main_id,
                 'merged_ids': merged_ids,
+                'names_before': {pid: original_players[pid]['display_name'] for pid in group['ids']},
                 'aliases_before': {pid: sorted(original_players[pid].get('aliases', [pid])) for pid in group['ids']},
                 'aliases_after': all_aliases,
             })
@@ -111,7 +142,7 @@ def print_diffs(diffs: list) -> None:
             print(f"    統合されたID: {', '.join(d['merged_ids'])}")
             print(f"    統合前:")
             for pid, aliases in d['aliases_before'].items():
-                print(f"      {pid}: {aliases}")
+                print(f"      {pid} ({d['names_before'][pid]}): {aliases}")
             print(f"    統合後 aliases: {d['aliases_after']}")
 
     if alias_changed:
@@ -136,6 +167,22 @@ def main():
         action="store_true",
         help="実際にファイルを書き込まない"
     )
+    parser.add_argument(
+        "--near",
+        action="store_true",
+        help="近い名前の統合候補も統合する（find_duplicate_players.py の候補）"
+    )
+    parser.add_argument(
+        "--min-score",
+        type=float,
+        default=0.9,
+        help="--near で統合する候補のスコアの下限 (default: 0.9)"
+    )
+    parser.add_argument(
+        "--data-dir",
+        default="data",
+        help="データディレクトリのパス（--near で Ledger の参照に使う, default: data）"
+    )
     args = parser.parse_args()
 
     base_dir = Path(__file__).parent.parent
@@ -145,7 +192,14 @@ def main():
         print(f"Error: {players_path} not found")
         sys.exit(1)
 
-    original_count, new_count, new_data, diffs = merge_duplicates(players_path, args.dry_run)
+    near_pairs = None
+    if args.near:
+        suggestions = find_near_duplicates(
+            players_path, base_dir / args.data_dir / "hand_histories", args.min_score
+        )
+        near_pairs = [s['ids'] for s in suggestions if not s['seated_together']]
+
+    original_count, new_count, new_data, diffs = merge_duplicates(players_path, args.dry_run, near_pairs)
     merged_count = original_count - new_count
 
     print(f"統合前: {original_count} プレイヤー")
@@ -0,0 +1,134 @@
+"""
+部分集計（main.py --map / --reduce）
+
+全期間の集計（ハンド履歴ログのパースとスタッツ計算）を、日付・テーブルディレクトリの一部ずつに分けて
+複数のマシン・CI ジョブで実行し、結果をまとめて通常の出力を作る。
+
+- map: 選んだテーブルのログをパース・計算し、テーブルごとの結果を部分集計ファイル（JSON）に書く。
+  中身はプレイヤー名ごとの生カウンタ（PlayerStats）・ユニークハンド数・ハンド指紋・Ledger の収支・
+  プレイヤー名 -> ID と ID 変更（レジストリに登録する観測）・レンジ表用の見せたハンド。
+  ID 変換・リーグは reduce で適用する
+- reduce: 部分集計ファイルをいくつでも読み込み、テーブルを通常の実行と同じ順（日付・テーブル名順）に
+  並べて取り込む。どの順にファイルを渡しても結果は同じで、1プロセスで全体を集計したときと一致する
+
+凍結シーズン・計算済み JSON の日付は reduce 側で通常どおり読む（ログのパースが無いので軽い）。
+重複ハンドの判定はシャード内で行い、reduce でやり直す。別のシャードのログと重複していた
+テーブルだけ、reduce 側の手元のログを読み直す。
+"""
+
+import fnmatch
+import json
+from dataclasses import asdict
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from hand_fingerprints import FingerprintIndex
+from stats_aggregator import SessionInfo, StatsAggregator
+
+
+PARTIAL_VERSION = 4
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """"I/N"（1 始まり）を (I, N) にする"""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise ValueError(f"--shard は I/N の形式で指定してください: {value}")
+    if not 1 <= index <= count:
+        raise ValueError(f"--shard の I は 1 から N の間で指定してください: {value}")
+    return index, count
+
+
+def select_sessions(sessions: List[SessionInfo], patterns: Optional[Iterable[str]] = None,
+                    shard: Optional[Tuple[int, int]] = None) -> List[SessionInfo]:
+    """
+    map するテーブルを選ぶ
+
+    Args:
+        patterns: "日付" または "日付/テーブル" のパターン（fnmatch、例: 202602*, 20260316/*table1*）
+        shard: (I, N)。日付・テーブル名順に並べたテーブルを N 個に分けたうちの I 番目
+               （同じ日付のテーブルはなるべく同じシャードになるように連続した範囲で分ける）
+    """
+    tables = sorted(
+        (s for s in sessions if not s.is_precalculated and s.csv_path),
+        key=lambda s: (s.date, s.session_dir.name),
+    )
+    if patterns:
+        patterns = list(patterns)
+        tables = [
+            s for s in tables
+            if any(fnmatch.fnmatch(f"{s.date:%Y%m%d}", p) or fnmatch.fnmatch(f"{s.date:%Y%m%d}/{s.session_dir.name}", p)
+                   for p in patterns)
+        ]
+    if shard:
+        index, count = shard
+        start, end = len(tables) * (index - 1) // count, len(tables) * index // count
+        tables = tables[start:end]
+    return tables
+
+
+def map_tables(aggregator: StatsAggregator, sessions: List[SessionInfo]) -> dict:
+    """
+    テーブルのログをパース・計算して、部分集計ファイルの内容を返す
+
+    重複ハンドはこのシャード内だけで判定する（前回の実行の指紋インデックスは使わない）。
+    """
+    aggregator.fingerprints = FingerprintIndex()
+    manifest = aggregator.get_manifest()
+
+    tables = []
+    for session in sessions:
+        source = aggregator._log_source(session.csv_path)
+        if aggregator.verbose:
+            print(f"Mapping {source}")
+        table = aggregator._parse_table(session, source)
+        tables.append({
+            "date": f"{session.date:%Y%m%d}",
+            "table": session.session_dir.name,
+            "source": source,
+            "sha256": (manifest.file_info(session.csv_path) or {}).get("sha256"),
+            "fingerprints": table["fingerprints"],
+            "kept": table["kept"],
+            "unique_hands": table["unique_hands"],
+            "player_id_map": table["player_id_map"],
+            "id_changes": table["id_changes"],
+            "player_stats": {name: asdict(stats) for name, stats in table["player_stats"].items()},
+            "ledger": aggregator._read_ledger(session),
+            "holdings": table["holdings"],
+        })
+    return {
+        "version": PARTIAL_VERSION,
+        "dates": sorted({table["date"] for table in tables}),
+        "tables": tables,
+    }
+
+
+def save_partial(payload: dict, path: Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+    tmp.replace(path)
+    return path
+
+
+def load_partials(paths: Iterable[Path]) -> List[dict]:
+    """
+    部分集計ファイルを読み込み、テーブルを日付・テーブル名順に並べて返す
+
+    同じログが複数のファイルにあれば、内容（ハッシュ）が同じなら1つにまとめ、違えばエラーにする。
+    """
+    by_source = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != PARTIAL_VERSION:
+            raise ValueError(f"{path}: 部分集計ファイルのバージョンが違います（{payload.get('version')}）")
+        for table in payload["tables"]:
+            existing = by_source.get(table["source"])
+            if existing is not None and existing["sha256"] != table["sha256"]:
+                raise ValueError(f"{table['source']}: 内容の違うログが複数の部分集計ファイルにあります")
+            by_source[table["source"]] = table
+    return sorted(by_source.values(), key=lambda t: (t["date"], t["table"]))
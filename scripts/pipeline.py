@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+パイプライン実行スクリプト
+
+main.py（集計）・weekly_report.py・season_transition.py・preseason_formatter.py・preflop_ranges.py・
+fetch_stats.py を1つのプロセスで、依存関係（DAG）の順に実行する。
+
+各ステージは入力（ファイル・hand_histories のマニフェスト・自分と import 先のスクリプト）と
+出力を宣言し、実行後に入力の指紋（sha256）と出力のハッシュを data/cache/pipeline.json に保存する。
+次回は指紋が変わったステージ（または出力が消えた・変わったステージ）だけを実行する。
+上流が実行されても出力が同じなら、下流は実行しない。
+
+  fetch（--fetch のときだけ） -> aggregate -> weekly / transition / preseason / ranges
+
+依存の無いステージはスレッドで並行に実行し、集計結果のうち下流が使うもの（節別スタッツ・見せたハンド）は
+メモリ上で渡す（weekly は session_stats_raw.csv を読み直さない）。PlayerRegistry は
+ステージごとに aggregate が書いた players.json から作り直す（並行するステージで共有しない）。
+各ステージの出力（print）は data/cache/pipeline/{ステージ名}.log に保存し、
+最新のときはそのログの場所だけを表示する。
+
+Usage:
+    python scripts/pipeline.py                       # 古いステージだけを実行
+    python scripts/pipeline.py --dry-run             # 実行するステージを表示するだけ
+    python scripts/pipeline.py --force weekly        # weekly を指紋に関わらず実行
+    python scripts/pipeline.py --only aggregate weekly
+    DATABASE_URL=postgresql://... python scripts/pipeline.py --fetch
+"""
+
+import argparse
+import ast
+import hashlib
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from config_loader import ConfigLoader
+from dataset_manifest import DatasetManifest, file_sha256
+
+
+STATE_PATH = "cache/pipeline.json"
+LOG_DIR = "cache/pipeline"
+STATE_VERSION = 1
+
+
+@dataclass
+class Stage:
+    """パイプラインの1ステージ"""
+    name: str
+    # 実行する関数: run(ctx, upstream) -> (メモリ上の結果, 書いたファイルのリスト)
+    run: Callable
+    # 入力ファイル（ctx から求める）
+    inputs: Callable
+    # 自分の処理が書かれたスクリプト（import 先も含めて指紋に入れる）
+    module: str
+    deps: List[str] = field(default_factory=list)
+    # hand_histories のマニフェストを入力に含める
+    uses_manifest: bool = False
+    # 外部（DB）から読むので、選ばれたら常に実行する
+    always: bool = False
+
+
+@dataclass
+class Context:
+    base_dir: Path
+    data_dir: Path
+    config_dir: Path
+    transition_season: Optional[int] = None
+    verbose: bool = False
+    fetch_args: List[str] = field(default_factory=list)
+
+
+# --------------- Fingerprints ---------------
+
+def local_imports(module: str, seen: Optional[set] = None) -> set:
+    """scripts/ 内のモジュールが（推移的に）import する scripts/ 内のモジュール名"""
+    seen = set() if seen is None else seen
+    if module in seen:
+        return seen
+    path = script_dir / f"{module}.py"
+    if not path.exists():
+        return seen
+    seen.add(module)
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            local_imports(name.split(".")[0], seen)
+    return seen
+
+
+def manifest_digest(manifest: DatasetManifest) -> str:
+    """マニフェストのファイル名・ハッシュ・シーズン割り当てだけから作る指紋"""
+    digest = hashlib.sha256()
+    for date_str in manifest.date_strs():
+        entry = manifest.dates[date_str]
+        digest.update(f"{date_str}:{entry['season_id']}\n".encode())
+        for name, info in sorted(entry["files"].items()):
+            digest.update(f"  {name}:{info['sha256']}\n".encode())
+        for dir_name, files in sorted(entry["dirs"].items()):
+            for name, info in sorted(files.items()):
+                digest.update(f"  {dir_name}/{name}:{info['sha256']}\n".encode())
+    return digest.hexdigest()
+
+
+def path_digest(path: Path) -> str:
+    return file_sha256(str(path)) if path.is_file() else "missing"
+
+
+class Pipeline:
+    """ステージの指紋を比べて、古いステージだけを依存順に実行する"""
+
+    def __init__(self, stages: List[Stage], ctx: Context, jobs: int = 2):
+        self.stages = {stage.name: stage for stage in stages}
+        self.ctx = ctx
+        self.jobs = jobs
+        self.state_path = ctx.data_dir / STATE_PATH
+        self.log_dir = ctx.data_dir / LOG_DIR
+        self.state = self._load_state()
+        self._manifest_lock = threading.Lock()
+        self._manifest_digest: Optional[str] = None
+
+    def _load_state(self) -> dict:
+        if self.state_path.exists():
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") == STATE_VERSION:
+                return state
+        return {"version": STATE_VERSION, "stages": {}}
+
+    def _save_state(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        tmp.replace(self.state_path)
+
+    def _rel(self, path: Path) -> str:
+        return str(Path(path).resolve().relative_to(self.ctx.base_dir.resolve()))
+
+    def _hand_histories_digest(self, save: bool) -> str:
+        """hand_histories のマニフェストの指紋（ステージが実行されるまで使い回す）"""
+        with self._manifest_lock:
+            if self._manifest_digest is None:
+                config = ConfigLoader(str(self.ctx.config_dir))
+                manifest = DatasetManifest.refresh(self.ctx.data_dir, config, save=save)
+                self._manifest_digest = manifest_digest(manifest)
+            return self._manifest_digest
+
+    def fingerprint(self, stage: Stage, save_manifest: bool = True) -> str:
+        """ステージの入力の指紋（入力ファイル・マニフェスト・スクリプト）"""
+        digest = hashlib.sha256()
+        for module in sorted(local_imports(stage.module)):
+            digest.update(f"code:{module}:{path_digest(script_dir / f'{module}.py')}\n".encode())
+        for path in sorted(stage.inputs(self.ctx), key=str):
+            digest.update(f"file:{self._rel(path)}:{path_digest(path)}\n".encode())
+        if stage.uses_manifest:
+            digest.update(f"hand_histories:{self._hand_histories_digest(save_manifest)}\n".encode())
+        return digest.hexdigest()
+
+    def stale_reason(self, stage: Stage, fingerprint: str, force: bool) -> Optional[str]:
+        """実行が必要な理由（最新なら None）"""
+        if force:
+            return "forced"
+        if stage.always:
+            return "external input"
+        record = self.state["stages"].get(stage.name)
+        if record is None:
+            return "never run"
+        if record["inputs"] != fingerprint:
+            return "inputs changed"
+        for rel, sha in record["outputs"].items():
+            if path_digest(self.ctx.base_dir / rel) != sha:
+                return f"output changed: {rel}"
+        return None
+
+    def _execute(self, stage: Stage, upstream: Dict[str, object], force: bool) -> dict:
+        """ステージ1つ分（ワーカースレッドで実行）。出力は StageOutput で横取りする"""
+        fingerprint = self.fingerprint(stage)
+        reason = self.stale_reason(stage, fingerprint, force)
+        if reason is None:
+            return {"status": "fresh"}
+
+        buffer = io.StringIO()
+        StageOutput.capture(buffer)
+        started = time.perf_counter()
+        try:
+            value, outputs = stage.run(self.ctx, upstream)
+        except (Exception, SystemExit) as e:
+            return {"status": "failed", "reason": reason, "error": repr(e), "log": buffer.getvalue()}
+        finally:
+            StageOutput.release()
+        seconds = time.perf_counter() - started
+
+        # ステージ自身が入力を書き換えることがある（aggregate の players.json など）ので、
+        # 指紋は実行後の状態で取り直す
+        with self._manifest_lock:
+            self._manifest_digest = None
+        record = {
+            "inputs": self.fingerprint(stage),
+            "outputs": {self._rel(p): path_digest(Path(p)) for p in outputs},
+            "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "seconds": round(seconds, 3),
+        }
+        return {"status": "ran", "reason": reason, "value": value, "record": record,
+                "log": buffer.getvalue(), "seconds": seconds}
+
+    def _write_log(self, name: str, text: str) -> Path:
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        path = self.log_dir / f"{name}.log"
+        path.write_text(text, encoding="utf-8")
+        return path
+
+    def plan(self, selected: List[str], force: set) -> None:
+        """--dry-run: 今の入力で各ステージが古いかどうかを表示する（上流の実行による変化は含まない）"""
+        for name in self.order(selected):
+            stage = self.stages[name]
+            reason = self.stale_reason(stage, self.fingerprint(stage, save_manifest=False), name in force)
+            print(f"  {name:<11} {'run (' + reason + ')' if reason else 'up to date'}")
+
+    def order(self, selected: List[str]) -> List[str]:
+        """選ばれたステージのトポロジカル順"""
+        result, visiting = [], set()
+
+        def visit(name):
+            if name in result:
+                return
+            if name in visiting:
+                raise ValueError(f"cycle at stage {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                if dep in selected:
+                    visit(dep)
+            visiting.discard(name)
+            result.append(name)
+
+        for name in selected:
+            visit(name)
+        return result
+
+    def run(self, selected: List[str], force: set) -> bool:
+        """選ばれたステージを実行する。失敗したステージがあれば False"""
+        pending = self.order(selected)
+        results: Dict[str, dict] = {}
+        ok = True
+
+        with StageOutput.installed(), ThreadPoolExecutor(self.jobs) as pool:
+            running = {}
+            while pending or running:
+                for name in list(pending):
+                    deps = [d for d in self.stages[name].deps if d in selected]
+                    if any(d not in results for d in deps):
+                        continue
+                    pending.remove(name)
+                    if any(results[d]["status"] in ("failed", "skipped") for d in deps):
+                        results[name] = {"status": "skipped"}
+                        print(f"[{name}] skipped (upstream failed)")
+                        continue
+                    upstream = {d: results[d].get("value") for d in deps}
+                    running[pool.submit(self._execute, self.stages[name], upstream, name in force)] = name
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    result = results[name] = future.result()
+                    log_path = self.log_dir / f"{name}.log"
+                    if result["status"] == "fresh":
+                        print(f"[{name}] up to date ({self._rel(log_path) if log_path.exists() else 'no log'})")
+                        continue
+                    self._write_log(name, result["log"])
+                    sys.stdout.write(result["log"])
+                    if result["status"] == "failed":
+                        ok = False
+                        print(f"[{name}] FAILED ({result['reason']}): {result['error']}")
+                        continue
+                    self.state["stages"][name] = result["record"]
+                    self._save_state()
+                    print(f"[{name}] done in {result['seconds']:.2f}s ({result['reason']})")
+        return ok
+
+
+class StageOutput(io.TextIOBase):
+    """
+    スレッドごとに出力先を切り替える sys.stdout
+
+    並行に実行するステージの print が混ざらないように、capture したスレッドの出力は
+    そのスレッドのバッファに、それ以外は元の stdout に書く。
+    """
+
+    _local = threading.local()
+    _original = None
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer or StageOutput._original).write(text)
+
+    def flush(self):
+        StageOutput._original.flush()
+
+    @classmethod
+    def capture(cls, buffer: io.StringIO) -> None:
+        cls._local.buffer = buffer
+
+    @classmethod
+    def release(cls) -> None:
+        cls._local.buffer = None
+
+    @classmethod
+    def installed(cls):
+        class _Installed:
+            def __enter__(self_):
+                cls._original = sys.stdout
+                sys.stdout = cls()
+
+            def __exit__(self_, *exc):
+                sys.stdout = cls._original
+        return _Installed()
+
+
+# --------------- Stages ---------------
+
+def run_fetch(ctx: Context, upstream: dict):
+    import fetch_stats
+    before = set((ctx.data_dir / "hand_histories").rglob("player-stats-*.json"))
+    fetch_stats.main(["--data-dir", str(ctx.data_dir), *ctx.fetch_args])
+    after = set((ctx.data_dir / "hand_histories").rglob("player-stats-*.json"))
+    return None, sorted(after - before)
+
+
+def run_aggregate(ctx: Context, upstream: dict):
+    from main import print_summary, write_outputs
+    from player_registry import PlayerRegistry
+    from stats_aggregator import StatsAggregator
+
+    config = ConfigLoader(str(ctx.config_dir))
+    registry = PlayerRegistry(config)
+    aggregator = StatsAggregator(config, registry, data_dir=str(ctx.data_dir), verbose=ctx.verbose)
+    print("Processing sessions...")
+    aggregator.aggregate(aggregator.discover_sessions())
+    print_summary(aggregator)
+    try:
+        written = write_outputs(aggregator, registry, config, ctx.data_dir)
+    finally:
+        aggregator.close()
+    return {"stats_by_session": aggregator.stats_by_session, "holdings": aggregator.holdings}, written
+
+
+def aggregate_inputs(ctx: Context) -> List[Path]:
+    config = ConfigLoader(str(ctx.config_dir))
+    frozen = [s["id"] for s in config.get_all_seasons() if s.get("frozen")]
+    return [
+        ctx.config_dir / "seasons.json",
+        ctx.config_dir / "players.json",
+        ctx.data_dir / "cache" / "hand_fingerprints.json",
+        *(ctx.data_dir / f"season_{sid}_stats_raw.csv" for sid in frozen),
+        *(ctx.data_dir / f"season_{sid}_session_stats_raw.csv" for sid in frozen),
+    ]
+
+
+def run_weekly(ctx: Context, upstream: dict):
+    from player_registry import PlayerRegistry
+    from weekly_report import get_weekly_data, print_report, session_data_from_stats
+
+    # get_weekly_data は registry に ID 変更・プレイヤーを登録するので、自分の registry を使う
+    config = ConfigLoader(str(ctx.config_dir))
+    registry = PlayerRegistry(config)
+    aggregated = upstream.get("aggregate")
+    # 同じプロセスで集計した直後なら、その節別スタッツをそのまま使う
+    session_data = session_data_from_stats(aggregated["stats_by_session"]) if aggregated else None
+    weekly_data = get_weekly_data(ctx.data_dir, config, registry, session_stats_data=session_data)
+    print_report(weekly_data, config, registry, ctx.data_dir)
+    return None, []
+
+
+def weekly_inputs(ctx: Context) -> List[Path]:
+    return [
+        ctx.config_dir / "seasons.json",
+        ctx.config_dir / "players.json",
+        ctx.data_dir / "session_stats_raw.csv",
+        *sorted(ctx.data_dir.glob("season_*_stats.csv")),
+    ]
+
+
+def transition_season(ctx: Context) -> int:
+    if ctx.transition_season is not None:
+        return ctx.transition_season
+    return ConfigLoader(str(ctx.config_dir)).get_all_seasons()[-1]["id"]
+
+
+def run_transition(ctx: Context, upstream: dict):
+    from season_transition import run_transition as transition
+    return transition(transition_season(ctx), ctx.config_dir, ctx.data_dir, verbose=ctx.verbose), []
+
+
+def transition_inputs(ctx: Context) -> List[Path]:
+    return [
+        ctx.config_dir / "seasons.json",
+        ctx.config_dir / "players.json",
+        ctx.data_dir / f"season_{transition_season(ctx)}_stats.csv",
+    ]
+
+
+def run_preseason(ctx: Context, upstream: dict):
+    from preseason_formatter import PreseasonFormatter
+    output_path = ctx.data_dir / "preseason_all_stats.csv"
+    PreseasonFormatter(*map(str, preseason_inputs(ctx))).run(str(output_path))
+    return None, [output_path]
+
+
+def preseason_inputs(ctx: Context) -> List[Path]:
+    # PreseasonFormatter の引数順（chips, stats, players）
+    return [
+        ctx.data_dir / "preseason" / "preseason_chips.csv",
+        ctx.data_dir / "preseason" / "preseason_stats.csv",
+        ctx.config_dir / "players.json",
+    ]
+
+
+def run_ranges(ctx: Context, upstream: dict):
+    from player_registry import PlayerRegistry
+    from preflop_ranges import build_ranges
+
+    config = ConfigLoader(str(ctx.config_dir))
+    registry = PlayerRegistry(config)
+    # 同じプロセスで集計した直後なら、集計で読んだログの見せたハンドを使う（ログを読み直さない）
+    aggregated = upstream.get("aggregate")
+    holdings = aggregated["holdings"] if aggregated else None
+    return None, build_ranges(ctx.data_dir, config, registry, holdings=holdings, verbose=ctx.verbose)
+
+
+def ranges_inputs(ctx: Context) -> List[Path]:
+    return [
+        ctx.config_dir / "seasons.json",
+        ctx.config_dir / "players.json",
+    ]
+
+
+STAGES = [
+    Stage("fetch", run_fetch, lambda ctx: [], "fetch_stats", always=True),
+    Stage("aggregate", run_aggregate, aggregate_inputs, "main", deps=["fetch"], uses_manifest=True),
+    Stage("weekly", run_weekly, weekly_inputs, "weekly_report", deps=["aggregate"], uses_manifest=True),
+    Stage("transition", run_transition, transition_inputs, "season_transition", deps=["aggregate"]),
+    # players.json は aggregate が書き換えるので、その後に読む
+    Stage("preseason", run_preseason, preseason_inputs, "preseason_formatter", deps=["aggregate"]),
+    # canonical_id は aggregate が更新した players.json から求める
+    Stage("ranges", run_ranges, ranges_inputs, "preflop_ranges", deps=["aggregate"], uses_manifest=True),
+]
+DEFAULT_STAGES = ["aggregate", "weekly", "transition", "preseason", "ranges"]
+
+
+def main():
+    names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser(description="集計・レポートを依存順に、入力が変わったステージだけ実行")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--config-dir", default="config", help="設定ディレクトリのパス (default: config)")
+    parser.add_argument("--only", nargs="+", choices=names, default=None,
+                        help=f"実行するステージ (default: {' '.join(DEFAULT_STAGES)})")
+    parser.add_argument("--fetch", action="store_true", help="最初に fetch_stats.py で DB から JSON を取得する")
+    parser.add_argument("--fetch-args", nargs=argparse.REMAINDER, default=[],
+                        help="fetch_stats.py に渡す引数（最後に指定）")
+    parser.add_argument("--force", nargs="*", choices=names, default=None,
+                        help="指紋に関わらず実行するステージ（名前なしなら全部）")
+    parser.add_argument("--season", type=int, default=None,
+                        help="transition の対象シーズン ID (default: 最新のシーズン)")
+    parser.add_argument("--jobs", "-j", type=int, default=2, help="並行に実行するステージ数 (default: 2)")
+    parser.add_argument("--verbose", "-v", action="store_true", help="詳細な出力を表示")
+    parser.add_argument("--dry-run", action="store_true", help="実行するステージを表示するだけ")
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).parent.parent
+    ctx = Context(
+        base_dir=base_dir,
+        data_dir=base_dir / args.data_dir,
+        config_dir=base_dir / args.config_dir,
+        transition_season=args.season,
+        verbose=args.verbose,
+        fetch_args=args.fetch_args,
+    )
+    selected = list(args.only or DEFAULT_STAGES)
+    if args.fetch and "fetch" not in selected:
+        selected.insert(0, "fetch")
+    force = set(selected if args.force == [] else args.force or [])
+
+    pipeline = Pipeline(STAGES, ctx, jobs=max(1, args.jobs))
+    if args.dry_run:
+        print("[DRY RUN] stages:")
+        pipeline.plan(selected, force)
+        return
+
+    started = time.perf_counter()
+    ok = pipeline.run(selected, force)
+    print(f"\nPipeline finished in {time.perf_counter() - started:.2f}s")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
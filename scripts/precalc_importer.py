@@ -1,14 +1,18 @@
 """
 計算済みスタッツ取り込みモジュール
-Poker Now の player-stats-all-time-*.json を PlayerStats に変換する
+Poker Now の player-stats-all-time-*.json（累積）、
+player-stats-session-*.json（セッション単位）、
+snapshot_store のキーフレーム / 差分ファイルを PlayerStats に変換する
 """
 
 import json
 from pathlib import Path
 from typing import Dict, Optional
 
+from compressed_io import open_text
 from hand_analysis import PlayerStats
 from player_registry import PlayerRegistry
+import snapshot_store
 
 
 class PreCalcImporter:
@@ -18,9 +22,17 @@ class PreCalcImporter:
         self.registry = registry
 
     def load_json(self, json_path: Path) -> dict:
-        """JSONファイルを読み込む"""
-        with open(json_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        """
+        JSONファイルを読み込む
+
+        スナップショット（キーフレーム / 差分）は行形式なので、
+        player-stats JSON と同じ players のリストに展開する。
+        """
+        with open_text(json_path) as f:
+            data = json.load(f)
+        if snapshot_store.is_snapshot_file(json_path):
+            data["players"] = list(snapshot_store.iter_players(data))
+        return data
 
     def convert_to_player_stats(self, player_data: dict) -> PlayerStats:
         """
@@ -31,7 +43,8 @@ class PreCalcImporter:
         - PlayerStats の xxx_hands = 分母（例: vpip_hands = VPIP判定対象ハンド数）
         - PlayerStats の xxx_count = 分子（例: vpip_count = VPIPした回数）
         """
-        summary = player_data["summary"]
+        # スナップショットには summary がなく raw_totals（同じカウンタ名）だけが入っている
+        summary = player_data.get("summary") or player_data["raw_totals"]
         stats = PlayerStats()
 
         stats.hands = summary["hands"]
@@ -90,11 +103,31 @@ class PreCalcImporter:
         return None
 
     def import_json(self, json_path: Path, season_id: int) -> Dict[str, PlayerStats]:
-        """JSONファイルからスタッツを取り込む"""
+        """JSONファイルからスタッツを取り込む（差分ファイルならそのセッションの差分）"""
         data = self.load_json(json_path)
+        players = data["players"]
+        if data.get("kind") == "delta":
+            # compute_delta と同じく、ハンド数が増えていなければ参加とみなさない
+            players = [p for p in players if p["raw_totals"]["hands"] > 0]
+        return self._import_players(players)
+
+    def import_cumulative(self, json_path: Path, season_id: int) -> Dict[str, PlayerStats]:
+        """
+        JSONファイルの時点の累積スタッツを取り込む
+
+        差分ファイルの場合は、その日付以前のキーフレームと差分から累積値を復元する。
+        """
+        if not json_path.name.startswith(snapshot_store.DELTA_PREFIX):
+            return self.import_json(json_path, season_id)
+        data_dir = json_path.parent.parent.parent
+        players, _ = snapshot_store.reconstruct(data_dir, json_path.parent.name)
+        return self._import_players(players.values())
+
+    def _import_players(self, players) -> Dict[str, PlayerStats]:
+        """プレイヤーデータのリストを canonical_id -> PlayerStats に変換する"""
         result = {}
 
-        for player_data in data["players"]:
+        for player_data in players:
             if player_data.get("is_bot", False):
                 continue
 
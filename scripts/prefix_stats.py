@@ -0,0 +1,190 @@
+"""
+プレフィックス和によるスタッツストア
+
+節別スタッツ（StatsAggregator.stats_by_session）をプレイヤーごとに
+セッションの時系列で累積した int64 配列として持ち、
+  - ある日付時点の累積（as-of）
+  - 直近 N 節の合計（プレイヤーごとの参加節で数える / 全体の開催節で数える）
+を「累積値2つの引き算」で求める。パイプラインを入力を変えて回し直す必要はない。
+
+節別データのない凍結シーズン（season_N_stats_raw.csv のみ）は含まれない。
+"""
+
+from bisect import bisect_right
+from typing import Dict, List, Optional
+
+from hand_analysis import PlayerStats
+
+
+# PlayerStats の生カウンタ（net・ev_adjustment は 1/100 BB の整数にして持つ）
+COUNTERS = [
+    "net", "hands",
+    "vpip_hands", "vpip_count",
+    "pfr_hands", "pfr_count",
+    "three_bet_hands", "three_bet_count",
+    "fold_to_3bet_hands", "fold_to_3bet_count",
+    "cb_hands", "cb_count",
+    "wtsd_hands", "wtsd_count",
+    "wdsd_count",
+    "ev_adjustment", "ev_hands",
+]
+NET_SCALE = 100
+BB_COUNTERS = ("net", "ev_adjustment")
+
+
+class PrefixStatsStore:
+    """
+    プレイヤー × セッションの累積カウンタ
+
+    Attributes:
+        dates: セッション日付 (YYYYMMDD) の昇順リスト
+        player_ids: 行番号 -> player_id
+        prefix: (プレイヤー数, セッション数 + 1, カウンタ数) の int64 配列。
+            prefix[p, i] はセッション dates[0..i-1] の合計（prefix[p, 0] = 0）
+        attended: (プレイヤー数, セッション数 + 1) の int64 配列。参加節数の累積
+        positions / offsets: プレイヤー p が参加したセッション番号は
+            positions[offsets[p]:offsets[p + 1]]（直近 N 節の開始位置を O(1) で引く）
+    """
+
+    def __init__(self, dates: List[str], player_ids: List[str], prefix, attended,
+                 positions, offsets, profiles: Dict[str, PlayerStats]):
+        self.dates = dates
+        self.player_ids = player_ids
+        self.index = {pid: i for i, pid in enumerate(player_ids)}
+        self.prefix = prefix
+        self.attended = attended
+        self.positions = positions
+        self.offsets = offsets
+        self.profiles = profiles
+
+    @classmethod
+    def from_sessions(cls, stats_by_session: Dict[str, Dict[str, PlayerStats]],
+                      profiles: Optional[Dict[str, PlayerStats]] = None) -> "PrefixStatsStore":
+        """
+        節別スタッツから作る
+
+        Args:
+            stats_by_session: {date_str: {player_id: PlayerStats}}
+            profiles: 表示名・リーグを取る PlayerStats（省略時は最後に参加した節の値）
+        """
+        import numpy as np
+
+        dates = sorted(stats_by_session)
+        latest: Dict[str, PlayerStats] = {}
+        for date_str in dates:
+            latest.update(stats_by_session[date_str])
+        player_ids = sorted(latest)
+        index = {pid: i for i, pid in enumerate(player_ids)}
+
+        values = np.zeros((len(player_ids), len(dates) + 1, len(COUNTERS)), dtype=np.int64)
+        present = np.zeros((len(player_ids), len(dates) + 1), dtype=np.int64)
+        for col, date_str in enumerate(dates, start=1):
+            for pid, stats in stats_by_session[date_str].items():
+                row = index[pid]
+                values[row, col] = [
+                    round(getattr(stats, key) * NET_SCALE) if key in BB_COUNTERS else getattr(stats, key)
+                    for key in COUNTERS
+                ]
+                present[row, col] = 1
+
+        rows, cols = np.nonzero(present[:, 1:])
+        offsets = np.zeros(len(player_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(player_ids)), out=offsets[1:])
+
+        merged = dict(latest)
+        merged.update(profiles or {})
+        return cls(dates, player_ids, values.cumsum(axis=1), present.cumsum(axis=1),
+                   cols.astype(np.int64), offsets, merged)
+
+    # --------------- Lookups ---------------
+
+    def session_index(self, as_of: Optional[str] = None) -> int:
+        """as_of（YYYYMMDD、その日を含む）までのセッション数。None なら全セッション"""
+        return len(self.dates) if as_of is None else bisect_right(self.dates, as_of)
+
+    def as_of(self, as_of: Optional[str] = None):
+        """
+        as_of 時点の累積カウンタ
+
+        Returns:
+            tuple: (counters (プレイヤー数, カウンタ数), sessions (プレイヤー数,))
+        """
+        end = self.session_index(as_of)
+        return self.prefix[:, end], self.attended[:, end]
+
+    def last_sessions(self, n: int, as_of: Optional[str] = None):
+        """
+        as_of 時点で、各プレイヤーが参加した直近 n 節の合計
+
+        Returns:
+            tuple: (counters (プレイヤー数, カウンタ数), sessions (プレイヤー数,))
+        """
+        import numpy as np
+
+        end = self.session_index(as_of)
+        count = self.attended[:, end]
+        skip = np.maximum(count - n, 0)
+        # skip 番目（0始まり）に参加した節の位置から end までを引き算する（skip=0 なら先頭から）
+        has_start = skip > 0
+        start = np.zeros(len(self.player_ids), dtype=np.int64)
+        start[has_start] = self.positions[self.offsets[:-1][has_start] + skip[has_start]]
+        rows = np.arange(len(self.player_ids))
+        return self.prefix[rows, end] - self.prefix[rows, start], count - self.attended[rows, start]
+
+    def last_held_sessions(self, n: int, as_of: Optional[str] = None):
+        """
+        as_of 時点で、直近 n 回の開催（参加の有無に関係なく）の合計
+
+        Returns:
+            tuple: (counters (プレイヤー数, カウンタ数), sessions (プレイヤー数,))
+        """
+        end = self.session_index(as_of)
+        start = max(end - n, 0)
+        return (self.prefix[:, end] - self.prefix[:, start],
+                self.attended[:, end] - self.attended[:, start])
+
+    def player(self, player_id: str, as_of: Optional[str] = None,
+               last: Optional[int] = None) -> Optional[PlayerStats]:
+        """1人分の as-of / 直近 last 節のスタッツ（参加がなければ None）"""
+        row = self.index.get(player_id)
+        if row is None:
+            return None
+        end = self.session_index(as_of)
+        start = 0
+        if last is not None:
+            count = int(self.attended[row, end])
+            skip = max(count - last, 0)
+            if skip > 0:
+                start = int(self.positions[self.offsets[row] + skip])
+        if self.attended[row, end] - self.attended[row, start] == 0:
+            return None
+        return self._to_stats(row, self.prefix[row, end] - self.prefix[row, start])
+
+    # --------------- Conversion ---------------
+
+    def _to_stats(self, row: int, counters) -> PlayerStats:
+        pid = self.player_ids[row]
+        profile = self.profiles.get(pid)
+        stats = PlayerStats(
+            player_id=pid,
+            display_name=profile.display_name if profile else pid,
+            league=profile.league if profile else "C",
+        )
+        for key, value in zip(COUNTERS, counters.tolist()):
+            setattr(stats, key, value / NET_SCALE if key in BB_COUNTERS else value)
+        return stats
+
+    def to_player_stats(self, counters, sessions):
+        """
+        as_of / last_sessions の結果を PlayerStats に戻す（その範囲に参加したプレイヤーのみ）
+
+        Returns:
+            tuple: ({player_id: PlayerStats}, {player_id: 参加節数})
+        """
+        stats: Dict[str, PlayerStats] = {}
+        session_counts: Dict[str, int] = {}
+        for row in sessions.nonzero()[0].tolist():
+            pid = self.player_ids[row]
+            stats[pid] = self._to_stats(row, counters[row])
+            session_counts[pid] = int(sessions[row])
+        return stats, session_counts
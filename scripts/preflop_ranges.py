@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""
+プリフロップのレンジ（見せたハンドの 13×13 表）
+
+ショーダウンなどで見せたハンド（shows）と、ログを書き出したプレイヤーのハンド（Dealt to you）を、
+プレイヤー・シーズンごとに 13×13 の表に数える。表はプリフロップのアクション別に分ける。
+- open: そのハンドで最初のレイズをした（オープンレイズ）
+- call: レイズせずにコール（リンプを含む）した
+- 3bet: 誰かのレイズのあとに最初のレイズをした（4bet 以上も含む）
+チェック・フォールドだけのハンド（BB のチェックなど）は数えない。
+
+表の並びは A から 2 の順（行・列とも 0 = A）で、対角線がペア、右上がスーテッド、左下がオフスート。
+（AKs は 0 行 1 列、AKo は 1 行 0 列）
+
+集計:
+  ハンド履歴ログ（凍結シーズンも含む全期間）の見せたハンドを節ごとの表（raw ID の RangeMatrix）にし、
+  data/cache/ranges/{YYYYMMDD}.npz に保存する。次回はログ（パスとハッシュ）と、前の節との重複が
+  変わらない節をキャッシュから読み、変わった節だけを作り直す。作り直す節は main.py の集計が
+  読んだログの見せたハンド（StatsAggregator.holdings）を使い、集計しなかった節だけログを読む。
+  節の見せたハンドは (プレイヤー, アクション, カード1, カード2) の列に並べ、マス目の計算と
+  数え上げを np.bincount で行う。同じハンドが複数のログに入っている場合は、日付・テーブル名の順で
+  最初のログで1回だけ数える（ハンド指紋）。
+  raw ID は書き出すときに canonical_id にまとめる（players.json が変わってもキャッシュは使える）。
+  player-stats JSON（計算済みの節）にはカードが無いので、ログのある節だけが対象になる。
+
+出力:
+  data/ranges/{player_id}.json      # ユーザーページ用（プレイヤーごと、区切りの空白なし）
+  data/cache/ranges/{YYYYMMDD}.npz  # 節ごとの表（raw ID、merge でシーズン・全期間にまとめる）と、
+                                    # ログのハッシュ・節のハンドの指紋・数えたハンドの指紋
+
+JSON の構成:
+  {
+    "player_id": "...",
+    "seasons": {"3": {"hands": 12, "open": [169 個], "call": [169 個], "3bet": [169 個]}},
+    "all": {"hands": 40, "open": [...], "call": [...], "3bet": [...]}
+  }
+  各アクションの配列は表を行ごとに並べたもの（添字 = 行 * 13 + 列）。
+  内容の変わらないファイルは書き直さず、出力から無くなったプレイヤーのファイルは消す。
+
+Usage:
+    python scripts/preflop_ranges.py [--data-dir data] [-v]   # 変わった節だけ作り直して書く
+    python scripts/preflop_ranges.py --player ID [--season 1]  # プレイヤーの表を表示する
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from hand_evaluator import RANKS, parse_card
+
+
+RANGES_DIR = "ranges"
+CACHE_DIR = "cache/ranges"
+
+# アクションの順（RangeMatrix.counts の2番目の軸）
+ACTIONS = ("open", "call", "3bet")
+OPEN, CALL, THREE_BET = range(len(ACTIONS))
+GRID = 13
+CELLS = GRID * GRID
+
+# 表の見出し（0 = A）
+GRID_RANKS = RANKS[::-1]
+
+PREFLOP_ACTION_PATTERN = re.compile(r"^(.*): (calls|raises)\b")
+SHOWS_PATTERN = re.compile(r"^(.*): shows a (.*?)\.?$")
+DEALT_PATTERN = re.compile(r"^Dealt to you \[(.*?)\]")
+CARD_PATTERN = re.compile(r"(?:10|[2-9TJQKA])[shdc]")
+
+
+def cell_index(first, second):
+    """
+    ホールカード（整数、配列でも可）から表のマス目の添字（行 * 13 + 列）を求める
+    """
+    import numpy as np
+
+    first, second = np.asarray(first), np.asarray(second)
+    high = 12 - np.maximum(first >> 2, second >> 2)
+    low = 12 - np.minimum(first >> 2, second >> 2)
+    suited = (first & 3) == (second & 3)
+    row = np.where(suited, high, low)
+    col = np.where(suited, low, high)
+    return row * GRID + col
+
+
+def cell_label(index: int) -> str:
+    """マス目の添字をハンドの表記（"AKs" / "AKo" / "AA"）にする"""
+    row, col = divmod(index, GRID)
+    if row == col:
+        return GRID_RANKS[row] * 2
+    if row < col:
+        return f"{GRID_RANKS[row]}{GRID_RANKS[col]}s"
+    return f"{GRID_RANKS[col]}{GRID_RANKS[row]}o"
+
+
+def preflop_actions(history: str) -> Dict[str, int]:
+    """変換後の1ハンドから、プレイヤー名 -> プリフロップのアクション（ACTIONS の添字）"""
+    actions: Dict[str, int] = {}
+    raises = 0
+    for line in history.split("\n"):
+        if line.startswith("*** FLOP ***"):
+            break
+        match = PREFLOP_ACTION_PATTERN.match(line)
+        if match is None:
+            continue
+        name, verb = match.groups()
+        if verb == "raises":
+            # 最初のレイズでアクションを決める（オープン後の 4bet はオープンのまま）
+            if actions.get(name, CALL) == CALL:
+                actions[name] = OPEN if raises == 0 else THREE_BET
+            raises += 1
+        else:
+            actions.setdefault(name, CALL)
+    return actions
+
+
+def shown_holdings(history: str, dealt_player: Optional[str] = None) -> List[Tuple[str, int, int, int]]:
+    """
+    変換後の1ハンドから、見せたハンドを (プレイヤー名, アクション, カード1, カード2) で返す
+
+    Args:
+        dealt_player: Dealt to you のプレイヤー名（PokerNowParser.dealt_player）。None なら使わない
+    """
+    holes: Dict[str, Tuple[int, int]] = {}
+    for line in history.split("\n"):
+        if dealt_player is not None and line.startswith("Dealt to you"):
+            match = DEALT_PATTERN.match(line)
+            if match:
+                cards = CARD_PATTERN.findall(match.group(1))
+                if len(cards) == 2:
+                    holes[dealt_player] = (parse_card(cards[0]), parse_card(cards[1]))
+            continue
+        if ": shows a " not in line:
+            continue
+        match = SHOWS_PATTERN.match(line)
+        if match:
+            cards = CARD_PATTERN.findall(match.group(2))
+            if len(cards) == 2:
+                holes[match.group(1)] = (parse_card(cards[0]), parse_card(cards[1]))
+    if not holes:
+        return []
+    actions = preflop_actions(history)
+    return [(name, actions[name], *cards) for name, cards in holes.items() if name in actions]
+
+
+class RangeMatrix:
+    """
+    プレイヤーごと・アクションごとの見せたハンドの 13×13 の表
+
+    counts は (プレイヤー数, 3, 13, 13) の uint32。player_ids は counts の1番目の軸の順（ソート済み）。
+    """
+
+    def __init__(self, player_ids: List[str], counts):
+        self.player_ids = list(player_ids)
+        self.counts = counts
+
+    @classmethod
+    def empty(cls) -> "RangeMatrix":
+        import numpy as np
+        return cls([], np.zeros((0, len(ACTIONS), GRID, GRID), dtype=np.uint32))
+
+    def __len__(self) -> int:
+        return len(self.player_ids)
+
+    def merge(self, other: "RangeMatrix") -> "RangeMatrix":
+        """2つの表を足した新しい表を返す（プレイヤーの和集合）"""
+        import numpy as np
+
+        player_ids = sorted(set(self.player_ids) | set(other.player_ids))
+        counts = np.zeros((len(player_ids), len(ACTIONS), GRID, GRID), dtype=np.uint32)
+        for matrix in (self, other):
+            if len(matrix):
+                counts[np.searchsorted(player_ids, matrix.player_ids)] += matrix.counts
+        return RangeMatrix(player_ids, counts)
+
+    @classmethod
+    def merge_all(cls, matrices: Iterable["RangeMatrix"]) -> "RangeMatrix":
+        merged = cls.empty()
+        for matrix in matrices:
+            merged = merged.merge(matrix)
+        return merged
+
+    def player(self, player_id: str):
+        """プレイヤーの (3, 13, 13) の表（いなければ None）"""
+        try:
+            return self.counts[self.player_ids.index(player_id)]
+        except ValueError:
+            return None
+
+    def rename(self, rename: Callable[[str], str]) -> "RangeMatrix":
+        """player_id を rename(player_id) に付け替えた表（同じ ID になったプレイヤーは足す）"""
+        import numpy as np
+
+        renamed = [rename(player_id) for player_id in self.player_ids]
+        player_ids = sorted(set(renamed))
+        counts = np.zeros((len(player_ids), len(ACTIONS), GRID, GRID), dtype=np.uint32)
+        if renamed:
+            np.add.at(counts, np.searchsorted(player_ids, renamed), self.counts)
+        return RangeMatrix(player_ids, counts)
+
+    def save(self, path: Path, **arrays) -> None:
+        """npz に保存する（arrays は一緒に保存する配列）"""
+        import numpy as np
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, player_ids=np.array(self.player_ids, dtype=str), counts=self.counts, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "RangeMatrix":
+        import numpy as np
+        with np.load(path) as data:
+            return cls(data["player_ids"].tolist(), data["counts"].astype(np.uint32))
+
+
+def session_matrices(dates: List[str], columns: dict) -> Dict[str, RangeMatrix]:
+    """
+    見せたハンドの列を節ごとの RangeMatrix にする（渡した節をまとめて1回の bincount）
+    """
+    import numpy as np
+
+    if not columns["date"]:
+        return {}
+    date_index = np.asarray(columns["date"], dtype=np.int64)
+    player_ids, player_index = np.unique(np.asarray(columns["player"], dtype=str), return_inverse=True)
+    action = np.asarray(columns["action"], dtype=np.int64)
+    cells = cell_index(np.asarray(columns["card1"], dtype=np.int64), np.asarray(columns["card2"], dtype=np.int64))
+
+    # (節, プレイヤー) の組を番号にし、組ごとに 3 × 169 のマス目を数える
+    groups, group_index = np.unique(date_index * len(player_ids) + player_index, return_inverse=True)
+    keys = (group_index * len(ACTIONS) + action) * CELLS + cells
+    counts = np.bincount(keys, minlength=len(groups) * len(ACTIONS) * CELLS)
+    counts = counts.astype(np.uint32).reshape(len(groups), len(ACTIONS), GRID, GRID)
+
+    # groups は節の順に並んでいるので、節ごとに切り分ける
+    group_dates, group_players = np.divmod(groups, len(player_ids))
+    bounds = np.searchsorted(group_dates, np.arange(len(dates) + 1))
+    sessions = {}
+    for i, date_str in enumerate(dates):
+        start, end = bounds[i], bounds[i + 1]
+        if start < end:
+            sessions[date_str] = RangeMatrix(player_ids[group_players[start:end]].tolist(), counts[start:end])
+    return sessions
+
+
+def log_holdings(histories: List[str], dealt_player: Optional[str] = None) -> List[Tuple[int, str, int, int, int]]:
+    """ログの全ハンドの見せたハンドを (ハンドの添字, プレイヤー名, アクション, カード1, カード2) で返す"""
+    return [
+        (hand, *holding)
+        for hand, history in enumerate(histories)
+        for holding in shown_holdings(history, dealt_player)
+    ]
+
+
+def date_logs(data_dir: Path, manifest, date_str: str) -> List[Tuple[str, str, Path]]:
+    """日付のハンド履歴ログを (data_dir からの相対パス, sha256, パス) でテーブル名順に返す"""
+    from dataset_manifest import LOG_PREFIX
+
+    logs = []
+    for table in manifest.table_dirs(date_str):
+        path = manifest.table_file(date_str, table, LOG_PREFIX)
+        if path is not None:
+            logs.append((path.relative_to(data_dir).as_posix(), manifest.file_info(path)["sha256"], path))
+    return logs
+
+
+def parse_tables(logs: List[Tuple[str, str, Path]]) -> List[dict]:
+    """
+    ログをパースして、StatsAggregator.holdings と同じ形のテーブルのリストにする
+
+    Returns:
+        テーブルごとの {"source", "sha256", "fingerprints",
+                        "holdings": [(ハンドの添字, raw ID, アクション, カード1, カード2)]}
+    """
+    from csv_formatter import PokerNowParser, extract_player_id_map
+
+    tables = []
+    for source, sha256, path in logs:
+        parser = PokerNowParser(str(path))
+        formatted, _ = parser.parse()
+        player_id_map = extract_player_id_map(parser.raw_text)
+        histories = [h for h in formatted.split("\n\n") if h.strip()]
+        tables.append({
+            "source": source,
+            "sha256": sha256,
+            "fingerprints": parser.hand_fingerprints,
+            "holdings": [
+                (hand, player_id_map.get(name, name), action, first, second)
+                for hand, name, action, first, second in log_holdings(histories, parser.dealt_player)
+            ],
+        })
+    return tables
+
+
+def date_matrix(date_str: str, tables: List[dict], seen: set) -> Tuple[RangeMatrix, List[str], List[str]]:
+    """
+    日付のテーブル（テーブル名順）から、前の日付・テーブルに無かったハンドだけを数えた表（raw ID）を作る
+
+    同じハンドが複数のログに入っている場合は最初のログで1回だけ数える。seen に日付のハンドの指紋を加える。
+
+    Returns:
+        (表, 日付のハンドの指紋, 数えたハンドの指紋)
+    """
+    columns = {key: [] for key in ("date", "player", "action", "card1", "card2")}
+    hands, counted = [], []
+    for table in tables:
+        new = []
+        for fingerprint in table["fingerprints"]:
+            new.append(fingerprint not in seen)
+            if new[-1]:
+                seen.add(fingerprint)
+                counted.append(fingerprint)
+        hands.extend(table["fingerprints"])
+        for hand, player_id, action, first, second in table["holdings"]:
+            if new[hand]:
+                columns["date"].append(0)
+                columns["player"].append(player_id)
+                columns["action"].append(action)
+                columns["card1"].append(first)
+                columns["card2"].append(second)
+    matrix = session_matrices([date_str], columns).get(date_str, RangeMatrix.empty())
+    return matrix, hands, counted
+
+
+def _table_sources(tables: List[dict]) -> List[str]:
+    return [f"{table['source']}\t{table['sha256']}" for table in tables]
+
+
+def load_cached_date(path: Path, sources: List[str], seen: set) -> Optional[RangeMatrix]:
+    """
+    節のキャッシュの表（raw ID）を読む
+
+    ログ（パスとハッシュ）が同じで、数えたハンドが「前の日付に無かったハンド」のままなら使い、
+    seen に日付のハンドの指紋を加える。使えなければ None（seen は変えない）。
+    """
+    import numpy as np
+
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        if "sources" not in data.files or data["sources"].tolist() != sources:
+            return None
+        hands = data["hands"].tolist()
+        if {fingerprint for fingerprint in hands if fingerprint not in seen} != set(data["counted"].tolist()):
+            return None
+        matrix = RangeMatrix(data["player_ids"].tolist(), data["counts"].astype(np.uint32))
+    seen.update(hands)
+    return matrix
+
+
+def update_sessions(data_dir: Path, config, holdings: Optional[Dict[str, List[dict]]] = None,
+                    verbose: bool = False) -> Tuple[Dict[str, RangeMatrix], Dict[str, Optional[int]]]:
+    """
+    ログのある全ての節の表（raw ID）を求め、変わった節のキャッシュを書き直す
+
+    節ごとに、キャッシュ（data/cache/ranges/{YYYYMMDD}.npz）が使えればそれを、
+    使えなければ集計（StatsAggregator.holdings）で読んだばかりのログの見せたハンドを、
+    どちらも無ければログを読み直して使う。凍結シーズンや --season / --since の範囲外の節は
+    ログが変わらない限りキャッシュから読むだけになる。
+
+    Returns:
+        (日付 -> 表, 日付 -> シーズン ID)
+    """
+    import numpy as np
+    from dataset_manifest import DatasetManifest
+
+    data_dir = Path(data_dir)
+    holdings = holdings or {}
+    manifest = DatasetManifest.refresh(data_dir, config, save=False)
+    cache_dir = data_dir / CACHE_DIR
+
+    sessions: Dict[str, RangeMatrix] = {}
+    season_of: Dict[str, Optional[int]] = {}
+    seen: set = set()
+    for date_str in sorted(set(manifest.date_strs()) | set(holdings)):
+        logs = date_logs(data_dir, manifest, date_str) if date_str in manifest.dates else []
+        fresh = holdings.get(date_str)
+        if not logs and fresh is None:
+            continue
+        sources = [f"{source}\t{sha256}" for source, sha256, _ in logs] if logs else _table_sources(fresh)
+        path = cache_dir / f"{date_str}.npz"
+        matrix = load_cached_date(path, sources, seen)
+        if matrix is None:
+            if fresh is not None and _table_sources(fresh) == sources:
+                tables, origin = fresh, "aggregated"
+            else:
+                tables, origin = parse_tables(logs), "parsed"
+            matrix, hands, counted = date_matrix(date_str, tables, seen)
+            matrix.save(path, sources=np.array(sources, dtype=str), hands=np.array(sorted(set(hands)), dtype=str),
+                        counted=np.array(sorted(counted), dtype=str))
+            if verbose:
+                print(f"  {date_str}: {int(matrix.counts.sum())} shown hands ({origin})")
+        sessions[date_str] = matrix
+        if date_str in manifest.dates:
+            season_of[date_str] = manifest.season_id(date_str)
+        else:
+            season = config.get_season_by_date(datetime.strptime(date_str, "%Y%m%d"))
+            season_of[date_str] = season["id"] if season else None
+
+    # ログの無くなった日付のキャッシュを消す
+    if cache_dir.exists():
+        for path in cache_dir.glob("*.npz"):
+            if path.stem not in sessions:
+                path.unlink()
+    return sessions, season_of
+
+
+def _summary(counts) -> dict:
+    """(3, 13, 13) の表を JSON 用の辞書にする"""
+    summary = {"hands": int(counts.sum())}
+    for i, name in enumerate(ACTIONS):
+        summary[name] = counts[i].ravel().tolist()
+    return summary
+
+
+def player_documents(sessions: Dict[str, RangeMatrix], season_of: Dict[str, Optional[int]]) -> Dict[str, dict]:
+    """節ごとの表からプレイヤーごとの JSON（シーズン別と全期間）を作る"""
+    by_season: Dict[int, List[RangeMatrix]] = {}
+    for date_str, matrix in sessions.items():
+        season_id = season_of.get(date_str)
+        if season_id is not None:
+            by_season.setdefault(season_id, []).append(matrix)
+    seasons = {sid: RangeMatrix.merge_all(matrices) for sid, matrices in sorted(by_season.items())}
+    total = RangeMatrix.merge_all(sessions.values())
+
+    documents = {}
+    for index, player_id in enumerate(total.player_ids):
+        document = {"player_id": player_id, "seasons": {}, "all": _summary(total.counts[index])}
+        for season_id, matrix in seasons.items():
+            counts = matrix.player(player_id)
+            if counts is not None:
+                document["seasons"][str(season_id)] = _summary(counts)
+        documents[player_id] = document
+    return documents
+
+
+def write_ranges(data_dir: Path, sessions: Dict[str, RangeMatrix], season_of: Dict[str, Optional[int]],
+                 verbose: bool = False) -> List[Path]:
+    """
+    節ごとの表（canonical_id）からプレイヤーごとの JSON を書き、書いた（内容の変わった）JSON のパスを返す
+    """
+    data_dir = Path(data_dir)
+    documents = player_documents(sessions, season_of)
+
+    out_dir = data_dir / RANGES_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    for player_id, document in documents.items():
+        path = out_dir / f"{player_id}.json"
+        text = json.dumps(document, ensure_ascii=False, separators=(",", ":")) + "\n"
+        if path.exists() and path.read_text(encoding="utf-8") == text:
+            continue
+        path.write_text(text, encoding="utf-8")
+        written.append(path)
+
+    # 出力から無くなったプレイヤーのファイルを消す
+    for path in sorted(out_dir.glob("*.json")):
+        if path.stem not in documents:
+            path.unlink()
+            if verbose:
+                print(f"Removed stale range file {path.name}")
+
+    if verbose:
+        print(f"Wrote {len(written)} of {len(documents)} range files ({len(sessions)} sessions)")
+    return written
+
+
+def build_ranges(data_dir: Path, config, registry, holdings: Optional[Dict[str, List[dict]]] = None,
+                 verbose: bool = False) -> List[Path]:
+    """
+    節ごとの表を更新してプレイヤーごとの JSON を書く（main.py と pipeline の ranges ステージ）
+
+    Args:
+        holdings: 同じプロセスで集計したときの StatsAggregator.holdings（そのログを読み直さない）
+    """
+    sessions, season_of = update_sessions(data_dir, config, holdings, verbose=verbose)
+    sessions = {date_str: matrix.rename(registry.get_canonical_id) for date_str, matrix in sessions.items()}
+    return write_ranges(data_dir, sessions, season_of, verbose=verbose)
+
+
+def print_grid(counts) -> None:
+    """(3, 13, 13) の表をアクションごとに表示する"""
+    for i, name in enumerate(ACTIONS):
+        print(f"[{name}] {int(counts[i].sum())} hands")
+        print("     " + " ".join(f"{r:>3}" for r in GRID_RANKS))
+        for row in range(GRID):
+            cells = " ".join(f"{int(v):>3}" if v else "  ." for v in counts[i, row])
+            print(f"  {GRID_RANKS[row]}  {cells}")
+
+
+def main():
+    from config_loader import ConfigLoader
+    from player_registry import PlayerRegistry
+
+    parser = argparse.ArgumentParser(description="見せたハンドからプリフロップのレンジの表を作る")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--config-dir", default="config", help="設定ディレクトリのパス (default: config)")
+    parser.add_argument("--player", default=None, help="書き込まずにこのプレイヤー ID の表を表示する")
+    parser.add_argument("--season", type=int, default=None, help="--player で表示するシーズン ID（default: 全期間）")
+    parser.add_argument("--verbose", "-v", action="store_true", help="詳細な出力を表示")
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).parent.parent
+    data_dir = base_dir / args.data_dir
+    config = ConfigLoader(str(base_dir / args.config_dir))
+    registry = PlayerRegistry(config)
+
+    if args.player:
+        import numpy as np
+
+        player_id = registry.get_canonical_id(args.player)
+        path = data_dir / RANGES_DIR / f"{player_id}.json"
+        if not path.exists():
+            print(f"{path} がありません")
+            sys.exit(1)
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        summary = document["all"] if args.season is None else document["seasons"].get(str(args.season))
+        if summary is None:
+            print(f"シーズン {args.season} の見せたハンドがありません")
+            return
+        print_grid(np.array([summary[name] for name in ACTIONS]).reshape(len(ACTIONS), GRID, GRID))
+        return
+
+    start = time.perf_counter()
+    written = build_ranges(data_dir, config, registry, verbose=args.verbose)
+    print(f"Wrote {len(written)} range files in {time.perf_counter() - start:.2f}s")
+    for path in written:
+        print(f"  - {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -175,7 +175,8 @@ class PreseasonFormatter:
 
         formatted_data = []
 
-        for player_name in all_players:
+        # 同じハンド数の並びが実行ごとに変わらないように名前順で回す（ソートは安定）
+        for player_name in sorted(all_players):
             # players.jsonからplayer_idを取得
             player_id = self.players_map.get(player_name, player_name)
 
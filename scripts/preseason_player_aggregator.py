@@ -10,6 +10,8 @@ from pathlib import Path
 from typing import Dict, Set
 from collections import defaultdict
 
+from compressed_io import glob_compressed, open_text
+
 
 class PreseasonPlayerAggregator:
     """Preseasonプレイヤー集約クラス"""
@@ -28,8 +30,8 @@ class PreseasonPlayerAggregator:
             print(f"Warning: {self.preseason_dir} does not exist")
             return csv_files
 
-        # poker_now_log_*.csvファイルを再帰的に検索
-        csv_files = list(self.preseason_dir.glob("**/poker_now_log_*.csv"))
+        # poker_now_log_*.csvファイルを再帰的に検索（アーカイブ済みの .gz / .xz も含む）
+        csv_files = glob_compressed(self.preseason_dir, "**/poker_now_log_*.csv")
         return csv_files
 
     def extract_player_mappings(self, csv_path: Path) -> Dict[str, str]:
@@ -40,7 +42,7 @@ class PreseasonPlayerAggregator:
             Dict[str, str]: {プレイヤー名: プレイヤーID}の辞書（複数IDある場合は最後のもの）
         """
         try:
-            with open(csv_path, "r", encoding="utf-8") as f:
+            with open_text(csv_path) as f:
                 raw_text = f.read()
 
             # "name @ id" パターンを抽出
@@ -63,7 +65,7 @@ class PreseasonPlayerAggregator:
             print(f"Processing: {csv_path}")
 
             try:
-                with open(csv_path, "r", encoding="utf-8") as f:
+                with open_text(csv_path) as f:
                     raw_text = f.read()
 
                 # CSVでは""でエスケープされたプレイヤー名とIDのペアを抽出
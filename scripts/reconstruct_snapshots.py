@@ -1,636 +1,532 @@
 #!/usr/bin/env python3
 """
-6/29 スナップショットの再構築スクリプト
+スナップショットの再構築スクリプト
 
-houou-main の R4(6/29) と R5(7/6) のハンドデータから
-プレイヤースタッツを計算し、正しい累積スナップショットを生成する。
+hand_players + hand_actions から各セッションのプレイヤースタッツを計算し、
+指定期間の各セッション終了時点の累積スナップショットを生成する。
 
 方針:
-  1. hand_players + hand_actions から R4/R5 の各スタッツを直接計算
-  2. houou-shared（凍結データ）+ R4 分 = 6/29 の正しい all-time snapshot
-  3. houou-shared + houou-main = 7/6 の正しい all-time snapshot（予選卓 houou-yosen は除外）
+  1. 対象サーバーの完了ハンドを (サーバー, セッション日付) ごとに
+     最大 --batch-size ハンドのバッチに分ける
+  2. バッチは接続プール（--connections 本）で先読みし、analyze_hand は
+     プロセスプール（--workers）で次のバッチの取得と並行して実行する
+  3. --base-servers の player_stats（ハンドデータから計算しないサーバー）を
+     すべてのスナップショットに加算する
+  4. 対象サーバーごとに、計算結果と player_stats を4項目で突き合わせる
+
+Usage:
+    # 6/29 と 7/6 の再構築（houou-shared は player_stats、houou-main はハンドから計算）
+    DATABASE_URL=postgresql://... python scripts/reconstruct_snapshots.py rebuild \\
+        --from 20260629 --to 20260706 --servers houou-main --base-servers houou-shared
+
+    # フィクスチャを入れたローカル SQLite で動作確認
+    DATABASE_URL=sqlite:///fixture.db python scripts/reconstruct_snapshots.py rebuild --dry-run
+
+    # numpy 版の集計が analyze_hand と一致するかを実データで確認
+    DATABASE_URL=postgresql://... python scripts/reconstruct_snapshots.py verify
+
+    # ハンドをローカルキャッシュにダンプし（2回目以降は差分のみ）、DB なしで再構築
+    DATABASE_URL=postgresql://... python scripts/reconstruct_snapshots.py dump
+    python scripts/reconstruct_snapshots.py rebuild --cache data/cache/hands --dry-run
 """
 
+import argparse
 import json
 import os
 import sys
-from collections import defaultdict
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Dict, List, Tuple
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from fast_table_db import (
+    DEFAULT_SERVERS, ConnectionPool, connect, read_snapshot,
+    fetch_batch_rows, fetch_hand_index, fetch_server_stats, fetch_users,
+)
+from fast_table_stats import (
+    STAT_KEYS, empty_stats, accumulate_columns, accumulate_hands, accumulate_hands_columnar,
+)
+from fetch_stats import build_export_player, format_generated_at, format_file_timestamp
+import hand_cache
+import snapshot_store
+
+
+# player_stats と突き合わせる項目
+VALIDATION_KEYS = ["hands", "net_cbb", "saw_flop_hands", "went_showdown_hands"]
+
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_CONNECTIONS = 3
+
+# --engine: numpy はバッチ全体を列形式で一括分析する（python は analyze_hand をハンドごとに実行）
+ENGINES = {
+    "numpy": accumulate_hands_columnar,
+    "python": accumulate_hands,
+}
+
+
+# --------------- Batch planning ---------------
+
+def plan_batches(hand_index: List[dict], batch_size: int) -> List[Tuple[str, str, int, int]]:
+    """
+    完了ハンドを (サーバー, セッション日付) ごとに batch_size 件ずつのバッチに分ける
+
+    Returns:
+        list: [(server_id, session_date, first_hand_id, last_hand_id)]（日付順）
+    """
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for row in hand_index:
+        groups.setdefault((row["session_date"], row["server_id"]), []).append(row["hand_id"])
+
+    batches = []
+    for (date_str, server_id), hand_ids in sorted(groups.items()):
+        for i in range(0, len(hand_ids), batch_size):
+            chunk = hand_ids[i:i + batch_size]
+            batches.append((server_id, date_str, chunk[0], chunk[-1]))
+    return batches
+
+
+def split_after(hand_index: List[dict], to_date: str) -> Tuple[Dict[str, int], List[dict]]:
+    """
+    to_date より後のハンドを除く
+
+    Returns:
+        tuple: (サーバーごとの to_date より後のハンド数, to_date までのハンド)
+    """
+    later_hands: Dict[str, int] = {}
+    in_range = []
+    for row in hand_index:
+        if row["session_date"] > to_date:
+            later_hands[row["server_id"]] = later_hands.get(row["server_id"], 0) + 1
+        else:
+            in_range.append(row)
+    return later_hands, in_range
+
+
+# --------------- Data sources ---------------
+
+class DatabaseSource:
+    """
+    DB からハンドを読むデータソース
+
+    hand_cache.CacheSource と同じメソッドを持つ。fetch はスレッドごとの接続で実行する。
+    """
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url
+        self.pool = ConnectionPool(database_url)
 
-try:
-    import psycopg2
-    import psycopg2.extras
-except ImportError:
-    print("Error: psycopg2 is required. Install with: pip install psycopg2-binary")
-    sys.exit(1)
-
-DATABASE_URL = os.environ.get("DATABASE_URL")
-if not DATABASE_URL:
-    print("Error: DATABASE_URL environment variable is required")
-    sys.exit(1)
-
-STAT_KEYS = [
-    "hands", "vpip_hands", "pfr_hands",
-    "three_bet_hands", "three_bet_opp",
-    "four_bet_hands", "four_bet_opp",
-    "fold_to_three_bet_hands", "faced_three_bet_opp",
-    "fold_to_four_bet_hands", "faced_four_bet_opp",
-    "cbet_flop_made", "cbet_flop_opp",
-    "cbet_turn_made", "cbet_turn_opp",
-    "cbet_river_made", "cbet_river_opp",
-    "fold_to_cbet_flop", "fold_to_cbet_flop_opp",
-    "fold_to_cbet_turn", "fold_to_cbet_turn_opp",
-    "fold_to_cbet_river", "fold_to_cbet_river_opp",
-    "agg_raise", "agg_call", "agg_check",
-    "saw_flop_hands", "went_showdown_hands",
-    "won_showdown_hands", "won_when_saw_flop_hands",
-    "net_cbb", "showdown_cbb", "non_showdown_cbb",
-]
-
-
-def empty_stats():
-    return {k: 0 for k in STAT_KEYS}
-
-
-def add_stats(a, b):
-    return {k: a.get(k, 0) + b.get(k, 0) for k in STAT_KEYS}
-
-
-def sub_stats(a, b):
-    return {k: a.get(k, 0) - b.get(k, 0) for k in STAT_KEYS}
-
-
-# --------------- DB fetch functions ---------------
-
-def fetch_houou_main_hands(conn, date_str):
-    """指定日の houou-main ハンドIDリストを取得"""
-    with conn.cursor() as cur:
-        cur.execute("""
-            SELECT id FROM hands
-            WHERE server_id = 'houou-main'
-            AND DATE(started_at AT TIME ZONE 'UTC') = %s
-            ORDER BY id
-        """, (date_str,))
-        return [row[0] for row in cur.fetchall()]
-
-
-def fetch_hand_players_bulk(conn, hand_ids):
-    """hand_players を一括取得"""
-    if not hand_ids:
-        return {}
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""
-            SELECT hand_id, user_id::text, delta_cbb, showdown,
-                   folded_street
-            FROM hand_players
-            WHERE hand_id = ANY(%s)
-        """, (hand_ids,))
-        result = defaultdict(list)
-        for row in cur.fetchall():
-            result[row["hand_id"]].append(row)
-        return result
-
-
-def fetch_hand_actions_bulk(conn, hand_ids):
-    """hand_actions を一括取得（action_index順）"""
-    if not hand_ids:
-        return {}
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""
-            SELECT hand_id, user_id::text, street, action, amount_cbb
-            FROM hand_actions
-            WHERE hand_id = ANY(%s)
-            ORDER BY hand_id, action_index
-        """, (hand_ids,))
-        result = defaultdict(list)
-        for row in cur.fetchall():
-            result[row["hand_id"]].append(row)
-        return result
-
-
-def fetch_per_server_stats(conn):
-    """player_stats を server_id ごとに取得"""
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""
-            SELECT user_id::text, server_id,
-                   hands, vpip_hands, pfr_hands,
-                   three_bet_hands, three_bet_opp,
-                   four_bet_hands, four_bet_opp,
-                   fold_to_three_bet_hands, faced_three_bet_opp,
-                   fold_to_four_bet_hands, faced_four_bet_opp,
-                   cbet_flop_made, cbet_flop_opp,
-                   cbet_turn_made, cbet_turn_opp,
-                   cbet_river_made, cbet_river_opp,
-                   fold_to_cbet_flop, fold_to_cbet_flop_opp,
-                   fold_to_cbet_turn, fold_to_cbet_turn_opp,
-                   fold_to_cbet_river, fold_to_cbet_river_opp,
-                   agg_raise, agg_call, agg_check,
-                   saw_flop_hands, went_showdown_hands,
-                   won_showdown_hands, won_when_saw_flop_hands,
-                   net_cbb, showdown_cbb, non_showdown_cbb
-            FROM player_stats
-        """)
-        result = defaultdict(dict)
-        for row in cur.fetchall():
-            uid = row["user_id"]
-            sid = row["server_id"]
-            stats = {k: int(v) if v is not None else 0
-                     for k, v in row.items()
-                     if k not in ("user_id", "server_id")}
-            result[uid][sid] = stats
-        return result
-
-
-def fetch_participants(conn):
-    """全参加者情報を取得"""
-    with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-        cur.execute("""
-            SELECT DISTINCT hp.user_id::text,
-                   u.display_name,
-                   CASE WHEN u.is_bot THEN NULL ELSE u.discord_id END AS discord_id,
-                   u.is_bot
-            FROM hand_players hp
-            JOIN users u ON u.id = hp.user_id
-            JOIN hands h ON h.id = hp.hand_id
-            WHERE h.status = 'completed'
-            ORDER BY u.display_name, hp.user_id::text
-        """)
-        return {row["user_id"]: row for row in cur.fetchall()}
+    def hand_index(self, servers) -> List[dict]:
+        return fetch_hand_index(self.pool.get(), servers)
+
+    def users(self) -> Dict[str, dict]:
+        return fetch_users(self.pool.get())
+
+    def server_stats(self) -> Dict[str, Dict[str, dict]]:
+        return fetch_server_stats(self.pool.get())
+
+    def fetch(self, batch: Tuple[str, str, int, int]):
+        """バッチのハンドをスレッド専用の接続で取得する"""
+        server_id, date_str, first_hand_id, last_hand_id = batch
+        players_by_hand, actions_by_hand, _ = fetch_batch_rows(
+            self.pool.get(), server_id, date_str, first_hand_id, last_hand_id
+        )
+        return players_by_hand, actions_by_hand
+
+    def close(self) -> None:
+        self.pool.close_all()
+
+
+def open_source(args):
+    """--cache があればキャッシュ、なければ DATABASE_URL の DB を開く"""
+    if args.cache:
+        cache_dir = Path(__file__).parent.parent / args.cache
+        try:
+            return hand_cache.CacheSource(cache_dir)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url:
+        print("Error: DATABASE_URL environment variable is required (or use --cache)")
+        sys.exit(1)
+    try:
+        connect(database_url).close()
+    except ImportError:
+        print("Error: psycopg2 is required. Install with: pip install psycopg2-binary")
+        sys.exit(1)
+    return DatabaseSource(database_url)
 
 
 # --------------- Hand analysis ---------------
 
-def analyze_hand(hand_id, players_data, actions_data):
-    """1ハンドを分析し、各プレイヤーのスタッツ貢献を返す"""
-    per_player = defaultdict(empty_stats)
-    player_uids = set()
-
-    # Check if flop was actually dealt:
-    # - any action on flop/turn/river, OR
-    # - any player went to showdown (all-in preflop runout), OR
-    # - any player folded on flop/turn/river
-    hand_reached_flop = (
-        any(a["street"] != "preflop" for a in actions_data)
-        or any(p["showdown"] for p in players_data)
-        or any(p["folded_street"] in ("flop", "turn", "river") for p in players_data)
-    )
 
-    for p in players_data:
-        uid = p["user_id"]
-        player_uids.add(uid)
-        per_player[uid]["hands"] = 1
-        per_player[uid]["net_cbb"] = int(p["delta_cbb"] or 0)
-
-        did_not_fold_preflop = (p["folded_street"] is None or p["folded_street"] != "preflop")
-        saw_flop = hand_reached_flop and did_not_fold_preflop
-        showdown = bool(p["showdown"])
-        won = int(p["delta_cbb"] or 0) > 0
-
-        if saw_flop:
-            per_player[uid]["saw_flop_hands"] = 1
-        if showdown:
-            per_player[uid]["went_showdown_hands"] = 1
-            per_player[uid]["showdown_cbb"] = int(p["delta_cbb"] or 0)
-        else:
-            per_player[uid]["non_showdown_cbb"] = int(p["delta_cbb"] or 0)
-        if showdown and won:
-            per_player[uid]["won_showdown_hands"] = 1
-        if saw_flop and won:
-            per_player[uid]["won_when_saw_flop_hands"] = 1
-
-    # Split actions by street
-    preflop_actions = []
-    postflop_actions = defaultdict(list)  # street -> [actions]
-    for a in actions_data:
-        if a["street"] == "preflop":
-            preflop_actions.append(a)
-        else:
-            postflop_actions[a["street"]].append(a)
-
-    # --- Preflop analysis ---
-    preflop_raise_count = 0
-    raisers = []  # [(uid, raise_number)]
-    players_who_vpipped = set()
-
-    for a in preflop_actions:
-        uid = a["user_id"]
-        act = a["action"]
-
-        # VPIP: call, raise, bet, or all_in on preflop
-        if act in ("call", "raise", "bet", "all_in"):
-            if uid not in players_who_vpipped:
-                per_player[uid]["vpip_hands"] = 1
-                players_who_vpipped.add(uid)
-
-        # PFR: raise or all_in on preflop (first raise action by this player)
-        if act in ("raise", "all_in"):
-            preflop_raise_count += 1
-            raisers.append((uid, preflop_raise_count))
-
-            # Only count PFR once per player
-            if per_player[uid]["pfr_hands"] == 0:
-                per_player[uid]["pfr_hands"] = 1
-
-            if preflop_raise_count == 2:
-                per_player[uid]["three_bet_hands"] = 1
-            elif preflop_raise_count == 3:
-                per_player[uid]["four_bet_hands"] = 1
-
-        # 3bet opportunity: player acts when exactly 1 raise has occurred,
-        # and they are NOT the original raiser
-        if preflop_raise_count == 1:
-            original_raiser = raisers[0][0]
-            if uid != original_raiser:
-                if act in ("call", "raise", "fold", "all_in"):
-                    per_player[uid]["three_bet_opp"] += 1
-
-        # 4bet opportunity: player acts when exactly 2 raises have occurred,
-        # and they are NOT the 3bettor
-        if preflop_raise_count == 2 and len(raisers) >= 2:
-            three_bettor = raisers[1][0]
-            if uid != three_bettor:
-                if act in ("call", "raise", "fold", "all_in"):
-                    per_player[uid]["four_bet_opp"] += 1
-
-    # faced_three_bet_opp / fold_to_three_bet:
-    # The original raiser faces a 3bet if raise_count >= 2
-    if preflop_raise_count >= 2 and len(raisers) >= 1:
-        original_raiser = raisers[0][0]
-        per_player[original_raiser]["faced_three_bet_opp"] = 1
-        # Check if original raiser folded after the 3bet
-        after_3bet = False
-        for a in preflop_actions:
-            if after_3bet and a["user_id"] == original_raiser:
-                if a["action"] == "fold":
-                    per_player[original_raiser]["fold_to_three_bet_hands"] = 1
-                break
-            if len(raisers) >= 2 and a["user_id"] == raisers[1][0] and a["action"] in ("raise", "all_in"):
-                after_3bet = True
-
-    # faced_four_bet_opp / fold_to_four_bet:
-    if preflop_raise_count >= 3 and len(raisers) >= 2:
-        three_bettor = raisers[1][0]
-        per_player[three_bettor]["faced_four_bet_opp"] = 1
-        after_4bet = False
-        for a in preflop_actions:
-            if after_4bet and a["user_id"] == three_bettor:
-                if a["action"] == "fold":
-                    per_player[three_bettor]["fold_to_four_bet_hands"] = 1
-                break
-            if len(raisers) >= 3 and a["user_id"] == raisers[2][0] and a["action"] in ("raise", "all_in"):
-                after_4bet = True
-
-    # --- Postflop analysis ---
-    # Determine last preflop aggressor (for cbet)
-    last_pf_aggressor = raisers[-1][0] if raisers else None
-
-    # Process each postflop street
-    street_order = ["flop", "turn", "river"]
-    prev_street_aggressor = last_pf_aggressor
-
-    for street in street_order:
-        street_actions = postflop_actions.get(street, [])
-        if not street_actions:
-            prev_street_aggressor = None
-            continue
+def _merge_totals(target: Dict[str, dict], totals: Dict[str, dict]) -> None:
+    for uid, stats in totals.items():
+        merged = target.setdefault(uid, empty_stats())
+        for k in STAT_KEYS:
+            merged[k] += stats[k]
 
-        # Cbet: if the previous street's aggressor bets this street
-        cbet_candidate = prev_street_aggressor
-        street_first_aggressor = None
-        cbet_key_made = f"cbet_{street}_made"
-        cbet_key_opp = f"cbet_{street}_opp"
-        fold_cbet_key = f"fold_to_cbet_{street}"
-        fold_cbet_opp_key = f"fold_to_cbet_{street}_opp"
-
-        if cbet_candidate and any(a["user_id"] == cbet_candidate for a in street_actions):
-            per_player[cbet_candidate][cbet_key_opp] = 1
-
-        cbet_happened = False
-        for a in street_actions:
-            uid = a["user_id"]
-            act = a["action"]
-
-            # Aggression stats (postflop only)
-            if act in ("raise", "bet", "all_in"):
-                per_player[uid]["agg_raise"] += 1
-                if street_first_aggressor is None:
-                    street_first_aggressor = uid
-            elif act == "call":
-                per_player[uid]["agg_call"] += 1
-            elif act == "check":
-                per_player[uid]["agg_check"] += 1
-
-            # Cbet detection
-            if uid == cbet_candidate and act in ("bet", "raise", "all_in"):
-                per_player[uid][cbet_key_made] = 1
-                cbet_happened = True
-
-            # Fold to cbet
-            if cbet_happened and uid != cbet_candidate:
-                if act in ("fold", "call", "raise", "all_in"):
-                    per_player[uid][fold_cbet_opp_key] += 1
-                    if act == "fold":
-                        per_player[uid][fold_cbet_key] += 1
-
-        prev_street_aggressor = street_first_aggressor
-
-    return per_player
-
-
-def compute_stats_for_hands(conn, hand_ids, verbose=False):
-    """指定ハンドIDリストからプレイヤースタッツを計算"""
-    if not hand_ids:
-        return {}
-
-    BATCH_SIZE = 2000
-    total_stats = defaultdict(empty_stats)
-
-    for i in range(0, len(hand_ids), BATCH_SIZE):
-        batch = hand_ids[i:i + BATCH_SIZE]
-        if verbose:
-            print(f"  Processing hands {i+1}-{i+len(batch)} of {len(hand_ids)}...")
 
-        players_bulk = fetch_hand_players_bulk(conn, batch)
-        actions_bulk = fetch_hand_actions_bulk(conn, batch)
+def compute_batches(source, batches: List[Tuple[str, str, int, int]],
+                    connections: int = DEFAULT_CONNECTIONS, workers: int = 0,
+                    engine: str = "numpy", verbose: bool = False) -> Tuple[Dict, Dict]:
+    """
+    バッチごとにハンドを取得して集計する
 
-        for hand_id in batch:
-            pdata = players_bulk.get(hand_id, [])
-            adata = actions_bulk.get(hand_id, [])
-            if not pdata:
-                continue
+    取得は connections 本のスレッドで最大 connections * 2 バッチ先まで先読みし、
+    集計は workers 個のプロセスで並行に行う（workers=0 なら取得スレッドの外で逐次集計）。
+    source が列形式で読める（fetch_columns がある）場合、numpy エンジンは行の dict を経由しない。
+
+    Returns:
+        tuple: (by_date, by_server)
+            by_date: {session_date: {user_id: stats}}
+            by_server: {server_id: {user_id: stats}}
+    """
+    by_date: Dict[str, Dict[str, dict]] = {}
+    by_server: Dict[str, Dict[str, dict]] = {}
+
+    def collect(batch, totals):
+        server_id, date_str, first_hand_id, last_hand_id = batch
+        _merge_totals(by_date.setdefault(date_str, {}), totals)
+        _merge_totals(by_server.setdefault(server_id, {}), totals)
+        if verbose:
+            print(f"  {date_str} {server_id}: hands {first_hand_id}-{last_hand_id} done")
+
+    if engine == "numpy" and hasattr(source, "fetch_columns"):
+        fetch, accumulate = source.fetch_columns, accumulate_columns
+    else:
+        fetch, accumulate = source.fetch, ENGINES[engine]
+    analyzer = ProcessPoolExecutor(workers) if workers > 0 else None
+    try:
+        with ThreadPoolExecutor(connections) as fetcher:
+            remaining = iter(batches)
+            fetching = deque()
+            analyzing = deque()
+
+            def prefetch():
+                batch = next(remaining, None)
+                if batch is not None:
+                    fetching.append((batch, fetcher.submit(fetch, batch)))
+
+            for _ in range(connections * 2):
+                prefetch()
+
+            while fetching:
+                batch, future = fetching.popleft()
+                fetched = future.result()
+                prefetch()
+
+                if analyzer is None:
+                    collect(batch, accumulate(*fetched))
+                    continue
+
+                analyzing.append((batch, analyzer.submit(accumulate, *fetched)))
+                # 集計待ちのバッチが溜まりすぎないよう、古いものから回収する
+                while len(analyzing) > workers * 2:
+                    done_batch, done = analyzing.popleft()
+                    collect(done_batch, done.result())
+
+            while analyzing:
+                done_batch, done = analyzing.popleft()
+                collect(done_batch, done.result())
+    finally:
+        if analyzer is not None:
+            analyzer.shutdown()
 
-            hand_stats = analyze_hand(hand_id, pdata, adata)
-            for uid, stats in hand_stats.items():
-                for k in STAT_KEYS:
-                    total_stats[uid][k] += stats[k]
+    return by_date, by_server
 
-    return dict(total_stats)
 
+# --------------- Validation ---------------
 
-# --------------- JSON output ---------------
+def validate_against_player_stats(by_server, server_stats, users, later_hands):
+    """
+    サーバーごとに計算結果と player_stats を VALIDATION_KEYS で突き合わせる
 
-def safe_pct(numerator, denominator, decimals=1):
-    if not denominator:
-        return 0
-    return round((numerator / denominator) * 100, decimals)
+    --to より後にもハンドがあるサーバーは player_stats と範囲が違うので検証しない。
 
+    Returns:
+        int: 不一致の件数
+    """
+    mismatches = 0
+    for server_id in sorted(by_server):
+        if later_hands.get(server_id):
+            print(f"   {server_id}: skipped ({later_hands[server_id]} hands after --to)")
+            continue
 
-def build_export_json(participants, stats_by_user, generated_at_str):
-    """fetch_stats.py と同じ JSON フォーマットで出力を構築"""
-    CBB_PER_BB = 100
+        computed = by_server[server_id]
+        db_users = {uid for uid, servers in server_stats.items() if server_id in servers}
+        server_mismatches = 0
+        for uid in sorted(set(computed) | db_users):
+            ours = computed.get(uid, empty_stats())
+            theirs = server_stats.get(uid, {}).get(server_id, empty_stats())
+            for k in VALIDATION_KEYS:
+                if ours[k] != theirs[k]:
+                    name = users.get(uid, {}).get("display_name", uid)
+                    print(f"   MISMATCH {server_id} {name}: {k} computed={ours[k]} vs db={theirs[k]}")
+                    server_mismatches += 1
+        if server_mismatches == 0:
+            print(f"   {server_id}: all {len(computed)} players match")
+        mismatches += server_mismatches
+    return mismatches
+
+
+# --------------- Snapshots ---------------
+
+def build_cumulative_snapshots(by_date, base_totals, session_dates):
+    """
+    ベースライン + セッション別集計を日付順に足し込み、各セッション終了時点の累積値を返す
+
+    Returns:
+        list: [(session_date, {user_id: stats})]
+    """
+    cumulative = {uid: dict(stats) for uid, stats in base_totals.items()}
+    snapshots = []
+    for date_str in sorted(by_date):
+        _merge_totals(cumulative, by_date[date_str])
+        if date_str in session_dates:
+            snapshots.append((date_str, {uid: dict(stats) for uid, stats in cumulative.items()}))
+    return snapshots
+
+
+def build_players(cumulative, users):
+    """累積値を player-stats JSON のプレイヤー配列にする"""
     players = []
+    for uid, stats in cumulative.items():
+        participant = users.get(uid, {"user_id": uid, "display_name": uid, "discord_id": None, "is_bot": False})
+        players.append(build_export_player(participant, stats))
+    players.sort(key=lambda p: (p["display_name"], p["user_id"]))
+    return players
 
-    for uid, pinfo in sorted(participants.items(), key=lambda x: x[1]["display_name"]):
-        stats = stats_by_user.get(uid, empty_stats())
-        if stats["hands"] == 0:
-            stats = empty_stats()
-
-        hands = stats["hands"]
-        vpip_pct = safe_pct(stats["vpip_hands"], hands)
-        pfr_pct = safe_pct(stats["pfr_hands"], hands)
-        three_bet_pct = safe_pct(stats["three_bet_hands"], stats["three_bet_opp"])
-        four_bet_pct = safe_pct(stats["four_bet_hands"], stats["four_bet_opp"])
-        fold_to_three_bet_pct = safe_pct(stats["fold_to_three_bet_hands"], stats["faced_three_bet_opp"])
-        fold_to_four_bet_pct = safe_pct(stats["fold_to_four_bet_hands"], stats["faced_four_bet_opp"])
-        cbet_flop_pct = safe_pct(stats["cbet_flop_made"], stats["cbet_flop_opp"])
-        cbet_turn_pct = safe_pct(stats["cbet_turn_made"], stats["cbet_turn_opp"])
-        cbet_river_pct = safe_pct(stats["cbet_river_made"], stats["cbet_river_opp"])
-        fold_to_cbet_flop_pct = safe_pct(stats["fold_to_cbet_flop"], stats["fold_to_cbet_flop_opp"])
-        fold_to_cbet_turn_pct = safe_pct(stats["fold_to_cbet_turn"], stats["fold_to_cbet_turn_opp"])
-        fold_to_cbet_river_pct = safe_pct(stats["fold_to_cbet_river"], stats["fold_to_cbet_river_opp"])
-
-        agg_r = stats["agg_raise"]
-        agg_c = stats["agg_call"]
-        agg_ch = stats["agg_check"]
-        if agg_c > 0:
-            aggression = f"{agg_r / agg_c:.2f}"
-        elif agg_r > 0:
-            aggression = "99.00"
-        else:
-            aggression = "0.00"
-        agg_freq_den = agg_r + agg_c + agg_ch
-        aggression_freq_pct = safe_pct(agg_r, agg_freq_den)
-
-        wtsd_pct = safe_pct(stats["went_showdown_hands"], stats["saw_flop_hands"])
-        wsd_pct = safe_pct(stats["won_showdown_hands"], stats["went_showdown_hands"])
-        wwsf_pct = safe_pct(stats["won_when_saw_flop_hands"], stats["saw_flop_hands"])
-        bb_per_100 = f"{(stats['net_cbb'] / CBB_PER_BB / hands * 100):.2f}" if hands else "0.00"
-
-        summary = {
-            "hands": hands,
-            "vpip_pct": vpip_pct, "pfr_pct": pfr_pct,
-            "three_bet_pct": three_bet_pct, "four_bet_pct": four_bet_pct,
-            "fold_to_three_bet_pct": fold_to_three_bet_pct,
-            "fold_to_four_bet_pct": fold_to_four_bet_pct,
-            "cbet_flop_pct": cbet_flop_pct, "cbet_turn_pct": cbet_turn_pct,
-            "cbet_river_pct": cbet_river_pct,
-            "fold_to_cbet_flop_pct": fold_to_cbet_flop_pct,
-            "fold_to_cbet_turn_pct": fold_to_cbet_turn_pct,
-            "fold_to_cbet_river_pct": fold_to_cbet_river_pct,
-            "vpip_hands": stats["vpip_hands"], "pfr_hands": stats["pfr_hands"],
-            "three_bet_hands": stats["three_bet_hands"],
-            "three_bet_opp": stats["three_bet_opp"],
-            "four_bet_hands": stats["four_bet_hands"],
-            "four_bet_opp": stats["four_bet_opp"],
-            "fold_to_three_bet_hands": stats["fold_to_three_bet_hands"],
-            "faced_three_bet_opp": stats["faced_three_bet_opp"],
-            "fold_to_four_bet_hands": stats["fold_to_four_bet_hands"],
-            "faced_four_bet_opp": stats["faced_four_bet_opp"],
-            "cbet_flop_made": stats["cbet_flop_made"],
-            "cbet_flop_opp": stats["cbet_flop_opp"],
-            "cbet_turn_made": stats["cbet_turn_made"],
-            "cbet_turn_opp": stats["cbet_turn_opp"],
-            "cbet_river_made": stats["cbet_river_made"],
-            "cbet_river_opp": stats["cbet_river_opp"],
-            "fold_to_cbet_flop": stats["fold_to_cbet_flop"],
-            "fold_to_cbet_flop_opp": stats["fold_to_cbet_flop_opp"],
-            "fold_to_cbet_turn": stats["fold_to_cbet_turn"],
-            "fold_to_cbet_turn_opp": stats["fold_to_cbet_turn_opp"],
-            "fold_to_cbet_river": stats["fold_to_cbet_river"],
-            "fold_to_cbet_river_opp": stats["fold_to_cbet_river_opp"],
-            "agg_raise": agg_r, "agg_call": agg_c, "agg_check": agg_ch,
-            "saw_flop_hands": stats["saw_flop_hands"],
-            "went_showdown_hands": stats["went_showdown_hands"],
-            "won_showdown_hands": stats["won_showdown_hands"],
-            "won_when_saw_flop_hands": stats["won_when_saw_flop_hands"],
-            "aggression": aggression,
-            "aggression_freq_pct": aggression_freq_pct,
-            "wtsd_pct": wtsd_pct, "wsd_pct": wsd_pct, "wwsf_pct": wwsf_pct,
-            "bb_per_100": bb_per_100,
-            "net_cbb": stats["net_cbb"],
-            "showdown_cbb": stats["showdown_cbb"],
-            "non_showdown_cbb": stats["non_showdown_cbb"],
-        }
-
-        metrics = {
-            "vpip": {"pct": vpip_pct, "numerator": stats["vpip_hands"], "denominator": hands},
-            "pfr": {"pct": pfr_pct, "numerator": stats["pfr_hands"], "denominator": hands},
-            "three_bet": {"pct": three_bet_pct, "numerator": stats["three_bet_hands"], "denominator": stats["three_bet_opp"]},
-            "four_bet": {"pct": four_bet_pct, "numerator": stats["four_bet_hands"], "denominator": stats["four_bet_opp"]},
-            "fold_to_three_bet": {"pct": fold_to_three_bet_pct, "numerator": stats["fold_to_three_bet_hands"], "denominator": stats["faced_three_bet_opp"]},
-            "fold_to_four_bet": {"pct": fold_to_four_bet_pct, "numerator": stats["fold_to_four_bet_hands"], "denominator": stats["faced_four_bet_opp"]},
-            "cbet_flop": {"pct": cbet_flop_pct, "numerator": stats["cbet_flop_made"], "denominator": stats["cbet_flop_opp"]},
-            "cbet_turn": {"pct": cbet_turn_pct, "numerator": stats["cbet_turn_made"], "denominator": stats["cbet_turn_opp"]},
-            "cbet_river": {"pct": cbet_river_pct, "numerator": stats["cbet_river_made"], "denominator": stats["cbet_river_opp"]},
-            "fold_to_cbet_flop": {"pct": fold_to_cbet_flop_pct, "numerator": stats["fold_to_cbet_flop"], "denominator": stats["fold_to_cbet_flop_opp"]},
-            "fold_to_cbet_turn": {"pct": fold_to_cbet_turn_pct, "numerator": stats["fold_to_cbet_turn"], "denominator": stats["fold_to_cbet_turn_opp"]},
-            "fold_to_cbet_river": {"pct": fold_to_cbet_river_pct, "numerator": stats["fold_to_cbet_river"], "denominator": stats["fold_to_cbet_river_opp"]},
-            "aggression": {"value": aggression, "numerator": agg_r, "denominator": agg_c},
-            "aggression_frequency": {"pct": aggression_freq_pct, "numerator": agg_r, "denominator": agg_freq_den},
-            "wtsd": {"pct": wtsd_pct, "numerator": stats["went_showdown_hands"], "denominator": stats["saw_flop_hands"]},
-            "wsd": {"pct": wsd_pct, "numerator": stats["won_showdown_hands"], "denominator": stats["went_showdown_hands"]},
-            "wwsf": {"pct": wwsf_pct, "numerator": stats["won_when_saw_flop_hands"], "denominator": stats["saw_flop_hands"]},
-            "bb_per_100": {"value": float(bb_per_100), "numerator": stats["net_cbb"], "denominator": hands},
-            "net": {"cbb": stats["net_cbb"]},
-            "showdown": {"cbb": stats["showdown_cbb"]},
-            "non_showdown": {"cbb": stats["non_showdown_cbb"]},
-        }
-
-        raw_totals = {k: stats[k] for k in STAT_KEYS}
-
-        players.append({
-            "user_id": uid,
-            "display_name": pinfo["display_name"],
-            "discord_id": pinfo.get("discord_id"),
-            "discord_username": None,
-            "discord_global_name": None,
-            "is_bot": pinfo["is_bot"],
-            "summary": summary,
-            "metrics": metrics,
-            "raw_totals": raw_totals,
-        })
-
-    return {
-        "generated_at": generated_at_str,
-        "scope": {"type": "all_time", "date": None, "timezone": None},
-        "player_count": len(players),
-        "players": players,
-    }
-
-
-# --------------- Main ---------------
 
-def main():
-    conn = psycopg2.connect(DATABASE_URL)
+def rebuild(args) -> None:
+    data_dir = Path(__file__).parent.parent / args.data_dir
+    to_date = args.to_date or datetime.now(timezone.utc).strftime("%Y%m%d")
 
+    source = open_source(args)
     try:
-        print("=== 6/29 スナップショット再構築 ===\n")
-
-        # 1. 参加者情報を取得
-        print("1. Fetching participants...")
-        participants = fetch_participants(conn)
-        print(f"   {len(participants)} participants found")
-
-        # 2. houou-main ハンドを日付別に取得
-        print("\n2. Fetching houou-main hand IDs...")
-        r4_hands = fetch_houou_main_hands(conn, "2026-06-29")
-        r5_hands = fetch_houou_main_hands(conn, "2026-07-06")
-        print(f"   R4 (6/29): {len(r4_hands)} hands")
-        print(f"   R5 (7/6): {len(r5_hands)} hands")
-
-        # 3. R4 スタッツを計算
-        print("\n3. Computing R4 stats from hand data...")
-        r4_stats = compute_stats_for_hands(conn, r4_hands, verbose=True)
-        print(f"   R4: {len(r4_stats)} players")
-
-        # 4. R5 スタッツを計算
-        print("\n4. Computing R5 stats from hand data...")
-        r5_stats = compute_stats_for_hands(conn, r5_hands, verbose=True)
-        print(f"   R5: {len(r5_stats)} players")
-
-        # 5. per-server stats を取得して検証
-        print("\n5. Fetching per-server stats for validation...")
-        server_stats = fetch_per_server_stats(conn)
-
-        # 検証: R4 + R5 == houou-main for each player
-        print("\n6. Validating R4 + R5 == houou-main...")
-        validation_errors = 0
-        for uid in set(list(r4_stats.keys()) + list(r5_stats.keys())):
-            r4 = r4_stats.get(uid, empty_stats())
-            r5 = r5_stats.get(uid, empty_stats())
-            computed_sum = add_stats(r4, r5)
-            db_main = server_stats.get(uid, {}).get("houou-main", empty_stats())
-
-            for k in ["hands", "net_cbb", "saw_flop_hands", "went_showdown_hands"]:
-                if computed_sum[k] != db_main[k]:
-                    pname = participants.get(uid, {}).get("display_name", uid)
-                    print(f"   MISMATCH {pname}: {k} computed={computed_sum[k]} vs db={db_main[k]}")
-                    validation_errors += 1
-
-        if validation_errors == 0:
-            print("   All key stats match!")
-        else:
-            print(f"   {validation_errors} mismatches found (proceeding anyway)")
-
-        # 7. 6/29 all-time = houou-shared + R4 houou-main
-        print("\n7. Building 6/29 all-time snapshot...")
-        snapshot_0629 = {}
-        for uid, pinfo in participants.items():
-            shared = server_stats.get(uid, {}).get("houou-shared", empty_stats())
-            r4 = r4_stats.get(uid, empty_stats())
-            snapshot_0629[uid] = add_stats(shared, r4)
-
-        players_with_hands = sum(1 for s in snapshot_0629.values() if s["hands"] > 0)
-        print(f"   {players_with_hands} players with hands > 0")
-
-        # 8. 7/6 all-time = houou-shared + houou-main (予選卓 houou-yosen は除外)
-        print("\n8. Building 7/6 all-time snapshot...")
-        snapshot_0706 = {}
-        for uid, pinfo in participants.items():
-            shared = server_stats.get(uid, {}).get("houou-shared", empty_stats())
-            main = server_stats.get(uid, {}).get("houou-main", empty_stats())
-            snapshot_0706[uid] = add_stats(shared, main)
-
-        players_with_hands_0706 = sum(1 for s in snapshot_0706.values() if s["hands"] > 0)
-        print(f"   {players_with_hands_0706} players with hands > 0")
-
-        # 9. JSON 出力
-        base_dir = Path(__file__).parent.parent / "data" / "hand_histories"
-
-        # 6/29
-        out_dir_0629 = base_dir / "20260629"
-        out_dir_0629.mkdir(parents=True, exist_ok=True)
-        json_0629 = build_export_json(
-            participants, snapshot_0629,
-            "2026-06-29T17:16:33.251Z"
-        )
-        out_path_0629 = out_dir_0629 / "player-stats-all-time-2026-06-29T17-16-33-251Z.json"
-        with open(out_path_0629, "w", encoding="utf-8") as f:
-            json.dump(json_0629, f, indent=2, ensure_ascii=False)
-        print(f"\n9. Written: {out_path_0629}")
-
-        # 7/6
-        out_dir_0706 = base_dir / "20260706"
-        out_dir_0706.mkdir(parents=True, exist_ok=True)
-        json_0706 = build_export_json(
-            participants, snapshot_0706,
-            "2026-07-06T14:30:00.000Z"
+        print(f"1. Fetching hand index, users and player_stats ({'cache' if args.cache else 'database'})...")
+        hand_index = source.hand_index(args.servers)
+        users = source.users()
+        server_stats = source.server_stats()
+
+        later_hands, in_range = split_after(hand_index, to_date)
+        session_dates = {row["session_date"] for row in in_range}
+        if args.from_date:
+            session_dates = {d for d in session_dates if d >= args.from_date}
+        print(f"   {len(in_range)} hands on {', '.join(args.servers)} up to {to_date}, "
+              f"{len(session_dates)} sessions to snapshot")
+
+        batches = plan_batches(in_range, args.batch_size)
+        print(f"\n2. Computing stats ({len(batches)} batches, "
+              f"{args.connections} connections, {args.workers} workers, {args.engine} engine)...")
+        started = time.perf_counter()
+        by_date, by_server = compute_batches(
+            source, batches, args.connections, args.workers, args.engine, verbose=args.verbose
         )
-        out_path_0706 = out_dir_0706 / "player-stats-all-time-2026-07-06T14-30-00-000Z.json"
-        with open(out_path_0706, "w", encoding="utf-8") as f:
-            json.dump(json_0706, f, indent=2, ensure_ascii=False)
-        print(f"   Written: {out_path_0706}")
-
-        # 10. サマリー表示
-        print("\n=== Summary ===")
-        print(f"6/29 snapshot: {json_0629['player_count']} players")
-        print(f"7/6  snapshot: {json_0706['player_count']} players")
-
-        # 12問題プレイヤーの検証
-        problem_names = ["Deke", "Guest", "Kou", "Nao", "Neku", "Untri",
-                         "kiyo", "tica", "くりきんとん", "すず", "はなうさ", "三崎美咲"]
-        print("\n--- 12 Problem Players R4 contribution ---")
-        for uid, pinfo in participants.items():
-            if pinfo["display_name"] in problem_names:
-                r4 = r4_stats.get(uid, empty_stats())
-                s29 = snapshot_0629.get(uid, empty_stats())
-                print(f"  {pinfo['display_name']}: R4 hands={r4['hands']}, "
-                      f"6/29 total hands={s29['hands']}, net_cbb={s29['net_cbb']}")
+        elapsed = time.perf_counter() - started
+        print(f"   {len(in_range)} hands in {elapsed:.2f}s ({len(in_range) / max(elapsed, 1e-9):,.0f} hands/s)")
+    finally:
+        source.close()
+
+    print("\n3. Validating against player_stats...")
+    mismatches = validate_against_player_stats(by_server, server_stats, users, later_hands)
+    if mismatches:
+        print(f"   {mismatches} mismatches found (proceeding anyway)")
+
+    base_totals: Dict[str, dict] = {}
+    for uid, servers in server_stats.items():
+        for server_id in args.base_servers:
+            if server_id in servers:
+                _merge_totals(base_totals, {uid: servers[server_id]})
+    if args.base_servers:
+        print(f"\n   Baseline from player_stats ({', '.join(args.base_servers)}): {len(base_totals)} players")
+
+    print("\n4. Building snapshots...")
+    snapshots = build_cumulative_snapshots(by_date, base_totals, session_dates)
+    now = datetime.now(timezone.utc)
+
+    if args.snapshot_format == "delta" and not args.dry_run:
+        latest = snapshot_store.find_latest_delta(data_dir, "99999999")
+        if latest and latest.parent.name > to_date:
+            print(f"   Warning: deltas after {to_date} exist ({latest.parent.name}); "
+                  f"rebuild through the latest session to keep the chain consistent")
+
+    for date_str, cumulative in snapshots:
+        players = build_players(cumulative, users)
+        with_hands = sum(1 for p in players if p["raw_totals"]["hands"] > 0)
+        print(f"   {date_str}: {len(players)} players ({with_hands} with hands > 0)")
+        if args.dry_run:
+            continue
 
+        if args.snapshot_format == "delta":
+            written = snapshot_store.write_snapshot(
+                data_dir, date_str, {p["user_id"]: p for p in players},
+                file_timestamp=format_file_timestamp(now),
+                generated_at=format_generated_at(now),
+                keyframe_every=args.keyframe_every,
+            )
+        else:
+            output_dir = data_dir / "hand_histories" / date_str
+            output_dir.mkdir(parents=True, exist_ok=True)
+            output_path = output_dir / f"player-stats-all-time-{format_file_timestamp(now)}.json"
+            payload = {
+                "generated_at": format_generated_at(now),
+                "scope": {"type": "all_time", "date": None, "timezone": None},
+                "player_count": len(players),
+                "players": players,
+            }
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, indent=2, ensure_ascii=False)
+            written = [output_path]
+        for path in written:
+            print(f"   Written: {path}")
+
+    if args.dry_run:
+        print("\n[DRY RUN] No files written")
+
+
+def verify(args) -> None:
+    """
+    numpy 版と analyze_hand 版の集計結果をバッチごとに突き合わせる
+
+    列形式の分析を変更したときに、実データのハンドで結果が変わらないことを確認する。
+    --cache の場合は、キャッシュの列から直接分析した結果も突き合わせる。
+    """
+    source = open_source(args)
+    mismatched_batches = 0
+    try:
+        hand_index = source.hand_index(args.servers)
+        if args.from_date:
+            hand_index = [r for r in hand_index if r["session_date"] >= args.from_date]
+        if args.to_date:
+            hand_index = [r for r in hand_index if r["session_date"] <= args.to_date]
+
+        batches = plan_batches(hand_index, args.batch_size)
+        print(f"Verifying {len(hand_index)} hands in {len(batches)} batches...")
+        for batch in batches:
+            players_by_hand, actions_by_hand = source.fetch(batch)
+            expected = accumulate_hands(players_by_hand, actions_by_hand)
+            actual = accumulate_hands_columnar(players_by_hand, actions_by_hand)
+            if hasattr(source, "fetch_columns") and actual == expected:
+                actual = accumulate_columns(*source.fetch_columns(batch))
+            if expected == actual:
+                continue
+            mismatched_batches += 1
+            server_id, date_str, first_hand_id, last_hand_id = batch
+            for uid in sorted(set(expected) | set(actual)):
+                ours = actual.get(uid, {})
+                theirs = expected.get(uid, {})
+                diffs = [k for k in STAT_KEYS if ours.get(k) != theirs.get(k)]
+                if diffs:
+                    print(f"   MISMATCH {date_str} {server_id} hands {first_hand_id}-{last_hand_id} {uid}: "
+                          + ", ".join(f"{k} numpy={ours.get(k)} python={theirs.get(k)}" for k in diffs))
+    finally:
+        source.close()
+
+    if mismatched_batches:
+        print(f"{mismatched_batches} of {len(batches)} batches differ")
+        sys.exit(1)
+    print("All batches match")
+
+
+def dump(args) -> None:
+    """DB のハンドをローカルキャッシュに追記する（前回のダンプ以降の分だけ）"""
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url:
+        print("Error: DATABASE_URL environment variable is required")
+        sys.exit(1)
+
+    cache_dir = Path(__file__).parent.parent / args.cache
+    try:
+        conn = connect(database_url)
+    except ImportError:
+        print("Error: psycopg2 is required. Install with: pip install psycopg2-binary")
+        sys.exit(1)
+
+    print(f"Dumping hands on {', '.join(args.servers)} to {cache_dir}...")
+    started = time.perf_counter()
+    try:
+        # ウォーターマーク・ハンド・進行中ハンド・player_stats を同じ時点から読む
+        with read_snapshot(conn):
+            manifest = hand_cache.dump(
+                conn, cache_dir, args.servers, batch_size=args.batch_size, full=args.full,
+                verbose=args.verbose, dry_run=args.dry_run,
+            )
     finally:
         conn.close()
 
+    total = sum(p["hands"] for parts in manifest["partitions"].values() for p in parts.values())
+    print(f"   {total} hands cached up to #{manifest['watermark']} "
+          f"({len(manifest['pending_hand_ids'])} pending) in {time.perf_counter() - started:.2f}s")
+    if args.dry_run:
+        print("\n[DRY RUN] No files written")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="hand_players / hand_actions から累積スナップショットを再構築"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("rebuild", help="指定期間の各セッションの累積スナップショットを再構築")
+    p.add_argument("--from", dest="from_date", default=None,
+                   help="スナップショットを出力する最初のセッション日付 YYYYMMDD（default: 最初のセッション）")
+    p.add_argument("--to", dest="to_date", default=None,
+                   help="最後のセッション日付 YYYYMMDD（default: 当日 UTC）")
+    p.add_argument("--servers", nargs="+", default=list(DEFAULT_SERVERS),
+                   help=f"ハンドから計算するサーバー (default: {' '.join(DEFAULT_SERVERS)})")
+    p.add_argument("--base-servers", nargs="*", default=[],
+                   help="player_stats の値をそのままベースラインに加算するサーバー")
+    p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                   help=f"1回の取得で読むハンド数 (default: {DEFAULT_BATCH_SIZE})")
+    p.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS,
+                   help=f"バッチ取得に使う接続数 (default: {DEFAULT_CONNECTIONS})")
+    p.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                   help="analyze_hand を実行するプロセス数。0 で逐次実行 (default: min(4, CPU数))")
+    p.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    p.add_argument("--snapshot-format", choices=["json", "delta"], default="json",
+                   help="json: player-stats-all-time-*.json / delta: snapshot_store の差分 (default: json)")
+    p.add_argument("--keyframe-every", type=int, default=snapshot_store.DEFAULT_KEYFRAME_EVERY,
+                   help=f"--snapshot-format delta のキーフレーム間隔 (default: {snapshot_store.DEFAULT_KEYFRAME_EVERY})")
+    p.add_argument("--engine", choices=sorted(ENGINES), default="numpy",
+                   help="集計の実装。numpy: 列形式で一括分析 / python: analyze_hand (default: numpy)")
+    p.add_argument("--cache", default=None,
+                   help=f"DB の代わりに dump したキャッシュから読む (例: {hand_cache.DEFAULT_CACHE_DIR})")
+    p.add_argument("--verbose", "-v", action="store_true", help="詳細な出力を表示")
+    p.add_argument("--dry-run", action="store_true", help="実際にファイルを書き込まない")
+    p.set_defaults(func=rebuild)
+
+    v = sub.add_parser("verify", help="numpy 版と analyze_hand 版の集計結果を突き合わせる")
+    v.add_argument("--from", dest="from_date", default=None, help="最初のセッション日付 YYYYMMDD")
+    v.add_argument("--to", dest="to_date", default=None, help="最後のセッション日付 YYYYMMDD")
+    v.add_argument("--servers", nargs="+", default=list(DEFAULT_SERVERS),
+                   help=f"対象サーバー (default: {' '.join(DEFAULT_SERVERS)})")
+    v.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                   help=f"1回の取得で読むハンド数 (default: {DEFAULT_BATCH_SIZE})")
+    v.add_argument("--cache", default=None, help="DB の代わりに dump したキャッシュから読む")
+    v.set_defaults(func=verify)
+
+    d = sub.add_parser("dump", help="hand_players / hand_actions をローカルキャッシュにダンプ（差分）")
+    d.add_argument("--cache", default=hand_cache.DEFAULT_CACHE_DIR,
+                   help=f"キャッシュのディレクトリ (default: {hand_cache.DEFAULT_CACHE_DIR})")
+    d.add_argument("--servers", nargs="+", default=list(DEFAULT_SERVERS),
+                   help=f"対象サーバー (default: {' '.join(DEFAULT_SERVERS)})")
+    d.add_argument("--batch-size", type=int, default=hand_cache.DEFAULT_DUMP_BATCH_SIZE,
+                   help=f"1回の取得で読むハンド数 (default: {hand_cache.DEFAULT_DUMP_BATCH_SIZE})")
+    d.add_argument("--full", action="store_true", help="既存のキャッシュを使わず最初からダンプ")
+    d.add_argument("--verbose", "-v", action="store_true", help="詳細な出力を表示")
+    d.add_argument("--dry-run", action="store_true", help="実際にファイルを書き込まない")
+    d.set_defaults(func=dump)
+
+    args = parser.parse_args()
+    args.func(args)
+
 
 if __name__ == "__main__":
     main()
@@ -225,34 +225,26 @@ def print_summary(transitions: dict, players_config: dict, csv_names: dict, acti
         print(f"  {league} リーグ: {count}人{suffix}")
 
 
-def main():
-    parser = argparse.ArgumentParser(description="シーズン移行: 昇格・降格を計算")
-    parser.add_argument("--season", type=int, required=True, help="対象シーズン ID")
-    parser.add_argument("--verbose", "-v", action="store_true", help="詳細なランキングを表示")
-    args = parser.parse_args()
-
-    base_dir = Path(__file__).parent.parent
-    config_dir = base_dir / "config"
-    data_dir = base_dir / "data"
-
+def run_transition(season_id: int, config_dir: Path, data_dir: Path, verbose: bool = False) -> dict:
+    """シーズン移行を計算して表示し、次シーズン用の leagues 設定を返す"""
     config = load_config(config_dir)
     players_config = load_players(config_dir)
 
     season_config = None
     for s in config["seasons"]:
-        if s["id"] == args.season:
+        if s["id"] == season_id:
             season_config = s
             break
 
     if not season_config:
-        print(f"Error: シーズン {args.season} が見つかりません")
+        print(f"Error: シーズン {season_id} が見つかりません")
         sys.exit(1)
 
-    stats = load_season_stats(data_dir, args.season)
+    stats = load_season_stats(data_dir, season_id)
     csv_names = {s["player_id"]: s["name"] for s in stats}
     active_leagues = get_active_leagues(season_config)
 
-    transitions = compute_transitions(season_config, stats, verbose=args.verbose)
+    transitions = compute_transitions(season_config, stats, verbose=verbose)
     print_summary(transitions, players_config, csv_names, active_leagues)
 
     new_leagues = build_new_leagues(transitions, active_leagues)
@@ -260,7 +252,17 @@ def main():
     print("次シーズン用 leagues 設定:")
     print("=" * 60)
     print(json.dumps(new_leagues, indent=2, ensure_ascii=False))
+    return new_leagues
 
 
+def main():
+    parser = argparse.ArgumentParser(description="シーズン移行: 昇格・降格を計算")
+    parser.add_argument("--season", type=int, required=True, help="対象シーズン ID")
+    parser.add_argument("--verbose", "-v", action="store_true", help="詳細なランキングを表示")
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).parent.parent
+    run_transition(args.season, base_dir / "config", base_dir / "data", verbose=args.verbose)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+節別 CSV の日付ごとの分割（パーティション）
+
+session_stats.csv / session_stats_raw.csv を節（日付）ごとのファイルに分け、
+パーティションの一覧（日付・シーズン・行数・ハッシュ）をインデックスに書く。
+ブラウザ（user.html）はインデックスを読み、表示するシーズンの節のファイルだけを取得する。
+まとめた CSV はこれまでどおり main.py が出力する（互換のため）。
+
+内容の変わらないパーティションは書き直さないので、毎週の集計で書き換わるのは
+新しい節のファイルとインデックスだけになる（出力から無くなった日付のファイルは消す）。
+
+出力:
+  data/sessions/
+    index.json              # インデックス
+    {YYYYMMDD}.csv          # session_stats.csv のその日付の行（ヘッダー付き）
+    {YYYYMMDD}_raw.csv      # session_stats_raw.csv のその日付の行（ヘッダー付き）
+
+インデックスの構成:
+  {
+    "version": 1,
+    "partitions": [
+      {
+        "date": "YYYYMMDD",
+        "season_id": 3,
+        "rows": 47,
+        "files": {
+          "session_stats": {"path": "sessions/YYYYMMDD.csv", "sha256": "...", "bytes": 1234},
+          "session_stats_raw": {"path": "sessions/YYYYMMDD_raw.csv", "sha256": "...", "bytes": 2345}
+        }
+      }
+    ]
+  }
+  path は data/ からの相対パス。partitions は日付順。
+
+Usage:
+    python scripts/session_partitions.py [--data-dir data] [-v]   # 既存の CSV から作り直す
+    python scripts/session_partitions.py --verify                 # インデックスとファイルを照合する
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from dataset_manifest import file_sha256
+
+
+PARTITIONS_DIR = "sessions"
+INDEX_NAME = "index.json"
+INDEX_VERSION = 1
+
+# インデックスの files のキー -> (まとめた CSV, パーティションのファイル名の接尾辞)
+SOURCES = {
+    "session_stats": ("session_stats.csv", ""),
+    "session_stats_raw": ("session_stats_raw.csv", "_raw"),
+}
+
+
+def _encode(rows: List[list]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def iter_date_blocks(path: Path) -> Iterator[Tuple[str, str, bytes, int]]:
+    """
+    まとめた CSV を日付ごとに分けて返す（ファイルは日付順に並んでいる前提）
+
+    Yields:
+        (日付, シーズン ID, ヘッダー付きの CSV のバイト列, 行数)
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        headers = next(reader, None)
+        if headers is None:
+            return
+        date_col, season_col = headers.index("session_date"), headers.index("season_id")
+        block: List[list] = []
+        for row in reader:
+            if block and row[date_col] != block[0][date_col]:
+                yield block[0][date_col], block[0][season_col], _encode([headers, *block]), len(block)
+                block = []
+            block.append(row)
+        if block:
+            yield block[0][date_col], block[0][season_col], _encode([headers, *block]), len(block)
+
+
+def load_index(data_dir: Path) -> Optional[dict]:
+    path = Path(data_dir) / PARTITIONS_DIR / INDEX_NAME
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_partitions(data_dir: Path, verbose: bool = False) -> List[Path]:
+    """
+    まとめた CSV から日付ごとのファイルとインデックスを書き、書いた（内容の変わった）ファイルのパスを返す
+    """
+    data_dir = Path(data_dir)
+    out_dir = data_dir / PARTITIONS_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # 前回のインデックスのハッシュと一致し、ファイルも残っていれば書き直さない
+    previous: Dict[str, str] = {}
+    for partition in (load_index(data_dir) or {}).get("partitions", []):
+        for info in partition["files"].values():
+            previous[info["path"]] = info["sha256"]
+
+    partitions: Dict[str, dict] = {}
+    written: List[Path] = []
+    for key, (source_name, suffix) in SOURCES.items():
+        source = data_dir / source_name
+        if not source.exists():
+            continue
+        for date_str, season_id, content, rows in iter_date_blocks(source):
+            relative = f"{PARTITIONS_DIR}/{date_str}{suffix}.csv"
+            digest = hashlib.sha256(content).hexdigest()
+            partition = partitions.setdefault(date_str, {
+                "date": date_str,
+                "season_id": int(season_id) if season_id.isdigit() else None,
+                "rows": rows,
+                "files": {},
+            })
+            partition["files"][key] = {"path": relative, "sha256": digest, "bytes": len(content)}
+            path = data_dir / relative
+            if previous.get(relative) == digest and path.exists():
+                continue
+            with open(path, "wb") as f:
+                f.write(content)
+            written.append(path)
+
+    # 出力から無くなった日付のファイルを消す
+    current = {info["path"] for p in partitions.values() for info in p["files"].values()}
+    for path in sorted(out_dir.glob("*.csv")):
+        if f"{PARTITIONS_DIR}/{path.name}" not in current:
+            path.unlink()
+            if verbose:
+                print(f"Removed stale partition {path.name}")
+
+    index = {
+        "version": INDEX_VERSION,
+        "partitions": [partitions[d] for d in sorted(partitions)],
+    }
+    index_path = out_dir / INDEX_NAME
+    text = json.dumps(index, ensure_ascii=False, indent=2) + "\n"
+    if not index_path.exists() or index_path.read_text(encoding="utf-8") != text:
+        index_path.write_text(text, encoding="utf-8")
+        written.append(index_path)
+
+    if verbose:
+        print(f"Wrote {len(written)} of {len(current) + 1} partition files ({len(partitions)} sessions)")
+    return written
+
+
+def verify_partitions(data_dir: Path) -> List[str]:
+    """インデックスとパーティションのファイルを照合し、問題のリストを返す（空なら OK）"""
+    data_dir = Path(data_dir)
+    index = load_index(data_dir)
+    if index is None:
+        return [f"{PARTITIONS_DIR}/{INDEX_NAME} がありません"]
+    problems = []
+    for partition in index["partitions"]:
+        for info in partition["files"].values():
+            path = data_dir / info["path"]
+            if not path.exists():
+                problems.append(f"{info['path']}: ファイルがありません")
+            elif file_sha256(str(path)) != info["sha256"]:
+                problems.append(f"{info['path']}: ハッシュが一致しません")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="節別 CSV を日付ごとのファイルに分割し、インデックスを書く")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--verify", action="store_true", help="書き込まずにインデックスとファイルを照合する")
+    parser.add_argument("--verbose", "-v", action="store_true", help="詳細な出力を表示")
+    args = parser.parse_args()
+
+    data_dir = Path(__file__).parent.parent / args.data_dir
+    if args.verify:
+        problems = verify_partitions(data_dir)
+        for problem in problems:
+            print(f"  - {problem}")
+        if problems:
+            sys.exit(1)
+        print("OK")
+        return
+
+    for path in write_partitions(data_dir, verbose=args.verbose):
+        print(f"  - {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+節別データのディスク退避（main.py --stream）
+
+ストリーミング集計では、節（日付）の集計が終わるたびにその節の行（session_stats.csv と
+session_stats_raw.csv の形式）を一時ファイルに追記し、メモリからは消す。
+最後に日付順に並べ直して出力する（日付ごとのファイル内の位置だけを持つので、出力時もメモリは一定）。
+
+集計の順（凍結シーズン -> 計算済み JSON -> ハンド履歴ログ）は日付順とは限らないので、
+出力ファイルに直接追記せずに一時ファイルを経由する。
+"""
+
+import csv
+import io
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# 日付順に書き出すときに一度に読む大きさ
+COPY_CHUNK = 1 << 20
+
+
+class SessionSpill:
+    """節ごとの行を一時ファイルに溜め、日付順の CSV に書き出す"""
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = directory
+        # 節の行（display / raw）。閉じると消える
+        self._display = tempfile.TemporaryFile(dir=directory)
+        self._raw = tempfile.TemporaryFile(dir=directory)
+        # 日付 -> (シーズン ID, [(display の位置, 長さ, raw の位置, 長さ, 行数)])
+        self._blocks: Dict[str, Tuple[object, List[Tuple[int, int, int, int, int]]]] = {}
+
+    @staticmethod
+    def _encode(rows: List[list]) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def append(self, date_str: str, season_id, display_rows: List[list], raw_rows: List[list]) -> None:
+        """1節分の行を追記する"""
+        display = self._encode(display_rows)
+        raw = self._encode(raw_rows)
+        self._display.seek(0, io.SEEK_END)
+        self._raw.seek(0, io.SEEK_END)
+        block = (self._display.tell(), len(display), self._raw.tell(), len(raw), len(raw_rows))
+        self._display.write(display)
+        self._raw.write(raw)
+        _, blocks = self._blocks.setdefault(date_str, (season_id, []))
+        blocks.append(block)
+
+    def __contains__(self, date_str: str) -> bool:
+        return date_str in self._blocks
+
+    @property
+    def sessions(self) -> int:
+        return len(self._blocks)
+
+    def season_ids(self) -> List:
+        return sorted({sid for sid, _ in self._blocks.values() if sid not in (None, "")})
+
+    def _copy(self, source, blocks: List[Tuple[int, int]], f) -> None:
+        for offset, length in blocks:
+            source.seek(offset)
+            while length > 0:
+                chunk = source.read(min(COPY_CHUNK, length))
+                f.write(chunk)
+                length -= len(chunk)
+
+    def write(self, output_path: Path, headers: List[str], raw: bool, season_id=None) -> int:
+        """
+        日付順の CSV を書き出す
+
+        Args:
+            raw: True なら session_stats_raw.csv、False なら session_stats.csv の行
+            season_id: 指定した場合はそのシーズンの節だけ
+
+        Returns:
+            書き出した行数
+        """
+        source = self._raw if raw else self._display
+        source.flush()
+        rows = 0
+        with open(output_path, "wb") as f:
+            f.write(self._encode([headers]))
+            for date_str in sorted(self._blocks):
+                sid, blocks = self._blocks[date_str]
+                if season_id is not None and sid != season_id:
+                    continue
+                if raw:
+                    self._copy(source, [(b[2], b[3]) for b in blocks], f)
+                else:
+                    self._copy(source, [(b[0], b[1]) for b in blocks], f)
+                rows += sum(b[4] for b in blocks)
+        return rows
+
+    def close(self) -> None:
+        self._display.close()
+        self._raw.close()
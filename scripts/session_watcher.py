@@ -0,0 +1,154 @@
+"""
+ハンド履歴の監視（main.py --watch）
+
+data/hand_histories/ のうち凍結していないシーズンの日付ディレクトリを一定間隔で走査し、
+ファイル（poker_now_log_*・ledger_*・計算済み JSON）の追加・変更があれば集計をやり直す。
+
+- 書き込み途中のファイルを読まないように、最後の変更から debounce 秒間どこも変わらなくなってから処理する
+- プロセスを起動したままにし、テーブル単位のパース・計算結果（StatsAggregator の table_cache）を
+  使い回すので、読み直すのは変更のあったログだけ（集計のやり直しは数百ミリ秒）
+- CSV は全期間・節別と、変更のあった日付のシーズンの分だけを書き直す
+"""
+
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+from config_loader import ConfigLoader
+from player_registry import PlayerRegistry
+from stats_aggregator import StatsAggregator
+
+
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_DEBOUNCE = 10.0
+
+# ダウンロード中・コピー中の一時ファイル
+IGNORED_SUFFIXES = (".tmp", ".part", ".crdownload", ".download")
+
+
+def snapshot_tree(hand_histories_dir: Path, config: ConfigLoader) -> Dict[str, Tuple[int, int]]:
+    """凍結していないシーズンの日付ディレクトリ以下のファイル -> (サイズ, 更新時刻)"""
+    snapshot: Dict[str, Tuple[int, int]] = {}
+    if not hand_histories_dir.exists():
+        return snapshot
+
+    def walk(path: str, rel: str) -> None:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                name = f"{rel}/{entry.name}"
+                if entry.is_dir():
+                    walk(entry.path, name)
+                elif entry.is_file() and not entry.name.startswith(".") \
+                        and not entry.name.endswith(IGNORED_SUFFIXES):
+                    stat = entry.stat()
+                    snapshot[name] = (stat.st_size, stat.st_mtime_ns)
+
+    with os.scandir(hand_histories_dir) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            try:
+                date = datetime.strptime(entry.name, "%Y%m%d")
+            except ValueError:
+                continue
+            season = config.get_season_by_date(date)
+            if season and season.get("frozen"):
+                continue
+            walk(entry.path, entry.name)
+    return snapshot
+
+
+def changed_files(before: Dict[str, tuple], after: Dict[str, tuple]) -> Set[str]:
+    """追加・変更・削除されたファイル（hand_histories からの相対パス）"""
+    return {name for name in before.keys() | after.keys() if before.get(name) != after.get(name)}
+
+
+class SessionWatcher:
+    """ハンド履歴を監視して、変更のあったテーブルだけを読み直して CSV を更新する"""
+
+    def __init__(self, config: ConfigLoader, registry: PlayerRegistry, data_dir: Path,
+                 table_cache: dict, verbose: bool = False, dry_run: bool = False,
+                 as_of: Optional[str] = None, window: Optional[int] = None,
+                 interval: float = DEFAULT_POLL_INTERVAL, debounce: float = DEFAULT_DEBOUNCE,
+                 workers: int = 0):
+        self.config = config
+        self.registry = registry
+        self.data_dir = Path(data_dir)
+        self.hand_histories_dir = self.data_dir / "hand_histories"
+        self.table_cache = table_cache
+        self.verbose = verbose
+        self.dry_run = dry_run
+        self.as_of = as_of
+        self.window = window
+        self.interval = interval
+        self.debounce = debounce
+        self.workers = workers
+
+    def snapshot(self) -> Dict[str, Tuple[int, int]]:
+        return snapshot_tree(self.hand_histories_dir, self.config)
+
+    def update(self, changed: Set[str]) -> StatsAggregator:
+        """集計をやり直し、変更のあった日付のシーズンの CSV を書き直す"""
+        from main import write_outputs
+
+        started = time.perf_counter()
+        previous = dict(self.table_cache)
+        aggregator = StatsAggregator(self.config, self.registry, data_dir=str(self.data_dir),
+                                     verbose=self.verbose, table_cache=self.table_cache, workers=self.workers)
+        sessions = aggregator.discover_sessions()
+        try:
+            aggregator.aggregate(sessions)
+        finally:
+            aggregator.close()
+
+        # 無くなったテーブルの結果は捨てる
+        active = {aggregator._log_source(s.csv_path) for s in sessions if s.csv_path}
+        for source in set(self.table_cache) - active:
+            del self.table_cache[source]
+        reparsed = sorted(s for s, table in self.table_cache.items() if previous.get(s) is not table)
+
+        dates = sorted({name.split("/", 1)[0] for name in changed})
+        season_ids = set()
+        for date_str in dates:
+            season = self.config.get_season_by_date(datetime.strptime(date_str, "%Y%m%d"))
+            if season:
+                season_ids.add(season["id"])
+
+        elapsed = time.perf_counter() - started
+        print(f"\n[{datetime.now():%H:%M:%S}] {len(changed)} files changed in {', '.join(dates)}: "
+              f"reparsed {len(reparsed)} tables, aggregated in {elapsed:.2f}s")
+        for source in reparsed:
+            print(f"  - {source}")
+        print(f"  Total players: {len(aggregator.all_stats)}, unique hands: {aggregator.total_unique_hands}")
+
+        if self.dry_run:
+            print("  [DRY RUN] Skipping file writes")
+        else:
+            write_outputs(aggregator, self.registry, self.config, self.data_dir,
+                          self.as_of, self.window, season_ids=season_ids)
+        return aggregator
+
+    def run(self) -> None:
+        """Ctrl+C まで監視を続ける"""
+        processed = observed = self.snapshot()
+        changed_at = time.monotonic()
+        print(f"\nWatching {self.hand_histories_dir} "
+              f"(poll every {self.interval:g}s, debounce {self.debounce:g}s, Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(self.interval)
+                current = self.snapshot()
+                now = time.monotonic()
+                if current != observed:
+                    # まだ書き込み中かもしれないので、変化が止まるまで待つ
+                    if self.verbose:
+                        print(f"[{datetime.now():%H:%M:%S}] {len(changed_files(observed, current))} files changing...")
+                    observed, changed_at = current, now
+                    continue
+                if current != processed and now - changed_at >= self.debounce:
+                    self.update(changed_files(processed, current))
+                    processed = current
+        except KeyboardInterrupt:
+            print("\nStopped watching")
@@ -0,0 +1,354 @@
+"""
+スナップショットストアモジュール
+累積スタッツを「キーフレーム（全プレイヤーの累積カウンタ）+ セッションごとの差分」で保存する
+
+ディレクトリ構造:
+    hand_histories/
+        {YYYYMMDD}/
+            player-stats-delta-*.json      (前回のスナップショットからの差分、毎セッション)
+            player-stats-keyframe-*.json   (累積カウンタ、N セッションごと)
+
+任意の日付の累積値は、その日付以前で最新のキーフレームに、
+キーフレームより後の差分を順に足せば復元できる。
+差分ファイルにはそのセッションで増えたプレイヤーしか入らないので、
+1セッションあたりのファイルサイズと読み込み時間は参加人数に比例する。
+
+使用方法:
+    # 既存の player-stats-all-time-*.json からスナップショットを作成
+    python scripts/snapshot_store.py convert [--keyframe-every 8] [--dry-run]
+
+    # 指定日の累積値を復元して確認
+    python scripts/snapshot_store.py show --date 20260706
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from fast_table_stats import STAT_KEYS
+from compressed_io import glob_compressed, open_text
+
+
+FORMAT_VERSION = 1
+
+KEYFRAME_PREFIX = "player-stats-keyframe-"
+DELTA_PREFIX = "player-stats-delta-"
+ALL_TIME_PREFIX = "player-stats-all-time-"
+
+# この数だけ差分が続いたらキーフレームを書く
+DEFAULT_KEYFRAME_EVERY = 8
+
+# 1行 = 1プレイヤー（カウンタは STAT_KEYS の順）
+PLAYER_COLUMNS = ["user_id", "display_name", "discord_id", "is_bot"] + STAT_KEYS
+
+
+def _date_dirs(data_dir: Path) -> List[Path]:
+    """hand_histories/ 直下の日付ディレクトリを日付順に返す"""
+    hand_histories_dir = data_dir / "hand_histories"
+    if not hand_histories_dir.exists():
+        return []
+    return sorted(
+        d for d in hand_histories_dir.iterdir()
+        if d.is_dir() and len(d.name) == 8 and d.name.isdigit()
+    )
+
+
+def _latest(date_dir: Path, prefix: str) -> Optional[Path]:
+    """日付ディレクトリ内で最新（ファイル名順で最後）のファイルを返す（.gz / .xz も含む）"""
+    files = glob_compressed(date_dir, f"{prefix}*.json")
+    return files[-1] if files else None
+
+
+def is_snapshot_file(path: Path) -> bool:
+    return path.name.startswith(KEYFRAME_PREFIX) or path.name.startswith(DELTA_PREFIX)
+
+
+def find_delta(data_dir: Path, date_str: str) -> Optional[Path]:
+    """指定日の差分ファイルを返す"""
+    return _latest(data_dir / "hand_histories" / date_str, DELTA_PREFIX)
+
+
+def find_latest_delta(data_dir: Path, until_date: str, inclusive: bool = True) -> Optional[Path]:
+    """until_date 以前（inclusive=False なら より前）で最新の差分ファイルを返す"""
+    for date_dir in reversed(_date_dirs(data_dir)):
+        if date_dir.name > until_date or (not inclusive and date_dir.name == until_date):
+            continue
+        delta = _latest(date_dir, DELTA_PREFIX)
+        if delta:
+            return delta
+    return None
+
+
+def load_snapshot(path: Path) -> dict:
+    """スナップショットファイルを読み込む"""
+    with open_text(path) as f:
+        return json.load(f)
+
+
+def iter_players(snapshot: dict):
+    """
+    スナップショットの各行を player-stats JSON と同じ形の dict にして返す
+
+    Yields:
+        dict: {user_id, display_name, discord_id, is_bot, raw_totals}
+    """
+    columns = snapshot["columns"]
+    stat_columns = [(i, name) for i, name in enumerate(columns) if name in STAT_KEYS]
+    for row in snapshot["players"]:
+        record = dict(zip(columns[:4], row[:4]))
+        record["raw_totals"] = {name: row[i] for i, name in stat_columns}
+        yield record
+
+
+def _build_rows(players: Dict[str, dict]) -> List[list]:
+    rows = []
+    for player in sorted(players.values(), key=lambda p: (p["display_name"], p["user_id"])):
+        totals = player["raw_totals"]
+        rows.append(
+            [player["user_id"], player["display_name"], player.get("discord_id"), bool(player["is_bot"])]
+            + [int(totals.get(k, 0)) for k in STAT_KEYS]
+        )
+    return rows
+
+
+def _write(path: Path, header: dict, rows: List[list]) -> None:
+    """
+    ヘッダーと行を書き出す
+
+    インデントなしの JSON だが、git の差分が読めるようにプレイヤーは1行ずつ改行する。
+    """
+    def dump(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    body = [f"{dump(k)}:{dump(v)}" for k, v in header.items()]
+    body.append(f"{dump('columns')}:{dump(PLAYER_COLUMNS)}")
+    players = ",\n".join(dump(row) for row in rows)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{" + ",\n".join(body) + ",\n\"players\":[\n" + players + "\n]}\n")
+
+
+def reconstruct(data_dir: Path, date_str: str) -> Tuple[Dict[str, dict], Optional[dict]]:
+    """
+    指定日時点の累積値を「キーフレーム + 差分」から復元する
+
+    Returns:
+        tuple: (players, last_snapshot)
+            players: {user_id: {user_id, display_name, discord_id, is_bot, raw_totals}}
+            last_snapshot: 最後に適用したファイルのヘッダー（ウォーターマーク取得用）。
+                スナップショットがなければ ({}, None)
+
+    Raises:
+        ValueError: 差分の base が1つ前のスナップショットの日付と一致しない場合
+    """
+    date_dirs = [d for d in _date_dirs(data_dir) if d.name <= date_str]
+
+    keyframe_path = None
+    for date_dir in reversed(date_dirs):
+        keyframe_path = _latest(date_dir, KEYFRAME_PREFIX)
+        if keyframe_path:
+            break
+    if keyframe_path is None:
+        return {}, None
+
+    keyframe = load_snapshot(keyframe_path)
+    players = {p["user_id"]: p for p in iter_players(keyframe)}
+    last = keyframe
+    last_date = keyframe["date"]
+
+    for date_dir in date_dirs:
+        if date_dir.name <= last_date:
+            continue
+        delta_path = _latest(date_dir, DELTA_PREFIX)
+        if delta_path is None:
+            continue
+        delta = load_snapshot(delta_path)
+        if delta["base"] != last_date:
+            raise ValueError(
+                f"{delta_path}: base {delta['base']} does not match previous snapshot {last_date}"
+            )
+        apply_delta(players, delta)
+        last = delta
+        last_date = delta["date"]
+
+    return players, last
+
+
+def apply_delta(players: Dict[str, dict], delta: dict) -> None:
+    """差分を累積値に足し込む（表示名などは差分側の値で更新する）"""
+    for record in iter_players(delta):
+        uid = record["user_id"]
+        current = players.get(uid)
+        if current is None:
+            players[uid] = record
+            continue
+        totals = current["raw_totals"]
+        for k, v in record["raw_totals"].items():
+            totals[k] = totals.get(k, 0) + v
+        current["display_name"] = record["display_name"]
+        current["discord_id"] = record["discord_id"]
+        current["is_bot"] = record["is_bot"]
+
+
+def diff_players(current: Dict[str, dict], previous: Dict[str, dict]) -> Dict[str, dict]:
+    """
+    2つの累積値の差分
+
+    カウンタが変化したプレイヤーに加えて、新しく現れたプレイヤー（カウンタが0でも）と
+    表示名などが変わったプレイヤーも入れる（復元したプレイヤー一覧を all-time JSON と揃えるため）。
+    """
+    delta = {}
+    for uid, player in current.items():
+        old = previous.get(uid)
+        before = old["raw_totals"] if old else {}
+        totals = {k: player["raw_totals"].get(k, 0) - before.get(k, 0) for k in STAT_KEYS}
+        renamed = old is not None and any(
+            old.get(k) != player.get(k) for k in ("display_name", "discord_id", "is_bot")
+        )
+        if any(totals.values()) or old is None or renamed:
+            delta[uid] = {**player, "raw_totals": totals}
+    return delta
+
+
+def load_all_time_json(path: Path) -> Dict[str, dict]:
+    """player-stats-all-time-*.json を user_id -> プレイヤーの dict にする"""
+    data = load_snapshot(path)
+    return {
+        p["user_id"]: {
+            "user_id": p["user_id"],
+            "display_name": p["display_name"],
+            "discord_id": p.get("discord_id"),
+            "is_bot": p.get("is_bot", False),
+            "raw_totals": {k: p["raw_totals"].get(k, 0) for k in STAT_KEYS},
+        }
+        for p in data["players"]
+    }
+
+
+def _previous_state(data_dir: Path, date_str: str) -> Tuple[Dict[str, dict], Optional[dict]]:
+    """date_str より前の最新スナップショットの累積値を返す（なければ all-time JSON から）"""
+    base_delta = find_latest_delta(data_dir, date_str, inclusive=False)
+    if base_delta is not None:
+        return reconstruct(data_dir, base_delta.parent.name)
+
+    # スナップショット導入前: 直近の all-time JSON を起点にする
+    for date_dir in reversed(_date_dirs(data_dir)):
+        if date_dir.name >= date_str:
+            continue
+        all_time = _latest(date_dir, ALL_TIME_PREFIX)
+        if all_time:
+            return load_all_time_json(all_time), None
+    return {}, None
+
+
+def write_snapshot(data_dir: Path, date_str: str, players: Dict[str, dict],
+                   file_timestamp: str, generated_at: str,
+                   watermark: Optional[dict] = None,
+                   keyframe_every: int = DEFAULT_KEYFRAME_EVERY,
+                   verbose: bool = False) -> List[Path]:
+    """
+    指定日の累積値をスナップショットとして書き出す
+
+    前回のスナップショットとの差分を必ず書き、差分が keyframe_every 回続いたとき
+    （またはチェーンがまだないとき）はキーフレームも書く。
+    同じ日付で再実行した場合は、その日より前の状態からの差分を書き直す。
+
+    Args:
+        players: {user_id: {user_id, display_name, discord_id, is_bot, raw_totals}}
+
+    Returns:
+        list: 書き出したファイルのパス
+    """
+    previous, base = _previous_state(data_dir, date_str)
+    delta_players = diff_players(players, previous)
+
+    chain_length = base["chain_length"] + 1 if base else 1
+    write_keyframe = base is None or chain_length >= keyframe_every
+    header = {
+        "format_version": FORMAT_VERSION,
+        "kind": "delta",
+        "date": date_str,
+        "base": base["date"] if base else None,
+        "chain_length": 0 if write_keyframe else chain_length,
+        "generated_at": generated_at,
+        "watermark": watermark,
+    }
+
+    output_dir = data_dir / "hand_histories" / date_str
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+
+    delta_path = output_dir / f"{DELTA_PREFIX}{file_timestamp}.json"
+    _write(delta_path, header, _build_rows(delta_players))
+    written.append(delta_path)
+
+    if write_keyframe:
+        keyframe_path = output_dir / f"{KEYFRAME_PREFIX}{file_timestamp}.json"
+        _write(keyframe_path, {**header, "kind": "keyframe", "base": None},
+               _build_rows(players))
+        written.append(keyframe_path)
+
+    if verbose:
+        kind = "delta + keyframe" if write_keyframe else f"delta ({chain_length} since keyframe)"
+        print(f"Snapshot {date_str}: {kind}, {len(delta_players)} changed players")
+
+    return written
+
+
+def cmd_convert(args) -> None:
+    """既存の all-time JSON を日付順にスナップショットに変換する"""
+    data_dir = Path(__file__).parent.parent / args.data_dir
+    for date_dir in _date_dirs(data_dir):
+        all_time = _latest(date_dir, ALL_TIME_PREFIX)
+        if all_time is None or find_delta(data_dir, date_dir.name):
+            continue
+        data = load_snapshot(all_time)
+        timestamp = all_time.stem[len(ALL_TIME_PREFIX):]
+        if args.dry_run:
+            print(f"[DRY RUN] Would convert {date_dir.name}/{all_time.name}")
+            continue
+        write_snapshot(
+            data_dir, date_dir.name, load_all_time_json(all_time),
+            timestamp, data.get("generated_at"), data.get("watermark"),
+            keyframe_every=args.keyframe_every, verbose=True,
+        )
+
+
+def cmd_show(args) -> None:
+    """指定日の累積値を復元して表示する"""
+    players, last = reconstruct(Path(__file__).parent.parent / args.data_dir, args.date)
+    if last is None:
+        print(f"No snapshot on or before {args.date}")
+        return
+    print(f"Reconstructed {args.date} from {last['kind']} {last['date']} ({len(players)} players)")
+    for player in sorted(players.values(), key=lambda p: -p["raw_totals"]["hands"])[:args.top]:
+        totals = player["raw_totals"]
+        print(f"  {player['display_name']}: {totals['hands']} hands, {totals['net_cbb'] / 100:+.1f} BB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="キーフレーム + 差分形式のスナップショットを管理")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="既存の all-time JSON からスナップショットを作成")
+    convert.add_argument("--keyframe-every", type=int, default=DEFAULT_KEYFRAME_EVERY,
+                         help=f"キーフレームの間隔（セッション数, default: {DEFAULT_KEYFRAME_EVERY}）")
+    convert.add_argument("--dry-run", action="store_true", help="実際にファイルを書き込まない")
+    convert.set_defaults(func=cmd_convert)
+
+    show = sub.add_parser("show", help="指定日の累積値を復元して表示")
+    show.add_argument("--date", required=True, help="日付 YYYYMMDD")
+    show.add_argument("--top", type=int, default=10, help="表示するプレイヤー数 (default: 10)")
+    show.set_defaults(func=cmd_show)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
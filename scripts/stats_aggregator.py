@@ -4,19 +4,29 @@
 """
 
 import csv
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
-from hand_analysis import PlayerStats, StatsCalculator
+from hand_analysis import PlayerStats, StatsCalculator, calculate_players
 from csv_formatter import PokerNowParser, LedgerParser, extract_player_id_map
 from config_loader import ConfigLoader
 from player_registry import PlayerRegistry
 from precalc_importer import PreCalcImporter
+from prefix_stats import PrefixStatsStore
+from hand_fingerprints import DEFAULT_INDEX_PATH, FingerprintIndex
+from dataset_manifest import DatasetManifest, file_sha256
+from preflop_ranges import log_holdings
+from session_spill import SessionSpill
+import snapshot_store
 
 
 BB_SIZE = 20  # 1BB = 20チップ
+# --workers でログのハンドを分けるときの1範囲あたりの最小ハンド数。calculate_players は1ハンド約1.2ms、
+# プロセスへの受け渡しは1範囲約1.5ms（data/hand_histories の127ログで計測）なので、10ハンドあれば分ける方が速い
+PARALLEL_MIN_CHUNK_HANDS = 10
 
 
 @dataclass
@@ -29,6 +39,8 @@ class SessionInfo:
     season_id: Optional[int] = None
     stats_json_path: Optional[Path] = None
     is_precalculated: bool = False
+    # True: stats_json_path がセッション単位の JSON（累積差分の計算が不要）
+    is_session_scoped: bool = False
 
 
 class StatsAggregator:
@@ -38,7 +50,7 @@ class StatsAggregator:
         "player_id", "プレイヤー", "リーグ", "収支", "bb_size", "ハンド数", "参加節数",
         "VPIP", "VPIP_hands", "PFR", "PFR_hands", "3bet", "3bet_hands",
         "Fold to 3bet", "Fold to 3bet_hands", "CB", "CB_hands",
-        "WTSD", "WTSD_hands", "W$SD", "W$SD_hands"
+        "WTSD", "WTSD_hands", "W$SD", "W$SD_hands", "EV収支"
     ]
 
     SESSION_STATS_HEADERS = [
@@ -46,7 +58,7 @@ class StatsAggregator:
         "収支", "bb_size", "ハンド数",
         "VPIP", "VPIP_hands", "PFR", "PFR_hands", "3bet", "3bet_hands",
         "Fold to 3bet", "Fold to 3bet_hands", "CB", "CB_hands",
-        "WTSD", "WTSD_hands", "W$SD", "W$SD_hands"
+        "WTSD", "WTSD_hands", "W$SD", "W$SD_hands", "EV収支"
     ]
 
     RAW_CSV_HEADERS = [
@@ -57,7 +69,7 @@ class StatsAggregator:
         "Fold to 3bet", "Fold_to_3bet_count", "Fold_to_3bet_hands",
         "CB", "CB_count", "CB_hands",
         "WTSD", "WTSD_count", "WTSD_hands",
-        "W$SD", "W$SD_count", "W$SD_hands"
+        "W$SD", "W$SD_count", "W$SD_hands", "EV収支", "ev_adjustment"
     ]
 
     RAW_SESSION_STATS_HEADERS = [
@@ -69,11 +81,13 @@ class StatsAggregator:
         "Fold to 3bet", "Fold_to_3bet_count", "Fold_to_3bet_hands",
         "CB", "CB_count", "CB_hands",
         "WTSD", "WTSD_count", "WTSD_hands",
-        "W$SD", "W$SD_count", "W$SD_hands"
+        "W$SD", "W$SD_count", "W$SD_hands", "EV収支", "ev_adjustment"
     ]
 
     def __init__(self, config_loader: ConfigLoader, player_registry: PlayerRegistry,
-                 data_dir: str = "data", verbose: bool = False):
+                 data_dir: str = "data", verbose: bool = False, table_cache: Optional[dict] = None,
+                 seasons: Optional[set] = None, since: Optional[str] = None,
+                 session_spill: Optional[SessionSpill] = None, workers: int = 0):
         self.config = config_loader
         self.registry = player_registry
         self.data_dir = Path(data_dir)
@@ -100,6 +114,31 @@ class StatsAggregator:
         self.session_dates_by_season: Dict[int, set] = {}
         # 凍結シーズンのプレイヤー参加節数: season_id -> player_id -> count
         self.frozen_player_session_counts: Dict[int, Dict[str, int]] = {}
+        # 節別スタッツの累積ストア（prefix_store() で作成）
+        self._prefix_store: Optional[PrefixStatsStore] = None
+        # ハンド指紋インデックスと、スキップした重複ハンド: ログ -> 持ち主のログ -> ハンド数
+        self.fingerprints = FingerprintIndex.load(self.data_dir / DEFAULT_INDEX_PATH)
+        self.duplicate_hands: Dict[str, Dict[str, int]] = {}
+        # hand_histories のマニフェスト（get_manifest() で作成）
+        self.manifest: Optional[DatasetManifest] = None
+        # テーブル単位のパース・計算結果: ログ -> 結果（watch モードで集計をやり直すときに使い回す）
+        self.table_cache = table_cache
+        # 集計し直す範囲（--season / --since）。範囲外の日付は session_stats_raw.csv から復元する
+        self.seasons = set(seasons) if seasons else None
+        self.since = since
+        # 範囲内で集計し直したシーズン
+        self.rebuilt_season_ids: set = set()
+        # レンジ表（preflop_ranges.build_ranges）用に、読んだログの見せたハンド:
+        # 日付 -> テーブルごとの {"source", "sha256", "fingerprints", "holdings"}（raw ID、重複ハンドも含む）
+        self.holdings: Dict[str, List[dict]] = {}
+        # ストリーミング集計（--stream）: 集計の終わった節は stats_by_session から一時ファイルに移し、
+        # 参加日セットの代わりに参加節数だけを数える
+        self.session_spill = session_spill
+        self.player_session_counts: Dict[str, int] = {}
+        self.player_session_counts_by_season: Dict[int, Dict[str, int]] = {}
+        # 1つのログのハンドを分けてスタッツ計算するプロセス数（0 なら逐次）。プールは最初に使うときに作る
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
 
     def discover_sessions(self) -> List[SessionInfo]:
         """
@@ -107,10 +146,14 @@ class StatsAggregator:
 
         凍結シーズンはスキップする。
         日付ディレクトリ直下にJSONがあれば計算済みセッションとして扱う。
+        セッション単位のJSON（fetch_stats.py --scope session）、
+        スナップショットの差分ファイル、累積JSONの順に優先する。
 
         ディレクトリ構造:
             hand_histories/
                 {YYYYMMDD}/
+                    player-stats-session-*.json   (セッション単位の計算済みスタッツ)
+                    player-stats-delta-*.json     (前回スナップショットからの差分)
                     player-stats-all-time-*.json  (計算済みスタッツ)
                     {table{N} または YYYYMMDD_table{N}}/
                         poker_now_log_*.csv
@@ -124,23 +167,19 @@ class StatsAggregator:
                 print(f"Warning: {hand_histories_dir} does not exist")
             return sessions
 
-        # 日付ディレクトリを走査
-        for date_dir in sorted(hand_histories_dir.iterdir()):
-            if not date_dir.is_dir():
-                continue
+        manifest = self.get_manifest()
+        if self.verbose:
+            for name in manifest.ignored:
+                print(f"Warning: Cannot parse date from {name}")
 
-            # ディレクトリ名から日付を抽出 (例: 20260112)
-            date_str = date_dir.name
-            try:
-                date = datetime.strptime(date_str, "%Y%m%d")
-            except ValueError:
-                if self.verbose:
-                    print(f"Warning: Cannot parse date from {date_str}")
-                continue
+        # 日付ディレクトリを走査（マニフェストから）
+        for date_str in manifest.date_strs():
+            date_dir = hand_histories_dir / date_str
+            date = datetime.strptime(date_str, "%Y%m%d")
 
             # シーズンを特定
-            season_config = self.config.get_season_by_date(date)
-            season_id = season_config["id"] if season_config else None
+            season_id = manifest.season_id(date_str)
+            season_config = self.config.get_season_by_id(season_id) if season_id is not None else None
 
             # 凍結シーズンはスキップ
             if season_config and season_config.get("frozen"):
@@ -149,7 +188,11 @@ class StatsAggregator:
                 continue
 
             # 日付ディレクトリ直下の計算済みJSON を検索
-            json_files = sorted(date_dir.glob("player-stats-all-time-*.json"))
+            session_json_files = (
+                manifest.date_files(date_str, "player-stats-session-")
+                or manifest.date_files(date_str, snapshot_store.DELTA_PREFIX)
+            )
+            json_files = session_json_files or manifest.date_files(date_str, "player-stats-all-time-")
             if json_files:
                 session = SessionInfo(
                     date=date,
@@ -157,35 +200,23 @@ class StatsAggregator:
                     season_id=season_id,
                     stats_json_path=json_files[-1],  # 最新のJSONを使用
                     is_precalculated=True,
+                    is_session_scoped=bool(session_json_files),
                 )
                 sessions.append(session)
                 if self.verbose:
                     print(f"Found precalculated JSON: {json_files[-1].name}")
                 continue  # JSONがあればテーブルディレクトリはスキップ
 
-            # テーブルディレクトリを走査
-            for table_dir in sorted(date_dir.iterdir()):
-                if not table_dir.is_dir():
-                    continue
-
-                # テーブルディレクトリ名の検証 (table{N} または YYYYMMDD_table{N})
-                table_name = table_dir.name
-                if not ("table" in table_name.lower()):
-                    if self.verbose:
-                        print(f"Warning: Skipping non-table directory {table_name}")
-                    continue
-
-                session = SessionInfo(date=date, session_dir=table_dir, season_id=season_id)
-
-                # テーブルディレクトリ直下のCSVファイルを検索
-                csv_files = list(table_dir.glob("poker_now_log_*.csv"))
-                if csv_files:
-                    session.csv_path = csv_files[0]
-
-                ledger_files = list(table_dir.glob("ledger_*.csv"))
-                if ledger_files:
-                    session.ledger_path = ledger_files[0]
-
+            # テーブルディレクトリ (table{N} または YYYYMMDD_table{N})
+            if self.verbose:
+                for name in manifest.subdirs(date_str):
+                    if "table" not in name.lower():
+                        print(f"Warning: Skipping non-table directory {name}")
+
+            for table_name in manifest.table_dirs(date_str):
+                session = SessionInfo(date=date, session_dir=date_dir / table_name, season_id=season_id)
+                session.csv_path = manifest.table_file(date_str, table_name, "poker_now_log_")
+                session.ledger_path = manifest.table_file(date_str, table_name, "ledger_")
                 sessions.append(session)
 
         return sessions
@@ -194,6 +225,9 @@ class StatsAggregator:
         """
         1セッションを処理してスタッツを計算
 
+        table_cache があり、ログの内容（マニフェストのハッシュ）と取り込むハンドが前回と同じなら
+        パース・スタッツ計算をせずに前回の結果を使う（ID 変換・リーグ・Ledger は毎回適用する）。
+
         Returns:
             tuple: (session_stats: Dict[str, PlayerStats], unique_hands: int)
         """
@@ -205,35 +239,50 @@ class StatsAggregator:
                 print(f"  Warning: No CSV file found")
             return {}, 0
 
-        # CSVをパース
-        parser = PokerNowParser(str(session.csv_path))
-        formatted_text, player_names = parser.parse()
-
-        # パース済みのテキストを使用（csv.readerでクォートが正しく処理されている）
-        raw_text = parser.raw_text
+        source = self._log_source(session.csv_path)
+        info = self.get_manifest().file_info(session.csv_path) or {}
+        cached = self.table_cache.get(source) if self.table_cache is not None else None
+        if cached is not None and cached["sha256"] == info.get("sha256"):
+            kept = self._claim_hands(source, cached["fingerprints"])
+            table = cached if kept == cached["kept"] else self._parse_table(session, source, kept)
+        else:
+            table = self._parse_table(session, source)
+        if self.table_cache is not None and info.get("sha256"):
+            table["sha256"] = info["sha256"]
+            self.table_cache[source] = table
+        self._record_holdings(f"{session.date:%Y%m%d}", source, info.get("sha256"), table)
+
+        return self._apply_table(session, table, self._read_ledger(session))
+
+    def _read_ledger(self, session: SessionInfo) -> Optional[Dict[str, int]]:
+        """Ledger の収支（raw ID -> チップ）。Ledger が無ければ None"""
+        if not session.ledger_path or not session.ledger_path.exists():
+            return None
+        ledger_data = LedgerParser(str(session.ledger_path)).parse()
+        return {player_id: info["net"] for player_id, info in ledger_data.items()}
 
-        # ID変更を検出
-        self.registry.process_id_changes(raw_text)
+    def _apply_table(self, session: SessionInfo, table: dict,
+                     ledger: Optional[Dict[str, int]]) -> tuple:
+        """
+        テーブルの結果（_parse_table）に ID 変換・リーグ・Ledger の収支を適用する
 
-        # プレイヤーIDマップを取得
-        player_id_map = extract_player_id_map(raw_text)
+        Returns:
+            tuple: (session_stats: Dict[str, PlayerStats], unique_hands: int)
+        """
+        # ID変更を登録
+        for change in table["id_changes"]:
+            self.registry.register_id_change(change["old_id"], change["new_id"], change["display_name"])
 
-        # ハンド履歴を取得
-        histories = [h for h in formatted_text.split("\n\n") if h.strip()]
-        if not histories:
+        unique_hands = table["unique_hands"]
+        if not unique_hands:
             if self.verbose:
                 print(f"  Warning: No hands found")
             return {}, 0
 
-        unique_hands = len(histories)
-
-        # スタッツ計算
-        calculator = StatsCalculator(histories)
-        all_players = calculator.get_all_players()
-
+        player_id_map = table["player_id_map"]
         session_stats = {}
-        for player_name in all_players:
-            stats = calculator.calculate_all(player_name)
+        for player_name, table_stats in table["player_stats"].items():
+            stats = replace(table_stats)
             raw_player_id = player_id_map.get(player_name, player_name)
             # canonical_id に変換して一貫したIDを使用
             canonical_id = self.registry.get_canonical_id(raw_player_id)
@@ -258,13 +307,10 @@ class StatsAggregator:
                 session_stats[canonical_id] = stats
 
         # Ledgerから収支を取得（チップ → BB 変換）
-        if session.ledger_path and session.ledger_path.exists():
-            ledger_parser = LedgerParser(str(session.ledger_path))
-            ledger_data = ledger_parser.parse()
-
-            for player_id, ledger_info in ledger_data.items():
+        if ledger is not None:
+            for player_id, net in ledger.items():
                 canonical_id = self.registry.get_canonical_id(player_id)
-                net_bb = ledger_info["net"] / BB_SIZE
+                net_bb = net / BB_SIZE
                 if canonical_id in session_stats:
                     session_stats[canonical_id].net = net_bb
                 elif player_id in session_stats:
@@ -275,10 +321,123 @@ class StatsAggregator:
 
         return session_stats, unique_hands
 
+    def _record_holdings(self, date_str: str, source: str, sha256: Optional[str], table: dict) -> None:
+        """テーブルの見せたハンドを raw ID にして holdings に加える"""
+        player_id_map = table["player_id_map"]
+        self.holdings.setdefault(date_str, []).append({
+            "source": source,
+            "sha256": sha256,
+            "fingerprints": table["fingerprints"],
+            "holdings": [
+                (hand, player_id_map.get(name, name), action, first, second)
+                for hand, name, action, first, second in table["holdings"]
+            ],
+        })
+
+    def _parse_table(self, session: SessionInfo, source: str, kept: Optional[List[bool]] = None) -> dict:
+        """
+        ログをパースし、取り込むハンドからプレイヤー名ごとのスタッツを計算する（ID 変換前）
+
+        kept を渡した場合は指紋の確認を済ませたものとしてそのまま使う。
+        レンジ表用の見せたハンド（holdings）は、重複の判定を preflop_ranges でやり直すので全ハンドから集める。
+        """
+        parser = PokerNowParser(str(session.csv_path))
+        formatted_text, _ = parser.parse()
+
+        # パース済みのテキストを使用（csv.readerでクォートが正しく処理されている）
+        raw_text = parser.raw_text
+
+        # ハンド履歴を取得（他のログ・同じログ内で取り込み済みのハンドはスキップ）
+        histories = [h for h in formatted_text.split("\n\n") if h.strip()]
+        holdings = log_holdings(histories, parser.dealt_player)
+        if kept is None:
+            kept = self._claim_hands(source, parser.hand_fingerprints)
+        histories = [history for history, keep in zip(histories, kept) if keep]
+
+        return {
+            "fingerprints": parser.hand_fingerprints,
+            "kept": kept,
+            "id_changes": self.registry.detect_id_changes(raw_text),
+            "player_id_map": extract_player_id_map(raw_text),
+            "player_stats": self._calculate_player_stats(histories),
+            "unique_hands": len(histories),
+            "holdings": holdings,
+        }
+
+    def _calculate_player_stats(self, histories: List[str]) -> Dict[str, PlayerStats]:
+        """
+        プレイヤー名ごとのスタッツを計算する
+
+        workers があれば、ハンドを最大 workers 個（1範囲 PARALLEL_MIN_CHUNK_HANDS ハンド以上）の連続した範囲に
+        分けて並行に計算し、範囲の順に足し合わせる（結果は逐次の計算と一致する）。プレイヤー名・ID の対応と
+        ID 変更はログ全体から求めるので、範囲の境目の影響を受けない。
+        """
+        players = StatsCalculator(histories).get_all_players()
+        chunks = min(self.workers, len(histories) // PARALLEL_MIN_CHUNK_HANDS)
+        if chunks < 2:
+            return calculate_players(histories, players)
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers)
+        size = -(-len(histories) // chunks)
+        futures = [
+            self._pool.submit(calculate_players, histories[start:start + size], players)
+            for start in range(0, len(histories), size)
+        ]
+        player_stats = {name: PlayerStats(display_name=name) for name in players}
+        for future in futures:
+            for name, stats in future.result().items():
+                player_stats[name].merge(stats)
+        return player_stats
+
+    def close(self) -> None:
+        """スタッツ計算のプロセスプールを閉じる"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _claim_hands(self, source: str, fingerprints: List[str]) -> List[bool]:
+        """ログの各ハンドを集計するか（指紋インデックスで重複を確認し、スキップ数を記録）"""
+        kept = []
+        for fingerprint in fingerprints:
+            owner = self.fingerprints.claim(fingerprint, source)
+            kept.append(owner is None)
+            if owner is not None:
+                counts = self.duplicate_hands.setdefault(source, {})
+                counts[owner] = counts.get(owner, 0) + 1
+        if self.verbose and source in self.duplicate_hands:
+            for owner, count in self.duplicate_hands[source].items():
+                print(f"  Skipped {count} duplicate hands (already in {owner})")
+        return kept
+
+    def get_manifest(self) -> DatasetManifest:
+        """hand_histories のマニフェスト（初回呼び出しで変更のあったファイルだけ読み直す）"""
+        if self.manifest is None:
+            self.manifest = DatasetManifest.refresh(self.data_dir, self.config, save=False,
+                                                    verbose=self.verbose)
+        return self.manifest
+
+    def save_manifest(self) -> Path:
+        """マニフェストを保存する（次回の走査で変更のないファイルを読み直さない）"""
+        return self.get_manifest().save()
+
+    def _log_source(self, csv_path: Path) -> str:
+        """指紋インデックスでのログの名前（data_dir からの相対パス）"""
+        try:
+            return csv_path.relative_to(self.data_dir).as_posix()
+        except ValueError:
+            return csv_path.as_posix()
+
+    def save_fingerprints(self) -> Path:
+        """ハンド指紋インデックスを保存する"""
+        self.fingerprints.save()
+        return self.fingerprints.path
+
     def _accumulate_session(self, session_stats: Dict[str, PlayerStats],
                             date_str: str, season_id: Optional[int],
                             unique_hands: int = 0) -> None:
         """セッションデータを蓄積する"""
+        self._flush_sessions(keep=date_str)
         # ユニークハンド数を加算
         self.total_unique_hands += unique_hands
         if season_id:
@@ -303,11 +462,12 @@ class StatsAggregator:
                 )
                 self.stats_by_session[date_str][player_id].merge(stats)
 
-            # プレイヤーの参加日を記録
-            self.player_session_dates.setdefault(player_id, set()).add(date_str)
+            # プレイヤーの参加日を記録（ストリーミング集計では節を書き出すときに数える）
+            if self.session_spill is None:
+                self.player_session_dates.setdefault(player_id, set()).add(date_str)
 
             # シーズン別の参加日を記録
-            if season_id:
+            if season_id and self.session_spill is None:
                 self.player_session_dates_by_season.setdefault(season_id, {})
                 self.player_session_dates_by_season[season_id].setdefault(
                     player_id, set()
@@ -337,30 +497,67 @@ class StatsAggregator:
                 )
                 self.all_stats[player_id].merge(stats)
 
+    def _flush_sessions(self, keep: Optional[str] = None) -> None:
+        """
+        ストリーミング集計で、keep 以外の節を一時ファイルに書き出して stats_by_session から消す
+
+        節は日付ごとにまとまって届く（凍結シーズン・計算済み JSON・ハンド履歴ログのどれも日付順）ので、
+        別の日付が届いた時点でそれまでの節は終わっている。
+        """
+        if self.session_spill is None:
+            return
+        if keep is not None and keep not in self.stats_by_session and keep in self.session_spill:
+            raise ValueError(f"{keep} の節は書き出し済みです（ストリーミング集計では同じ日付を続けて集計する必要があります）")
+        for date_str in [d for d in self.stats_by_session if d != keep]:
+            players = self.stats_by_session.pop(date_str)
+            season_id = self.session_season_map.get(date_str)
+            sorted_players = sorted(players.values(), key=self._hands_order)
+            self.session_spill.append(
+                date_str, season_id,
+                [self._session_row(date_str, season_id or "", stats) for stats in sorted_players],
+                [self._raw_session_row(date_str, season_id or "", stats) for stats in sorted_players],
+            )
+            for player_id in players:
+                self.player_session_counts[player_id] = self.player_session_counts.get(player_id, 0) + 1
+                if season_id:
+                    season_counts = self.player_session_counts_by_season.setdefault(season_id, {})
+                    season_counts[player_id] = season_counts.get(player_id, 0) + 1
+
     def _find_baseline_json(self, before_date: datetime) -> Optional[Path]:
-        """指定日付より前の最新の累積JSONを探す（前シーズンのベースライン用）"""
+        """
+        指定日付より前の最新の累積JSONを探す（前シーズンのベースライン用）
+
+        スナップショットの差分ファイルがあればそれを返す
+        （PreCalcImporter.import_cumulative でキーフレームから累積値を復元する）。
+        """
         hand_histories_dir = self.data_dir / "hand_histories"
         if not hand_histories_dir.exists():
             return None
 
+        manifest = self.get_manifest()
+        before_str = before_date.strftime("%Y%m%d")
         candidate = None
-        for date_dir in sorted(hand_histories_dir.iterdir(), reverse=True):
-            if not date_dir.is_dir():
-                continue
-            try:
-                dir_date = datetime.strptime(date_dir.name, "%Y%m%d")
-            except ValueError:
+        for date_str in reversed(manifest.date_strs()):
+            if date_str >= before_str:
                 continue
-            if dir_date >= before_date:
-                continue
-            json_files = sorted(date_dir.glob("player-stats-all-time-*.json"))
+            json_files = (
+                manifest.date_files(date_str, snapshot_store.DELTA_PREFIX)
+                or manifest.date_files(date_str, "player-stats-all-time-")
+            )
             if json_files:
                 candidate = json_files[-1]
                 break
         return candidate
 
-    def _process_precalculated_sessions(self, sessions: List[SessionInfo]) -> None:
-        """計算済みJSONセッションを処理する"""
+    def _process_precalculated_sessions(self, sessions: List[SessionInfo],
+                                        restored: Optional[Dict[str, Dict[str, PlayerStats]]] = None) -> None:
+        """
+        計算済みJSONセッションを処理する
+
+        restored にある日付（--season / --since の範囲外）は、累積差分の基準を進めるために JSON は読むが、
+        集計には復元した節別データを使う。
+        """
+        restored = restored or {}
         if not sessions:
             return
 
@@ -376,10 +573,12 @@ class StatsAggregator:
             season_config = self.config.get_season_by_id(season_id)
 
             # 前シーズンの最終累積JSONをベースラインとして使用
+            # （全てセッション単位のJSONなら差分計算をしないので不要）
             first_date = sorted_sessions[0].date
-            baseline_json = self._find_baseline_json(first_date)
+            needs_baseline = any(not s.is_session_scoped for s in sorted_sessions)
+            baseline_json = self._find_baseline_json(first_date) if needs_baseline else None
             if baseline_json:
-                previous_cumulative = importer.import_json(baseline_json, season_id)
+                previous_cumulative = importer.import_cumulative(baseline_json, season_id)
                 if self.verbose:
                     print(f"  Using baseline from {baseline_json.parent.name} ({len(previous_cumulative)} players)")
             else:
@@ -414,6 +613,29 @@ class StatsAggregator:
                 if self.verbose:
                     print(f"Processing precalculated session: {date_str}")
 
+                if session.is_session_scoped:
+                    # セッション単位のJSONはそのままセッション別データになる
+                    session_delta = importer.import_json(session.stats_json_path, season_id)
+                    if season_config:
+                        for pid, stats in session_delta.items():
+                            stats.league = self.config.get_player_league(
+                                pid, season_config
+                            )
+                    if self.verbose:
+                        print(f"  Found {len(session_delta)} players in session JSON")
+                    self._accumulate_session(restored.get(date_str, session_delta), date_str, season_id)
+
+                    # 後続に累積JSONのセッションがあれば差分の基準になるよう累積を進める
+                    if previous_cumulative is None:
+                        previous_cumulative = {}
+                    for pid, stats in session_delta.items():
+                        prev = previous_cumulative.setdefault(pid, PlayerStats(
+                            player_id=stats.player_id,
+                            display_name=stats.display_name,
+                        ))
+                        prev.merge(stats)
+                    continue
+
                 current_cumulative = importer.import_json(
                     session.stats_json_path, season_id
                 )
@@ -451,10 +673,52 @@ class StatsAggregator:
                     print(f"  Found {len(session_delta)} players in session delta")
 
                 # 蓄積
-                self._accumulate_session(session_delta, date_str, season_id)
+                self._accumulate_session(restored.get(date_str, session_delta), date_str, season_id)
 
                 previous_cumulative = current_cumulative
 
+    @staticmethod
+    def _stats_from_raw_row(row: Dict[str, str]) -> PlayerStats:
+        """
+        raw counts CSV（シーズン別・節別）の1行から PlayerStats を復元する
+
+        補正は丸めていない ev_adjustment の列から読む（--season / --since で範囲外の節を復元しても
+        全体の再集計と同じ値になるように）。ev_adjustment の列が無ければ EV収支 - 収支とする。
+        どちらも空（計算済み JSON の節や、補正を計算していない凍結シーズン）なら補正は無い
+        （ev_hands = 0 で、出力の EV収支も空になる）。
+        """
+        net = float(row["収支"].replace("+", ""))
+        hands = int(row["ハンド数"])
+        ev_net = row.get("EV収支")
+        if row.get("ev_adjustment"):
+            ev_adjustment, ev_hands = float(row["ev_adjustment"]), hands
+        elif ev_net:
+            ev_adjustment, ev_hands = float(ev_net.replace("+", "")) - net, hands
+        else:
+            ev_adjustment, ev_hands = 0, 0
+        return PlayerStats(
+            player_id=row["player_id"],
+            display_name=row["プレイヤー"],
+            league=row["リーグ"],
+            net=net,
+            ev_adjustment=ev_adjustment,
+            ev_hands=ev_hands,
+            hands=hands,
+            vpip_count=int(row["VPIP_count"]),
+            vpip_hands=int(row["VPIP_hands"]),
+            pfr_count=int(row["PFR_count"]),
+            pfr_hands=int(row["PFR_hands"]),
+            three_bet_count=int(row["3bet_count"]),
+            three_bet_hands=int(row["3bet_hands"]),
+            fold_to_3bet_count=int(row["Fold_to_3bet_count"]),
+            fold_to_3bet_hands=int(row["Fold_to_3bet_hands"]),
+            cb_count=int(row["CB_count"]),
+            cb_hands=int(row["CB_hands"]),
+            wtsd_count=int(row["WTSD_count"]),
+            wtsd_hands=int(row["WTSD_hands"]),
+            wdsd_count=int(row["W$SD_count"]),
+        )
+
     def load_frozen_season(self, season_id: int) -> None:
         """凍結シーズンのraw counts CSVを読み込みスタッツを復元する"""
         raw_csv_path = self.data_dir / f"season_{season_id}_stats_raw.csv"
@@ -472,27 +736,7 @@ class StatsAggregator:
             reader = csv.DictReader(f)
             for row in reader:
                 player_id = row["player_id"]
-                net_str = row["収支"].replace("+", "")
-                stats = PlayerStats(
-                    player_id=player_id,
-                    display_name=row["プレイヤー"],
-                    league=row["リーグ"],
-                    net=float(net_str),
-                    hands=int(row["ハンド数"]),
-                    vpip_count=int(row["VPIP_count"]),
-                    vpip_hands=int(row["VPIP_hands"]),
-                    pfr_count=int(row["PFR_count"]),
-                    pfr_hands=int(row["PFR_hands"]),
-                    three_bet_count=int(row["3bet_count"]),
-                    three_bet_hands=int(row["3bet_hands"]),
-                    fold_to_3bet_count=int(row["Fold_to_3bet_count"]),
-                    fold_to_3bet_hands=int(row["Fold_to_3bet_hands"]),
-                    cb_count=int(row["CB_count"]),
-                    cb_hands=int(row["CB_hands"]),
-                    wtsd_count=int(row["WTSD_count"]),
-                    wtsd_hands=int(row["WTSD_hands"]),
-                    wdsd_count=int(row["W$SD_count"]),
-                )
+                stats = self._stats_from_raw_row(row)
 
                 season_stats[player_id] = stats
 
@@ -537,28 +781,8 @@ class StatsAggregator:
             for row in reader:
                 date_str = row["session_date"]
                 player_id = row["player_id"]
-                net_str = row["収支"].replace("+", "")
-
-                stats = PlayerStats(
-                    player_id=player_id,
-                    display_name=row["プレイヤー"],
-                    league=row["リーグ"],
-                    net=float(net_str),
-                    hands=int(row["ハンド数"]),
-                    vpip_count=int(row["VPIP_count"]),
-                    vpip_hands=int(row["VPIP_hands"]),
-                    pfr_count=int(row["PFR_count"]),
-                    pfr_hands=int(row["PFR_hands"]),
-                    three_bet_count=int(row["3bet_count"]),
-                    three_bet_hands=int(row["3bet_hands"]),
-                    fold_to_3bet_count=int(row["Fold_to_3bet_count"]),
-                    fold_to_3bet_hands=int(row["Fold_to_3bet_hands"]),
-                    cb_count=int(row["CB_count"]),
-                    cb_hands=int(row["CB_hands"]),
-                    wtsd_count=int(row["WTSD_count"]),
-                    wtsd_hands=int(row["WTSD_hands"]),
-                    wdsd_count=int(row["W$SD_count"]),
-                )
+                stats = self._stats_from_raw_row(row)
+                self._flush_sessions(keep=date_str)
 
                 # stats_by_session に追加
                 if date_str not in self.stats_by_session:
@@ -568,6 +792,10 @@ class StatsAggregator:
                 # session_season_map に追加
                 self.session_season_map[date_str] = season_id
 
+                row_count += 1
+                if self.session_spill is not None:
+                    continue
+
                 # player_session_dates に追加
                 self.player_session_dates.setdefault(player_id, set()).add(date_str)
 
@@ -577,12 +805,10 @@ class StatsAggregator:
                     player_id, set()
                 ).add(date_str)
 
-                row_count += 1
-
         if self.verbose:
             sessions_loaded = len({
-                d for d in self.stats_by_session
-                if self.session_season_map.get(d) == season_id
+                d for d in self.session_season_map
+                if self.session_season_map[d] == season_id
             })
             print(f"  Loaded {row_count} rows across {sessions_loaded} sessions")
 
@@ -596,24 +822,22 @@ class StatsAggregator:
         if not hand_histories_dir.exists():
             return
 
-        for date_dir in sorted(hand_histories_dir.iterdir()):
-            if not date_dir.is_dir():
-                continue
-            date_str = date_dir.name
-            try:
-                date = datetime.strptime(date_str, "%Y%m%d")
-            except ValueError:
-                continue
-            season_config = self.config.get_season_by_date(date)
-            if season_config:
-                season_id = season_config["id"]
+        manifest = self.get_manifest()
+        for date_str in manifest.date_strs():
+            season_id = manifest.season_id(date_str)
+            if season_id is not None:
                 self.session_dates_by_season.setdefault(season_id, set()).add(date_str)
 
         for season_id, dates in self.session_dates_by_season.items():
             self.session_counts_by_season[season_id] = len(dates)
 
-    def aggregate(self, sessions: List[SessionInfo]) -> None:
-        """全セッションを集計"""
+    def aggregate(self, sessions: List[SessionInfo], partial_tables: Optional[List[dict]] = None) -> None:
+        """
+        全セッションを集計
+
+        partial_tables（partial_aggregate.load_partials）を渡した場合、ハンド履歴ログのセッションは
+        ログを読まずに部分集計ファイルのテーブル単位の結果を使う（reduce）。
+        """
         # 1. 凍結シーズンを読み込み（集計 + 節別）
         for season_config in self.config.get_all_seasons():
             if season_config.get("frozen"):
@@ -628,21 +852,129 @@ class StatsAggregator:
         # 3. 日付ディレクトリを走査してセッション数を計算
         self._scan_session_dates()
 
+        # 範囲外（--season / --since）の日付は前回の出力から復元する
+        restored = self._load_restored_sessions(sessions)
+        self.rebuilt_season_ids = {
+            s.season_id for s in sessions
+            if s.season_id is not None and s.date.strftime("%Y%m%d") not in restored
+        }
+
         # 4. 計算済みセッションを処理
-        self._process_precalculated_sessions(precalc_sessions)
+        self._process_precalculated_sessions(precalc_sessions, restored)
 
         # 5. 通常セッションを処理
-        for session in regular_sessions:
-            session_stats, unique_hands = self.process_session(session)
-            date_str = session.date.strftime("%Y%m%d")
-            self._accumulate_session(session_stats, date_str, session.season_id, unique_hands)
+        if partial_tables is not None:
+            self._process_partial_tables(partial_tables)
+        else:
+            sources = {s.date.strftime("%Y%m%d"): [] for s in regular_sessions}
+            for s in regular_sessions:
+                if s.csv_path:
+                    sources[s.date.strftime("%Y%m%d")].append(self._log_source(s.csv_path))
+            # 読み直さないログのハンドは前回の持ち主のまま残す（範囲内のログでは重複としてスキップする）。
+            # 読み直すログは日付・テーブル名の順に claim するので、持ち主はその順で最初のログになる
+            self.fingerprints.retain_sources(
+                source for date_str, names in sources.items() if date_str in restored for source in names
+            )
+            restored_dates = set()
+            for session in regular_sessions:
+                date_str = session.date.strftime("%Y%m%d")
+                if date_str in restored:
+                    # 同じ日付の最初のテーブルの位置で、日付分をまとめて取り込む
+                    if date_str not in restored_dates:
+                        self._accumulate_session(restored[date_str], date_str, session.season_id)
+                        restored_dates.add(date_str)
+                    continue
+                session_stats, unique_hands = self.process_session(session)
+                self._accumulate_session(session_stats, date_str, session.season_id, unique_hands)
+        self._flush_sessions()
 
-        # 6. 全体のセッション数を更新（_scan_session_dates で設定済みの値から算出）
+        # 6. 全体のセッション数を更新（_scan_session_dates で設定済みの値に、部分集計だけにある日付を加えて算出）
         all_dates = set()
-        for dates in self.session_dates_by_season.values():
+        for season_id, dates in self.session_dates_by_season.items():
+            self.session_counts_by_season[season_id] = len(dates)
             all_dates.update(dates)
         self.total_session_count = len(all_dates)
 
+    def in_scope(self, date_str: str, season_id: Optional[int]) -> bool:
+        """日付が集計し直す範囲（--season / --since）に入るか"""
+        if self.seasons is not None and season_id not in self.seasons:
+            return False
+        return self.since is None or date_str >= self.since
+
+    def _load_restored_sessions(self, sessions: List[SessionInfo]) -> Dict[str, Dict[str, PlayerStats]]:
+        """
+        範囲外の日付の節別データを session_stats_raw.csv から復元する（範囲の指定が無ければ空）
+
+        Returns:
+            日付 -> player_id -> PlayerStats（前回の出力に行が無い日付は空）
+        """
+        out_of_scope = {
+            s.date.strftime("%Y%m%d") for s in sessions
+            if not self.in_scope(s.date.strftime("%Y%m%d"), s.season_id)
+        }
+        if not out_of_scope:
+            return {}
+
+        path = self.data_dir / "session_stats_raw.csv"
+        if not path.exists():
+            raise ValueError(f"{path} がありません（範囲を指定する前に全体を集計してください）")
+
+        restored: Dict[str, Dict[str, PlayerStats]] = {date_str: {} for date_str in out_of_scope}
+        with open(path, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["session_date"] in restored:
+                    restored[row["session_date"]][row["player_id"]] = self._stats_from_raw_row(row)
+
+        for date_str in sorted(out_of_scope):
+            if not restored[date_str]:
+                print(f"Warning: {date_str} は {path.name} に無いので集計に含まれません（範囲に含めてください）")
+        if self.verbose:
+            print(f"Restored {len(out_of_scope)} sessions outside the rebuild range from {path.name}")
+        return restored
+
+    def _process_partial_tables(self, tables: List[dict]) -> None:
+        """
+        部分集計のテーブルを通常の実行と同じ順（日付・テーブル名順）に取り込む
+
+        重複ハンドの判定はここでやり直し、別のシャードのログと重複していて取り込むハンドが
+        map のときと変わったテーブルだけ、手元のログを読み直す。
+        """
+        sessions = []
+        for table in tables:
+            date = datetime.strptime(table["date"], "%Y%m%d")
+            season = self.config.get_season_by_date(date)
+            if season and season.get("frozen"):
+                continue
+            session = SessionInfo(
+                date=date,
+                session_dir=self.data_dir / "hand_histories" / table["date"] / table["table"],
+                season_id=season["id"] if season else None,
+            )
+            sessions.append((session, table))
+
+        for session, table in sessions:
+            if self.verbose:
+                print(f"Processing partial table: {table['source']}")
+            source = table["source"]
+            kept = self._claim_hands(source, table["fingerprints"])
+            if kept == table["kept"]:
+                parsed = dict(table, player_stats={
+                    name: PlayerStats(**counters) for name, counters in table["player_stats"].items()
+                })
+            else:
+                session.csv_path = self.data_dir / source
+                if not session.csv_path.exists() or file_sha256(str(session.csv_path)) != table["sha256"]:
+                    raise ValueError(
+                        f"{source}: 他のシャードのログと重複するハンドがあり、手元に同じログがないため"
+                        f"集計し直せません（重複するログを同じシャードで map してください）"
+                    )
+                if self.verbose:
+                    print(f"  Reparsing (duplicate hands in another shard)")
+                parsed = self._parse_table(session, source, kept)
+            self._record_holdings(table["date"], source, table["sha256"], parsed)
+            session_stats, unique_hands = self._apply_table(session, parsed, table["ledger"])
+            self._accumulate_session(session_stats, table["date"], session.season_id, unique_hands)
+
     def _update_all_stats_league(self) -> None:
         """全期間スタッツのリーグを最新シーズンの情報で更新する"""
         current_season = self.config.get_current_season()
@@ -651,7 +983,27 @@ class StatsAggregator:
         for player_id, stats in self.all_stats.items():
             stats.league = self.config.get_player_league(player_id, current_season)
 
-    def _format_net(self, net: float) -> str:
+    @staticmethod
+    def _hands_order(stats: PlayerStats) -> tuple:
+        """ハンド数の多い順（同数は player_id 順にして、集計の順序によらず同じ並びにする）"""
+        return (-stats.hands, stats.player_id)
+
+    @staticmethod
+    def _format_exact(value: float) -> str:
+        """丸めずに書く（repr は読み戻すと同じ float になる）"""
+        return "0" if value == 0 else repr(float(value))
+
+    def _format_ev_net(self, stats: PlayerStats, scale: int = 1) -> str:
+        """EV収支（補正を計算していないハンドがある場合は空）"""
+        ev_net = stats.ev_net
+        return "" if ev_net is None else self._format_net(ev_net * scale)
+
+    def _format_ev_adjustment(self, stats: PlayerStats) -> str:
+        """丸めていない補正（補正を計算していないハンドがある場合は空）"""
+        return "" if stats.ev_net is None else self._format_exact(stats.ev_adjustment)
+
+    @staticmethod
+    def _format_net(net: float) -> str:
         """収支をフォーマット（+/-付き、BB単位）"""
         rounded = round(net, 2)
         if rounded == 0:
@@ -664,6 +1016,9 @@ class StatsAggregator:
 
     def _get_season_session_counts(self, season_id: int) -> Dict[str, int]:
         """シーズン別のプレイヤー参加節数を取得する"""
+        # ストリーミング集計で数えた参加節数
+        if season_id in self.player_session_counts_by_season:
+            return self.player_session_counts_by_season[season_id]
         # アクティブセッションからの参加日数
         if season_id in self.player_session_dates_by_season:
             return {
@@ -681,10 +1036,13 @@ class StatsAggregator:
         # player_session_dates からの参加日数（アクティブ + 読込済み凍結セッション）
         for pid, dates in self.player_session_dates.items():
             counts[pid] = counts.get(pid, 0) + len(dates)
+        # ストリーミング集計で数えた参加節数
+        for pid, count in self.player_session_counts.items():
+            counts[pid] = counts.get(pid, 0) + count
         # 凍結シーズンの参加節数（節別データが読み込めなかったシーズンのみ）
         for season_id, player_counts in self.frozen_player_session_counts.items():
-            if season_id in self.player_session_dates_by_season:
-                continue  # 節別データが読込済みなので player_session_dates で計上済み
+            if season_id in self.player_session_dates_by_season or season_id in self.player_session_counts_by_season:
+                continue  # 節別データが読込済みなので player_session_dates（player_session_counts）で計上済み
             for pid, count in player_counts.items():
                 counts[pid] = counts.get(pid, 0) + count
         return counts
@@ -699,8 +1057,7 @@ class StatsAggregator:
             # ハンド数でソート
             sorted_stats = sorted(
                 stats_dict.values(),
-                key=lambda s: s.hands,
-                reverse=True
+                key=self._hands_order,
             )
 
             for stats in sorted_stats:
@@ -731,6 +1088,7 @@ class StatsAggregator:
                     stats.wtsd_hands,
                     stats.wdsd,
                     stats.wtsd_count,
+                    self._format_ev_net(stats, BB_SIZE),
                 ]
                 writer.writerow(row)
 
@@ -744,8 +1102,7 @@ class StatsAggregator:
             # ハンド数でソート
             sorted_stats = sorted(
                 stats_dict.values(),
-                key=lambda s: s.hands,
-                reverse=True
+                key=self._hands_order,
             )
 
             for stats in sorted_stats:
@@ -782,6 +1139,8 @@ class StatsAggregator:
                     stats.wdsd,
                     stats.wdsd_count,
                     stats.wtsd_count,
+                    self._format_ev_net(stats),
+                    self._format_ev_adjustment(stats),
                 ]
                 writer.writerow(row)
 
@@ -796,10 +1155,41 @@ class StatsAggregator:
             print(f"Wrote all_stats.csv with {len(self.all_stats)} players")
         return output_path
 
-    def output_season_stats(self) -> List[Path]:
-        """シーズン別スタッツをCSV出力"""
+    def prefix_store(self) -> PrefixStatsStore:
+        """節別スタッツの累積ストア（aggregate 後に初回呼び出しで作成）"""
+        if self._prefix_store is None:
+            self._update_all_stats_league()
+            self._prefix_store = PrefixStatsStore.from_sessions(self.stats_by_session, self.all_stats)
+        return self._prefix_store
+
+    def output_prefix_stats(self, as_of: Optional[str] = None, window: Optional[int] = None) -> Path:
+        """
+        as-of 時点の累積、または直近 window 節（各プレイヤーの参加節）のスタッツをCSV出力
+
+        Args:
+            as_of: YYYYMMDD（その日を含む）。None なら最新
+            window: 直近の参加節数。None なら as_of までの全節
+        """
+        store = self.prefix_store()
+        if window is None:
+            counters, sessions = store.as_of(as_of)
+            name = f"all_stats_as_of_{as_of}.csv"
+        else:
+            counters, sessions = store.last_sessions(window, as_of)
+            name = f"all_stats_last_{window}.csv" if as_of is None else f"all_stats_last_{window}_as_of_{as_of}.csv"
+        stats_dict, session_counts = store.to_player_stats(counters, sessions)
+        output_path = self.data_dir / name
+        self._write_csv(stats_dict, output_path, session_counts=session_counts)
+        if self.verbose:
+            print(f"Wrote {name} with {len(stats_dict)} players")
+        return output_path
+
+    def output_season_stats(self, season_ids: Optional[set] = None) -> List[Path]:
+        """シーズン別スタッツをCSV出力（season_ids を渡した場合はそのシーズンだけ）"""
         output_paths = []
         for season_id, stats_dict in self.stats_by_season.items():
+            if season_ids is not None and season_id not in season_ids:
+                continue
             output_path = self.data_dir / f"season_{season_id}_stats.csv"
             season_session_counts = self._get_season_session_counts(season_id)
             self._write_csv(stats_dict, output_path, session_counts=season_session_counts)
@@ -808,10 +1198,12 @@ class StatsAggregator:
                 print(f"Wrote season_{season_id}_stats.csv with {len(stats_dict)} players")
         return output_paths
 
-    def output_raw_season_stats(self) -> List[Path]:
-        """シーズン別raw counts CSVを出力"""
+    def output_raw_season_stats(self, season_ids: Optional[set] = None) -> List[Path]:
+        """シーズン別raw counts CSVを出力（season_ids を渡した場合はそのシーズンだけ）"""
         output_paths = []
         for season_id, stats_dict in self.stats_by_season.items():
+            if season_ids is not None and season_id not in season_ids:
+                continue
             output_path = self.data_dir / f"season_{season_id}_stats_raw.csv"
             season_session_counts = self._get_season_session_counts(season_id)
             self._write_raw_csv(stats_dict, output_path, session_counts=season_session_counts)
@@ -820,9 +1212,78 @@ class StatsAggregator:
                 print(f"Wrote season_{season_id}_stats_raw.csv with {len(stats_dict)} players")
         return output_paths
 
+    def _session_row(self, date_str: str, season_id, stats: PlayerStats) -> list:
+        """session_stats.csv の1行"""
+        return [
+            date_str,
+            season_id,
+            stats.player_id,
+            stats.display_name,
+            stats.league,
+            self._format_net(stats.net * BB_SIZE),
+            BB_SIZE,
+            stats.hands,
+            stats.vpip,
+            stats.vpip_hands,
+            stats.pfr,
+            stats.pfr_hands,
+            stats.three_bet,
+            stats.three_bet_hands,
+            stats.fold_to_3bet,
+            stats.fold_to_3bet_hands,
+            stats.cb,
+            stats.cb_hands,
+            stats.wtsd,
+            stats.wtsd_hands,
+            stats.wdsd,
+            stats.wtsd_count,
+            self._format_ev_net(stats, BB_SIZE),
+        ]
+
+    def _raw_session_row(self, date_str: str, season_id, stats: PlayerStats) -> list:
+        """session_stats_raw.csv（シーズン別も同じ）の1行"""
+        return [
+            date_str,
+            season_id,
+            stats.player_id,
+            stats.display_name,
+            stats.league,
+            self._format_net(stats.net),
+            BB_SIZE,
+            stats.hands,
+            stats.vpip,
+            stats.vpip_count,
+            stats.vpip_hands,
+            stats.pfr,
+            stats.pfr_count,
+            stats.pfr_hands,
+            stats.three_bet,
+            stats.three_bet_count,
+            stats.three_bet_hands,
+            stats.fold_to_3bet,
+            stats.fold_to_3bet_count,
+            stats.fold_to_3bet_hands,
+            stats.cb,
+            stats.cb_count,
+            stats.cb_hands,
+            stats.wtsd,
+            stats.wtsd_count,
+            stats.wtsd_hands,
+            stats.wdsd,
+            stats.wdsd_count,
+            stats.wtsd_count,
+            self._format_ev_net(stats),
+            self._format_ev_adjustment(stats),
+        ]
+
     def output_session_stats(self) -> Path:
         """節ごとの個人成績をCSV出力"""
         output_path = self.data_dir / "session_stats.csv"
+        if self.session_spill is not None:
+            rows = self.session_spill.write(output_path, self.SESSION_STATS_HEADERS, raw=False)
+            if self.verbose:
+                print(f"Wrote session_stats.csv with {rows} rows across {self.session_spill.sessions} sessions")
+            return output_path
         with open(output_path, "w", encoding="utf-8", newline="") as f:
             writer = csv.writer(f)
             writer.writerow(self.SESSION_STATS_HEADERS)
@@ -834,45 +1295,32 @@ class StatsAggregator:
                 # ハンド数でソート
                 sorted_players = sorted(
                     players.values(),
-                    key=lambda s: s.hands,
-                    reverse=True
+                    key=self._hands_order,
                 )
 
                 for stats in sorted_players:
-                    row = [
-                        date_str,
-                        season_id,
-                        stats.player_id,
-                        stats.display_name,
-                        stats.league,
-                        self._format_net(stats.net * BB_SIZE),
-                        BB_SIZE,
-                        stats.hands,
-                        stats.vpip,
-                        stats.vpip_hands,
-                        stats.pfr,
-                        stats.pfr_hands,
-                        stats.three_bet,
-                        stats.three_bet_hands,
-                        stats.fold_to_3bet,
-                        stats.fold_to_3bet_hands,
-                        stats.cb,
-                        stats.cb_hands,
-                        stats.wtsd,
-                        stats.wtsd_hands,
-                        stats.wdsd,
-                        stats.wtsd_count,
-                    ]
-                    writer.writerow(row)
+                    writer.writerow(self._session_row(date_str, season_id, stats))
 
         if self.verbose:
             total_rows = sum(len(p) for p in self.stats_by_session.values())
             print(f"Wrote session_stats.csv with {total_rows} rows across {len(self.stats_by_session)} sessions")
         return output_path
 
-    def output_raw_session_stats(self) -> Path:
-        """節ごとの個人成績をraw counts CSVに出力"""
+    def output_raw_session_stats(self, season_ids: Optional[set] = None) -> Path:
+        """節ごとの個人成績をraw counts CSVに出力（シーズン別のファイルは season_ids を渡した場合はそのシーズンだけ）"""
         output_path = self.data_dir / "session_stats_raw.csv"
+        if self.session_spill is not None:
+            rows = self.session_spill.write(output_path, self.RAW_SESSION_STATS_HEADERS, raw=True)
+            if self.verbose:
+                print(f"Wrote session_stats_raw.csv with {rows} rows across {self.session_spill.sessions} sessions")
+            for sid in self.session_spill.season_ids():
+                if season_ids is not None and sid not in season_ids:
+                    continue
+                season_path = self.data_dir / f"season_{sid}_session_stats_raw.csv"
+                rows = self.session_spill.write(season_path, self.RAW_SESSION_STATS_HEADERS, raw=True, season_id=sid)
+                if self.verbose:
+                    print(f"Wrote season_{sid}_session_stats_raw.csv with {rows} rows")
+            return output_path
         with open(output_path, "w", encoding="utf-8", newline="") as f:
             writer = csv.writer(f)
             writer.writerow(self.RAW_SESSION_STATS_HEADERS)
@@ -883,43 +1331,11 @@ class StatsAggregator:
 
                 sorted_players = sorted(
                     players.values(),
-                    key=lambda s: s.hands,
-                    reverse=True
+                    key=self._hands_order,
                 )
 
                 for stats in sorted_players:
-                    row = [
-                        date_str,
-                        season_id,
-                        stats.player_id,
-                        stats.display_name,
-                        stats.league,
-                        self._format_net(stats.net),
-                        BB_SIZE,
-                        stats.hands,
-                        stats.vpip,
-                        stats.vpip_count,
-                        stats.vpip_hands,
-                        stats.pfr,
-                        stats.pfr_count,
-                        stats.pfr_hands,
-                        stats.three_bet,
-                        stats.three_bet_count,
-                        stats.three_bet_hands,
-                        stats.fold_to_3bet,
-                        stats.fold_to_3bet_count,
-                        stats.fold_to_3bet_hands,
-                        stats.cb,
-                        stats.cb_count,
-                        stats.cb_hands,
-                        stats.wtsd,
-                        stats.wtsd_count,
-                        stats.wtsd_hands,
-                        stats.wdsd,
-                        stats.wdsd_count,
-                        stats.wtsd_count,
-                    ]
-                    writer.writerow(row)
+                    writer.writerow(self._raw_session_row(date_str, season_id, stats))
 
         if self.verbose:
             total_rows = sum(len(p) for p in self.stats_by_session.values())
@@ -929,7 +1345,7 @@ class StatsAggregator:
         sessions_by_season: Dict[int, Dict[str, Dict[str, PlayerStats]]] = {}
         for date_str, players in self.stats_by_session.items():
             sid = self.session_season_map.get(date_str)
-            if sid is not None:
+            if sid is not None and (season_ids is None or sid in season_ids):
                 sessions_by_season.setdefault(sid, {})[date_str] = players
 
         for sid, sessions in sessions_by_season.items():
@@ -940,23 +1356,10 @@ class StatsAggregator:
                 for d_str in sorted(sessions.keys()):
                     sorted_players = sorted(
                         sessions[d_str].values(),
-                        key=lambda s: s.hands,
-                        reverse=True,
+                        key=self._hands_order,
                     )
                     for stats in sorted_players:
-                        row = [
-                            d_str, sid,
-                            stats.player_id, stats.display_name, stats.league,
-                            self._format_net(stats.net), BB_SIZE, stats.hands,
-                            stats.vpip, stats.vpip_count, stats.vpip_hands,
-                            stats.pfr, stats.pfr_count, stats.pfr_hands,
-                            stats.three_bet, stats.three_bet_count, stats.three_bet_hands,
-                            stats.fold_to_3bet, stats.fold_to_3bet_count, stats.fold_to_3bet_hands,
-                            stats.cb, stats.cb_count, stats.cb_hands,
-                            stats.wtsd, stats.wtsd_count, stats.wtsd_hands,
-                            stats.wdsd, stats.wdsd_count, stats.wtsd_count,
-                        ]
-                        writer.writerow(row)
+                        writer.writerow(self._raw_session_row(d_str, sid, stats))
             if self.verbose:
                 rows = sum(len(p) for p in sessions.values())
                 print(f"Wrote season_{sid}_session_stats_raw.csv with {rows} rows")
@@ -982,7 +1385,7 @@ class StatsAggregator:
 
             for league_name, players in league_groups.items():
                 # 収支降順でソート
-                sorted_players = sorted(players, key=lambda s: s.net, reverse=True)
+                sorted_players = sorted(players, key=lambda s: (-s.net, s.player_id))
 
                 output_path = self.data_dir / f"season_{season_id}_{league_name}_stats.csv"
                 with open(output_path, "w", encoding="utf-8", newline="") as f:
@@ -1014,6 +1417,7 @@ class StatsAggregator:
                             stats.wtsd_hands,
                             stats.wdsd,
                             stats.wtsd_count,
+                            self._format_ev_net(stats, BB_SIZE),
                         ]
                         writer.writerow(row)
 
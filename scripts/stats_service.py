@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+スタッツの HTTP API（asyncio）
+
+main.py の出力（all_stats.csv・season_{N}_stats.csv・session_stats.csv）をメモリ上のインデックスに読み込み、
+プレイヤー単位・シーズン単位・スタッツ順のランキングを JSON で返す。サイト（静的ファイル）は
+ページを開くたびに CSV 全体を読み直しているが、この API なら必要な分だけを取れる。
+
+- レスポンスは本文の SHA-1 を ETag にし、If-None-Match が一致すれば 304 を返す
+- 同じリクエストのレスポンス（JSON の本文）はキャッシュし、2回目以降はエンコードもしない
+- CSV が書き換えられたら（サイズ・更新時刻が変わり、次の確認まで変化が止まったら）読み直す
+- 標準ライブラリのみ（asyncio のストリームで HTTP/1.1 の keep-alive を処理する）
+
+エンドポイント:
+    GET /seasons                                   シーズンごとのプレイヤー数・節
+    GET /players?name=...                          名前（部分一致）でプレイヤーを検索
+    GET /players/{player_id}                       全期間・シーズンごとのスタッツ
+    GET /players/{player_id}/sessions?season=N     節ごとのスタッツ
+    GET /leaderboard?season=all|N&stat=VPIP&order=desc&limit=50&offset=0&min_hands=0
+
+Usage:
+    python scripts/stats_service.py                      # http://127.0.0.1:8080
+    python scripts/stats_service.py --port 9000 --reload-interval 5
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+DEFAULT_PORT = 8080
+DEFAULT_RELOAD_INTERVAL = 2.0
+# キャッシュするレスポンス数（超えたら古いものから捨てる）
+RESPONSE_CACHE_SIZE = 4096
+MAX_LIMIT = 500
+DEFAULT_LIMIT = 50
+
+SEASON_STATS_PATTERN = re.compile(r"season_(\d+)_stats\.csv$")
+
+# クエリの stat に使える別名（CSV の列名もそのまま使える）
+STAT_ALIASES = {
+    "net": "収支",
+    "hands": "ハンド数",
+    "sessions": "参加節数",
+    "vpip": "VPIP",
+    "pfr": "PFR",
+    "3bet": "3bet",
+    "fold_to_3bet": "Fold to 3bet",
+    "cb": "CB",
+    "wtsd": "WTSD",
+    "wsd": "W$SD",
+}
+# 数値にしない列
+TEXT_COLUMNS = {"player_id", "プレイヤー", "リーグ", "session_date"}
+
+
+def parse_row(row: Dict[str, str]) -> dict:
+    """CSV の1行の数値列を int / float にする"""
+    parsed = {}
+    for key, value in row.items():
+        if key in TEXT_COLUMNS or value is None:
+            parsed[key] = value
+            continue
+        try:
+            parsed[key] = int(value)
+        except ValueError:
+            try:
+                parsed[key] = float(value)
+            except ValueError:
+                parsed[key] = value
+    return parsed
+
+
+def read_rows(path: Path) -> List[dict]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [parse_row(row) for row in csv.DictReader(f)]
+
+
+class StatsIndex:
+    """
+    CSV の内容をリクエストで引ける形にしたインデックス（作成後は変更しない）
+
+    scopes: "all" / シーズン ID（文字列） -> プレイヤーの行のリスト
+    players: player_id -> {"all": 行, "seasons": {ID: 行}, "sessions": [節の行（日付順）]}
+    """
+
+    def __init__(self, data_dir: Path):
+        self.data_dir = Path(data_dir)
+        self.scopes: Dict[str, List[dict]] = {}
+        self.players: Dict[str, dict] = {}
+        self.sessions_by_season: Dict[str, List[str]] = {}
+        self._sorted: Dict[Tuple[str, str, bool], List[dict]] = {}
+
+        all_stats = self.data_dir / "all_stats.csv"
+        if all_stats.exists():
+            self.scopes["all"] = read_rows(all_stats)
+        for path in sorted(self.data_dir.glob("season_*_stats.csv"), key=lambda p: p.name):
+            match = SEASON_STATS_PATTERN.match(path.name)
+            if match:
+                self.scopes[match.group(1)] = read_rows(path)
+
+        for scope, rows in self.scopes.items():
+            for row in rows:
+                player = self.players.setdefault(row["player_id"], {"all": None, "seasons": {}, "sessions": []})
+                if scope == "all":
+                    player["all"] = row
+                else:
+                    player["seasons"][scope] = row
+
+        session_stats = self.data_dir / "session_stats.csv"
+        if session_stats.exists():
+            for row in read_rows(session_stats):
+                player = self.players.setdefault(row["player_id"], {"all": None, "seasons": {}, "sessions": []})
+                player["sessions"].append(row)
+                dates = self.sessions_by_season.setdefault(str(row["season_id"]), [])
+                if row["session_date"] not in dates:
+                    dates.append(row["session_date"])
+        for player in self.players.values():
+            player["sessions"].sort(key=lambda r: r["session_date"])
+        for dates in self.sessions_by_season.values():
+            dates.sort()
+
+    @staticmethod
+    def source_files(data_dir: Path) -> List[Path]:
+        paths = [data_dir / "all_stats.csv", data_dir / "session_stats.csv"]
+        paths += [p for p in data_dir.glob("season_*_stats.csv") if SEASON_STATS_PATTERN.match(p.name)]
+        return sorted(paths)
+
+    @classmethod
+    def signature(cls, data_dir: Path) -> Tuple:
+        """読み込む CSV の (名前, サイズ, 更新時刻)。変わったら読み直す"""
+        signature = []
+        for path in cls.source_files(Path(data_dir)):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            signature.append((path.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def ranked(self, scope: str, stat: str, descending: bool) -> List[dict]:
+        """stat の順に並べた行（並び順はスコープ・スタッツ・向きごとに1回だけ計算する）"""
+        key = (scope, stat, descending)
+        if key not in self._sorted:
+            rows = [r for r in self.scopes[scope] if isinstance(r.get(stat), (int, float))]
+            # 同じ値は player_id 順（向きによらず）
+            rows.sort(key=lambda r: r["player_id"])
+            rows.sort(key=lambda r: r[stat], reverse=descending)
+            self._sorted[key] = rows
+        return self._sorted[key]
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _query_int(query: dict, name: str, default: int, minimum: int = 0, maximum: Optional[int] = None) -> int:
+    value = query.get(name, [None])[0]
+    if value is None:
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise HttpError(400, f"{name} must be an integer")
+    if number < minimum:
+        raise HttpError(400, f"{name} must be >= {minimum}")
+    return min(number, maximum) if maximum is not None else number
+
+
+class StatsService:
+    """リクエストのルーティングと、レスポンスのキャッシュ・再読み込み"""
+
+    def __init__(self, data_dir: Path, reload_interval: float = DEFAULT_RELOAD_INTERVAL, verbose: bool = False):
+        self.data_dir = Path(data_dir)
+        self.reload_interval = reload_interval
+        self.verbose = verbose
+        self.signature = StatsIndex.signature(self.data_dir)
+        self.index = StatsIndex(self.data_dir)
+        self.loaded_at = time.time()
+        # リクエストのパス（クエリ込み） -> (ステータス, ETag, 本文)
+        self._responses: Dict[str, Tuple[int, str, bytes]] = {}
+
+    def reload_if_changed(self, previous: Optional[Tuple]) -> Optional[Tuple]:
+        """
+        CSV が変わっていて、前回の確認から変化が止まっていれば読み直す
+
+        Returns:
+            今回のシグネチャ（次の呼び出しに渡す）
+        """
+        current = StatsIndex.signature(self.data_dir)
+        if current != self.signature and current == previous:
+            started = time.perf_counter()
+            try:
+                index = StatsIndex(self.data_dir)
+            except (OSError, csv.Error, KeyError) as e:
+                print(f"Reload failed, keeping the previous data: {e}")
+                return None
+            self.index, self.signature = index, current
+            self.loaded_at = time.time()
+            self._responses.clear()
+            print(f"Reloaded {len(index.players)} players in {time.perf_counter() - started:.2f}s")
+        return current
+
+    def respond(self, target: str) -> Tuple[int, str, bytes]:
+        """GET target の (ステータス, ETag, JSON 本文)"""
+        cached = self._responses.get(target)
+        if cached is not None:
+            return cached
+        try:
+            status, payload = 200, self.route(target)
+        except HttpError as e:
+            status, payload = e.status, {"error": e.message}
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        response = (status, f'"{hashlib.sha1(body).hexdigest()}"', body)
+        if len(self._responses) >= RESPONSE_CACHE_SIZE:
+            del self._responses[next(iter(self._responses))]
+        self._responses[target] = response
+        return response
+
+    def route(self, target: str):
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+        index = self.index
+
+        if parts == ["seasons"]:
+            return {
+                "seasons": [
+                    {"season": scope, "players": len(rows), "sessions": index.sessions_by_season.get(scope, [])}
+                    for scope, rows in index.scopes.items() if scope != "all"
+                ],
+                "players": len(index.players),
+                "loaded_at": self.loaded_at,
+            }
+
+        if parts == ["players"]:
+            name = query.get("name", [""])[0].lower()
+            if not name:
+                raise HttpError(400, "name is required")
+            matches = []
+            for player_id, player in index.players.items():
+                row = player["all"] or next(iter(player["seasons"].values()), None) \
+                    or (player["sessions"][-1] if player["sessions"] else None)
+                if row and name in row["プレイヤー"].lower():
+                    matches.append({"player_id": player_id, "プレイヤー": row["プレイヤー"], "リーグ": row["リーグ"]})
+            return {"players": sorted(matches, key=lambda m: m["プレイヤー"])}
+
+        if len(parts) in (2, 3) and parts[0] == "players":
+            player = index.players.get(parts[1])
+            if player is None:
+                raise HttpError(404, f"player not found: {parts[1]}")
+            if len(parts) == 2:
+                return {"player_id": parts[1], "all": player["all"], "seasons": player["seasons"],
+                        "sessions": len(player["sessions"])}
+            if parts[2] != "sessions":
+                raise HttpError(404, "not found")
+            season = query.get("season", [None])[0]
+            sessions = player["sessions"]
+            if season is not None:
+                sessions = [r for r in sessions if str(r["season_id"]) == season]
+            return {"player_id": parts[1], "sessions": sessions}
+
+        if parts == ["leaderboard"]:
+            scope = query.get("season", ["all"])[0]
+            if scope not in index.scopes:
+                raise HttpError(404, f"season not found: {scope}")
+            stat = query.get("stat", ["収支"])[0]
+            stat = STAT_ALIASES.get(stat.lower(), stat)
+            rows = index.scopes[scope]
+            if not rows or stat in TEXT_COLUMNS or stat not in rows[0]:
+                raise HttpError(400, f"unknown stat: {stat}")
+            order = query.get("order", ["desc"])[0]
+            if order not in ("asc", "desc"):
+                raise HttpError(400, "order must be asc or desc")
+            limit = _query_int(query, "limit", DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+            offset = _query_int(query, "offset", 0)
+            min_hands = _query_int(query, "min_hands", 0)
+
+            ranked = index.ranked(scope, stat, order == "desc")
+            if min_hands:
+                ranked = [r for r in ranked if r.get("ハンド数", 0) >= min_hands]
+            return {
+                "season": scope, "stat": stat, "order": order, "total": len(ranked),
+                "offset": offset, "limit": limit,
+                "rows": [dict(r, rank=offset + i + 1) for i, r in enumerate(ranked[offset:offset + limit])],
+            }
+
+        raise HttpError(404, "not found")
+
+    # --------------- HTTP ---------------
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """1接続分（keep-alive で複数リクエストを順に処理する）"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    writer.write(self._head(400, 0, None, False))
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        key, value = line.split(":", 1)
+                        headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0) or 0)
+                if length:
+                    await reader.readexactly(length)
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+                if method not in ("GET", "HEAD"):
+                    writer.write(self._head(405, 0, None, keep_alive))
+                else:
+                    status, etag, body = self.respond(target)
+                    if status == 200 and headers.get("if-none-match") == etag:
+                        writer.write(self._head(304, 0, etag, keep_alive))
+                    else:
+                        writer.write(self._head(status, len(body), etag, keep_alive))
+                        if method == "GET":
+                            writer.write(body)
+                    if self.verbose:
+                        print(f"{method} {target} {status}")
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            return
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _head(status: int, length: int, etag: Optional[str], keep_alive: bool) -> bytes:
+        reason = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+                  405: "Method Not Allowed"}[status]
+        lines = [f"HTTP/1.1 {status} {reason}"]
+        if status != 304:
+            lines.append("Content-Type: application/json; charset=utf-8")
+        lines.append(f"Content-Length: {length}")
+        if etag:
+            lines += [f"ETag: {etag}", "Cache-Control: no-cache"]
+        lines.append("Access-Control-Allow-Origin: *")
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def watch(self) -> None:
+        previous = self.signature
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            previous = self.reload_if_changed(previous)
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        address = server.sockets[0].getsockname()
+        print(f"Serving {len(self.index.players)} players from {self.data_dir} "
+              f"on http://{address[0]}:{address[1]} (Ctrl+C to stop)", flush=True)
+        if self.reload_interval > 0:
+            asyncio.get_running_loop().create_task(self.watch())
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="スタッツの CSV をメモリに読み込んで JSON API で返す")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"待ち受けるポート (default: {DEFAULT_PORT})")
+    parser.add_argument("--reload-interval", type=float, default=DEFAULT_RELOAD_INTERVAL,
+                        help=f"CSV の変更を確認する間隔（秒、0 で確認しない, default: {DEFAULT_RELOAD_INTERVAL:g}）")
+    parser.add_argument("--verbose", "-v", action="store_true", help="リクエストごとに表示")
+    args = parser.parse_args()
+
+    data_dir = Path(__file__).parent.parent / args.data_dir
+    service = StatsService(data_dir, reload_interval=args.reload_interval, verbose=args.verbose)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+stats_service.py の負荷試験
+
+keep-alive の接続を複数開き、プレイヤーの参照・節ごとのスタッツ・ランキングのページを混ぜたリクエストを
+一定時間送り続けて、秒間リクエスト数とレイテンシーを表示する。同じ URL の2回目以降の半分は
+If-None-Match（前回の ETag）付きで送る（304 の割合も表示）。
+
+--url を指定しなければ stats_service.py を別プロセスで起動して測る
+（CPU が1コアならクライアントとサーバーで分け合うので、サーバー単体の性能より低く出る）。
+
+Usage:
+    python scripts/stats_service_loadtest.py                        # サーバーを起動して 10 秒間
+    python scripts/stats_service_loadtest.py --connections 64 --duration 30
+    python scripts/stats_service_loadtest.py --url http://127.0.0.1:8080
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import quote, urlsplit
+
+script_dir = Path(__file__).parent
+sys.path.insert(0, str(script_dir))
+
+from stats_service import STAT_ALIASES, StatsIndex
+
+
+def build_targets(index: StatsIndex, count: int, seed: int) -> List[str]:
+    """リクエストする URL の並び（プレイヤー 40%・節 20%・ランキング 35%・検索 5%）"""
+    rng = random.Random(seed)
+    player_ids = sorted(index.players)
+    scopes = sorted(index.scopes)
+    stats = sorted(STAT_ALIASES)
+    names = sorted({row["プレイヤー"] for rows in index.scopes.values() for row in rows})
+    targets = []
+    for _ in range(count):
+        kind = rng.random()
+        player_id = quote(rng.choice(player_ids), safe="")
+        if kind < 0.4:
+            targets.append(f"/players/{player_id}")
+        elif kind < 0.6:
+            targets.append(f"/players/{player_id}/sessions")
+        elif kind < 0.95:
+            scope = rng.choice(scopes)
+            order = rng.choice(["asc", "desc"])
+            offset = rng.choice([0, 0, 0, 50, 100])
+            targets.append(f"/leaderboard?season={scope}&stat={rng.choice(stats)}&order={order}&offset={offset}")
+        else:
+            targets.append(f"/players?name={quote(rng.choice(names)[:2])}")
+    return targets
+
+
+async def client(host: str, port: int, targets: List[str], deadline: float, seed: int,
+                 latencies: List[float], statuses: Dict[int, int]) -> None:
+    """1接続分。deadline まで順にリクエストを送る"""
+    rng = random.Random(seed)
+    etags: Dict[str, str] = {}
+    reader, writer = await asyncio.open_connection(host, port)
+    position = rng.randrange(len(targets))
+    try:
+        while time.perf_counter() < deadline:
+            target = targets[position % len(targets)]
+            position += 1
+            request = f"GET {target} HTTP/1.1\r\nHost: {host}\r\n"
+            if target in etags and rng.random() < 0.5:
+                request += f"If-None-Match: {etags[target]}\r\n"
+            started = time.perf_counter()
+            writer.write((request + "\r\n").encode("latin-1"))
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            status = int(lines[0].split(" ")[1])
+            length = 0
+            for line in lines[1:]:
+                key, _, value = line.partition(":")
+                key = key.lower()
+                if key == "content-length":
+                    length = int(value)
+                elif key == "etag":
+                    etags[target] = value.strip()
+            if length:
+                await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, targets: List[str], connections: int, duration: float):
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    # 接続を開いてキャッシュを温める（計測には含めない）
+    await asyncio.gather(*(client(host, port, targets, time.perf_counter() + 1, i, [], {})
+                           for i in range(connections)))
+    started = time.perf_counter()
+    await asyncio.gather(*(client(host, port, targets, started + duration, i, latencies, statuses)
+                           for i in range(connections)))
+    return time.perf_counter() - started, latencies, statuses
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_server(host: str, port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"stats_service did not start on {host}:{port}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="stats_service.py の負荷試験")
+    parser.add_argument("--url", default=None, help="対象のサーバー（省略時は stats_service.py を起動する）")
+    parser.add_argument("--data-dir", default="data", help="データディレクトリのパス (default: data)")
+    parser.add_argument("--connections", "-c", type=int, default=32, help="同時接続数 (default: 32)")
+    parser.add_argument("--duration", "-d", type=float, default=10, help="計測する秒数 (default: 10)")
+    parser.add_argument("--targets", type=int, default=2000, help="URL の種類数 (default: 2000)")
+    parser.add_argument("--seed", type=int, default=0, help="URL を選ぶ乱数のシード (default: 0)")
+    args = parser.parse_args()
+
+    data_dir = Path(__file__).parent.parent / args.data_dir
+    targets = build_targets(StatsIndex(data_dir), args.targets, args.seed)
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        server = subprocess.Popen(
+            [sys.executable, str(script_dir / "stats_service.py"), "--data-dir", args.data_dir,
+             "--port", str(port), "--reload-interval", "0"],
+            stdout=subprocess.DEVNULL,
+        )
+    try:
+        wait_for_server(host, port)
+        elapsed, latencies, statuses = asyncio.run(
+            run_load(host, port, targets, args.connections, args.duration))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    latencies.sort()
+    total = len(latencies)
+    if not total:
+        print("No requests completed")
+        return
+
+    def percentile(p: float) -> float:
+        return latencies[min(total - 1, int(total * p))] * 1000
+
+    print(f"Requests:    {total} in {elapsed:.1f}s ({args.connections} connections)")
+    print(f"Throughput:  {total / elapsed:,.0f} req/s")
+    print(f"Latency:     p50 {percentile(0.5):.2f} ms, p99 {percentile(0.99):.2f} ms, max {latencies[-1] * 1000:.2f} ms")
+    print("Status:      " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+
+
+if __name__ == "__main__":
+    main()
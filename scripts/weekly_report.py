@@ -4,7 +4,7 @@
 シーズン・週ごとの詳細統計を計算する
 
 Usage:
-    python scripts/weekly_report.py [--config-dir config] [--data-dir data]
+    python scripts/weekly_report.py [--config-dir config] [--data-dir data] [--source auto|scan|reparse]
 """
 
 import argparse
@@ -12,8 +12,7 @@ import csv
 import sys
 from pathlib import Path
 from collections import defaultdict
-from datetime import datetime
-from typing import Dict, Set, List
+from typing import Dict, Set, List, Optional
 
 script_dir = Path(__file__).parent
 sys.path.insert(0, str(script_dir))
@@ -21,7 +20,16 @@ sys.path.insert(0, str(script_dir))
 from config_loader import ConfigLoader
 from player_registry import PlayerRegistry
 from csv_formatter import PokerNowParser, extract_player_id_map
+from dataset_manifest import LOG_PREFIX, DatasetManifest
 from hand_analysis import StatsCalculator
+from cohort_analysis import Attendance, print_retention
+
+
+# get_weekly_data のデータ取得方法
+#   auto:    session_stats_raw.csv（ログより新しい場合）→ 着席スキャン → 再パースの順に試す
+#   scan:    マニフェスト（ログの Player stacks 行から数えた着席ハンド数）を使う
+#   reparse: ログを PokerNowParser + StatsCalculator で再計算する（従来の方法）
+SOURCES = ["auto", "scan", "reparse"]
 
 
 def _load_session_stats_data(data_dir: Path) -> dict:
@@ -44,10 +52,54 @@ def _load_session_stats_data(data_dir: Path) -> dict:
     return result
 
 
-def get_weekly_data(data_dir: Path, config: ConfigLoader, registry: PlayerRegistry) -> dict:
+def _scan_table(log_info: dict, registry: PlayerRegistry) -> List[tuple]:
+    """マニフェストにあるログの着席情報から [(raw ID, 表示名, ハンド数)] を返す"""
+    if "seated" not in log_info:
+        raise ValueError("no seated players in manifest")
+    for change in log_info["id_changes"]:
+        registry.register_id_change(change["old_id"], change["new_id"], change["display_name"])
+    return [tuple(row) for row in log_info["seated"]]
+
+
+def _reparse_table(csv_path: Path, registry: PlayerRegistry) -> List[tuple]:
+    """ログを再パースしてスタッツを計算し、[(raw ID, 表示名, ハンド数)] を返す"""
+    parser = PokerNowParser(str(csv_path))
+    formatted_text, _ = parser.parse()
+    raw_text = parser.raw_text
+
+    registry.process_id_changes(raw_text)
+    player_id_map = extract_player_id_map(raw_text)
+
+    histories = [h for h in formatted_text.split("\n\n") if h.strip()]
+    calculator = StatsCalculator(histories)
+    return [
+        (player_id_map.get(name, name), name, calculator.calculate_all(name).hands)
+        for name in calculator.get_all_players()
+    ]
+
+
+def session_data_from_stats(stats_by_session: dict) -> dict:
+    """StatsAggregator.stats_by_session を _load_session_stats_data と同じ形にする"""
+    return {
+        date_str: {
+            'players': set(players),
+            'player_hands': {pid: stats.hands for pid, stats in players.items()},
+        }
+        for date_str, players in stats_by_session.items()
+    }
+
+
+def get_weekly_data(data_dir: Path, config: ConfigLoader, registry: PlayerRegistry,
+                    source: str = "auto", session_stats_data: Optional[dict] = None) -> dict:
     """
     週（日付）ごとのデータを収集
 
+    auto では main.py が出力した session_stats_raw.csv を優先し、
+    その日のログの方が新しい（CSV が古い）場合だけログを読む。
+    ログは着席情報だけをスキャンし、失敗したテーブルだけを再パースする。
+    session_stats_data（session_data_from_stats）を渡した場合は CSV の代わりにそれを使い、
+    同じプロセスで集計した直後の結果としてログより新しいものとみなす（pipeline.py から）。
+
     Returns:
         dict: {
             date_str: {
@@ -65,61 +117,58 @@ def get_weekly_data(data_dir: Path, config: ConfigLoader, registry: PlayerRegist
         return weekly_data
 
     # session_stats_raw.csv からセッション別データを事前読み込み
-    session_stats_data = _load_session_stats_data(data_dir)
-
-    for date_dir in sorted(hand_histories_dir.iterdir()):
-        if not date_dir.is_dir():
-            continue
+    if session_stats_data is None:
+        session_stats_data = _load_session_stats_data(data_dir)
+        cache_path = data_dir / "session_stats_raw.csv"
+        cache_mtime_ns = cache_path.stat().st_mtime_ns if cache_path.exists() else 0
+    else:
+        cache_mtime_ns = float("inf")
 
-        date_str = date_dir.name
-        if not date_str.isdigit() or len(date_str) != 8:
-            continue
+    # 日付・テーブル・ログの一覧はマニフェストから（変更のあったログだけ読み直す）
+    manifest = DatasetManifest.refresh(data_dir, config)
 
-        # 日付からシーズンを特定
-        date = datetime.strptime(date_str, "%Y%m%d")
-        season = config.get_season_by_date(date)
-        season_id = season["id"] if season else None
+    for date_str in manifest.date_strs():
+        season_id = manifest.season_id(date_str)
 
         # テーブル数をカウント
-        table_dirs = [d for d in date_dir.iterdir() if d.is_dir() and "table" in d.name.lower()]
-        table_count = len(table_dirs)
+        table_names = manifest.table_dirs(date_str)
+        table_count = len(table_names)
 
         players = set()
         player_hands = defaultdict(int)
 
-        for table_dir in table_dirs:
-            csv_files = list(table_dir.glob("poker_now_log_*.csv"))
-            if not csv_files:
-                continue
-
-            try:
-                parser = PokerNowParser(str(csv_files[0]))
-                formatted_text, _ = parser.parse()
-                raw_text = parser.raw_text
-
-                registry.process_id_changes(raw_text)
-                player_id_map = extract_player_id_map(raw_text)
-
-                histories = [h for h in formatted_text.split("\n\n") if h.strip()]
-                if not histories:
+        log_files = []
+        for table_name in table_names:
+            csv_file = manifest.table_file(date_str, table_name, LOG_PREFIX)
+            if csv_file:
+                log_files.append((csv_file.parent, csv_file))
+
+        # CSV がその日のどのログよりも新しければ、ログは読まない
+        cache_fresh = (
+            source == "auto"
+            and date_str in session_stats_data
+            and all(manifest.file_info(f)["mtime_ns"] <= cache_mtime_ns for _, f in log_files)
+        )
+
+        for table_dir, csv_file in ([] if cache_fresh else log_files):
+            table_hands = None
+            if source != "reparse":
+                try:
+                    table_hands = _scan_table(manifest.file_info(csv_file), registry)
+                except Exception as e:
+                    print(f"Warning: Failed to scan {table_dir}: {e} (reparsing)")
+            if table_hands is None:
+                try:
+                    table_hands = _reparse_table(csv_file, registry)
+                except Exception as e:
+                    print(f"Warning: Failed to parse {table_dir}: {e}")
                     continue
 
-                calculator = StatsCalculator(histories)
-                played_players = calculator.get_all_players()
-
-                for player_name in played_players:
-                    raw_id = player_id_map.get(player_name, player_name)
-                    registry.register_player(raw_id, player_name)
-                    canonical_id = registry.get_canonical_id(raw_id)
-                    players.add(canonical_id)
-
-                    # ハンド数を計算
-                    stats = calculator.calculate_all(player_name)
-                    player_hands[canonical_id] += stats.hands
-
-            except Exception as e:
-                print(f"Warning: Failed to parse {table_dir}: {e}")
-                continue
+            for raw_id, player_name, hands in table_hands:
+                registry.register_player(raw_id, player_name)
+                canonical_id = registry.get_canonical_id(raw_id)
+                players.add(canonical_id)
+                player_hands[canonical_id] += hands
 
         # テーブルディレクトリから取得できなかった場合、session_stats_raw.csv から補完
         if not players and date_str in session_stats_data:
@@ -186,32 +235,8 @@ def calculate_stat_rankings(stats: List[dict], stat_name: str, top_n: int = 10,
     return top_players, round(avg, 2)
 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="週次レポートを生成"
-    )
-    parser.add_argument(
-        "--data-dir",
-        default="data",
-        help="データディレクトリのパス (default: data)"
-    )
-    parser.add_argument(
-        "--config-dir",
-        default="config",
-        help="設定ディレクトリのパス (default: config)"
-    )
-    args = parser.parse_args()
-
-    base_dir = Path(__file__).parent.parent
-    data_dir = base_dir / args.data_dir
-    config_dir = base_dir / args.config_dir
-
-    config = ConfigLoader(str(config_dir))
-    registry = PlayerRegistry(config)
-
-    print("データを収集中...")
-    weekly_data = get_weekly_data(data_dir, config, registry)
-
+def print_report(weekly_data: dict, config: ConfigLoader, registry: PlayerRegistry, data_dir: Path) -> None:
+    """get_weekly_data の結果から週次レポートを表示"""
     if not weekly_data:
         print("データが見つかりませんでした。")
         return
@@ -222,50 +247,47 @@ def main():
         sid = season_config["id"]
         required_hands_by_season[sid] = season_config.get("league_rules", {}).get("required_hands", 400)
 
-    # シーズンごとに集計
-    seasons_cumulative: Dict[int, Set[str]] = defaultdict(set)  # シーズンごとの累計参加者
-    seasons_hands: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))  # シーズンごとのハンド数
-    all_time_players: Set[str] = set()  # 全期間の参加者
+    # シーズンごとに集計（参加者はビット行列で持ち、新規・累計・ハンド数到達者を一括計算）
+    attendance = Attendance.from_sessions(weekly_data)
+    sorted_dates = attendance.dates
+    all_time_players: Set[str] = set(attendance.player_ids)  # 全期間の参加者
 
-    sorted_dates = sorted(weekly_data.keys())
+    season_ids = sorted({data['season_id'] for data in weekly_data.values() if data['season_id']})
+    season_attendance: Dict[int, Attendance] = {
+        sid: attendance.subset(d for d in sorted_dates if weekly_data[d]['season_id'] == sid)
+        for sid in season_ids
+    }
 
     # 週次データを事前計算
+    by_date: Dict[str, dict] = {}
+    all_new = attendance.new_players()
+    for row, date_str in enumerate(sorted_dates):
+        by_date[date_str] = {
+            'new_players': attendance.members(all_new[row]),
+            'cumulative': 0,
+            'players_400_plus': 0,
+        }
+    for sid, sub in season_attendance.items():
+        req = required_hands_by_season.get(sid, 400)
+        new_rows = sub.new_players()
+        cumulative = sub.cumulative_counts()
+        gate = sub.hand_gate_counts(req)
+        for row, date_str in enumerate(sub.dates):
+            by_date[date_str] = {
+                'new_players': sub.members(new_rows[row]),
+                'cumulative': int(cumulative[row]),
+                'players_400_plus': int(gate[row]),
+            }
+
     weekly_results = []
     for date_str in sorted_dates:
         data = weekly_data[date_str]
-        season_id = data['season_id']
-        players = data['players']
-        player_hands = data['player_hands']
-
-        # 新規参加者を計算
-        if season_id:
-            previous_cumulative = seasons_cumulative[season_id].copy()
-            new_players = players - previous_cumulative
-            seasons_cumulative[season_id].update(players)
-
-            # ハンド数を累計
-            for pid, hands in player_hands.items():
-                seasons_hands[season_id][pid] += hands
-        else:
-            new_players = players - all_time_players
-
-        all_time_players.update(players)
-
-        # required_hands 以上のプレイヤー数
-        if season_id:
-            req = required_hands_by_season.get(season_id, 400)
-            players_400_plus = sum(1 for h in seasons_hands[season_id].values() if h >= req)
-        else:
-            players_400_plus = 0
-
         weekly_results.append({
             'date_str': date_str,
-            'season_id': season_id,
+            'season_id': data['season_id'],
             'table_count': data['table_count'],
-            'players': players,
-            'new_players': new_players,
-            'cumulative': len(seasons_cumulative[season_id]) if season_id else 0,
-            'players_400_plus': players_400_plus
+            'players': data['players'],
+            **by_date[date_str],
         })
 
     # === 1. 全体サマリー ===
@@ -278,12 +300,10 @@ def main():
     print(f"総卓数: {total_tables} 卓")
 
     # シーズンごとの総ハンド数（延べ）
-    for season_id in sorted(seasons_hands.keys()):
-        if season_id is None:
-            continue
+    for season_id in season_ids:
         season = config.get_season_by_id(season_id)
         season_name = season['name'] if season else f"シーズン {season_id}"
-        total_hands = sum(seasons_hands[season_id].values())
+        total_hands = int(season_attendance[season_id].hands.sum())
         print(f"総ハンド数（{season_name}）: {total_hands:,}")
 
     # === 2. 週次レポート ===
@@ -352,17 +372,23 @@ def main():
         for i in range(0, len(both_names), 10):
             print(f"  {', '.join(both_names[i:i+10])}")
 
-    # === 4. シーズン別スタッツランキング ===
+    # === 4. シーズン別コホート継続率 ===
+    print("\n" + "=" * 70)
+    print("シーズン別コホート継続率")
+    print("=" * 70)
+
+    for season_id in season_ids:
+        season = config.get_season_by_id(season_id)
+        print_retention(season_attendance[season_id], season['name'] if season else f"シーズン {season_id}")
+
+    # === 5. シーズン別スタッツランキング ===
     print("\n" + "=" * 70)
     print("シーズン別スタッツランキング（100ハンド以上対象）")
     print("=" * 70)
 
     stat_columns = ['VPIP', 'PFR', '3bet', 'Fold to 3bet', 'CB', 'WTSD', 'W$SD']
 
-    for season_id in sorted(seasons_cumulative.keys()):
-        if season_id is None:
-            continue
-
+    for season_id in season_ids:
         season = config.get_season_by_id(season_id)
         season_name = season['name'] if season else f"シーズン {season_id}"
 
@@ -391,5 +417,40 @@ def main():
                 print(f"  {i:2d}.   {name}    {p['value']:6.1f}%    {p['hands']:4d}")
 
 
+def main():
+    parser = argparse.ArgumentParser(
+        description="週次レポートを生成"
+    )
+    parser.add_argument(
+        "--data-dir",
+        default="data",
+        help="データディレクトリのパス (default: data)"
+    )
+    parser.add_argument(
+        "--config-dir",
+        default="config",
+        help="設定ディレクトリのパス (default: config)"
+    )
+    parser.add_argument(
+        "--source",
+        choices=SOURCES,
+        default="auto",
+        help="ハンド数の取得方法。auto: session_stats_raw.csv → ログの着席スキャン / "
+             "scan: 常にログをスキャン / reparse: 常にログを再パース (default: auto)"
+    )
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).parent.parent
+    data_dir = base_dir / args.data_dir
+    config_dir = base_dir / args.config_dir
+
+    config = ConfigLoader(str(config_dir))
+    registry = PlayerRegistry(config)
+
+    print("データを収集中...")
+    weekly_data = get_weekly_data(data_dir, config, registry, args.source)
+    print_report(weekly_data, config, registry, data_dir)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# scripts/ のモジュールは scripts/ を sys.path に入れて import する前提
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import fast_table_fixture  # noqa: E402
+import log_tree_fixture  # noqa: E402
+
+
+@pytest.fixture
+def fast_table(tmp_path, monkeypatch):
+    """標準のハンドを入れた SQLite の fast-table DB（DATABASE_URL も設定する）"""
+    hands = fast_table_fixture.build_hands()
+    url = fast_table_fixture.build_db(tmp_path / "fast_table.db", hands)
+    monkeypatch.setenv("DATABASE_URL", url)
+    return {"url": url, "path": tmp_path / "fast_table.db", "hands": hands}
+
+
+@pytest.fixture
+def log_tree(tmp_path):
+    """リポジトリのログの一部をコピーした config/ と data/（凍結していない2シーズン）"""
+    return log_tree_fixture.build_tree(tmp_path / "tree")
@@ -0,0 +1,251 @@
+"""
+fast-table DB のテスト用フィクスチャ
+
+tests/fixtures/fast_table_schema.sql のスキーマで SQLite DB を作り、
+乱数（シード固定）で生成したハンドを入れる。player_stats は fast-table と同じく
+完了ハンドだけをサーバーごとに集計した値にする。
+
+ハンドは {id, server_id, status, started_at, players, actions} の dict で持ち、
+テスト側は同じ dict から期待値を計算できる。
+"""
+
+import random
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+from fast_table_stats import STAT_KEYS, accumulate_hands
+
+
+SCHEMA_PATH = Path(__file__).parent / "fixtures" / "fast_table_schema.sql"
+
+# (id, display_name, discord_id, is_bot)
+# 3 と 7 は同じ表示名（並び順が user_id で決まることの確認用）、9 は bot（discord_id は出力しない）
+USERS = [
+    (1, "あかね", "100000000000000001", 0),
+    (2, "いつき", "100000000000000002", 0),
+    (3, "うみ", "100000000000000003", 0),
+    (4, "えいじ", "100000000000000004", 0),
+    (5, "おとは", "100000000000000005", 0),
+    (6, "かなた", None, 0),
+    (7, "うみ", "100000000000000007", 0),
+    (8, "Kou", "100000000000000008", 0),
+    (9, "fast-bot", "900000000000000009", 1),
+    (10, "予選のみ", "100000000000000010", 0),
+]
+
+# 鳳凰戦のサーバーで着席するユーザー（10 は予選卓 houou-yosen だけ）
+TABLE_USERS = [1, 2, 3, 4, 5, 6, 7, 8, 9]
+
+STREETS = ("preflop", "flop", "turn", "river")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S+00:00"
+
+
+# --------------- Hand generation ---------------
+
+def random_hand(rng: random.Random, hand_id: int, server_id: str, started_at: datetime,
+                user_ids: List[int], status: str = "completed") -> dict:
+    """それらしいアクション列を持つ1ハンドを生成する"""
+    seated = rng.sample(user_ids, rng.randint(2, min(6, len(user_ids))))
+    active = list(seated)
+    folded_street: Dict[int, str] = {}
+    invested = {uid: 0 for uid in seated}
+    actions = []
+
+    def act(uid, street, action, amount=None):
+        actions.append({
+            "hand_id": hand_id, "action_index": len(actions), "user_id": uid,
+            "street": street, "action": action, "amount_cbb": amount,
+        })
+        if amount:
+            invested[uid] += amount
+        if action == "fold":
+            active.remove(uid)
+            folded_street[uid] = street
+
+    for street in STREETS:
+        if len(active) < 2:
+            break
+        facing_bet = street == "preflop"
+        for _ in range(rng.choice((1, 1, 2))):
+            for uid in list(active):
+                if len(active) < 2:
+                    break
+                if facing_bet:
+                    action = rng.choices(("fold", "call", "raise", "all_in"), (4, 5, 3, 0.3))[0]
+                else:
+                    action = rng.choices(("check", "bet", "all_in", "muck"), (6, 3, 0.2, 0.1))[0]
+                amount = None if action in ("fold", "check", "muck") else rng.choice((100, 200, 300, 600))
+                act(uid, street, action, amount)
+                facing_bet = facing_bet or action in ("bet", "raise", "all_in")
+
+    # ショーダウン（2人以上残った場合）か、最後に残ったプレイヤーの勝ち
+    showdown = len(active) >= 2
+    winner = rng.choice(active)
+    players = []
+    for uid in seated:
+        delta = -invested[uid] if uid != winner else sum(v for k, v in invested.items() if k != uid)
+        players.append({
+            "hand_id": hand_id, "user_id": uid, "delta_cbb": delta,
+            "showdown": showdown and uid in active,
+            "folded_street": folded_street.get(uid),
+        })
+
+    return {
+        "id": hand_id,
+        "server_id": server_id,
+        "status": status,
+        "started_at": started_at.strftime(TIMESTAMP_FORMAT),
+        "players": players,
+        "actions": actions,
+    }
+
+
+def session_hands(rng: random.Random, first_hand_id: int, date_str: str,
+                  servers: Iterable[str], hands_per_server: int,
+                  user_ids: List[int] = TABLE_USERS, start_hour: int = 12) -> List[dict]:
+    """1セッション分のハンドを生成する（サーバーをまたいで id は開始時刻順）"""
+    servers = list(servers)
+    start = datetime.strptime(date_str, "%Y%m%d") + timedelta(hours=start_hour)
+    hands = []
+    for i in range(hands_per_server * len(servers)):
+        server_id = servers[i % len(servers)]
+        started_at = start + timedelta(seconds=40 * i)
+        hands.append(random_hand(rng, first_hand_id + i, server_id, started_at, user_ids))
+    return hands
+
+
+def build_hands(seed: int = 20260629) -> List[dict]:
+    """
+    標準のフィクスチャのハンドを生成する
+
+    - 3セッション（houou-shared / houou-main）
+    - 予選卓 houou-yosen のハンド（集計対象外）
+    - UTC の日付境界をまたぐハンド（23:59:59 と翌 00:00:00）
+    - 途中で止まった進行中のハンド
+    """
+    rng = random.Random(seed)
+    servers = ("houou-shared", "houou-main")
+    hands = []
+    for date_str in ("20260622", "20260629", "20260706"):
+        first_hand_id = hands[-1]["id"] + 1 if hands else 1
+        hands.extend(session_hands(rng, first_hand_id, date_str, servers, 30))
+        if date_str == "20260629":
+            next_id = hands[-1]["id"] + 1
+            hands.extend(session_hands(rng, next_id, date_str, ["houou-yosen"], 8,
+                                       user_ids=[1, 2, 10], start_hour=9))
+            next_id = hands[-1]["id"] + 1
+            late = datetime(2026, 6, 29, 23, 59, 59)
+            hands.append(random_hand(rng, next_id, "houou-main", late, TABLE_USERS))
+            hands.append(random_hand(rng, next_id + 1, "houou-main", late + timedelta(seconds=1), TABLE_USERS))
+
+    # 最初のセッションのハンドを1つ進行中にする（完了ハンドより id が古い）
+    hands[20]["status"] = "in_progress"
+    return hands
+
+
+# --------------- Database ---------------
+
+def create_db(path: Path) -> sqlite3.Connection:
+    """スキーマとユーザーだけを入れた DB を作る"""
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+    conn.executemany("INSERT INTO users (id, display_name, discord_id, is_bot) VALUES (?, ?, ?, ?)", USERS)
+    conn.commit()
+    return conn
+
+
+def insert_hands(conn: sqlite3.Connection, hands: Iterable[dict]) -> None:
+    for hand in hands:
+        conn.execute(
+            "INSERT INTO hands (id, server_id, status, started_at) VALUES (?, ?, ?, ?)",
+            (hand["id"], hand["server_id"], hand["status"], hand["started_at"]),
+        )
+        conn.executemany(
+            "INSERT INTO hand_players (hand_id, user_id, delta_cbb, showdown, folded_street) "
+            "VALUES (:hand_id, :user_id, :delta_cbb, :showdown, :folded_street)",
+            hand["players"],
+        )
+        conn.executemany(
+            "INSERT INTO hand_actions (hand_id, action_index, user_id, street, action, amount_cbb) "
+            "VALUES (:hand_id, :action_index, :user_id, :street, :action, :amount_cbb)",
+            hand["actions"],
+        )
+    conn.commit()
+
+
+def hand_totals(hands: Iterable[dict], servers: Iterable[str] = None) -> Dict[str, dict]:
+    """完了ハンドを analyze_hand で集計する（user_id は DB から読んだときと同じ文字列）"""
+    servers = None if servers is None else set(servers)
+    players_by_hand, actions_by_hand = {}, {}
+    for hand in hands:
+        if hand["status"] != "completed" or (servers is not None and hand["server_id"] not in servers):
+            continue
+        players_by_hand[hand["id"]] = [{**p, "user_id": str(p["user_id"])} for p in hand["players"]]
+        actions_by_hand[hand["id"]] = [{**a, "user_id": str(a["user_id"])} for a in hand["actions"]]
+    return accumulate_hands(players_by_hand, actions_by_hand)
+
+
+def write_player_stats(conn: sqlite3.Connection, hands: List[dict]) -> None:
+    """player_stats を完了ハンドの集計値で作り直す"""
+    conn.execute("DELETE FROM player_stats")
+    for server_id in sorted({hand["server_id"] for hand in hands}):
+        for uid, stats in hand_totals(hands, [server_id]).items():
+            conn.execute(
+                f"INSERT INTO player_stats (user_id, server_id, {', '.join(STAT_KEYS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(STAT_KEYS))})",
+                (int(uid), server_id, *(stats[k] for k in STAT_KEYS)),
+            )
+    conn.commit()
+
+
+def complete_hand(conn: sqlite3.Connection, hands: List[dict], hand_id: int) -> None:
+    """進行中のハンドを完了にする"""
+    for hand in hands:
+        if hand["id"] == hand_id:
+            hand["status"] = "completed"
+    conn.execute("UPDATE hands SET status = 'completed' WHERE id = ?", (hand_id,))
+    conn.commit()
+
+
+def add_next_session(path: Path, hands: List[dict]) -> List[int]:
+    """
+    7/13 のセッションを追加する（hands にも追記する）
+
+    新規ユーザー、新しい進行中ハンド、予選卓のハンドを含み、
+    それまで進行中だったハンドは完了にする。
+
+    Returns:
+        list: 完了にしたハンドの id
+    """
+    conn = sqlite3.connect(str(path))
+    try:
+        conn.execute("INSERT INTO users (id, display_name, discord_id, is_bot) VALUES (11, 'さくら', NULL, 0)")
+        rng = random.Random(20260713)
+        new_hands = session_hands(rng, hands[-1]["id"] + 1, "20260713",
+                                  ("houou-shared", "houou-main"), 20, user_ids=TABLE_USERS + [11])
+        new_hands[5]["status"] = "in_progress"
+        new_hands.append(random_hand(rng, new_hands[-1]["id"] + 1, "houou-yosen",
+                                     datetime(2026, 7, 13, 18), [1, 10, 11]))
+        pending = [h["id"] for h in hands if h["status"] == "in_progress"]
+        insert_hands(conn, new_hands)
+        hands.extend(new_hands)
+
+        for hand_id in pending:
+            complete_hand(conn, hands, hand_id)
+        write_player_stats(conn, hands)
+    finally:
+        conn.close()
+    return pending
+
+
+def build_db(path: Path, hands: List[dict]) -> str:
+    """hands を入れた DB を作り、DATABASE_URL を返す"""
+    conn = create_db(path)
+    try:
+        insert_hands(conn, hands)
+        write_player_stats(conn, hands)
+    finally:
+        conn.close()
+    return f"sqlite:///{path}"
@@ -0,0 +1,74 @@
+-- fast-table DB のテスト用 SQLite スキーマ
+-- fast_table_db.py / fetch_stats.py / hand_cache.py が参照する列だけを持つ
+
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY,
+    display_name TEXT NOT NULL,
+    discord_id TEXT,
+    is_bot BOOLEAN NOT NULL DEFAULT 0
+);
+
+CREATE TABLE hands (
+    id INTEGER PRIMARY KEY,
+    server_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    started_at TEXT NOT NULL
+);
+
+CREATE TABLE hand_players (
+    hand_id INTEGER NOT NULL REFERENCES hands (id),
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    delta_cbb BIGINT,
+    showdown BOOLEAN NOT NULL DEFAULT 0,
+    folded_street TEXT,
+    PRIMARY KEY (hand_id, user_id)
+);
+
+CREATE TABLE hand_actions (
+    hand_id INTEGER NOT NULL REFERENCES hands (id),
+    action_index INTEGER NOT NULL,
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    street TEXT NOT NULL,
+    action TEXT NOT NULL,
+    amount_cbb BIGINT,
+    PRIMARY KEY (hand_id, action_index)
+);
+
+CREATE TABLE player_stats (
+    user_id INTEGER NOT NULL REFERENCES users (id),
+    server_id TEXT NOT NULL,
+    hands BIGINT NOT NULL DEFAULT 0,
+    vpip_hands BIGINT NOT NULL DEFAULT 0,
+    pfr_hands BIGINT NOT NULL DEFAULT 0,
+    three_bet_hands BIGINT NOT NULL DEFAULT 0,
+    three_bet_opp BIGINT NOT NULL DEFAULT 0,
+    four_bet_hands BIGINT NOT NULL DEFAULT 0,
+    four_bet_opp BIGINT NOT NULL DEFAULT 0,
+    fold_to_three_bet_hands BIGINT NOT NULL DEFAULT 0,
+    faced_three_bet_opp BIGINT NOT NULL DEFAULT 0,
+    fold_to_four_bet_hands BIGINT NOT NULL DEFAULT 0,
+    faced_four_bet_opp BIGINT NOT NULL DEFAULT 0,
+    cbet_flop_made BIGINT NOT NULL DEFAULT 0,
+    cbet_flop_opp BIGINT NOT NULL DEFAULT 0,
+    cbet_turn_made BIGINT NOT NULL DEFAULT 0,
+    cbet_turn_opp BIGINT NOT NULL DEFAULT 0,
+    cbet_river_made BIGINT NOT NULL DEFAULT 0,
+    cbet_river_opp BIGINT NOT NULL DEFAULT 0,
+    fold_to_cbet_flop BIGINT NOT NULL DEFAULT 0,
+    fold_to_cbet_flop_opp BIGINT NOT NULL DEFAULT 0,
+    fold_to_cbet_turn BIGINT NOT NULL DEFAULT 0,
+    fold_to_cbet_turn_opp BIGINT NOT NULL DEFAULT 0,
+    fold_to_cbet_river BIGINT NOT NULL DEFAULT 0,
+    fold_to_cbet_river_opp BIGINT NOT NULL DEFAULT 0,
+    agg_raise BIGINT NOT NULL DEFAULT 0,
+    agg_call BIGINT NOT NULL DEFAULT 0,
+    agg_check BIGINT NOT NULL DEFAULT 0,
+    saw_flop_hands BIGINT NOT NULL DEFAULT 0,
+    went_showdown_hands BIGINT NOT NULL DEFAULT 0,
+    won_showdown_hands BIGINT NOT NULL DEFAULT 0,
+    won_when_saw_flop_hands BIGINT NOT NULL DEFAULT 0,
+    net_cbb BIGINT NOT NULL DEFAULT 0,
+    showdown_cbb BIGINT NOT NULL DEFAULT 0,
+    non_showdown_cbb BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, server_id)
+);
@@ -0,0 +1,72 @@
+"""
+ハンド履歴ログのテスト用フィクスチャ
+
+data/hand_histories の小さいテーブルのログと Ledger を一時ディレクトリにコピーし、
+凍結していない2シーズン（2/2・2/9 がシーズン1、2/16 がシーズン2）の設定で main.py を動かす。
+players.json はリポジトリのものをコピーする（canonical_id への変換は本番と同じ）。
+"""
+
+import json
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, Optional
+
+ROOT = Path(__file__).parent.parent
+HAND_HISTORIES = ROOT / "data" / "hand_histories"
+
+# 日付 -> コピーするテーブル（各日付の小さいログ）
+TABLES = {
+    "20260202": ["20260202_table19", "20260202_table20", "20260202_table21"],
+    "20260209": ["20260209_table16", "20260209_table29", "20260209_table31"],
+    "20260216": ["20260216_table13", "20260216_table15"],
+}
+
+SEASONS = {
+    "seasons": [
+        {"id": 1, "name": "シーズン 1", "start_date": "2026-02-01", "end_date": "2026-02-12",
+         "leagues": {"A": [], "B": [], "C": ["*"]}, "status": "completed", "frozen": False,
+         "data_source": "hand_histories"},
+        {"id": 2, "name": "シーズン 2", "start_date": "2026-02-13", "end_date": "2026-03-31",
+         "leagues": {"A": [], "B": [], "C": ["*"]}, "status": "active", "frozen": False,
+         "data_source": "hand_histories"},
+    ],
+    "current_season_id": 2,
+}
+
+
+def copy_table(base: Path, date_str: str, table: str, to_date: Optional[str] = None,
+               to_table: Optional[str] = None, ledger: bool = True) -> Path:
+    """リポジトリのテーブルのログ（と Ledger）を base/data/hand_histories にコピーし、コピー先を返す"""
+    target = base / "data" / "hand_histories" / (to_date or date_str) / (to_table or table)
+    target.mkdir(parents=True, exist_ok=True)
+    for path in (HAND_HISTORIES / date_str / table).iterdir():
+        if path.name.startswith("poker_now_log_") or (ledger and path.name.startswith("ledger_")):
+            shutil.copy2(path, target / path.name)
+    return target
+
+
+def build_tree(base: Path) -> Path:
+    """config/ と data/hand_histories/ を作る"""
+    config_dir = base / "config"
+    config_dir.mkdir(parents=True)
+    (config_dir / "seasons.json").write_text(json.dumps(SEASONS, ensure_ascii=False, indent=2), encoding="utf-8")
+    shutil.copy2(ROOT / "config" / "players.json", config_dir / "players.json")
+    for date_str, tables in TABLES.items():
+        for table in tables:
+            copy_table(base, date_str, table)
+    return base
+
+
+def run_main(monkeypatch, base: Path, *args: str) -> None:
+    import main
+    monkeypatch.setattr(sys, "argv", [
+        "main.py", "--data-dir", str(base / "data"), "--config-dir", str(base / "config"), *args,
+    ])
+    main.main()
+
+
+def read_outputs(data_dir: Path) -> Dict[str, bytes]:
+    """main.py が書く CSV・節ごとのファイル・レンジ表（data_dir からの相対パス -> 内容）"""
+    paths = [*data_dir.glob("*.csv"), *(data_dir / "sessions").glob("*"), *(data_dir / "ranges").glob("*.json")]
+    return {path.relative_to(data_dir).as_posix(): path.read_bytes() for path in sorted(paths)}
@@ -0,0 +1,56 @@
+"""allin_ev.parse_allin のサイドポットの分け方と、EV 収支の補正を確認する"""
+
+import pytest
+
+from allin_ev import hand_ev_adjustments, parse_allin
+from hand_evaluator import parse_card
+
+# 短い あかね・中くらいの いつき・深い うみ の3人がプリフロップでオールイン、えいじ は SB を置いて降りる。
+# うみ の 3000 のうち いつき の 1500 を超える分は返却される（変換後のテキストには出ない）
+THREE_WAY = """Hold'em No Limit (10/20)
+Table 'Poker Now - Po' 10-max Seat #4 is the button
+seat 1: あかね (500 in chips)
+seat 2: いつき (1500 in chips)
+seat 3: うみ (4000 in chips)
+seat 4: えいじ (2000 in chips)
+えいじ: posts small blind 10
+あかね: posts big blind 20
+*** HOLE CARDS ***
+いつき: raises to 1500 and go all in
+うみ: raises to 3000
+えいじ: folds
+あかね: calls 500 and go all in
+あかね: shows a As, Ah.
+いつき: shows a Kd, Kc.
+うみ: shows a Qs, Jh.
+*** FLOP *** [2c, 7d, 9h]
+*** TURN *** [3s]
+*** RIVER *** [4c]
+あかね: wins 1510
+いつき: wins 2000"""
+
+
+def test_three_way_side_pots():
+    hand = parse_allin(THREE_WAY)
+    assert hand is not None
+    assert hand.bb == 20
+    assert hand.board == []
+    assert hand.holes["あかね"] == (parse_card("As"), parse_card("Ah"))
+    assert hand.invested == {"えいじ": 10, "あかね": 500, "いつき": 1500, "うみ": 1500}
+    # メインポットは3人の 500 ずつと えいじ の SB、サイドポットは いつき と うみ の残り
+    assert hand.pots == [(1510, ["あかね", "いつき", "うみ"]), (2000, ["いつき", "うみ"])]
+
+    adjustments = hand_ev_adjustments(hand)
+    assert set(adjustments) == {"あかね", "いつき", "うみ"}
+    assert sum(adjustments.values()) == pytest.approx(0, abs=1e-9)
+    # サイドポットの対象ではない あかね の期待値はメインポットの取り分だけ
+    assert adjustments["あかね"] < 0
+    assert adjustments["うみ"] > 0
+
+
+def test_hands_with_river_action_or_unshown_cards_are_skipped():
+    # リバーでアクションがあったハンドは対象外
+    river_action = THREE_WAY.replace("*** RIVER *** [4c]", "*** RIVER *** [4c]\nいつき: checks")
+    assert parse_allin(river_action) is None
+    # 残ったプレイヤーが1人でも見せていなければ対象外
+    assert parse_allin(THREE_WAY.replace("うみ: shows a Qs, Jh.\n", "")) is None
@@ -0,0 +1,44 @@
+"""cohort_analysis.Attendance のビット演算の集計を、手で数えた小さい参加表と比べる"""
+
+import pytest
+
+from cohort_analysis import Attendance
+
+# 10人（ビット列が2バイトにまたがる）・4節。p0 と p3 は1回休んで戻り、4節目は新規がいない
+TOY = {
+    "20260202": ["p0", "p1", "p2"],
+    "20260209": ["p1", "p2", "p3", "p4"],
+    "20260216": ["p0", "p3", "p5", "p6", "p7", "p8", "p9"],
+    "20260223": ["p2", "p4", "p9"],
+}
+
+
+def toy_attendance():
+    return Attendance.from_sessions({
+        date_str: {"players": set(players), "player_hands": {pid: 50 for pid in players}}
+        for date_str, players in TOY.items()
+    })
+
+
+def test_retention_matrix():
+    attendance = toy_attendance()
+    assert attendance.retention_matrix().tolist() == [
+        [3, 2, 1, 1],
+        [0, 2, 1, 1],
+        [0, 0, 5, 1],
+        [0, 0, 0, 0],
+    ]
+    assert [attendance.members(row) for row in attendance.new_players()] == [
+        {"p0", "p1", "p2"}, {"p3", "p4"}, {"p5", "p6", "p7", "p8", "p9"}, set(),
+    ]
+
+
+def test_counts_and_rates():
+    attendance = toy_attendance()
+    assert attendance.attendance_counts().tolist() == [3, 4, 7, 3]
+    assert attendance.cumulative_counts().tolist() == [3, 5, 10, 10]
+    assert attendance.hand_gate_counts(100).tolist() == [0, 2, 4, 6]
+    # 2/2 の3人のうち 2/9 にも来たのは2人、2/16 の7人のうち 2/23 に来たのは1人
+    assert attendance.return_rates()[0, 1] == pytest.approx(200 / 3)
+    assert attendance.churn_rates()[2, 3] == pytest.approx(600 / 7)
+    assert attendance.subset(["20260209", "20260223"]).pair_counts().tolist() == [[4, 2], [2, 3]]
@@ -0,0 +1,86 @@
+"""fast_table_stats の列形式の分析（analyze_columns）が analyze_hand と一致することを確認する"""
+
+import random
+
+import pytest
+
+from fast_table_fixture import build_hands, hand_totals
+from fast_table_stats import accumulate_hands, accumulate_hands_columnar
+
+STREETS = ["preflop", "flop", "turn", "river"]
+ACTIONS = ["fold", "check", "call", "bet", "raise", "all_in"]
+
+
+def random_rows(rng, n_hands, first_hand_id=1):
+    """
+    アクションの順序や組み合わせを制約しないランダムなハンド
+
+    実際には起きない並び（フォールド後のアクション、ストリートの飛び、
+    定義にない street / action、アクションのないハンド）も含めて、
+    2つの実装の分岐の違いを探す。
+    """
+    players_by_hand, actions_by_hand = {}, {}
+    for hand_id in range(first_hand_id, first_hand_id + n_hands):
+        seated = [str(u) for u in rng.sample(range(1, 13), rng.randint(1, 6))]
+        players_by_hand[hand_id] = [
+            {
+                "user_id": uid,
+                "delta_cbb": rng.choice([None, 0, -100, -250, 300, 1200]),
+                "showdown": rng.random() < 0.2,
+                "folded_street": rng.choice([None, None, "preflop", "flop", "turn", "river", "showdown"]),
+            }
+            for uid in seated
+        ]
+        actions = []
+        street_index = 0
+        for _ in range(rng.randint(0, 14)):
+            if rng.random() < 0.25:
+                street_index += rng.choice([1, 1, 2])
+            if rng.random() < 0.03:
+                street, action = rng.choice(["preflop", "showdown"]), rng.choice(ACTIONS + ["muck"])
+            else:
+                street = STREETS[min(street_index, 3)]
+                action = rng.choices(ACTIONS, [3, 3, 4, 2, 3, 1])[0]
+            # 着席していないユーザーのアクションもまれに混ぜる
+            uid = rng.choice(seated) if rng.random() < 0.97 else "99"
+            actions.append({"user_id": uid, "street": street, "action": action})
+        actions_by_hand[hand_id] = actions
+    # hand_players の行がないハンドは両方とも対象外
+    players_by_hand[first_hand_id + n_hands] = []
+    actions_by_hand[first_hand_id + n_hands] = [{"user_id": "1", "street": "preflop", "action": "raise"}]
+    return players_by_hand, actions_by_hand
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_columnar_matches_analyze_hand_on_random_batches(seed):
+    rng = random.Random(seed)
+    players_by_hand, actions_by_hand = random_rows(rng, 300)
+
+    assert accumulate_hands_columnar(players_by_hand, actions_by_hand) == \
+        accumulate_hands(players_by_hand, actions_by_hand)
+
+
+def test_columnar_matches_analyze_hand_per_hand():
+    """1ハンドずつでも一致する（バッチ内の別ハンドの行に引きずられない）"""
+    rng = random.Random(7)
+    players_by_hand, actions_by_hand = random_rows(rng, 500)
+    for hand_id, pdata in players_by_hand.items():
+        one = ({hand_id: pdata}, {hand_id: actions_by_hand[hand_id]})
+        assert accumulate_hands_columnar(*one) == accumulate_hands(*one), hand_id
+
+
+def test_columnar_matches_analyze_hand_on_fixture_hands():
+    hands = [h for h in build_hands() if h["status"] == "completed"]
+    players_by_hand = {h["id"]: [{**p, "user_id": str(p["user_id"])} for p in h["players"]] for h in hands}
+    actions_by_hand = {h["id"]: [{**a, "user_id": str(a["user_id"])} for a in h["actions"]] for h in hands}
+
+    assert accumulate_hands_columnar(players_by_hand, actions_by_hand) == hand_totals(hands)
+
+
+def test_columnar_adds_to_existing_totals():
+    rng = random.Random(11)
+    first = random_rows(rng, 100)
+    second = random_rows(rng, 100, first_hand_id=1000)
+
+    expected = accumulate_hands(*second, accumulate_hands(*first))
+    assert accumulate_hands_columnar(*second, accumulate_hands_columnar(*first)) == expected
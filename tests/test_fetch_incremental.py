@@ -0,0 +1,190 @@
+"""fetch_stats.py --incremental の結果が全件取得と一致することをフィクスチャ DB で確認する"""
+
+import json
+import sqlite3
+
+import fetch_stats
+from fast_table_db import connect, fetch_watermark, read_snapshot
+from fast_table_fixture import add_next_session, create_db, insert_hands
+
+
+def run_all_time(data_dir, date_str, *extra):
+    fetch_stats.main(["--date", date_str, "--data-dir", str(data_dir), *extra])
+    written = sorted((data_dir / "hand_histories" / date_str).glob("player-stats-all-time-*.json"))
+    with open(written[-1], encoding="utf-8") as f:
+        return json.load(f)
+
+
+def comparable(payload):
+    """generated_at と差分取得の回数を除いた内容"""
+    mark = payload["watermark"]
+    return {
+        **{k: v for k, v in payload.items() if k not in ("generated_at", "watermark")},
+        "watermark": {k: v for k, v in mark.items() if k not in ("mode", "incremental_runs")},
+    }
+
+
+def hand(hand_id, server_id, started_at, players, actions, status="completed"):
+    """players は (user_id, delta_cbb, showdown, folded_street)、actions は (user_id, street, action, amount_cbb)"""
+    return {
+        "id": hand_id, "server_id": server_id, "status": status, "started_at": started_at,
+        "players": [
+            {"hand_id": hand_id, "user_id": uid, "delta_cbb": delta, "showdown": showdown, "folded_street": folded}
+            for uid, delta, showdown, folded in players
+        ],
+        "actions": [
+            {"hand_id": hand_id, "action_index": i, "user_id": uid, "street": street,
+             "action": action, "amount_cbb": amount}
+            for i, (uid, street, action, amount) in enumerate(actions)
+        ],
+    }
+
+
+# 7/6 のセッション。2 は進行中のまま終わり、7/13 に完了する
+SESSION_1 = [
+    # 1 がオープンして 2 が降りる
+    hand(1, "houou-main", "2026-07-06 12:00:00+00:00",
+         [(1, 100, False, None), (2, -100, False, "preflop")],
+         [(1, "preflop", "raise", 300), (2, "preflop", "fold", None)]),
+    # 3 がオープン、1 がコール、フロップで 3 の c-bet に 1 が降りる
+    hand(2, "houou-shared", "2026-07-06 12:00:40+00:00",
+         [(1, -500, False, "flop"), (3, 500, False, None)],
+         [(3, "preflop", "raise", 300), (1, "preflop", "call", 300),
+          (3, "flop", "bet", 200), (1, "flop", "fold", None)],
+         status="in_progress"),
+    # リンプしてフロップで 2 がベット、ターンはチェックで回ってショーダウンで 3 の勝ち
+    hand(3, "houou-main", "2026-07-06 12:01:20+00:00",
+         [(2, -300, True, None), (3, 300, True, None)],
+         [(2, "preflop", "call", 100), (3, "preflop", "check", None),
+          (3, "flop", "check", None), (2, "flop", "bet", 200), (3, "flop", "call", 200),
+          (3, "turn", "check", None), (2, "turn", "check", None)]),
+]
+
+# 7/13 のセッション。11 は新規ユーザー、5 は予選卓（集計対象外）
+SESSION_2 = [
+    # 11 のオープンに 1 が 3bet して 11 が降りる
+    hand(4, "houou-main", "2026-07-13 12:00:00+00:00",
+         [(1, 300, False, None), (11, -300, False, "preflop")],
+         [(11, "preflop", "raise", 300), (1, "preflop", "raise", 900), (11, "preflop", "fold", None)]),
+    hand(5, "houou-yosen", "2026-07-13 18:00:00+00:00",
+         [(1, -100, False, "preflop"), (10, 100, False, None)],
+         [(10, "preflop", "raise", 300), (1, "preflop", "fold", None)]),
+]
+
+# fast-table の player_stats（サーバー別）。上のハンドから手で数えた値で、0 の列は省略する
+STATS_1 = {
+    (1, "houou-main"): {"hands": 1, "vpip_hands": 1, "pfr_hands": 1, "net_cbb": 100, "non_showdown_cbb": 100},
+    (2, "houou-main"): {
+        "hands": 2, "vpip_hands": 1, "three_bet_opp": 1, "cbet_turn_opp": 1,
+        "agg_raise": 1, "agg_check": 1, "saw_flop_hands": 1, "went_showdown_hands": 1,
+        "net_cbb": -400, "showdown_cbb": -300, "non_showdown_cbb": -100,
+    },
+    (3, "houou-main"): {
+        "hands": 1, "agg_call": 1, "agg_check": 2, "saw_flop_hands": 1, "went_showdown_hands": 1,
+        "won_showdown_hands": 1, "won_when_saw_flop_hands": 1, "net_cbb": 300, "showdown_cbb": 300,
+    },
+}
+STATS_2 = {
+    **STATS_1,
+    (1, "houou-main"): {
+        "hands": 2, "vpip_hands": 2, "pfr_hands": 2, "three_bet_hands": 1,
+        "net_cbb": 400, "non_showdown_cbb": 400,
+    },
+    (1, "houou-shared"): {
+        "hands": 1, "vpip_hands": 1, "three_bet_opp": 1, "fold_to_cbet_flop": 1, "fold_to_cbet_flop_opp": 1,
+        "saw_flop_hands": 1, "net_cbb": -500, "non_showdown_cbb": -500,
+    },
+    (3, "houou-shared"): {
+        "hands": 1, "vpip_hands": 1, "pfr_hands": 1, "cbet_flop_made": 1, "cbet_flop_opp": 1,
+        "agg_raise": 1, "saw_flop_hands": 1, "won_when_saw_flop_hands": 1, "net_cbb": 500, "non_showdown_cbb": 500,
+    },
+    (11, "houou-main"): {
+        "hands": 1, "vpip_hands": 1, "pfr_hands": 1, "four_bet_opp": 1, "fold_to_three_bet_hands": 1,
+        "faced_three_bet_opp": 1, "net_cbb": -300, "non_showdown_cbb": -300,
+    },
+    (1, "houou-yosen"): {"hands": 1, "net_cbb": -100, "non_showdown_cbb": -100},
+    (10, "houou-yosen"): {"hands": 1, "vpip_hands": 1, "pfr_hands": 1, "net_cbb": 100, "non_showdown_cbb": 100},
+}
+
+
+def write_stats(conn, stats):
+    conn.execute("DELETE FROM player_stats")
+    for (uid, server_id), values in stats.items():
+        conn.execute(
+            f"INSERT INTO player_stats (user_id, server_id, {', '.join(values)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(values))})",
+            (uid, server_id, *values.values()),
+        )
+    conn.commit()
+
+
+def test_incremental_matches_full_refresh(tmp_path, monkeypatch):
+    """
+    差分取得（前回の raw_totals + 新しいハンドの analyze_hand）が、サーバーの player_stats を
+    読み直した全件取得と一致する。player_stats は analyze_hand を通さずに書いた値にする
+    """
+    path = tmp_path / "fast_table.db"
+    conn = create_db(path)
+    insert_hands(conn, SESSION_1)
+    write_stats(conn, STATS_1)
+    conn.close()
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+
+    data_dir = tmp_path / "data"
+    first = run_all_time(data_dir, "20260706")
+    assert first["watermark"]["mode"] == "full"
+    assert first["watermark"]["pending_hand_ids"] == [2]
+
+    conn = sqlite3.connect(str(path))
+    conn.execute("INSERT INTO users (id, display_name, discord_id, is_bot) VALUES (11, 'さくら', NULL, 0)")
+    insert_hands(conn, SESSION_2)
+    conn.execute("UPDATE hands SET status = 'completed' WHERE id = 2")
+    write_stats(conn, STATS_2)
+    conn.close()
+
+    incremental = run_all_time(data_dir, "20260713", "--incremental")
+    assert incremental["watermark"]["mode"] == "incremental"
+    assert incremental["watermark"]["incremental_runs"] == 1
+    assert incremental["watermark"]["pending_hand_ids"] == []
+
+    full = run_all_time(tmp_path / "full", "20260713")
+    assert full["watermark"]["mode"] == "full"
+    assert comparable(incremental) == comparable(full)
+
+    # 鳳凰戦の2サーバーの合計（予選卓は含まない）
+    by_id = {p["user_id"]: p["raw_totals"] for p in incremental["players"]}
+    assert by_id["1"]["hands"] == 3
+    assert by_id["1"]["net_cbb"] == -100
+    assert by_id["3"]["won_when_saw_flop_hands"] == 2
+    assert by_id["11"]["fold_to_three_bet_hands"] == 1
+
+
+def test_incremental_falls_back_to_full_refresh(fast_table, tmp_path):
+    data_dir = tmp_path / "data"
+    run_all_time(data_dir, "20260706")
+    add_next_session(fast_table["path"], fast_table["hands"])
+
+    payload = run_all_time(data_dir, "20260713", "--incremental", "--full-refresh-every", "0")
+    assert payload["watermark"]["mode"] == "full"
+    assert payload["watermark"]["incremental_runs"] == 0
+
+
+def test_read_snapshot_hides_later_commits(fast_table):
+    """read_snapshot の中では、途中で完了したハンドはウォーターマークにも反映されない"""
+    writer = sqlite3.connect(str(fast_table["path"]))
+    writer.execute("PRAGMA journal_mode=WAL")
+    reader = connect(fast_table["url"])
+    try:
+        latest = fast_table["hands"][-1]
+        with read_snapshot(reader):
+            before = fetch_watermark(reader)
+            writer.execute(
+                "INSERT INTO hands (id, server_id, status, started_at) VALUES (?, 'houou-main', 'completed', ?)",
+                (latest["id"] + 1, latest["started_at"]),
+            )
+            writer.commit()
+            assert fetch_watermark(reader) == before
+        assert fetch_watermark(reader)["hand_id"] == latest["id"] + 1
+    finally:
+        reader.close()
+        writer.close()
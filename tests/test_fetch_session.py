@@ -0,0 +1,79 @@
+"""fetch_stats.py --scope session をフィクスチャ DB で実行する"""
+
+import json
+
+import fetch_stats
+from fast_table_fixture import hand_totals
+
+
+def run_session(tmp_path, date_str, *extra):
+    data_dir = tmp_path / "data"
+    fetch_stats.main(["--scope", "session", "--date", date_str, "--data-dir", str(data_dir), *extra])
+    written = sorted((data_dir / "hand_histories" / date_str).glob("player-stats-session-*.json"))
+    assert len(written) == 1
+    with open(written[0], encoding="utf-8") as f:
+        return json.load(f)
+
+
+def session_hands(hands, date_str, servers):
+    day = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}"
+    return [h for h in hands if h["started_at"].startswith(day) and h["server_id"] in servers]
+
+
+def test_session_totals_match_hands(fast_table, tmp_path):
+    payload = run_session(tmp_path, "20260629")
+
+    assert payload["scope"] == {
+        "type": "session", "date": "2026-06-29", "timezone": "UTC",
+        "servers": ["houou-shared", "houou-main"],
+    }
+    servers = ("houou-shared", "houou-main")
+    expected = hand_totals(session_hands(fast_table["hands"], "20260629", servers))
+    actual = {p["user_id"]: p["raw_totals"] for p in payload["players"]}
+    assert actual == {uid: fetch_stats.build_raw_totals(stats) for uid, stats in expected.items()}
+    assert payload["player_count"] == len(payload["players"])
+
+    # 23:59:59 のハンドは含み、翌 00:00:00 のハンドは翌日のセッションになる
+    late, midnight = [h for h in fast_table["hands"] if "2026-06-29 23:59:59" <= h["started_at"] < "2026-07"]
+    assert late in session_hands(fast_table["hands"], "20260629", servers)
+    assert sum(p["raw_totals"]["hands"] for p in payload["players"]) == sum(
+        len(h["players"]) for h in session_hands(fast_table["hands"], "20260629", servers)
+    )
+    next_day = run_session(tmp_path, "20260630")
+    assert {p["user_id"]: p["raw_totals"]["hands"] for p in next_day["players"]} == {
+        str(p["user_id"]): 1 for p in midnight["players"]
+    }
+
+
+def test_session_excludes_other_servers_and_hides_bot_discord_id(fast_table, tmp_path):
+    payload = run_session(tmp_path, "20260629")
+    by_id = {p["user_id"]: p for p in payload["players"]}
+
+    # 予選卓だけのユーザーは出ない
+    assert "10" not in by_id
+    assert by_id["9"]["is_bot"] is True
+    assert by_id["9"]["discord_id"] is None
+    # 表示名が同じユーザーは user_id 順
+    names = [(p["display_name"], p["user_id"]) for p in payload["players"]]
+    assert names == sorted(names)
+
+
+def test_session_skips_in_progress_hands(fast_table, tmp_path):
+    pending = [h for h in fast_table["hands"] if h["status"] == "in_progress"]
+    assert len(pending) == 1
+    payload = run_session(tmp_path, "20260622")
+
+    expected = hand_totals(session_hands(fast_table["hands"], "20260622", ("houou-shared", "houou-main")))
+    assert {p["user_id"]: p["raw_totals"]["hands"] for p in payload["players"]} == {
+        uid: stats["hands"] for uid, stats in expected.items()
+    }
+
+
+def test_session_single_server(fast_table, tmp_path):
+    payload = run_session(tmp_path, "20260706", "--servers", "houou-main")
+
+    assert payload["scope"]["servers"] == ["houou-main"]
+    expected = hand_totals(session_hands(fast_table["hands"], "20260706", ("houou-main",)))
+    assert {p["user_id"]: p["raw_totals"]["net_cbb"] for p in payload["players"]} == {
+        uid: stats["net_cbb"] for uid, stats in expected.items()
+    }
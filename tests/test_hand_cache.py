@@ -0,0 +1,141 @@
+"""hand_cache のダンプから DB なしで再構築・検証した結果が、DB から読んだ場合と一致することを確認する"""
+
+import random
+import sys
+
+import hand_cache
+import reconstruct_snapshots
+from fast_table_db import connect, read_snapshot
+from fast_table_fixture import add_next_session
+from fast_table_stats import accumulate_columns, accumulate_hands, accumulate_hands_columnar
+from test_fast_table_stats import random_rows
+from test_reconstruct_snapshots import load_snapshots, run_rebuild
+
+PLAYER_FIELDS = ("hand_id", "user_id", "delta_cbb", "showdown", "folded_street")
+ACTION_FIELDS = ("hand_id", "user_id", "action_index", "street", "action", "amount_cbb")
+
+
+def dump(url, cache_dir, full=False):
+    conn = connect(url)
+    try:
+        with read_snapshot(conn):
+            return hand_cache.dump(conn, cache_dir, ["houou-shared", "houou-main"], batch_size=9, full=full)
+    finally:
+        conn.close()
+
+
+def rows(by_hand, fields):
+    return {
+        hand_id: [tuple(bool(r[f]) if f == "showdown" else r[f] for f in fields) for r in hand_rows]
+        for hand_id, hand_rows in by_hand.items()
+    }
+
+
+def assert_same_as_database(url, cache_dir):
+    """キャッシュの全バッチが DB と同じ行・同じ集計結果になる"""
+    db = reconstruct_snapshots.DatabaseSource(url)
+    cache = hand_cache.CacheSource(cache_dir)
+    try:
+        servers = ["houou-shared", "houou-main"]
+        hand_index = db.hand_index(servers)
+        assert cache.hand_index(servers) == hand_index
+        assert cache.users() == db.users()
+        assert cache.server_stats() == db.server_stats()
+
+        for batch in reconstruct_snapshots.plan_batches(hand_index, 6):
+            db_players, db_actions = db.fetch(batch)
+            players, actions = cache.fetch(batch)
+            assert rows(players, PLAYER_FIELDS) == rows(db_players, PLAYER_FIELDS), batch
+            assert rows(actions, ACTION_FIELDS) == rows(db_actions, ACTION_FIELDS), batch
+
+            expected = accumulate_hands(db_players, db_actions)
+            assert accumulate_hands(players, actions) == expected, batch
+            assert accumulate_columns(*cache.fetch_columns(batch)) == expected, batch
+    finally:
+        db.close()
+        cache.close()
+
+
+def test_cache_matches_database(fast_table, tmp_path):
+    cache_dir = tmp_path / "cache"
+    manifest = dump(fast_table["url"], cache_dir)
+
+    assert manifest["pending_hand_ids"] == [21]
+    assert manifest["watermark"] == max(h["id"] for h in fast_table["hands"])
+    assert_same_as_database(fast_table["url"], cache_dir)
+
+
+def test_incremental_dump_matches_database(fast_table, tmp_path):
+    cache_dir = tmp_path / "cache"
+    before = dump(fast_table["url"], cache_dir)
+    completed = add_next_session(fast_table["path"], fast_table["hands"])
+
+    manifest = dump(fast_table["url"], cache_dir)
+    # 前回進行中だったハンドは古いパーティション（6/22）に追記される
+    assert completed == [21]
+    server_id = next(h["server_id"] for h in fast_table["hands"] if h["id"] == 21)
+    assert manifest["partitions"][server_id]["20260622"]["hands"] == \
+        before["partitions"][server_id]["20260622"]["hands"] + 1
+    assert len(manifest["pending_hand_ids"]) == 1
+    assert_same_as_database(fast_table["url"], cache_dir)
+
+    # 差分ダンプと最初からのダンプは同じ内容になる
+    full_dir = tmp_path / "full"
+    full = dump(fast_table["url"], full_dir, full=True)
+    assert {k: v for k, v in full.items() if k != "updated_at"} == \
+        {k: v for k, v in manifest.items() if k != "updated_at"}
+
+
+def test_cache_rebuild_matches_database_rebuild(fast_table, tmp_path, monkeypatch, capsys):
+    cache_dir = tmp_path / "cache"
+    dump(fast_table["url"], cache_dir)
+
+    common = ["--servers", "houou-main", "--base-servers", "houou-shared", "--batch-size", "7", "--workers", "2"]
+    run_rebuild(monkeypatch, *common, "--data-dir", str(tmp_path / "db"))
+    db_output = capsys.readouterr().out
+    monkeypatch.delenv("DATABASE_URL")
+    run_rebuild(monkeypatch, *common, "--data-dir", str(tmp_path / "cached"), "--cache", str(cache_dir))
+    cache_output = capsys.readouterr().out
+
+    assert load_snapshots(tmp_path / "cached") == load_snapshots(tmp_path / "db")
+    assert "houou-main: all" in cache_output and "houou-main: all" in db_output
+    assert "MISMATCH" not in cache_output + db_output
+
+
+def test_verify_cache(fast_table, tmp_path, monkeypatch, capsys):
+    cache_dir = tmp_path / "cache"
+    dump(fast_table["url"], cache_dir)
+
+    monkeypatch.setattr(sys, "argv", ["reconstruct_snapshots.py", "verify", "--cache", str(cache_dir),
+                                      "--batch-size", "10"])
+    reconstruct_snapshots.main()
+    assert "All batches match" in capsys.readouterr().out
+
+
+def test_partition_round_trip_keeps_missing_values():
+    """None（delta_cbb / folded_street / user_id）や定義にない値を含む行も元どおりに戻る"""
+    rng = random.Random(5)
+    players_by_hand, actions_by_hand = random_rows(rng, 200)
+    for hand_id, pdata in players_by_hand.items():
+        for p in pdata:
+            p["hand_id"] = hand_id
+        for i, a in enumerate(actions_by_hand[hand_id]):
+            a.update(hand_id=hand_id, action_index=i, amount_cbb=rng.choice([None, 100]))
+            if rng.random() < 0.02:
+                a["user_id"] = None
+    players_by_hand = {h: p for h, p in players_by_hand.items() if p}
+
+    cols = hand_cache.encode_partition(players_by_hand, actions_by_hand)
+    players, actions = hand_cache.decode_partition(cols)
+    assert rows(players, PLAYER_FIELDS) == rows(players_by_hand, PLAYER_FIELDS)
+    assert rows(actions, ACTION_FIELDS) == rows(
+        {h: a for h, a in actions_by_hand.items() if h in players_by_hand and a}, ACTION_FIELDS
+    )
+
+    # user_id のない行があるので、比較相手は同じ列形式の分析（hands_to_columns）にする
+    expected = accumulate_hands_columnar(players_by_hand, actions_by_hand)
+    assert accumulate_columns(*hand_cache.partition_to_columns(cols)) == expected
+    first, last = 50, 120
+    subset = {h: p for h, p in players_by_hand.items() if first <= h <= last}
+    assert accumulate_columns(*hand_cache.partition_to_columns(cols, first, last)) == \
+        accumulate_hands_columnar(subset, actions_by_hand)
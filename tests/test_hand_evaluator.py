@@ -0,0 +1,102 @@
+"""hand_evaluator の表による評価・エクイティを、5枚ずつ全組み合わせを比べる素朴な評価と照らし合わせる"""
+
+import random
+from itertools import combinations
+
+import pytest
+
+from hand_evaluator import equity, evaluate, parse_card
+
+
+def rank_five(cards):
+    """5枚の役を (役の種類, 比べる順のランク...) のタプルにする（大きいほど強い）"""
+    ranks = sorted((card >> 2 for card in cards), reverse=True)
+    flush = len({card & 3 for card in cards}) == 1
+    distinct = sorted(set(ranks), reverse=True)
+    straight = None
+    if len(distinct) == 5:
+        if distinct[0] - distinct[4] == 4:
+            straight = distinct[0]
+        elif distinct == [12, 3, 2, 1, 0]:
+            straight = 3
+    groups = sorted(((ranks.count(r), r) for r in distinct), reverse=True)
+    shape = [n for n, _ in groups]
+    order = [r for _, r in groups]
+
+    if straight is not None and flush:
+        return (8, straight)
+    if shape == [4, 1]:
+        return (7, *order)
+    if shape == [3, 2]:
+        return (6, *order)
+    if flush:
+        return (5, *ranks)
+    if straight is not None:
+        return (4, straight)
+    if shape == [3, 1, 1]:
+        return (3, *order)
+    if shape == [2, 2, 1]:
+        return (2, *order)
+    if shape == [2, 1, 1, 1]:
+        return (1, *order)
+    return (0, *ranks)
+
+
+def rank_seven(cards):
+    return max(rank_five(five) for five in combinations(cards, 5))
+
+
+def cards(text):
+    return [parse_card(card) for card in text.split()]
+
+
+def test_evaluate_orders_hands_like_best_five_of_seven():
+    rng = random.Random(20260202)
+    hands = [rng.sample(range(52), 7) for _ in range(3000)]
+    # ストレートフラッシュ・フォーカード・ホイールなどの少ない役も入れる
+    hands += [cards(text) for text in (
+        "As Ks Qs Js Ts 2d 3c", "5h 4h 3h 2h Ah Kd Kc", "9c 9d 9h 9s 2c 2d 3h",
+        "Ad 2c 3h 4s 5d Kh Kc", "7c 7d 7h 2s 2d 2h Ac", "Ac Kc Qc Jc 9c 8c 7c",
+    )]
+    values = evaluate(hands)
+    expected = [rank_seven(hand) for hand in hands]
+
+    assert 1 <= values.min() and values.max() <= 7462
+    by_value = {}
+    for value, rank in zip(values.tolist(), expected):
+        by_value.setdefault(value, set()).add(rank)
+    # 同じ値は同じ役、値の順は役の順
+    assert all(len(ranks) == 1 for ranks in by_value.values())
+    ordered = [next(iter(by_value[value])) for value in sorted(by_value)]
+    assert ordered == sorted(ordered)
+
+
+@pytest.mark.parametrize("holes, board", [
+    ("As Ah | Kd Kc", "2c 7d 9h"),
+    ("Ah Kh | Qs Qd | 9h 8h", "Th 5h 2s"),
+    ("5c 4c | Ad Kd", "3c 2d 9s Jc"),
+])
+def test_equity_matches_enumeration(holes, board):
+    holes = [tuple(cards(hole)) for hole in holes.split("|")]
+    board = cards(board)
+    deck = [c for c in range(52) if c not in board and all(c not in hole for hole in holes)]
+
+    wins = [0.0] * len(holes)
+    runouts = list(combinations(deck, 5 - len(board)))
+    for runout in runouts:
+        ranks = [rank_seven(list(hole) + board + list(runout)) for hole in holes]
+        best = max(ranks)
+        winners = [i for i, rank in enumerate(ranks) if rank == best]
+        for i in winners:
+            wins[i] += 1 / len(winners)
+
+    shares = equity(holes, board)[0]
+    assert shares.tolist() == pytest.approx([w / len(runouts) for w in wins], abs=1e-12)
+
+
+def test_preflop_aces_against_kings():
+    # 1,712,304 通りのボードを rank_seven で数えた値（AA の勝ち 1,388,072、引き分け 6,538 通り。数分かかるので定数にしておく）
+    aces = (1388072 + 6538 / 2) / 1712304
+    shares = equity([tuple(cards("As Ah")), tuple(cards("Kd Kc"))])[0]
+    assert shares.tolist() == pytest.approx([aces, 1 - aces], abs=1e-12)
+    assert shares.sum() == pytest.approx(1.0)
@@ -0,0 +1,58 @@
+"""重複ハンドの持ち主が、前回の実行の指紋インデックスによらずツリーだけで決まることを確認する"""
+
+import shutil
+
+from csv_formatter import PokerNowParser
+from hand_fingerprints import FingerprintIndex
+from log_tree_fixture import HAND_HISTORIES, copy_table, read_outputs, run_main
+
+
+def fingerprints(date_str, table):
+    log = next((HAND_HISTORIES / date_str / table).glob("poker_now_log_*.csv"))
+    parser = PokerNowParser(str(log))
+    parser.parse()
+    return parser.hand_fingerprints
+
+
+def test_claim_duplicated_log():
+    fps = fingerprints("20260209", "20260209_table16")
+    index = FingerprintIndex()
+    first, copy = "hand_histories/20260202/table9/log.csv", "hand_histories/20260209/table16/log.csv"
+
+    assert [index.claim(fp, first) for fp in fps] == [None] * len(fps)
+    # 同じログ内の重複は自分自身、別のログのコピーは最初のログが持ち主
+    assert index.claim(fps[0], first) == first
+    assert [index.claim(fp, copy) for fp in fps] == [first] * len(fps)
+
+
+def test_previous_index_is_only_reported():
+    fps = fingerprints("20260209", "20260209_table16")
+    earlier, later = "hand_histories/20260202/table9/log.csv", "hand_histories/20260209/table16/log.csv"
+    index = FingerprintIndex(previous={fp: later for fp in fps})
+
+    assert all(index.claim(fp, earlier) is None for fp in fps)
+    assert all(index.claim(fp, later) == earlier for fp in fps)
+    assert index.changed_owners() == {(later, earlier): len(fps)}
+
+
+def test_same_tree_gives_same_outputs_with_or_without_cache(log_tree, monkeypatch, capsys):
+    data_dir = log_tree / "data"
+    run_main(monkeypatch, log_tree)
+    capsys.readouterr()
+
+    # 2/9 のログを前の日付（2/2）にもう1つ置く。前回のインデックスでは 2/9 のログが持ち主
+    copy_table(log_tree, "20260209", "20260209_table16", to_date="20260202", to_table="20260202_table99",
+               ledger=False)
+    run_main(monkeypatch, log_tree)
+    output = capsys.readouterr().out
+    with_cache = read_outputs(data_dir)
+
+    shutil.rmtree(data_dir / "cache")
+    run_main(monkeypatch, log_tree)
+    without_cache = read_outputs(data_dir)
+
+    assert with_cache == without_cache
+    hands = len(fingerprints("20260209", "20260209_table16"))
+    assert f"hand_histories/20260209/20260209_table16/" in output
+    assert f"hand_histories/20260202/20260202_table99/" in output
+    assert f"Duplicate hands moved to another log since the last run: {hands}" in output
@@ -0,0 +1,33 @@
+"""league_simulator の境界（X = 0、A の枠より少ない人数）で試行が最後まで回ることを確認する"""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from league_simulator import PlayerModel, kth_largest, simulate
+
+ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture(scope="module")
+def model():
+    return PlayerModel.from_session_stats(ROOT / "data" / "session_stats_raw.csv")
+
+
+def test_kth_largest():
+    values = np.array([[5.0, 1.0, 3.0, 4.0], [2.0, 8.0, 6.0, 7.0]])
+    member = np.array([[True, True, True, False], [False, True, True, True]])
+    assert kth_largest(values, member, 1).ravel().tolist() == [5.0, 8.0]
+    assert kth_largest(values, member, 3).ravel().tolist() == [1.0, 6.0]
+    # メンバーが k 人未満なら -inf、k = 0 なら +inf
+    assert kth_largest(values, member, 4).ravel().tolist() == [-np.inf, -np.inf]
+    assert kth_largest(values, member, 0).ravel().tolist() == [np.inf, np.inf]
+
+
+@pytest.mark.parametrize("n_players", [20, 150])
+def test_no_movement_between_servers(model, n_players):
+    result = simulate(model, n_players, x=0, min_hands=100, trials=30, seasons=3, sessions=4)
+    assert result["luck"]["CD_to_AB"] == (0, 0)
+    assert len(result["first_houou"]) == 30
+    assert sum(result["league_sizes"].values()) == n_players
@@ -0,0 +1,35 @@
+"""live_tail.LiveTableStats をログ全体に流した結果が、hand_analysis.calculate_players の VPIP・PFR と一致することを確認する"""
+
+import pytest
+
+from csv_formatter import PokerNowParser
+from hand_analysis import StatsCalculator, calculate_players
+from live_tail import LiveTableStats, LogFollower
+from log_tree_fixture import HAND_HISTORIES, TABLES
+
+LOGS = [
+    log
+    for date_str, tables in TABLES.items()
+    for table in tables
+    for log in sorted((HAND_HISTORIES / date_str / table).glob("poker_now_log_*.csv"))
+]
+
+
+@pytest.mark.parametrize("log", LOGS, ids=lambda p: p.parent.name)
+def test_live_counts_match_calculate_players(log):
+    live = LiveTableStats(log.parent.name)
+    for entry in LogFollower(log).poll():
+        live.feed(entry)
+
+    formatted, _ = PokerNowParser(str(log)).parse()
+    histories = [h for h in formatted.split("\n\n") if h.strip()]
+    expected = calculate_players(histories, StatsCalculator(histories).get_all_players())
+
+    assert live.hands == len(histories)
+    assert {
+        name: (p["hands"], p["vpip"], p["pfr"], p["pfr_hands"]) for name, p in live.players.items()
+    } == {
+        name: (s.hands, s.vpip_count, s.pfr_count, s.pfr_hands) for name, s in expected.items()
+    }
+    # 収支はハンドごとのチップの出入りなので、テーブル全体では 0
+    assert sum(p["net"] for p in live.players.values()) == 0
@@ -0,0 +1,44 @@
+"""
+main.py の部分集計（--map / --reduce）・一部の節の集計し直し（--since / --season）・
+節ごとに一時ファイルに移す集計（--stream）が、全件の集計と同じ CSV を出力することを確認する
+"""
+
+import shutil
+
+from log_tree_fixture import read_outputs, run_main
+
+
+def full_run(log_tree, tmp_path, monkeypatch):
+    """log_tree のコピーを全件で集計し、出力を返す"""
+    full = tmp_path / "full"
+    shutil.copytree(log_tree, full)
+    run_main(monkeypatch, full)
+    return read_outputs(full / "data")
+
+
+def test_map_reduce_matches_full_run(log_tree, tmp_path, monkeypatch):
+    expected = full_run(log_tree, tmp_path, monkeypatch)
+
+    partials = [tmp_path / f"part{i}.json" for i in (1, 2)]
+    for i, path in enumerate(partials, 1):
+        run_main(monkeypatch, log_tree, "--map", str(path), "--shard", f"{i}/2")
+    run_main(monkeypatch, log_tree, "--reduce", *map(str, reversed(partials)))
+
+    assert read_outputs(log_tree / "data") == expected
+
+
+def test_since_and_season_match_full_run(log_tree, tmp_path, monkeypatch):
+    expected = full_run(log_tree, tmp_path, monkeypatch)
+    run_main(monkeypatch, log_tree)
+
+    # 範囲外の節は前回の session_stats_raw.csv から復元される
+    run_main(monkeypatch, log_tree, "--since", "20260209")
+    assert read_outputs(log_tree / "data") == expected
+    run_main(monkeypatch, log_tree, "--season", "2")
+    assert read_outputs(log_tree / "data") == expected
+
+
+def test_stream_matches_full_run(log_tree, tmp_path, monkeypatch):
+    expected = full_run(log_tree, tmp_path, monkeypatch)
+    run_main(monkeypatch, log_tree, "--stream")
+    assert read_outputs(log_tree / "data") == expected
@@ -0,0 +1,19 @@
+"""pipeline.py の並行実行が main.py・preflop_ranges.py を順に実行したときと同じ出力になることを確認する"""
+
+import shutil
+
+from log_tree_fixture import read_outputs, run_main
+from pipeline import STAGES, Context, Pipeline
+
+
+def test_concurrent_stages_match_main(log_tree, tmp_path, monkeypatch):
+    sequential = tmp_path / "sequential"
+    shutil.copytree(log_tree, sequential)
+    run_main(monkeypatch, sequential)
+
+    ctx = Context(base_dir=log_tree, data_dir=log_tree / "data", config_dir=log_tree / "config")
+    assert Pipeline(STAGES, ctx, jobs=2).run(["aggregate", "weekly", "ranges"], set())
+
+    assert read_outputs(log_tree / "data") == read_outputs(sequential / "data")
+    assert (log_tree / "config" / "players.json").read_bytes() == \
+        (sequential / "config" / "players.json").read_bytes()
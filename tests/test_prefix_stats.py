@@ -0,0 +1,72 @@
+"""PrefixStatsStore の as-of・直近 N 節の合計を、節別スタッツを素朴に足した値と比べる"""
+
+import random
+
+import pytest
+
+from hand_analysis import PlayerStats
+from prefix_stats import COUNTERS, PrefixStatsStore
+
+DATES = ["20260202", "20260209", "20260216", "20260223", "20260302", "20260309", "20260316"]
+
+
+def toy_sessions(seed=35):
+    """参加がまばらなプレイヤーを含む節別スタッツ（a は毎回、d は1回だけ）"""
+    rng = random.Random(seed)
+    attendance = {
+        "a": DATES,
+        "b": DATES[1::2],
+        "c": [DATES[0], DATES[4], DATES[5]],
+        "d": [DATES[3]],
+    }
+    sessions = {date_str: {} for date_str in DATES}
+    for pid, dates in attendance.items():
+        for date_str in dates:
+            hands = rng.randint(20, 120)
+            sessions[date_str][pid] = PlayerStats(
+                player_id=pid, display_name=pid.upper(), hands=hands, ev_hands=hands,
+                vpip_hands=hands, vpip_count=rng.randint(0, hands),
+                net=round(rng.uniform(-80, 80), 2), ev_adjustment=round(rng.uniform(-5, 5), 2),
+            )
+    return sessions
+
+
+def naive_last(sessions, n, as_of):
+    """各プレイヤーが as_of までに参加した直近 n 節を PlayerStats.merge で足す"""
+    result = {}
+    for pid in sorted({pid for players in sessions.values() for pid in players}):
+        attended = [d for d in sorted(sessions) if d <= as_of and pid in sessions[d]][-n:]
+        if attended:
+            merged = PlayerStats(player_id=pid)
+            for date_str in attended:
+                merged.merge(sessions[date_str][pid])
+            result[pid] = (merged, len(attended))
+    return result
+
+
+@pytest.mark.parametrize("as_of", [DATES[0], DATES[3], "20260305", DATES[-1]])
+@pytest.mark.parametrize("n", [1, 2, 3, 10])
+def test_last_sessions_matches_naive_sum(n, as_of):
+    sessions = toy_sessions()
+    store = PrefixStatsStore.from_sessions(sessions)
+    stats, counts = store.to_player_stats(*store.last_sessions(n, as_of))
+
+    expected = naive_last(sessions, n, as_of)
+    assert counts == {pid: count for pid, (_, count) in expected.items()}
+    for pid, (merged, _) in expected.items():
+        for key in COUNTERS:
+            assert getattr(stats[pid], key) == pytest.approx(getattr(merged, key)), (pid, key)
+        assert stats[pid].display_name == pid.upper()
+        # player() の直近 n 節も同じ
+        assert store.player(pid, as_of, last=n).hands == merged.hands
+
+
+def test_last_held_sessions_counts_absences():
+    sessions = toy_sessions()
+    store = PrefixStatsStore.from_sessions(sessions)
+    stats, counts = store.to_player_stats(*store.last_held_sessions(2, DATES[-1]))
+    # 直近2回の開催は 3/9（a, b, c）と 3/16（a）
+    assert counts == {"a": 2, "b": 1, "c": 1}
+    assert stats["c"].hands == sessions[DATES[5]]["c"].hands
+    assert store.player("d", DATES[-1], last=1).hands == sessions[DATES[3]]["d"].hands
+    assert store.player("d", DATES[2]) is None
@@ -0,0 +1,88 @@
+"""プリフロップのアクションの分類と、節ごとのキャッシュから作ったレンジ表が作り直しと一致することを確認する"""
+
+import json
+import re
+import shutil
+
+from config_loader import ConfigLoader
+from hand_evaluator import parse_card
+from log_tree_fixture import copy_table, read_outputs, run_main
+from player_registry import PlayerRegistry
+from preflop_ranges import (CACHE_DIR, CALL, OPEN, RANGES_DIR, THREE_BET, build_ranges, cell_index,
+                            preflop_actions, shown_holdings)
+
+HISTORY = "\n".join([
+    "seat 1: A (2000 in chips)",
+    "A: posts small blind 10",
+    "B: posts big blind 20",
+    "*** HOLE CARDS ***",
+    "C: calls 20",
+    "D: raises to 60",
+    "E: folds",
+    "A: raises to 180",
+    "B: folds",
+    "C: raises to 400",
+    "D: raises to 900",
+    "A: calls 720",
+    "*** FLOP *** [10d, 8d, 6h]",
+    "F: raises to 100",
+    "A: checks",
+    "A: shows a Ad, Kd.",
+    "D: shows a 7c, 7s.",
+])
+
+
+def test_preflop_actions():
+    # C はリンプのあとのレイズで 3bet、D のオープン後の 4bet はオープンのまま。
+    # フォールドだけの B・E とフロップ以降の F は数えない
+    assert preflop_actions(HISTORY) == {"C": THREE_BET, "D": OPEN, "A": THREE_BET}
+    assert preflop_actions("A: posts big blind 20\nB: calls 20\nA: checks") == {"B": CALL}
+
+
+def test_shown_holdings():
+    assert shown_holdings(HISTORY) == [
+        ("A", THREE_BET, parse_card("Ad"), parse_card("Kd")),
+        ("D", OPEN, parse_card("7c"), parse_card("7s")),
+    ]
+    # AKs は 0 行 1 列、AKo は 1 行 0 列、77 は対角線
+    assert cell_index(parse_card("Ad"), parse_card("Kd")) == 1
+    assert cell_index(parse_card("Kc"), parse_card("Ad")) == 13
+    assert cell_index(parse_card("7c"), parse_card("7s")) == 7 * 13 + 7
+
+
+def ranges(data_dir):
+    return {path: json.loads(text) for path, text in read_outputs(data_dir).items() if path.startswith(RANGES_DIR)}
+
+
+def test_cached_sessions_match_rebuild(log_tree, tmp_path, monkeypatch, capsys):
+    data_dir = log_tree / "data"
+    run_main(monkeypatch, log_tree)
+    first = ranges(data_dir)
+    assert first and sorted(path.stem for path in (data_dir / CACHE_DIR).glob("*.npz")) == \
+        ["20260202", "20260209", "20260216"]
+
+    # ログが変わらなければ、どの節もログを読み直さない
+    config = ConfigLoader(str(log_tree / "config"))
+    capsys.readouterr()
+    assert build_ranges(data_dir, config, PlayerRegistry(config), verbose=True) == []
+    assert "parsed" not in capsys.readouterr().out
+
+    # シーズン2（2/16）のログをシーズン1の 2/2 にもう1つ置くと、そのログのハンドは 2/2 で数える。
+    # --since の範囲外の 2/2 はログを読み、範囲内で集計した 2/16 は集計の結果を使い、2/9 はキャッシュのまま
+    copy_table(log_tree, "20260216", "20260216_table13", to_date="20260202", to_table="20260202_table99",
+               ledger=False)
+    run_main(monkeypatch, log_tree, "--since", "20260209", "-v")
+    output = capsys.readouterr().out
+    assert re.search(r"20260202: \d+ shown hands \(parsed\)", output)
+    assert re.search(r"20260216: \d+ shown hands \(aggregated\)", output)
+    assert "20260209: " not in output
+    cached = ranges(data_dir)
+
+    rebuilt = tmp_path / "rebuilt"
+    shutil.copytree(log_tree, rebuilt)
+    shutil.rmtree(rebuilt / "data" / "cache")
+    config = ConfigLoader(str(rebuilt / "config"))
+    build_ranges(rebuilt / "data", config, PlayerRegistry(config))
+
+    assert cached == ranges(rebuilt / "data")
+    assert cached != first
@@ -0,0 +1,53 @@
+"""--snapshot-format delta で書いたスナップショットから、all-time JSON と同じ累積値が復元できることを確認する"""
+
+import json
+
+import fetch_stats
+import snapshot_store
+from fast_table_fixture import build_db
+
+
+SESSIONS = ("20260622", "20260629", "20260706")
+
+
+def export(data_dir, date_str, *extra):
+    fetch_stats.main(["--date", date_str, "--data-dir", str(data_dir), *extra])
+
+
+def load_all_time(data_dir, date_str):
+    path = sorted((data_dir / "hand_histories" / date_str).glob("player-stats-all-time-*.json"))[-1]
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_delta_chain_matches_all_time_json(fast_table, tmp_path, monkeypatch):
+    json_dir, delta_dir = tmp_path / "json", tmp_path / "delta"
+    for date_str in SESSIONS:
+        # その日までのハンドだけを入れた DB で、両方の形式を書き出す
+        day_end = f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]} 23:59:59+00:00"
+        hands = [h for h in fast_table["hands"] if h["started_at"] <= day_end]
+        monkeypatch.setenv("DATABASE_URL", build_db(tmp_path / f"{date_str}.db", hands))
+        export(json_dir, date_str)
+        export(delta_dir, date_str, "--snapshot-format", "delta", "--keyframe-every", "2")
+
+    kinds = {
+        date_str: sorted(p.name.split("-")[2] for p in (delta_dir / "hand_histories" / date_str).iterdir())
+        for date_str in SESSIONS
+    }
+    assert kinds == {
+        "20260622": ["delta", "keyframe"],
+        "20260629": ["delta"],
+        "20260706": ["delta", "keyframe"],
+    }
+
+    for date_str in SESSIONS:
+        expected = load_all_time(json_dir, date_str)
+        players, last = snapshot_store.reconstruct(delta_dir, date_str)
+        assert last["watermark"] == expected["watermark"]
+        assert [(p["user_id"], p["display_name"], p["discord_id"], p["is_bot"]) for p in expected["players"]] == [
+            (p["user_id"], p["display_name"], p["discord_id"], p["is_bot"])
+            for p in sorted(players.values(), key=lambda p: (p["display_name"], p["user_id"]))
+        ]
+        assert {p["user_id"]: p["raw_totals"] for p in expected["players"]} == {
+            uid: p["raw_totals"] for uid, p in players.items()
+        }
@@ -0,0 +1,84 @@
+"""StatsAggregator のスタッツ計算（ログのハンドを範囲に分けた計算・EV収支の有無）を確認する"""
+
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+
+from config_loader import ConfigLoader
+from csv_formatter import PokerNowParser
+from hand_analysis import PlayerStats, StatsCalculator, calculate_players
+from player_registry import PlayerRegistry
+from stats_aggregator import PARALLEL_MIN_CHUNK_HANDS, StatsAggregator
+
+ROOT = Path(__file__).parent.parent
+LOGS = sorted((ROOT / "data" / "hand_histories").glob("*/*/poker_now_log_*.csv"))
+
+
+def load_histories(path):
+    parser = PokerNowParser(str(path))
+    formatted_text, _ = parser.parse()
+    return [h for h in formatted_text.split("\n\n") if h.strip()]
+
+
+def as_dicts(player_stats):
+    return {name: asdict(stats) for name, stats in player_stats.items()}
+
+
+# 最小・最大のログと、その間から数件
+SAMPLE_LOGS = sorted({LOGS[0], LOGS[-1], *LOGS[::25]}) if LOGS else []
+
+
+@pytest.mark.parametrize("path", SAMPLE_LOGS, ids=lambda p: f"{p.parent.parent.name}-{p.parent.name}")
+def test_chunks_merge_to_sequential(path):
+    histories = load_histories(path)
+    players = StatsCalculator(histories).get_all_players()
+    expected = as_dicts(calculate_players(histories, players))
+
+    for chunks in (2, 3, 7):
+        size = -(-len(histories) // chunks)
+        merged = {name: PlayerStats(display_name=name) for name in players}
+        for start in range(0, len(histories), size):
+            for name, stats in calculate_players(histories[start:start + size], players).items():
+                merged[name].merge(stats)
+        assert as_dicts(merged) == expected, chunks
+
+
+def test_aggregator_workers_match_sequential():
+    config = ConfigLoader(str(ROOT / "config"))
+    registry = PlayerRegistry(config)
+    sequential = StatsAggregator(config, registry, data_dir=str(ROOT / "data"))
+    parallel = StatsAggregator(config, registry, data_dir=str(ROOT / "data"), workers=3)
+    try:
+        # 一番短いログも範囲に分けて計算される
+        shortest = min(LOGS, key=lambda p: len(load_histories(p)))
+        for path in (shortest, LOGS[-1]):
+            histories = load_histories(path)
+            assert len(histories) >= 2 * PARALLEL_MIN_CHUNK_HANDS
+            assert as_dicts(parallel._calculate_player_stats(histories)) == \
+                as_dicts(sequential._calculate_player_stats(histories))
+        assert parallel._pool is not None
+    finally:
+        parallel.close()
+
+
+def test_ev_net_is_empty_without_adjustments():
+    histories = load_histories(LOGS[0])
+    players = StatsCalculator(histories).get_all_players()
+    from_log = next(stats for stats in calculate_players(histories, players).values() if stats.hands)
+    assert from_log.ev_hands == from_log.hands
+    assert from_log.ev_net == from_log.net + from_log.ev_adjustment
+
+    # 計算済み JSON のハンドが混ざると EV収支は求められない（収支で埋めない）
+    merged = PlayerStats(hands=10, net=5)
+    merged.merge(from_log)
+    assert merged.ev_net is None
+
+    row = {"player_id": "p", "プレイヤー": "p", "リーグ": "C", "収支": "+5", "ハンド数": "10",
+           **{column: "0" for column in ("VPIP_count", "VPIP_hands", "PFR_count", "PFR_hands",
+                                         "3bet_count", "3bet_hands", "Fold_to_3bet_count",
+                                         "Fold_to_3bet_hands", "CB_count", "CB_hands",
+                                         "WTSD_count", "WTSD_hands", "W$SD_count")}}
+    assert StatsAggregator._stats_from_raw_row(row).ev_net is None
+    assert StatsAggregator._stats_from_raw_row(dict(row, **{"EV収支": "", "ev_adjustment": ""})).ev_net is None
+    assert StatsAggregator._stats_from_raw_row(dict(row, **{"EV収支": "+7", "ev_adjustment": "2.0"})).ev_net == 7